@@ -0,0 +1,177 @@
+"""
+Compare list.sort() of a natively compiled SPy program with CPython's
+list.sort() on the same data.
+
+Usage:
+    python benchmarks/sort_vs_cpython.py [-n SIZE] [-r RUNS]
+
+The data is generated by the same LCG on both sides, in five shapes: random,
+few distinct values, already sorted, reversed and "sawtooth" (i % 100). For
+each shape we sort a list[i32] and a list[f64], plus a list[i32] with a key.
+The SPy program is built with `spy build --release --gc=none` and measures
+itself with time.time(), so that the build and the startup are not included;
+on the CPython side we use time.perf_counter() on equivalent lists of ints
+and floats. The times reported are the best of RUNS.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHAPES = ["random", "few", "sorted", "reversed", "sawtooth"]
+
+SPY_SRC = """
+import time
+
+def neg(x: i32) -> i32:
+    return -x
+
+def fmin(a: f64, b: f64) -> f64:
+    if a < b:
+        return a
+    return b
+
+def make(kind: i32, n: i32) -> list[i32]:
+    lst = list[i32]()
+    seed = 1
+    i = 0
+    while i < n:
+        seed = (seed * 75 + 74) % 65537
+        if kind == 0:
+            lst.append(seed)
+        elif kind == 1:
+            lst.append(seed % 10)
+        elif kind == 2:
+            lst.append(i)
+        elif kind == 3:
+            lst.append(n - i)
+        else:
+            lst.append(i % 100)
+        i += 1
+    return lst
+
+def to_f64(lst: list[i32]) -> list[f64]:
+    res = list[f64]()
+    for x in lst:
+        res.append(x / 7.0)
+    return res
+
+def main() -> None:
+    kind = 0
+    while kind < 5:
+        src = make(kind, {n})
+        fsrc = to_f64(src)
+        best_i = 1000.0
+        best_f = 1000.0
+        best_k = 1000.0
+        r = 0
+        while r < {runs}:
+            a = src.copy()
+            t0 = time.time()
+            a.sort()
+            t1 = time.time()
+            best_i = fmin(best_i, t1 - t0)
+            b = fsrc.copy()
+            t0 = time.time()
+            b.sort()
+            t1 = time.time()
+            best_f = fmin(best_f, t1 - t0)
+            c = src.copy()
+            t0 = time.time()
+            c.sort(neg)
+            t1 = time.time()
+            best_k = fmin(best_k, t1 - t0)
+            r += 1
+        print(best_i)
+        print(best_f)
+        print(best_k)
+        kind += 1
+"""
+
+
+def make(kind: int, n: int) -> list[int]:
+    lst = []
+    seed = 1
+    for i in range(n):
+        seed = (seed * 75 + 74) % 65537
+        if kind == 0:
+            lst.append(seed)
+        elif kind == 1:
+            lst.append(seed % 10)
+        elif kind == 2:
+            lst.append(i)
+        elif kind == 3:
+            lst.append(n - i)
+        else:
+            lst.append(i % 100)
+    return lst
+
+
+def neg(x: int) -> int:
+    return -x
+
+
+def best_of(runs: int, src: list[Any], key: Callable[[Any], Any] | None) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        lst = src.copy()
+        a = time.perf_counter()
+        lst.sort(key=key)
+        b = time.perf_counter()
+        best = min(best, b - a)
+    return best
+
+
+def run_spy(n: int, runs: int) -> list[float]:
+    with tempfile.TemporaryDirectory(prefix="spy-sort-") as tmpdir:
+        spyfile = os.path.join(tmpdir, "sort_bench.spy")
+        with open(spyfile, "w") as f:
+            f.write(SPY_SRC.format(n=n, runs=runs))
+        cmd = [
+            sys.executable,
+            "-m",
+            "spy",
+            "build",
+            "--release",
+            "--gc=none",
+            "-x",
+            spyfile,
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=ROOT)
+    # the first line is the "[release] build/..." message of spy build
+    lines = out.stdout.splitlines()[1:]
+    return [float(line) for line in lines]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--size", type=int, default=100_000)
+    parser.add_argument("-r", "--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    spy_times = run_spy(args.size, args.runs)
+    print(f"n = {args.size}, best of {args.runs} runs (ms)")
+    print(f"    {'':20s} {'SPy':>9s} {'CPython':>9s} {'speedup':>8s}")
+    for kind, shape in enumerate(SHAPES):
+        src = make(kind, args.size)
+        fsrc = [x / 7.0 for x in src]
+        cpy_times = [
+            best_of(args.runs, src, None),
+            best_of(args.runs, fsrc, None),
+            best_of(args.runs, src, neg),
+        ]
+        for j, what in enumerate(["i32", "f64", "i32, key"]):
+            spy_t = spy_times[kind * 3 + j] * 1000
+            cpy_t = cpy_times[j] * 1000
+            label = f"{shape} ({what})"
+            speedup = cpy_t / spy_t if spy_t else float("inf")
+            print(f"    {label:20s} {spy_t:9.3f} {cpy_t:9.3f} {speedup:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Compare the cold-start time of `spy execute` with the binary .spyc format and
+with the old pickle-based one.
+
+Usage:
+    python benchmarks/spyc_coldstart.py [-n RUNS] [FILE.spy ...]
+
+By default it runs examples/hello.spy and examples/dict_example.spy (which
+imports _dict and _list from the stdlib).
+
+Each measurement is a fresh process, with a warm cache: we run the program
+once to populate __pycache__, then we time RUNS executions. The pickle
+format is emulated by monkey-patching ImportAnalyzer to store the pickled
+ast.Module in a separate .spyc.pickle file, as SPy did before SPYC_VERSION 3.
+
+The end-to-end time is dominated by importing spy itself, so we also measure
+the module loading alone, in process: "load" is ImportAnalyzer.parse_all()
+(the best of RUNS), and "load+bodies" also walks all the nodes, which forces
+the lazily-decoded function bodies of the .spyc format.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FILES = ["examples/hello.spy", "examples/dict_example.spy"]
+
+
+def patch_pickle_format() -> None:
+    from spy.analyze.importing import ImportAnalyzer
+
+    def _get_spyc(self: Any, spyfile: Any) -> Any:
+        pycache = spyfile.dirpath("__pycache__")
+        return pycache.join(f"{spyfile.purebasename}.spyc.pickle")
+
+    def _load_spyc(self: Any, spyfile: Any, spyc: Any, modname: str) -> Any:
+        with spyc.open("rb") as f:
+            mod = pickle.load(f)["module"]
+        self.cached_mods[modname] = spyc
+        return mod
+
+    def _save_spyc(self: Any, mod: Any, spyc: Any) -> None:
+        spyc.dirpath().ensure(dir=True)
+        with spyc.open("wb") as f:
+            pickle.dump({"version": 2, "module": mod}, f)
+
+    ImportAnalyzer._get_spyc = _get_spyc  # type: ignore
+    ImportAnalyzer._load_spyc = _load_spyc  # type: ignore
+    ImportAnalyzer._save_spyc = _save_spyc  # type: ignore
+
+
+def run_one(fmt: str, filename: str) -> None:
+    if fmt == "pickle":
+        patch_pickle_format()
+    from spy.cli import app
+
+    sys.argv = ["spy", "execute", filename]
+    app()
+
+
+def best_of(runs: int, fn: Any) -> float:
+    best = float("inf")
+    for i in range(runs):
+        a = time.perf_counter()
+        fn()
+        b = time.perf_counter()
+        best = min(best, b - a)
+    return best
+
+
+def run_load(fmt: str, filename: str, runs: int) -> None:
+    if fmt == "pickle":
+        patch_pickle_format()
+    from spy import ast
+    from spy.analyze.importing import ImportAnalyzer
+    from spy.vm.vm import SPyVM
+
+    vm = SPyVM()
+    vm.path.append(os.path.dirname(os.path.abspath(filename)))
+    modname = os.path.splitext(os.path.basename(filename))[0]
+    ImportAnalyzer(vm, modname).parse_all()  # populate the cache
+
+    def load() -> ImportAnalyzer:
+        analyzer = ImportAnalyzer(vm, modname)
+        analyzer.parse_all()
+        assert analyzer.cached_mods, "the cache was not used"
+        return analyzer
+
+    def load_bodies() -> None:
+        for mod in load().mods.values():
+            if isinstance(mod, ast.Module):
+                for node in mod.walk():
+                    pass
+
+    print(json.dumps([best_of(runs, load), best_of(runs, load_bodies)]))
+
+
+def measure_load(fmt: str, filename: str, runs: int) -> list[float]:
+    cmd = [sys.executable, __file__, "--load", fmt, "-n", str(runs), filename]
+    res = subprocess.run(cmd, check=True, capture_output=True, cwd=ROOT, text=True)
+    return json.loads(res.stdout.splitlines()[-1])
+
+
+def measure(fmt: str, filename: str, runs: int) -> list[float]:
+    cmd = [sys.executable, __file__, "--run", fmt, filename]
+    # populate the cache
+    subprocess.run(cmd, check=True, capture_output=True, cwd=ROOT)
+    times = []
+    for i in range(runs):
+        a = time.perf_counter()
+        subprocess.run(cmd, check=True, capture_output=True, cwd=ROOT)
+        b = time.perf_counter()
+        times.append(b - a)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--run", choices=["pickle", "spyc"])
+    parser.add_argument("--load", choices=["pickle", "spyc"])
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    if args.run:
+        [filename] = args.files
+        run_one(args.run, filename)
+        return
+    if args.load:
+        [filename] = args.files
+        run_load(args.load, filename, args.runs)
+        return
+
+    for filename in args.files or DEFAULT_FILES:
+        print(f"{filename} ({args.runs} runs)")
+        for fmt in ["pickle", "spyc"]:
+            times = measure(fmt, filename, args.runs)
+            mean = statistics.mean(times) * 1000
+            stdev = statistics.stdev(times) * 1000 if len(times) > 1 else 0.0
+            best = min(times) * 1000
+            print(
+                f"    {fmt:7s} mean {mean:7.1f} ms ± {stdev:5.1f}   min {best:7.1f} ms"
+            )
+        for fmt in ["pickle", "spyc"]:
+            load, load_bodies = measure_load(fmt, filename, args.runs)
+            print(
+                f"    {fmt:7s} load {load * 1000:7.2f} ms   "
+                f"load+bodies {load_bodies * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,17 @@
 #   ./monitor_gc.sh
 #
 # This script:
-#   1. Compiles examples/gc_stress.spy with --gc=none and --gc=bdwgc
+#   1. Compiles examples/gc_stress.spy for native with --gc=none, --gc=bdwgc
+#      and --gc=spygc
 #   2. Runs each binary while sampling RSS (resident set size) every 0.1s
 #   3. Reports peak RSS for each run
+#   4. Compiles examples/gc_stress.spy for wasi with --gc=none and
+#      --gc=spygc, and reports the final size of the linear memory. WASM
+#      memory never shrinks, so this is also the peak.
 #
 # Expected result:
-#   --gc=none:  peak RSS grows unbounded (proportional to total allocations)
-#   --gc=bdwgc: peak RSS stays bounded (GC reclaims memory)
+#   --gc=none:  peak memory grows unbounded (proportional to total allocations)
+#   --gc=bdwgc, --gc=spygc: peak memory stays bounded (GC reclaims memory)
 
 set -e
 
@@ -29,6 +33,23 @@ echo "=== Compiling with --gc=bdwgc ==="
 spy build -t native --gc bdwgc -b "$BUILD_DIR" "$SPY_FILE"
 cp "$BUILD_DIR/gc_stress" "$BUILD_DIR/gc_stress_bdwgc"
 
+echo ""
+echo "=== Compiling with --gc=spygc ==="
+spy build -t native --gc spygc -b "$BUILD_DIR" "$SPY_FILE"
+cp "$BUILD_DIR/gc_stress" "$BUILD_DIR/gc_stress_spygc"
+
+# wasi executables are built in release mode: in debug mode they need
+# spy_debug_log & co. from the host
+echo ""
+echo "=== Compiling for wasi with --gc=none ==="
+spy build -t wasi --release --gc none -b "$BUILD_DIR" "$SPY_FILE"
+cp "$BUILD_DIR/gc_stress.wasm" "$BUILD_DIR/gc_stress_none.wasm"
+
+echo ""
+echo "=== Compiling for wasi with --gc=spygc ==="
+spy build -t wasi --release --gc spygc -b "$BUILD_DIR" "$SPY_FILE"
+cp "$BUILD_DIR/gc_stress.wasm" "$BUILD_DIR/gc_stress_spygc.wasm"
+
 # monitor_rss: run a command in background and sample its RSS
 # Usage: monitor_rss <label> <executable>
 monitor_rss() {
@@ -64,8 +85,23 @@ echo ""
 echo "=== Running with --gc=bdwgc ==="
 monitor_rss "--gc=bdwgc" "$BUILD_DIR/gc_stress_bdwgc"
 
+echo ""
+echo "=== Running with --gc=spygc ==="
+monitor_rss "--gc=spygc" "$BUILD_DIR/gc_stress_spygc"
+
+echo ""
+echo "=== Running wasi with --gc=none ==="
+python -m spy.tool.wasmtime --memory-stats "$BUILD_DIR/gc_stress_none.wasm"
+
+echo ""
+echo "=== Running wasi with --gc=spygc ==="
+SPYGC_STATS=1 python -m spy.tool.wasmtime --memory-stats "$BUILD_DIR/gc_stress_spygc.wasm"
+
 # Cleanup temporary binaries
-rm -f "$BUILD_DIR/gc_stress_none" "$BUILD_DIR/gc_stress_bdwgc"
+rm -f "$BUILD_DIR/gc_stress_none" "$BUILD_DIR/gc_stress_bdwgc" \
+      "$BUILD_DIR/gc_stress_spygc" "$BUILD_DIR/gc_stress_none.wasm" \
+      "$BUILD_DIR/gc_stress_spygc.wasm"
 
 echo ""
-echo "Done. With --gc=none, peak RSS should be much larger than with --gc=bdwgc."
+echo "Done. With --gc=none, peak memory should be much larger than with"
+echo "--gc=bdwgc and --gc=spygc."
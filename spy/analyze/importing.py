@@ -1,5 +1,4 @@
 import os
-import pickle
 from collections import deque
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Optional, Union
@@ -7,6 +6,7 @@ from typing import TYPE_CHECKING, Optional, Union
 import py.path
 
 from spy import ast
+from spy.analyze import spycformat
 from spy.analyze.scope import ScopeAnalyzer
 from spy.fqn import FQN
 from spy.parser import Parser
@@ -21,7 +21,7 @@ if TYPE_CHECKING:
 MODULE = Union[ast.Module, "W_Module", None]
 
 # Cache version: increment this when ast.Module or SymTable structure changes
-SPYC_VERSION = 2
+SPYC_VERSION = 5
 
 
 @dataclass
@@ -102,6 +102,7 @@ class ImportAnalyzer:
 
     def __init__(self, vm: "SPyVM", modname: str, use_spyc: bool = True) -> None:
         self.vm = vm
+        self.main_modname = modname
         self.queue = deque([modname])
         self.mods: dict[str, MODULE] = {}
         self.deps: dict[str, OrderedSet[str]] = {}  # modname -> list_of_imports
@@ -138,18 +139,18 @@ class ImportAnalyzer:
         Load a module from .spyc file.
         """
         try:
-            with spyc.open("rb") as f:
-                data = pickle.load(f)
-            if data["version"] == SPYC_VERSION:
+            data = spyc.read_binary()
+            cache_version = spycformat.read_version(data)
+            if cache_version == SPYC_VERSION:
                 # cache is valid
-                mod = data["module"]
-                assert isinstance(mod, ast.Module)
+                mod = spycformat.load(data)
                 assert mod.filename == str(spyfile)
                 self.cached_mods[modname] = spyc
                 return mod
             else:
-                # Version mismatch - record error and invalidate cache
-                cache_version = data["version"]
+                # Version mismatch (or a .spyc in an unknown format, e.g. one
+                # produced by an old version of SPy) - record error and
+                # invalidate cache
                 error = CacheError(
                     spyc=str(spyc),
                     operation="load",
@@ -174,15 +175,25 @@ class ImportAnalyzer:
             # Otherwise, return None to force re-parsing
             return None
 
+    def record_cache_error(self, spyc: str, operation: str, e: Exception) -> None:
+        """
+        Record an error which happened while loading or saving a cache file.
+
+        cli.py has robust_import_caching enabled: in that case we just want to
+        ignore the error. But during tests, we want to always raise it.
+        """
+        error = CacheError(spyc=spyc, operation=operation, error_message=str(e))
+        self.cache_errors.append(error)
+        if not self.vm.robust_import_caching:
+            raise e
+
     def _save_spyc(self, mod: ast.Module, spyc: py.path.local) -> None:
         """
         Save a module to cache file with version information.
         """
         try:
             spyc.dirpath().ensure(dir=True)
-            data = {"version": SPYC_VERSION, "module": mod}
-            with spyc.open("wb") as f:
-                pickle.dump(data, f)
+            spyc.write_binary(spycformat.dump(mod, SPYC_VERSION))
         except Exception as e:
             # Record the error
             error = CacheError(
@@ -440,7 +451,11 @@ class ImportAnalyzer:
     # visitor pattern to recurively find all "import" statements
 
     def visit(self, mod: ast.Module) -> None:
-        mod.visit("visit", self)
+        # imports are allowed only at module level, so we don't need to visit
+        # the function bodies, which might be lazily loaded from the .spyc
+        for decl in mod.decls:
+            if isinstance(decl, ast.Import):
+                self.visit_Import(decl)
 
     def visit_Import(self, imp: ast.Import) -> None:
         assert self.cur_modname is not None
@@ -0,0 +1,482 @@
+"""
+Binary format of .spyc files.
+
+A .spyc file contains an UNTYPED ast.Module, together with the symtables
+computed by ScopeAnalyzer. The layout is the following:
+
+    header      magic b"SPYC" + u32 version
+    strings     varint count, then for each string: varint size + utf-8 bytes
+    blobs       varint count, then the varint size of each blob
+    module      varint size + encoded ast.Module
+    ...         the blobs, one after the other
+
+All the strings (identifiers, filenames, string literals, etc.) are stored
+only once in the string table and referenced by index.
+
+Locs are delta-encoded against the previous Loc in the stream: the filename
+is stored only when it changes, and line_start relatively to the previous
+line. Most Locs take only 4-5 bytes.
+
+The body of each FuncDef is stored in a separate blob, which is decoded only
+when the body is accessed for the first time (see ast.LazyField). This way we
+don't pay the cost of decoding functions which are never called (e.g. most of
+the functions in _list.spy and _dict.spy).
+"""
+
+import dataclasses
+import struct
+from typing import Any, Callable, Optional
+
+from spy import ast
+from spy.analyze.symtable import ImportRef, Symbol, SymTable
+from spy.location import Loc
+
+MAGIC = b"SPYC"
+HEADER = struct.Struct("<4sI")
+FLOAT = struct.Struct("<d")
+
+# tags of the encoded values
+T_NONE = 0
+T_FALSE = 1
+T_TRUE = 2
+T_INT = 3
+T_FLOAT = 4
+T_STR = 5
+T_LIST = 6
+T_NODE = 7
+T_LOC = 8
+T_IMPORTREF = 9
+T_SYMBOL = 10
+T_SYMTABLE = 11
+T_BODY = 12
+
+# the Loc which is used as a base for the first Loc of the stream
+NO_LOC = Loc("", 0, 0, 0, 0)
+
+_FIELDS: dict[type, tuple[str, ...]] = {}
+
+
+def get_fields(cls: type) -> tuple[str, ...]:
+    fields = _FIELDS.get(cls)
+    if fields is None:
+        fields = tuple(f.name for f in dataclasses.fields(cls))
+        _FIELDS[cls] = fields
+    return fields
+
+
+def read_version(data: bytes) -> Optional[int]:
+    """
+    Return the version of the given .spyc data, or None if it's not in a
+    format that we recognize.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        return None
+    return version
+
+
+def dump(mod: ast.Module, version: int) -> bytes:
+    return SPyCWriter().dump(mod, version)
+
+
+def load(data: bytes) -> ast.Module:
+    return SPyCReader(data).load()
+
+
+class SPyCWriter:
+    strings: dict[str, int]
+    blobs: list[bytes]
+    buf: bytearray
+    last_loc: Loc
+
+    def __init__(self) -> None:
+        self.strings = {}
+        self.blobs = []
+        self.buf = bytearray()
+        self.last_loc = NO_LOC
+        self.dispatch: dict[type, Callable[[Any], None]] = {
+            type(None): self.write_None,
+            bool: self.write_bool,
+            int: self.write_int,
+            float: self.write_float,
+            str: self.write_str_value,
+            list: self.write_list,
+            Loc: self.write_loc_value,
+            ImportRef: self.write_ImportRef,
+            Symbol: self.write_Symbol,
+            SymTable: self.write_SymTable,
+        }
+
+    def dump(self, mod: ast.Module, version: int) -> bytes:
+        self.write_value(mod)
+        main = self.buf
+        self.buf = out = bytearray(HEADER.pack(MAGIC, version))
+        self.write_varint(len(self.strings))
+        for s in self.strings:  # dicts are ordered by insertion
+            b = s.encode("utf-8", "surrogatepass")
+            self.write_varint(len(b))
+            out += b
+        self.write_varint(len(self.blobs))
+        for blob in self.blobs:
+            self.write_varint(len(blob))
+        self.write_varint(len(main))
+        out += main
+        for blob in self.blobs:
+            out += blob
+        return bytes(out)
+
+    # ==== low-level encoding ====
+
+    def write_varint(self, n: int) -> None:
+        assert n >= 0
+        buf = self.buf
+        while n >= 0x80:
+            buf.append((n & 0x7F) | 0x80)
+            n >>= 7
+        buf.append(n)
+
+    def write_sint(self, n: int) -> None:
+        # zigzag encoding: 0, -1, 1, -2, 2, ... => 0, 1, 2, 3, 4, ...
+        self.write_varint(n << 1 if n >= 0 else ((-n) << 1) - 1)
+
+    def write_str(self, s: str) -> None:
+        i = self.strings.get(s)
+        if i is None:
+            i = self.strings[s] = len(self.strings)
+        self.write_varint(i)
+
+    def write_loc(self, loc: Loc) -> None:
+        last = self.last_loc
+        if loc.filename == last.filename:
+            self.buf.append(0)
+        else:
+            self.buf.append(1)
+            self.write_str(loc.filename)
+        self.write_sint(loc.line_start - last.line_start)
+        self.write_sint(loc.line_end - loc.line_start)
+        self.write_sint(loc.col_start)
+        self.write_sint(loc.col_end - loc.col_start)
+        self.last_loc = loc
+
+    # ==== values ====
+
+    def write_value(self, value: Any) -> None:
+        meth = self.dispatch.get(type(value))
+        if meth is not None:
+            meth(value)
+        elif isinstance(value, ast.Node):
+            self.write_node(value)
+        else:
+            raise TypeError(f"cannot store in .spyc: {value!r}")
+
+    def write_None(self, value: None) -> None:
+        self.buf.append(T_NONE)
+
+    def write_bool(self, value: bool) -> None:
+        self.buf.append(T_TRUE if value else T_FALSE)
+
+    def write_int(self, value: int) -> None:
+        self.buf.append(T_INT)
+        self.write_sint(value)
+
+    def write_float(self, value: float) -> None:
+        self.buf.append(T_FLOAT)
+        self.buf += FLOAT.pack(value)
+
+    def write_str_value(self, value: str) -> None:
+        self.buf.append(T_STR)
+        self.write_str(value)
+
+    def write_list(self, value: list) -> None:
+        self.buf.append(T_LIST)
+        self.write_varint(len(value))
+        for item in value:
+            self.write_value(item)
+
+    def write_loc_value(self, loc: Loc) -> None:
+        self.buf.append(T_LOC)
+        self.write_loc(loc)
+
+    def write_ImportRef(self, ref: ImportRef) -> None:
+        self.buf.append(T_IMPORTREF)
+        self.write_str(ref.modname)
+        self.write_value(ref.attr)
+
+    def write_Symbol(self, sym: Symbol) -> None:
+        self.buf.append(T_SYMBOL)
+        self.write_str(sym.name)
+        self.write_str(sym.varkind)
+        self.write_str(sym.varkind_origin)
+        self.write_str(sym.storage)
+        self.write_loc(sym.loc)
+        self.write_loc(sym.type_loc)
+        self.write_sint(sym.level)
+        self.write_value(sym.impref)
+
+    def write_SymTable(self, symtable: SymTable) -> None:
+        self.buf.append(T_SYMTABLE)
+        self.write_str(symtable.name)
+        self.write_str(symtable.color)
+        self.write_str(symtable.kind)
+        self.write_varint(len(symtable._symbols))
+        for sym in symtable._symbols.values():
+            self.write_Symbol(sym)
+        self.write_varint(len(symtable.implicit_imports))
+        for modname in sorted(symtable.implicit_imports):
+            self.write_str(modname)
+
+    def write_node(self, node: ast.Node) -> None:
+        cls = type(node)
+        self.buf.append(T_NODE)
+        self.write_str(cls.__name__)
+        for name in get_fields(cls):
+            if name == "body" and cls is ast.FuncDef:
+                assert isinstance(node, ast.FuncDef)
+                self.write_body(node)
+            else:
+                self.write_value(getattr(node, name))
+
+    def write_body(self, funcdef: ast.FuncDef) -> None:
+        """
+        Write the body of the funcdef into its own blob.
+
+        The Locs inside the blob are relative to funcdef.loc, so that the blob
+        can be decoded independently of the rest of the stream.
+        """
+        saved = self.buf, self.last_loc
+        self.buf = bytearray()
+        self.last_loc = funcdef.loc
+        self.write_value(funcdef.body)
+        blob = bytes(self.buf)
+        self.buf, self.last_loc = saved
+        self.blobs.append(blob)
+        self.buf.append(T_BODY)
+        self.write_varint(len(self.blobs) - 1)
+
+
+class LazyBody(ast.LazyValue):
+    """
+    The not-yet-decoded body of a FuncDef
+    """
+
+    def __init__(self, reader: "SPyCReader", index: int, loc: Loc) -> None:
+        self.reader = reader
+        self.index = index
+        self.loc = loc
+
+    def load(self) -> list[ast.Stmt]:
+        return self.reader.read_blob(self.index, self.loc)
+
+    def __reduce__(self) -> Any:
+        # the reader cannot be pickled: pickle the decoded body instead
+        return (list, (self.load(),))
+
+
+class SPyCReader:
+    data: bytes
+    pos: int
+    strings: list[str]
+    blobs: list[tuple[int, int]]  # [(start, end), ...]
+    last_loc: Loc
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = HEADER.size
+        self.strings = []
+        self.blobs = []
+        self.last_loc = NO_LOC
+        self.classes: dict[int, type[ast.Node]] = {}
+        self.dispatch: list[Callable[[], Any]] = [
+            lambda: None,  # T_NONE
+            lambda: False,  # T_FALSE
+            lambda: True,  # T_TRUE
+            self.read_int,
+            self.read_float,
+            self.read_str_value,
+            self.read_list,
+            self.read_node,
+            self.read_loc,
+            self.read_ImportRef,
+            self.read_Symbol,
+            self.read_SymTable,
+            self.read_body,
+        ]
+
+    def load(self) -> ast.Module:
+        data = self.data
+        n = self.read_varint()
+        strings = self.strings
+        for i in range(n):
+            size = self.read_varint()
+            start = self.pos
+            self.pos = start + size
+            strings.append(data[start : self.pos].decode("utf-8", "surrogatepass"))
+
+        sizes = [self.read_varint() for i in range(self.read_varint())]
+        main_size = self.read_varint()
+        start = self.pos + main_size
+        for size in sizes:
+            self.blobs.append((start, start + size))
+            start += size
+        assert start == len(data)
+
+        mod = self.read_value()
+        assert isinstance(mod, ast.Module)
+        return mod
+
+    def read_blob(self, index: int, loc: Loc) -> Any:
+        saved = self.pos, self.last_loc
+        self.pos, end = self.blobs[index]
+        self.last_loc = loc
+        res = self.read_value()
+        assert self.pos == end
+        self.pos, self.last_loc = saved
+        return res
+
+    # ==== low-level decoding ====
+
+    def read_varint(self) -> int:
+        data = self.data
+        pos = self.pos
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            self.pos = pos
+            return b
+        res = b & 0x7F
+        shift = 7
+        while True:
+            b = data[pos]
+            pos += 1
+            res |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return res
+
+    def read_sint(self) -> int:
+        n = self.read_varint()
+        return -((n + 1) >> 1) if n & 1 else n >> 1
+
+    def read_str(self) -> str:
+        return self.strings[self.read_varint()]
+
+    def read_loc(self) -> Loc:
+        # this is the hottest path of the decoder, so it is a bit more
+        # optimized than the rest
+        last = self.last_loc
+        data = self.data
+        if data[self.pos]:
+            self.pos += 1
+            filename = self.read_str()
+        else:
+            self.pos += 1
+            filename = last.filename
+        pos = self.pos
+        deltas = data[pos : pos + 4]
+        if len(deltas) == 4 and max(deltas) < 0x80:
+            # fast path: all the four deltas fit in one byte
+            a, b, c, d = deltas
+            self.pos = pos + 4
+            # inline zigzag decoding, see write_sint
+            line_start = last.line_start + ((a >> 1) ^ -(a & 1))
+            line_end = line_start + ((b >> 1) ^ -(b & 1))
+            col_start = (c >> 1) ^ -(c & 1)
+            col_end = col_start + ((d >> 1) ^ -(d & 1))
+        else:
+            line_start = last.line_start + self.read_sint()
+            line_end = line_start + self.read_sint()
+            col_start = self.read_sint()
+            col_end = col_start + self.read_sint()
+        # bypass the __init__ of the frozen dataclass, which is slow
+        loc = object.__new__(Loc)
+        ld = loc.__dict__
+        ld["filename"] = filename
+        ld["line_start"] = line_start
+        ld["line_end"] = line_end
+        ld["col_start"] = col_start
+        ld["col_end"] = col_end
+        self.last_loc = loc
+        return loc
+
+    # ==== values ====
+
+    def read_value(self) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+        return self.dispatch[tag]()
+
+    def read_int(self) -> int:
+        return self.read_sint()
+
+    def read_float(self) -> float:
+        pos = self.pos
+        self.pos = pos + FLOAT.size
+        return FLOAT.unpack_from(self.data, pos)[0]
+
+    def read_str_value(self) -> str:
+        return self.read_str()
+
+    def read_list(self) -> list:
+        read_value = self.read_value
+        return [read_value() for i in range(self.read_varint())]
+
+    def read_ImportRef(self) -> ImportRef:
+        modname = self.read_str()
+        attr = self.read_value()
+        return ImportRef(modname, attr)
+
+    def read_Symbol(self) -> Symbol:
+        name = self.read_str()
+        varkind: Any = self.read_str()
+        varkind_origin: Any = self.read_str()
+        storage: Any = self.read_str()
+        return Symbol(
+            name,
+            varkind,
+            varkind_origin,
+            storage,
+            loc=self.read_loc(),
+            type_loc=self.read_loc(),
+            level=self.read_sint(),
+            impref=self.read_value(),
+        )
+
+    def read_SymTable(self) -> SymTable:
+        name = self.read_str()
+        color: Any = self.read_str()
+        kind: Any = self.read_str()
+        symtable = SymTable(name, color, kind)
+        for i in range(self.read_varint()):
+            self.pos += 1  # T_SYMBOL
+            sym = self.read_Symbol()
+            symtable._symbols[sym.name] = sym
+        for i in range(self.read_varint()):
+            symtable.implicit_imports.add(self.read_str())
+        return symtable
+
+    def read_node(self) -> ast.Node:
+        i = self.read_varint()
+        cls = self.classes.get(i)
+        if cls is None:
+            cls = getattr(ast, self.strings[i])
+            assert isinstance(cls, type) and issubclass(cls, ast.Node)
+            self.classes[i] = cls
+        # bypass __init__ and __post_init__: the node has already been
+        # validated when it was created by the parser
+        node = cls.__new__(cls)
+        d = node.__dict__
+        read_value = self.read_value
+        for name in get_fields(cls):
+            d[name] = read_value()
+        if cls is ast.FuncDef:
+            # the Locs of the body are relative to the Loc of the FuncDef
+            d["body"].loc = d["loc"]
+        return node
+
+    def read_body(self) -> LazyBody:
+        # the loc is filled by read_node
+        return LazyBody(self, self.read_varint(), NO_LOC)
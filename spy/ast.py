@@ -85,12 +85,52 @@ class AST:
 del AST
 
 
+class LazyValue:
+    """
+    Placeholder for the value of a lazy field, which is computed on first
+    access. See LazyField.
+    """
+
+    def load(self) -> Any:
+        raise NotImplementedError
+
+
+class LazyField:
+    """
+    Descriptor for the fields declared with field(metadata={"lazy": True}).
+
+    The value is stored in the __dict__ of the node as usual, but it can also
+    be a LazyValue: in that case, it is loaded and replaced by the actual value
+    on first access. This is used by spycformat to decode the body of the
+    FuncDefs only when needed.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __get__(self, node: Any, owner: Any = None) -> Any:
+        if node is None:
+            return self
+        d = node.__dict__
+        value = d[self.name]
+        if isinstance(value, LazyValue):
+            value = d[self.name] = value.load()
+        return value
+
+    def __set__(self, node: Any, value: Any) -> None:
+        node.__dict__[self.name] = value
+
+
 @dataclass_transform(field_specifiers=(dataclasses.field,), eq_default=False)
 def astnode[T](klass: Type[T]) -> Type[T]:
     """Decorator to create dataclasses for AST nodes
     We want all nodes to compare by *identity* and be hashable, because e.g. we
     put them in dictionaries inside the typechecker."""
-    return dataclass(eq=False)(klass)
+    klass = dataclass(eq=False)(klass)
+    for name, f in getattr(klass, "__dataclass_fields__").items():
+        if f.metadata.get("lazy"):
+            setattr(klass, name, LazyField(name))
+    return klass
 
 
 @astnode
@@ -527,7 +567,8 @@ class FuncDef(Stmt):
     args: list[FuncArg]
     return_type: "Expr"
     docstring: Optional[str]
-    body: list["Stmt"]
+    # .spyc files decode the body lazily, see spycformat.py
+    body: list["Stmt"] = field(metadata={"lazy": True})
     decorators: list["Expr"]
     symtable: Any = field(repr=False, default=None)
 
@@ -172,7 +172,10 @@ class BinOp(Expr):
         r = str(self.right)
         if self.left.precedence() < self.precedence():
             l = f"({l})"
-        if self.right.precedence() < self.precedence():
+        # the binary operators are left-associative (apart from "=", which we
+        # never nest), so we need the parenthesis also when the right side has
+        # the same precedence, e.g. a - (b - c)
+        if self.right.precedence() <= self.precedence():
             r = f"({r})"
         return f"{l} {self.op} {r}"
 
@@ -1,17 +1,21 @@
+import hashlib
+import re
 from typing import Optional
 
 import py.path
 
 from spy.backend.c.cffiwriter import CFFIWriter
 from spy.backend.c.cmodwriter import CModule, CModuleWriter
+from spy.backend.c.cstrconsts import CStrConsts
 from spy.backend.c.cstructwriter import CStructDefs, CStructWriter
 from spy.build.cffi import cffi_build
 from spy.build.config import BuildConfig
 from spy.build.ninja import NinjaWriter
+from spy.fqn import FQN
 from spy.highlight import highlight_src
 from spy.vm.cell import W_Cell
 from spy.vm.function import W_ASTFunc
-from spy.vm.modules.unsafe.ptr import W_MemLocType
+from spy.vm.modules.unsafe.ptr import W_MemLocType, W_PtrType, W_RefType
 from spy.vm.object import W_Object, W_Type
 from spy.vm.primitive import W_I32
 from spy.vm.struct import W_StructType
@@ -30,8 +34,10 @@ class CBackend:
     build_dir: py.path.local
     dump_c: bool
     cffi: CFFIWriter
+    strconsts: CStrConsts
     ninja: Optional[NinjaWriter]
     c_structdefs: dict[str, CStructDefs]
+    structdefs_hfiles: dict[FQN, str]
     c_modules: dict[str, CModule]
     cfiles: list[py.path.local]
     build_script: Optional[py.path.local]
@@ -53,8 +59,10 @@ class CBackend:
         self.build_dir.join("src").ensure(dir=True)
         self.dump_c = dump_c
         self.cffi = CFFIWriter(main_modname, config, build_dir)
+        self.strconsts = CStrConsts(build_dir.join("src", "spy_strconsts.c"))
         self.ninja = None
         self.c_structdefs = {}
+        self.structdefs_hfiles = {}
         self.c_modules = {}
         self.cfiles = []  # generated C files
         self.build_script = None
@@ -114,37 +122,9 @@ class CBackend:
             )
             self.c_modules[modname] = c_mod
 
-        # for now we create a global with all types CStructDefs. Eventually we
-        # want to split them into multiple independent ones
-        #
-        # NOTE: currently structdefs work because of a very specific property.
-        # The point is that when we have nested structs, C requires that
-        # structs are defined be in topological order: i.e. the "inner" func
-        # first, the "outer" func next.
-        #
-        # As long as we have a single "spy_structdefs.h" file, we are
-        # guaranteed to have the structs in the right order: this happens
-        # because similarly to C you must define structs before being able to
-        # use them as fields for another struct, which means that the various
-        # W_Struct objects are put in vm.globals_w in the right order.
-        #
-        # See test_importing::test_circular_type_ref for an example of that.
-        #
-        # Eventually, we want to split structdefs into multiple files (to
-        # avoid recompiling everything at every change), but this will be
-        # non-obvious. It will require to:
-        #   1. maintain a graph of struct dependencies
-        #   2. identify the set of Strongly Connected Components (SCC)
-        #   3. ensure that structs in each SCC is in topological order
-        #   4. emit one .h for each SCC (or maybe group multiple SCC by
-        #      modname, but keep in mind that in case of circular deps it will
-        #      be impossible to guarantee the correspondance fqn.modname <=>
-        #      modname.h)
-        self.c_structdefs["globals"] = CStructDefs(
-            hfile=bdir.join("src", "spy_structdefs.h"), content=[]
-        )
-
-        # Put each FQN into the corresponding CModule or CStructDefs
+        # Put each FQN into the corresponding CModule, and collect the types
+        # which need to go into the structdefs headers
+        types: list[tuple[FQN, W_Type]] = []
         for fqn, w_obj in self.vm.globals_w.items():
             # ignore W_Modules
             if fqn.is_module():
@@ -159,36 +139,151 @@ class CBackend:
                 continue
 
             if isinstance(w_obj, W_Type):
-                self.c_structdefs["globals"].content.append((fqn, w_obj))
+                types.append((fqn, w_obj))
             else:
                 self.c_modules[modname].content.append((fqn, w_obj))
 
+        self.split_structdefs(types)
+
+    def split_structdefs(self, types: list[tuple[FQN, W_Type]]) -> None:
+        """
+        Split the types into multiple CStructDefs, one for each Strongly
+        Connected Component (SCC) of the graph of their dependencies.
+
+        When we have nested structs, C requires that structs are defined in
+        topological order: i.e. the "inner" struct first, the "outer" struct
+        next. A struct can also depend on itself, e.g. through a ptr field: in
+        that case the struct and the ptr type belong to the same SCC and they
+        are emitted in the same header. Inside each SCC, the types are in the
+        same order as in vm.globals_w, which is guaranteed to be a valid one:
+        similarly to C, you must define structs before being able to use them
+        as fields for another struct. See test_importing::test_circular_type_ref
+        for an example of that.
+
+        Each header includes the headers of the SCCs it depends on, and each
+        module includes only the headers of the types it uses (see
+        Context.add_structdefs_include_maybe). This way, a change in a struct
+        recompiles only the C files which actually depend on it.
+        """
+        index = {fqn: i for i, (fqn, w_T) in enumerate(types)}
+
+        def deps(w_T: W_Type) -> list[int]:
+            if isinstance(w_T, W_StructType) and w_T.is_defined():
+                deps_w = [w_field.w_T for w_field in w_T.iterfields_w()]
+            elif isinstance(w_T, W_PtrType):
+                deps_w = [w_T.w_itemT]
+            elif isinstance(w_T, W_RefType):
+                deps_w = [w_T.as_ptrtype(self.vm)]
+            else:
+                deps_w = []
+            return [index[w_dep.fqn] for w_dep in deps_w if w_dep.fqn in index]
+
+        # Tarjan's algorithm: the SCCs are found in reverse topological
+        # order, i.e. dependencies first
+        sccs: list[list[int]] = []
+        lowlink: dict[int, int] = {}
+        num: dict[int, int] = {}
+        stack: list[int] = []
+        on_stack: set[int] = set()
+
+        def visit(v: int) -> None:
+            num[v] = lowlink[v] = len(num)
+            stack.append(v)
+            on_stack.add(v)
+            for w in deps(types[v][1]):
+                if w not in num:
+                    visit(w)
+                    lowlink[v] = min(lowlink[v], lowlink[w])
+                elif w in on_stack:
+                    lowlink[v] = min(lowlink[v], num[w])
+            if lowlink[v] == num[v]:
+                scc = []
+                while True:
+                    w = stack.pop()
+                    on_stack.remove(w)
+                    scc.append(w)
+                    if w == v:
+                        break
+                sccs.append(sorted(scc))
+
+        for v in range(len(types)):
+            if v not in num:
+                visit(v)
+
+        for scc in sccs:
+            first_fqn = types[scc[0]][0]
+            hname = self.structdefs_hname(first_fqn)
+            self.c_structdefs[hname] = CStructDefs(
+                hfile=self.build_dir.join("src", hname),
+                content=[types[i] for i in scc],
+            )
+            for i in scc:
+                self.structdefs_hfiles[types[i][0]] = hname
+
+    def structdefs_hname(self, fqn: FQN) -> str:
+        """
+        Compute the name of the structdefs header for the SCC whose first
+        type is fqn. It must be stable across builds, so that unchanged
+        headers are not rewritten.
+        """
+        name = re.sub(r"[^A-Za-z0-9_]", "_", fqn.c_name)
+        if len(name) > 80:
+            h = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+            name = f"{name[:64]}_{h}"
+        hname = f"spy_structdefs_{name}.h"
+        n = 1
+        while hname in self.c_structdefs:
+            n += 1
+            hname = f"spy_structdefs_{name}_{n}.h"
+        return hname
+
     def cwrite(self) -> None:
         """
         Convert all non-builtins modules into .c files
         """
         self.split_fqns()
 
-        # Emit structdefs.h
+        # Emit the structdefs headers
         for c_structdefs in self.c_structdefs.values():
-            cstructwriter = CStructWriter(self.vm, c_structdefs, self.cffi)
+            cstructwriter = CStructWriter(
+                self.vm, c_structdefs, self.cffi, self.structdefs_hfiles
+            )
             cstructwriter.write_c_source()
             if self.dump_c:
                 print()
                 print(f"---- {c_structdefs.hfile} ----")
                 print(highlight_src("C", c_structdefs.hfile.read()))  # type: ignore
 
-        # Emit regular C modules
+        # Emit regular C modules. If there is only one, it contains also the
+        # string literals, see CStrConsts
+        single_module = len(self.c_modules) == 1
         for c_mod in self.c_modules.values():
             is_main_mod = c_mod.modname == self.main_modname
-            cwriter = CModuleWriter(self.vm, c_mod, is_main_mod, self.cffi)
-            cwriter.write_c_source()
+            cwriter = CModuleWriter(
+                self.vm,
+                c_mod,
+                is_main_mod,
+                self.cffi,
+                self.strconsts,
+                self.structdefs_hfiles,
+                gc_roots=self.config.gc == "spygc",
+            )
+            cwriter.write_c_source(with_strconsts=single_module)
             self.cfiles.append(c_mod.cfile)
             if self.dump_c:
                 print()
                 print(f"---- {c_mod.cfile} ----")
                 print(highlight_src("C", c_mod.cfile.read()))  # type: ignore
 
+        # Emit the string literals used by all the modules above
+        if not single_module:
+            self.strconsts.write_c_source()
+            self.cfiles.append(self.strconsts.cfile)
+            if self.dump_c:
+                print()
+                print(f"---- {self.strconsts.cfile} ----")
+                print(highlight_src("C", self.strconsts.cfile.read()))  # type: ignore
+
     def write_build_script(self) -> None:
         assert self.cfiles != [], "call .cwrite() first"
         wasm_exports = []
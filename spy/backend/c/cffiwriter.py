@@ -4,6 +4,7 @@ from spy.backend.c.context import Context
 from spy.build.config import BuildConfig, CompilerConfig
 from spy.fqn import FQN
 from spy.textbuilder import TextBuilder
+from spy.util import write_if_changed
 from spy.vm.function import W_ASTFunc
 
 
@@ -121,10 +122,10 @@ class CFFIWriter:
         self.cffi_dir.ensure(dir=True)
 
         pyfile = self.cffi_dir.join(f"{self.modname}.py")
-        pyfile.write(self.tb_py.build())
+        write_if_changed(pyfile, self.tb_py.build())
 
         build_script = self.cffi_dir.join(f"_{self.modname}-cffi-build.py")
-        build_script.write(self.tb_build.build())
+        write_if_changed(build_script, self.tb_build.build())
         return build_script
 
     def emit_include(self, header_name: str) -> None:
@@ -1,4 +1,3 @@
-import itertools
 from dataclasses import dataclass
 from typing import Optional
 
@@ -6,10 +5,12 @@ import py.path
 
 from spy.backend.c.cffiwriter import CFFIWriter
 from spy.backend.c.context import Context
+from spy.backend.c.cstrconsts import CStrConsts
 from spy.backend.c.cwriter import CFuncWriter
 from spy.errors import WIP
 from spy.fqn import FQN
 from spy.textbuilder import TextBuilder
+from spy.util import write_if_changed
 from spy.vm.b import B
 from spy.vm.cell import W_Cell
 from spy.vm.function import W_ASTFunc, W_BuiltinFunc
@@ -37,6 +38,7 @@ class CModuleWriter:
     ctx: Context
     c_mod: CModule
     is_main_mod: bool
+    strconsts: CStrConsts
     global_vars: set[str]
     jsffi_error_emitted: bool = False
 
@@ -58,11 +60,15 @@ class CModuleWriter:
         c_mod: CModule,
         is_main_mod: bool,
         cffi: CFFIWriter,
+        strconsts: CStrConsts,
+        structdefs_hfiles: dict[FQN, str] = {},
+        gc_roots: bool = False,
     ) -> None:
-        self.ctx = Context(vm)
+        self.ctx = Context(vm, structdefs_hfiles, gc_roots)
         self.c_mod = c_mod
         self.is_main_mod = is_main_mod
         self.cffi = cffi
+        self.strconsts = strconsts
         self.tbh = TextBuilder(use_colors=False)
         self.tbc = TextBuilder(use_colors=False)
         # nested builders are initialized lazily
@@ -73,22 +79,26 @@ class CModuleWriter:
     def __repr__(self) -> str:
         return f"<CModuleWriter for {self.c_mod.modname}>"
 
-    def write_c_source(self) -> None:
+    def write_c_source(self, with_strconsts: bool = False) -> None:
         self.emit_content()
-        self.c_mod.hfile.write(self.tbh.build())
-        self.c_mod.cfile.write(self.tbc.build())
-
-    def new_global_var(self, prefix: str) -> str:
+        if with_strconsts:
+            # this is the only module: emit the whole pool here, see CStrConsts
+            self.tbc.wl()
+            self.tbc.wl("// string literals")
+            self.strconsts.emit_definitions(self.tbc)
+        write_if_changed(self.c_mod.hfile, self.tbh.build())
+        write_if_changed(self.c_mod.cfile, self.tbc.build())
+
+    def declare_strconst(self, utf8: bytes) -> str:
         """
-        Create an unique name for a global var whose name starts with 'prefix'
+        Return the C name of the string literal in the CStrConsts pool, and
+        declare it in this module if needed.
         """
-        prefix = f"SPY_g_{prefix}"
-        for i in itertools.count():
-            varname = f"{prefix}{i}"
-            if varname not in self.global_vars:
-                break
-        self.global_vars.add(varname)
-        return varname
+        name = self.strconsts.get(utf8)
+        if name not in self.global_vars:
+            self.global_vars.add(name)
+            self.tbc_globals.wl(f"extern const spy_Str {name};")
+        return name
 
     def init_h(self) -> None:
         GUARD = self.c_mod.hfile.purebasename.upper()
@@ -107,7 +117,6 @@ class CModuleWriter:
         self.tbh.wl()
 
         self.tbh.wl("// includes")
-        self.tbh.wl('#include "spy_structdefs.h"')
         self.tbh_includes = self.tbh.make_nested_builder()
         self.tbh.wl()
 
@@ -8,6 +8,7 @@ from spy.vm.function import W_ASTFunc, W_Func
 from spy.vm.modules.jsffi import JSFFI
 from spy.vm.modules.posix import POSIX
 from spy.vm.modules.rawbuffer import RB
+from spy.vm.modules.unsafe import UNSAFE
 from spy.vm.modules.unsafe.ptr import W_RefType
 from spy.vm.object import W_Type
 from spy.vm.vm import SPyVM
@@ -119,11 +120,28 @@ class Context:
     vm: SPyVM
     tbh_includes: TextBuilder
     seen_modules: set[str]
+    structdefs_hfiles: dict[FQN, str]
+    seen_hfiles: set[str]
+    seen_fqns: set[FQN]
+    gc_roots: bool
     _d: dict[W_Type, C_Type]
 
-    def __init__(self, vm: SPyVM) -> None:
+    def __init__(
+        self,
+        vm: SPyVM,
+        structdefs_hfiles: dict[FQN, str] = {},
+        gc_roots: bool = False,
+    ) -> None:
         self.vm = vm
         self.seen_modules = set()
+        # map the FQN of each type to the structdefs header which defines it,
+        # see CBackend.split_structdefs
+        self.structdefs_hfiles = structdefs_hfiles
+        self.seen_hfiles = set()
+        self.seen_fqns = set()
+        # if True, emit SPY_GC_ROOT and SPY_GC_PIN for the values which might
+        # contain GC pointers, see libspy/include/spy/gc.h
+        self.gc_roots = gc_roots
         # set by CModuleWriter.emit_header
         self.tbh_includes = None  # type: ignore
         self._d = {}
@@ -136,24 +154,42 @@ class Context:
         self._d[B.w_f32] = C_Type("float")
         self._d[B.w_bool] = C_Type("bool")
         self._d[B.w_str] = C_Type("spy_Str *")
+        self._d[B.w_StringBuilder] = C_Type("spy_StringBuilder *")
         self._d[RB.w_RawBuffer] = C_Type("spy_RawBuffer *")
         self._d[JSFFI.w_JsRef] = C_Type("JsRef")
         self._d[POSIX.w__FILE] = C_Type("FILE *")
+        self._d[POSIX.w_File] = C_Type("spy_posix$File *")
+        self._d[POSIX.w_MMap] = C_Type("spy_posix$MMap *")
+        self._d[UNSAFE.w_Arena] = C_Type("spy_Arena *")
 
     def w2c(self, w_T: W_Type) -> C_Type:
         if w_T in self._d:
             return self._d[w_T]
 
         elif isinstance(w_T, W_Type):
-            # as soon as we split spy_structdefs into multiple files, here we
-            # should add a self.add_include_maybe. But for now it's not needed
-            # because we always include spy_structdefs.h anyway.
+            self.add_structdefs_include_maybe(w_T.fqn)
             c_type = C_Type(w_T.fqn.c_name)
             self._d[w_T] = c_type
             return c_type
 
         raise NotImplementedError(f"Cannot translate type {w_T} to C")
 
+    def needs_gc_root(self, w_T: W_Type) -> bool:
+        """
+        Return True if values of type w_T might contain pointers to GC memory.
+        We are conservative: everything which is not a primitive is rooted.
+        """
+        return w_T not in (
+            TYPES.w_NoneType,
+            B.w_i8,
+            B.w_u8,
+            B.w_i32,
+            B.w_u32,
+            B.w_f64,
+            B.w_f32,
+            B.w_bool,
+        )
+
     def c_restype_by_fqn(self, fqn: FQN) -> C_Type:
         w_func = self.vm.lookup_global(fqn)
         assert isinstance(w_func, W_Func)
@@ -185,6 +221,7 @@ class Context:
         return C_Function(name, c_params, c_restype)
 
     def add_include_maybe(self, fqn: FQN) -> None:
+        self.add_structdefs_include_maybe(fqn)
         modname = fqn.modname
         if modname in self.seen_modules:
             # we already encountered this module, nothing to do
@@ -194,3 +231,21 @@ class Context:
         w_mod = self.vm.modules_w[modname]
         if not w_mod.is_builtin():
             self.tbh_includes.wl(f'#include "{modname}.h"')
+
+    def add_structdefs_include_maybe(self, fqn: FQN) -> None:
+        """
+        Include the structdefs headers which define the types mentioned by
+        fqn. We look at the fqn itself, at its namespaces (e.g. the ptr type
+        in `unsafe::ptr[Point]::store`) and, recursively, at its qualifiers.
+        """
+        if fqn in self.seen_fqns:
+            return
+        self.seen_fqns.add(fqn)
+        for i in range(1, len(fqn.parts) + 1):
+            prefix = FQN(fqn.parts[:i])
+            hfile = self.structdefs_hfiles.get(prefix)
+            if hfile is not None and hfile not in self.seen_hfiles:
+                self.seen_hfiles.add(hfile)
+                self.tbh_includes.wl(f'#include "{hfile}"')
+            for qual in fqn.parts[i - 1].qualifiers:
+                self.add_structdefs_include_maybe(qual)
@@ -0,0 +1,68 @@
+import hashlib
+import re
+
+import py.path
+
+from spy.backend.c import c_ast as C
+from spy.textbuilder import TextBuilder
+from spy.util import write_if_changed
+from spy.vm.str import ll_spy_str_hash
+
+
+class CStrConsts:
+    """
+    Whole-program pool of string literals.
+
+    Each distinct literal is emitted only once, into spy_strconsts.c, as a
+    const spy_Str with a precomputed hash. Since the hash is never 0,
+    spy_str_hash never writes to it, so the pool can live in read-only data.
+
+    If the program consists of a single C module, the pool is emitted at the
+    end of its .c file instead, so that the build still has a single C file
+    (see NinjaWriter.gen_build_ninja_single).
+
+    The name of each constant depends only on its content: this way, adding
+    a literal to one module does not change the C code of the others.
+    """
+
+    cfile: py.path.local
+    consts: dict[bytes, str]  # utf8 -> C name
+
+    def __init__(self, cfile: py.path.local) -> None:
+        self.cfile = cfile
+        self.consts = {}
+
+    def __repr__(self) -> str:
+        return f"<CStrConsts {self.cfile} ({len(self.consts)} strings)>"
+
+    def get(self, utf8: bytes) -> str:
+        """
+        Return the C name of the constant for the given string
+        """
+        name = self.consts.get(utf8)
+        if name is None:
+            name = self.make_name(utf8)
+            self.consts[utf8] = name
+        return name
+
+    @staticmethod
+    def make_name(utf8: bytes) -> str:
+        # e.g. SPY_str_hello_world_1a2b3c4d5e6f
+        slug = re.sub(rb"[^A-Za-z0-9_]", b"_", utf8[:16]).decode("ascii")
+        h = hashlib.sha1(utf8).hexdigest()[:12]
+        return f"SPY_str_{slug}_{h}"
+
+    def emit_definitions(self, tb: TextBuilder) -> None:
+        # sort by name, so that the output is stable across builds
+        for utf8, name in sorted(self.consts.items(), key=lambda item: item[1]):
+            n = len(utf8)
+            h = ll_spy_str_hash(utf8)
+            lit = C.Literal.from_bytes(utf8)
+            tb.wl(f"const spy_Str {name} = {{{n}, {h}, {lit}}};")
+
+    def write_c_source(self) -> None:
+        tb = TextBuilder(use_colors=False)
+        tb.wl("#include <spy.h>")
+        tb.wl()
+        self.emit_definitions(tb)
+        write_if_changed(self.cfile, tb.build())
@@ -7,6 +7,7 @@ from spy.backend.c.cffiwriter import CFFIWriter
 from spy.backend.c.context import C_Type, Context
 from spy.fqn import FQN
 from spy.textbuilder import TextBuilder
+from spy.util import write_if_changed
 from spy.vm.modules.unsafe.ptr import W_PtrType, W_RefType
 from spy.vm.object import W_Type
 from spy.vm.struct import W_StructType
@@ -35,8 +36,11 @@ class CStructWriter:
         vm: SPyVM,
         c_structdefs: CStructDefs,
         cffi: CFFIWriter,
+        structdefs_hfiles: dict[FQN, str] = {},
     ) -> None:
-        self.ctx = Context(vm)
+        self.ctx = Context(vm, structdefs_hfiles)
+        # the types of this header are defined here, don't include ourselves
+        self.ctx.seen_hfiles.add(c_structdefs.hfile.basename)
         self.c_structdefs = c_structdefs
         self.cffi = cffi
         self.tbh = TextBuilder(use_colors=False)
@@ -50,7 +54,7 @@ class CStructWriter:
         Write the structdefs header
         """
         self.emit_content()
-        self.c_structdefs.hfile.write(self.tbh.build())
+        write_if_changed(self.c_structdefs.hfile, self.tbh.build())
 
     def init_h(self) -> None:
         GUARD = self.c_structdefs.hfile.purebasename.upper()
@@ -163,7 +167,7 @@ class CStructWriter:
     def emit_RefType(self, fqn: FQN, w_reftype: W_RefType) -> None:
         w_ptrtype = w_reftype.as_ptrtype(self.ctx.vm)
         c_reftype = C_Type(w_reftype.fqn.c_name)
-        c_ptrtype = C_Type(w_ptrtype.fqn.c_name)
+        c_ptrtype = self.ctx.w2c(w_ptrtype)
 
         self.tbh_fwdecl.wb(f"""
         typedef {c_ptrtype} {c_reftype};
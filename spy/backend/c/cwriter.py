@@ -78,14 +78,18 @@ class CFuncWriter:
         """
         assert self.w_func.locals_types_w is not None
         param_names = [arg.name for arg in self.w_func.funcdef.args]
+        gc_roots = []
         for varname, w_T in self.w_func.locals_types_w.items():
             c_type = self.ctx.w2c(w_T)
-            if (
-                varname not in ("@return", "@if", "@and", "@or", "@while", "@assert")
-                and varname not in param_names
-            ):
-                c_varname = C_Ident(varname)
+            if varname in ("@return", "@if", "@and", "@or", "@while", "@assert"):
+                continue
+            c_varname = C_Ident(varname)
+            if varname not in param_names:
                 self.tbc.wl(f"{c_type} {c_varname};")
+            if self.ctx.gc_roots and self.ctx.needs_gc_root(w_T):
+                gc_roots.append(c_varname)
+        for c_varname in gc_roots:
+            self.tbc.wl(f"SPY_GC_ROOT({c_varname});")
 
     # ==============
 
@@ -265,34 +269,30 @@ class CFuncWriter:
             raise NotImplementedError("WIP")
 
     def fmt_expr_StrConst(self, const: ast.StrConst) -> C.Expr:
-        # SPy string literals must be initialized as C globals. We want to
-        # generate the following:
+        # SPy string literals are C globals which live in the whole-program
+        # pool, see CStrConsts. We want to generate the following:
         #
-        #     // global declarations
-        #     static spy_Str SPY_g_str0 = {5, 0, "hello"};
+        #     // in spy_strconsts.c
+        #     const spy_Str SPY_str_hello_f572d396fae9 = {5, 1335831723, "hello"};
+        #
+        #     // in this module: global declarations
+        #     extern const spy_Str SPY_str_hello_f572d396fae9;
         #     ...
         #     // literal expr
-        #     &SPY_g_str0 /* "hello" */
+        #     ((spy_Str *)&SPY_str_hello_f572d396fae9) /* "hello" */
         #
         # Note that in the literal expr we also put a comment showing what is
         # the content of the literal: hopefully this will make the code more
         # readable for humans.
-        #
-        # Emit the global decl
-        s = const.value
-        utf8 = s.encode("utf-8")
-        v = self.cmodw.new_global_var("str")  # SPY_g_str0
-        n = len(utf8)
-        lit = C.Literal.from_bytes(utf8)
-        init = "{%d, 0, %s}" % (n, lit)
-        self.cmodw.tbc_globals.wl(f"static spy_Str {v} = {init};")
+        utf8 = const.value.encode("utf-8")
+        v = self.cmodw.declare_strconst(utf8)
         #
         # shortstr is what we show in the comment, with a length limit
         comment = shortrepr(utf8.decode("utf-8"), 15)
-        v = f"{v} /* {comment} */"
-        return C.UnaryOp("&", C.Literal(v))
+        return C.Literal(f"((spy_Str *)&{v}) /* {comment} */")
 
     def fmt_expr_FQNConst(self, const: ast.FQNConst) -> C.Expr:
+        self.ctx.add_structdefs_include_maybe(const.fqn)
         w_obj = self.ctx.vm.lookup_global(const.fqn)
         if isinstance(w_obj, W_Ptr):
             # for each PtrType, we emit the corresponding NULL define with the
@@ -437,11 +437,22 @@ class CFuncWriter:
         FQN("operator::f64_neg"): "-",
     }
 
+    # ptr operations which take an extra w_loc argument, see below
+    PTR_TAGS_WITH_LOC = (
+        "ptr.getitem",
+        "ptr.store",
+        "ptr.memcpy",
+        "ptr.memmove",
+        "ptr.memset",
+        "ptr.fill",
+    )
+
     def fmt_expr_Call(self, call: ast.Call) -> C.Expr:
         assert isinstance(call.func, ast.FQNConst), (
             "indirect calls are not supported yet"
         )
         fqn = call.func.fqn
+        self.ctx.add_structdefs_include_maybe(fqn)
 
         irtag = self.ctx.vm.get_irtag(fqn)
         if call.func.fqn.modname == "jsffi":
@@ -476,8 +487,8 @@ class CFuncWriter:
             # we handle ptr.deref explicitly for extra clarity
             return self.fmt_generic_call(fqn, call)
 
-        elif irtag.tag in ("ptr.getitem", "ptr.store"):
-            # see unsafe/ptr.py::w_GETITEM and w_SETITEM there, we insert an
+        elif irtag.tag in self.PTR_TAGS_WITH_LOC:
+            # see unsafe/ptr.py::w_GETITEM, w_SETITEM and unsafe/mem.py: we insert an
             # extra "w_loc" argument, which is not needed by the C backend
             # because we rely on C's own mechanism to get line numbers.
             # Moreover, we don't have a way to render "W_Loc" consts to C.
@@ -497,7 +508,17 @@ class CFuncWriter:
         self.ctx.add_include_maybe(fqn)
         c_name = fqn.c_name
         c_args = [self.fmt_expr(arg) for arg in call.args]
-        return C.Call(c_name, c_args)
+        c_call = C.Call(c_name, c_args)
+        if self.ctx.gc_roots:
+            w_func = self.ctx.vm.lookup_global(fqn)
+            if isinstance(w_func, W_Func):
+                w_restype = w_func.w_functype.w_restype
+                if self.ctx.needs_gc_root(w_restype):
+                    # keep the result alive while the rest of the enclosing
+                    # expression is evaluated
+                    c_restype = C.Literal(str(self.ctx.w2c(w_restype)))
+                    return C.Call("SPY_GC_PIN", [c_restype, c_call])
+        return c_call
 
     def fmt_struct_make(self, fqn: FQN, call: ast.Call, irtag: IRTag) -> C.Expr:
         c_structtype = self.ctx.c_restype_by_fqn(fqn)
@@ -0,0 +1,253 @@
+"""
+Benchmark harness for `spy bench`.
+
+Each benchmark is a .spy file with a main() function. It is run in one or
+more modes:
+
+  - execute: run main() in the interpreter, like `spy execute`
+  - redshift: redshift the module and run main(), like `spy redshift -x`
+  - native, wasi: build an executable, like `spy build`, and run it
+
+Every run is split into phases (init, parse, import, redshift, cwrite, cc,
+run) which are timed separately, so that a slowdown in e.g. the parser is not
+hidden by the noise of the run phase. The .spyc and .spyr caches are
+disabled, so that parse and redshift are measured every time, and each build
+happens in a fresh build directory, so that cc measures a full compilation.
+
+The results can be saved as JSON and compared against a baseline produced by
+a previous run.
+"""
+
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Literal, Optional
+
+import py.path
+
+import spy
+from spy.analyze.importing import ImportAnalyzer
+from spy.backend.c.cbackend import CBackend
+from spy.build.config import BuildConfig
+from spy.vm.b import B
+from spy.vm.function import W_ASTFunc
+from spy.vm.object import W_Object
+from spy.vm.vm import SPyVM
+
+BenchMode = Literal["execute", "redshift", "native", "wasi"]
+ALL_MODES: list[BenchMode] = ["execute", "redshift", "native", "wasi"]
+BENCH_VERSION = 1
+
+# the phases which are measured for each mode, in order
+PHASES: dict[BenchMode, list[str]] = {
+    "execute": ["init", "parse", "import", "run"],
+    "redshift": ["init", "parse", "import", "redshift", "run"],
+    "native": ["init", "parse", "import", "redshift", "cwrite", "cc", "run"],
+    "wasi": ["init", "parse", "import", "redshift", "cwrite", "cc", "run"],
+}
+
+
+def default_benchmarks() -> list[py.path.local]:
+    bench_dir = spy.ROOT.dirpath().join("benchmarks")
+    return sorted(bench_dir.listdir("*.spy"))
+
+
+@dataclass
+class PhaseTimer:
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        a = time.perf_counter()
+        yield
+        b = time.perf_counter()
+        self.timings[name] = self.timings.get(name, 0.0) + (b - a)
+
+
+async def run_once(spyfile: py.path.local, mode: BenchMode) -> dict[str, float]:
+    """
+    Run the benchmark once in the given mode and return the time spent in
+    each phase, in seconds.
+    """
+    modname = spyfile.purebasename
+    t = PhaseTimer()
+    with t.phase("init"):
+        vm = await SPyVM.async_new()
+        vm.path.append(str(spyfile.dirpath()))
+    importer = ImportAnalyzer(vm, modname, use_spyc=False)
+    with t.phase("parse"):
+        importer.parse_all()
+    with t.phase("import"):
+        importer.import_all()
+
+    if mode == "execute":
+        with t.phase("run"):
+            call_main(vm, modname, redshift=False)
+        return t.timings
+
+    with t.phase("redshift"):
+        vm.redshift(error_mode="eager")
+
+    if mode == "redshift":
+        with t.phase("run"):
+            call_main(vm, modname, redshift=True)
+        return t.timings
+
+    with tempfile.TemporaryDirectory(prefix="spy-bench-") as tmpdir:
+        build_dir = py.path.local(tmpdir)
+        config = BuildConfig(target=mode, kind="exe", build_type="release")
+        backend = CBackend(vm, modname, config, build_dir, dump_c=False)
+        with t.phase("cwrite"):
+            backend.cwrite()
+            backend.write_build_script()
+        with t.phase("cc"):
+            exe = backend.build()
+        if mode == "native":
+            cmd = [str(exe)]
+        else:
+            cmd = [sys.executable, "-m", "spy.tool.wasmtime", str(exe)]
+        with t.phase("run"):
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return t.timings
+
+
+def call_main(vm: SPyVM, modname: str, *, redshift: bool) -> None:
+    """
+    Call main() with an empty argv, discarding what it prints
+    """
+    w_main = vm.modules_w[modname].getattr_maybe("main")
+    assert isinstance(w_main, W_ASTFunc), f"{modname}.spy has no main()"
+    w_restype, has_args = vm.typecheck_main(w_main)
+    if redshift:
+        assert w_main.w_redshifted_into is not None
+        w_main = w_main.w_redshifted_into
+    args_w: list[W_Object] = []
+    if has_args:
+        args_w = [vm.wrap_list(B.w_str, [])]
+    with contextlib.redirect_stdout(io.StringIO()):
+        vm.fast_call(w_main, args_w)
+
+
+def summarize(samples: list[float]) -> dict[str, Any]:
+    return {
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.mean(samples),
+        "median": statistics.median(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+async def run_benchmark(
+    spyfile: py.path.local, mode: BenchMode, *, repeat: int, warmup: int
+) -> dict[str, dict[str, Any]]:
+    """
+    Run the benchmark `warmup + repeat` times, and return the statistics of
+    the last `repeat` runs for each phase, plus the total.
+    """
+    for _ in range(warmup):
+        await run_once(spyfile, mode)
+    samples: dict[str, list[float]] = {phase: [] for phase in PHASES[mode]}
+    samples["total"] = []
+    for _ in range(repeat):
+        timings = await run_once(spyfile, mode)
+        for phase in PHASES[mode]:
+            samples[phase].append(timings[phase])
+        samples["total"].append(sum(timings.values()))
+    return {phase: summarize(s) for phase, s in samples.items()}
+
+
+def make_report(results: dict[str, Any], *, repeat: int, warmup: int) -> dict:
+    return {
+        "version": BENCH_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "warmup": warmup,
+        "results": results,
+    }
+
+
+def load_report(filename: str) -> dict:
+    with open(filename) as f:
+        report = json.load(f)
+    if report.get("version") != BENCH_VERSION:
+        raise ValueError(f"{filename}: unsupported benchmark format")
+    return report
+
+
+@dataclass
+class Comparison:
+    bench: str
+    mode: str
+    phase: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        if self.baseline == 0:
+            return 1.0
+        return self.current / self.baseline
+
+    def is_regression(self, threshold: float, min_delta: float) -> bool:
+        delta = self.current - self.baseline
+        return self.ratio > 1 + threshold and delta > min_delta
+
+
+def compare_reports(baseline: dict, current: dict) -> list[Comparison]:
+    """
+    Compare the medians of all the phases which are in both reports
+    """
+    res = []
+    for bench, modes in current["results"].items():
+        base_modes = baseline["results"].get(bench, {})
+        for mode, phases in modes.items():
+            base_phases = base_modes.get(mode, {})
+            for phase, stats in phases.items():
+                if phase not in base_phases:
+                    continue
+                base = base_phases[phase]["median"]
+                res.append(Comparison(bench, mode, phase, base, stats["median"]))
+    return res
+
+
+def fmt_time(t: float) -> str:
+    if t < 1e-3:
+        return f"{t * 1e6:.0f}us"
+    elif t < 1:
+        return f"{t * 1e3:.1f}ms"
+    return f"{t:.3f}s"
+
+
+def fmt_results(bench: str, mode: str, phases: dict[str, dict[str, Any]]) -> str:
+    parts = []
+    for phase, stats in phases.items():
+        median = fmt_time(stats["median"])
+        stdev = fmt_time(stats["stdev"])
+        parts.append(f"{phase}={median}±{stdev}")
+    return f"{bench:<16} {mode:<9} " + " ".join(parts)
+
+
+def fmt_comparison(c: Comparison, regression: bool) -> str:
+    change = (c.ratio - 1) * 100
+    mark = "  REGRESSION" if regression else ""
+    return (
+        f"{c.bench:<16} {c.mode:<9} {c.phase:<9} "
+        f"{fmt_time(c.baseline):>9} -> {fmt_time(c.current):>9} "
+        f"({change:+.1f}%){mark}"
+    )
+
+
+def find_regressions(
+    comparisons: list[Comparison], threshold: float, min_delta: float
+) -> list[Comparison]:
+    return [c for c in comparisons if c.is_regression(threshold, min_delta)]
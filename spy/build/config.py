@@ -1,3 +1,7 @@
+import functools
+import os
+import re
+import shlex
 import shutil
 import subprocess
 import sys
@@ -5,12 +9,16 @@ from dataclasses import dataclass
 from os import getenv
 from typing import Literal, Optional
 
+import py.path
+
 import spy.libspy
 
 BuildTarget = Literal["native", "wasi", "emscripten"]
 OutputKind = Literal["exe", "lib", "py-cffi"]
 BuildType = Literal["release", "debug"]
-GCOption = Literal["none", "bdwgc"]
+GCOption = Literal["none", "bdwgc", "spygc"]
+OptLevel = Literal["0", "1", "2", "3", "s"]
+PGOMode = Literal["none", "generate", "use"]
 
 
 @dataclass
@@ -18,11 +26,23 @@ class BuildConfig:
     target: BuildTarget
     kind: OutputKind
     build_type: BuildType
-    opt_level: Optional[int] = None
+    opt_level: Optional[OptLevel] = None  # None means "depends on build_type"
+    lto: Optional[bool] = None  # None means "only in release mode"
+    pgo: PGOMode = "none"
     warning_as_error: bool = False
     gc: GCOption = "none"
     static: bool = False
 
+    def get_opt_level(self) -> OptLevel:
+        if self.opt_level is not None:
+            return self.opt_level
+        return "3" if self.build_type == "release" else "0"
+
+    def get_lto(self) -> bool:
+        if self.lto is not None:
+            return self.lto
+        return self.build_type == "release"
+
 
 # ======= CFLAGS and LDFLAGS logic =======
 
@@ -40,12 +60,14 @@ LDFLAGS = [
 WARNING_CFLAGS = ["-Werror=implicit-function-declaration"]
 WARNING_AS_ERROR_CFLAGS = ["-Werror", "-Wno-unreachable-code"]
 
-RELEASE_CFLAGS  = ["-DSPY_RELEASE", "-O3", "-flto"]
-RELEASE_LDFLAGS = ["-flto"]
+RELEASE_CFLAGS  = ["-DSPY_RELEASE"]
+RELEASE_LDFLAGS: list[str] = []
 
-DEBUG_CFLAGS    = ["-DSPY_DEBUG", "-O0", "-g"]
+DEBUG_CFLAGS    = ["-DSPY_DEBUG", "-g"]
 DEBUG_LDFLAGS: list[str] = []
 
+LTO_FLAGS = ["-flto"]
+
 WASM_CFLAGS = [
     "-mmultivalue",
     "-Xclang", "-target-abi",
@@ -54,12 +76,123 @@ WASM_CFLAGS = [
 # fmt: on
 
 
+@functools.cache
+def cc_version(CC: str) -> str:
+    """
+    Return the output of `CC --version`, or "" if CC cannot be run
+    """
+    try:
+        return subprocess.run(
+            [*shlex.split(CC), "--version"], capture_output=True, text=True
+        ).stdout
+    except OSError:
+        return ""
+
+
+def cc_is_clang(CC: str) -> bool:
+    return "clang" in cc_version(CC)
+
+
+class PGOError(Exception):
+    """
+    Raised when the profile collected by a --pgo-generate build cannot be used
+    """
+
+
+def find_llvm_profdata(CC: str) -> list[str]:
+    """
+    Return the command to run the llvm-profdata which goes with the clang
+    used by CC.
+
+    The format of .profraw files changes between LLVM versions, so we try
+    the following, in order:
+
+      - $SPY_LLVM_PROFDATA, if set
+      - the llvm-profdata installed next to clang
+      - llvm-profdata-N, where N is the major version of clang (Debian/Ubuntu)
+      - llvm-profdata in the PATH
+      - on macOS, the one which comes with Xcode
+    """
+    env = getenv("SPY_LLVM_PROFDATA")
+    if env:
+        return shlex.split(env)
+
+    cmd = [*shlex.split(CC), "-print-prog-name=llvm-profdata"]
+    try:
+        path = subprocess.run(cmd, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        path = ""
+    if os.path.isabs(path) and os.access(path, os.X_OK):
+        return [path]
+
+    candidates = ["llvm-profdata"]
+    m = re.search(r"clang version (\d+)", cc_version(CC))
+    if m:
+        candidates.insert(0, f"llvm-profdata-{m.group(1)}")
+    for name in candidates:
+        found = shutil.which(name)
+        if found:
+            return [found]
+
+    if sys.platform == "darwin" and shutil.which("xcrun"):
+        proc = subprocess.run(
+            ["xcrun", "--find", "llvm-profdata"], capture_output=True, text=True
+        )
+        if proc.returncode == 0:
+            return [proc.stdout.strip()]
+
+    raise PGOError(
+        "cannot find llvm-profdata, which is needed to use the profile "
+        "collected by clang: install it or set SPY_LLVM_PROFDATA"
+    )
+
+
+def merge_profiles(CC: str, profile_dir: py.path.local) -> py.path.local:
+    """
+    Merge the .profraw files written by clang into profile_dir/default.profdata.
+
+    The merge is skipped if default.profdata is newer than all the .profraw
+    files, so that a --pgo-use build recompiles only if the profile changed.
+    """
+    profdata = profile_dir.join("default.profdata")
+    profraws = []
+    if profile_dir.check(dir=True):
+        profraws = profile_dir.listdir("*.profraw")
+    if not profraws:
+        if profdata.check(file=True):
+            return profdata
+        raise PGOError(
+            f"no profile data in {profile_dir}: run the executable built "
+            "with --pgo-generate first"
+        )
+    if profdata.check(file=True) and profdata.mtime() >= max(
+        f.mtime() for f in profraws
+    ):
+        return profdata
+
+    cmd = [*find_llvm_profdata(CC), "merge", f"-output={profdata}"]
+    cmd += [str(f) for f in profraws]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        raise PGOError(f"cannot run {cmd[0]}: {e}")
+    if proc.returncode != 0:
+        raise PGOError(
+            f"{cmd[0]} failed to merge the profile data in {profile_dir}:\n"
+            f"{proc.stderr.strip()}"
+        )
+    return profdata
+
+
 class CompilerConfig:
     def __init__(self, config: BuildConfig):
         self.CC = ""
         self.ext = ""
         self.cflags = []
         self.ldflags = []
+        # files which are read by the compiler but are not sources, such as
+        # the PGO profile: the build must be redone when they change
+        self.implicit_inputs: list[py.path.local] = []
 
         self.cflags += CFLAGS
         self.cflags += [f"-DSPY_TARGET_{config.target.upper()}"]
@@ -104,6 +237,15 @@ class CompilerConfig:
             self.cflags += DEBUG_CFLAGS
             self.ldflags += DEBUG_CFLAGS
 
+        # the optimization level is passed also to the linker, because it is
+        # the linker which optimizes the code in case of LTO
+        opt = f"-O{config.get_opt_level()}"
+        self.cflags += [opt]
+        self.ldflags += [opt]
+        if config.get_lto():
+            self.cflags += LTO_FLAGS
+            self.ldflags += LTO_FLAGS
+
         # target specific flags
         if config.target == "native" and config.static:
             self.CC = "python -m ziglang cc"
@@ -139,11 +281,10 @@ class CompilerConfig:
         else:
             assert False, f"Invalid target: {config.target}"
 
-        if config.opt_level is not None:
-            self.cflags += [f"-O{config.opt_level}"]
-
         # GC flags
-        if config.gc == "bdwgc":
+        if config.gc == "spygc":
+            self.cflags += ["-DSPY_GC_SPYGC"]
+        elif config.gc == "bdwgc":
             self.cflags += ["-DSPY_GC_BDWGC"]
             if config.static:
                 self._build_bdwgc_static()
@@ -164,6 +305,43 @@ class CompilerConfig:
                         self.cflags += ["-I", f"{prefix}/include"]
                         self.ldflags += ["-L", f"{prefix}/lib"]
 
+    def add_pgo_flags(self, config: BuildConfig, profile_dir: py.path.local) -> None:
+        """
+        Add the flags for profile-guided optimization.
+
+        With pgo="generate", the executable writes its profile into
+        profile_dir every time it runs. With pgo="use", the compiler reads
+        it back: gcc reads the .gcda files directly, while for clang we need
+        to merge the .profraw files into a .profdata first.
+
+        The profile files are added to implicit_inputs. Raise PGOError if the
+        profile cannot be used.
+        """
+        if config.pgo == "none":
+            return
+        if config.target != "native":
+            raise ValueError("PGO is supported only for the native target")
+        if config.pgo == "generate":
+            flags = [f"-fprofile-generate={profile_dir}"]
+            self.cflags += flags
+            self.ldflags += flags
+        elif cc_is_clang(self.CC):
+            profdata = merge_profiles(self.CC, profile_dir)
+            self.implicit_inputs.append(profdata)
+            flags = [f"-fprofile-use={profdata}", "-Wno-profile-instr-unprofiled"]
+            self.cflags += flags
+            self.ldflags += flags
+        else:
+            if profile_dir.check(dir=True):
+                self.implicit_inputs += profile_dir.listdir("*.gcda")
+            flags = [
+                f"-fprofile-use={profile_dir}",
+                "-fprofile-correction",
+                "-Wno-missing-profile",
+            ]
+            self.cflags += flags
+            self.ldflags += flags
+
     @staticmethod
     def _build_bdwgc_static() -> None:
         deps_dir = str(spy.libspy.DEPS)
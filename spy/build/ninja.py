@@ -6,7 +6,7 @@ import py.path
 from spy.build.config import BuildConfig, CompilerConfig
 from spy.errors import WIP
 from spy.textbuilder import TextBuilder
-from spy.util import robust_run
+from spy.util import robust_run, write_if_changed
 
 
 def fmt_flags(flags: list[str]) -> str:
@@ -47,6 +47,13 @@ class NinjaWriter:
         self.build_dir = build_dir
         self.out = None
 
+    @property
+    def pgo_dir(self) -> py.path.local:
+        """
+        The directory where the profile data for PGO is stored
+        """
+        return self.build_dir.join("pgo")
+
     def write(
         self,
         basename: str,
@@ -58,15 +65,17 @@ class NinjaWriter:
         self.out = basename + comp.ext
         if self.config.kind == "lib":
             comp.ldflags += [f"-Wl,--export={name}" for name in wasm_exports]
+        if self.config.pgo == "generate":
+            self.pgo_dir.ensure(dir=True)
+        comp.add_pgo_flags(self.config, self.pgo_dir)
 
         # generate build.ninja
         build_ninja = self.build_dir.join("build.ninja")
-        with build_ninja.open("w") as f:
-            if len(cfiles) == 1:
-                s = self.gen_build_ninja_single(comp, cfiles[0])
-            else:
-                s = self.gen_build_ninja_many(comp, cfiles)
-            f.write(s)
+        if len(cfiles) == 1:
+            s = self.gen_build_ninja_single(comp, cfiles[0])
+        else:
+            s = self.gen_build_ninja_many(comp, cfiles)
+        write_if_changed(build_ninja, s)
 
     def gen_build_ninja_single(self, comp: CompilerConfig, cfile: py.path.local) -> str:
         """
@@ -75,6 +84,10 @@ class NinjaWriter:
         It collapses CC and LINK together, so avoid invoking it twice. This is
         a tiny optimization but it's important because it's used by almost all
         the tests, so it shaves several seconds from total testing time.
+
+        Like in gen_build_ninja_many, the compiler writes a depfile, so that
+        a change which touches only a header (e.g. a structdefs header)
+        triggers a rebuild even if the .c file is unchanged.
         """
         CC = comp.CC
         cflags = fmt_flags(comp.cflags)
@@ -87,15 +100,18 @@ class NinjaWriter:
         ldflags = {ldflags}
 
         rule cc
-          command = $cc $in -o $out $cflags $ldflags
+          command = $cc $in -o $out $cflags -MMD -MF $out.d $ldflags
           description = CC $out
+          depfile = $out.d
+          deps = gcc
         """)
         c = cfile.relto(self.build_dir)
         if c == "":
             # this means that cfile is not inside build_dir, use abspath
             c = str(cfile)
+        implicit = self.fmt_implicit_inputs(comp)
         tb.wl("")
-        tb.wl(f"build {self.out}: cc {c}")
+        tb.wl(f"build {self.out}: cc {c}{implicit}")
         tb.wl(f"default {self.out}")
         return tb.build()
 
@@ -122,6 +138,7 @@ class NinjaWriter:
           command = $cc $in -o $out $ldflags
           description = LINK $out
         """)
+        implicit = self.fmt_implicit_inputs(comp)
         tb.wl("")
         ofiles = []
         for cfile in cfiles:
@@ -129,13 +146,29 @@ class NinjaWriter:
             c = cfile.relto(self.build_dir)
             o = ofile.relto(self.build_dir)
             ofiles.append(o)
-            tb.wl(f"build {o}: cc {c}")
+            tb.wl(f"build {o}: cc {c}{implicit}")
 
         ofiles_s = fmt_flags(ofiles)
-        tb.wl(f"build {self.out}: link {ofiles_s}")
+        # with LTO, the linker reads the profile too
+        tb.wl(f"build {self.out}: link {ofiles_s}{implicit}")
         tb.wl(f"default {self.out}")
         return tb.build()
 
+    def fmt_implicit_inputs(self, comp: CompilerConfig) -> str:
+        """
+        Format comp.implicit_inputs as the implicit dependencies of a ninja
+        build edge, e.g. " | pgo/default.profdata"
+        """
+        if not comp.implicit_inputs:
+            return ""
+        paths = []
+        for f in comp.implicit_inputs:
+            p = f.relto(self.build_dir)
+            if p == "":
+                p = str(f)
+            paths.append(p.replace("$", "$$").replace(" ", "$ ").replace(":", "$:"))
+        return " | " + " ".join(paths)
+
     def build(self) -> py.path.local:
         assert self.out is not None
         cmdline = ["ninja", "-C", str(self.build_dir)]
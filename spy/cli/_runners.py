@@ -82,6 +82,7 @@ def execute_spy_main(
     argv: list[str],
     redshift: bool = False,
     _timeit: bool = False,
+    _opcache_stats: bool = False,
 ) -> None:
     w_main = w_mod.getattr_maybe("main")
     if w_main is None:
@@ -112,6 +113,9 @@ def execute_spy_main(
     with ctx:
         w_res = vm.fast_call(w_main, args_w)
 
+    if _opcache_stats:
+        vm.opcache.pp(file=sys.stderr)
+
     if has_exit_code:
         sys.exit(vm.unwrap_i32(w_res))
     else:
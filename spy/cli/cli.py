@@ -1,6 +1,7 @@
 import sys
 from typing import Any
 
+from spy.cli.commands.bench import bench
 from spy.cli.commands.build import build
 from spy.cli.commands.cleanup import cleanup
 from spy.cli.commands.colorize import colorize
@@ -30,3 +31,4 @@ app.spy_command(pyparse, name="pyparse")
 app.spy_command(imports, name="imports")
 app.spy_command(symtable, name="symtable")
 app.spy_command(cleanup, name="cleanup")
+app.spy_command(bench, name="bench")
@@ -0,0 +1,138 @@
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated, Optional
+
+import click
+import py.path
+from typer import Argument, Option
+
+from spy.bench import (
+    ALL_MODES,
+    compare_reports,
+    default_benchmarks,
+    find_regressions,
+    fmt_comparison,
+    fmt_results,
+    load_report,
+    make_report,
+    run_benchmark,
+)
+from spy.cli.commands.shared_args import Base_Args
+
+
+@dataclass
+class Bench_Args(Base_Args):
+    files: Annotated[
+        Optional[list[Path]],
+        Argument(
+            help="Benchmarks to run",
+            show_default="all the .spy files in benchmarks/",
+        ),
+    ] = None
+
+    modes: Annotated[
+        Optional[list[str]],
+        Option(
+            "-m",
+            "--mode",
+            help="Mode to benchmark; can be given multiple times "
+            "(default: execute, redshift, native)",
+            click_type=click.Choice(ALL_MODES),
+            show_default=False,
+        ),
+    ] = None
+
+    repeat: Annotated[
+        int,
+        Option("-n", "--repeat", metavar="N", help="Number of measured runs"),
+    ] = 5
+
+    warmup: Annotated[
+        int,
+        Option(
+            "-w",
+            "--warmup",
+            metavar="N",
+            help="Number of runs to do before measuring",
+        ),
+    ] = 1
+
+    json_output: Annotated[
+        Optional[Path],
+        Option("--json", help="Save the results to this JSON file"),
+    ] = None
+
+    baseline: Annotated[
+        Optional[Path],
+        Option(
+            "--baseline",
+            help="Compare the results against this JSON file, produced by a "
+            "previous --json",
+        ),
+    ] = None
+
+    threshold: Annotated[
+        float,
+        Option(
+            "--threshold",
+            metavar="PERCENT",
+            help="Report a regression if a phase is slower than the baseline "
+            "by more than this",
+        ),
+    ] = 10.0
+
+    min_delta: Annotated[
+        float,
+        Option(
+            "--min-delta",
+            metavar="MS",
+            help="Ignore regressions smaller than this, to filter out noise",
+        ),
+    ] = 1.0
+
+
+async def bench(args: Bench_Args) -> None:
+    """Run benchmarks and compare them against a baseline"""
+    if args.files:
+        files = [py.path.local(str(f)) for f in args.files]
+    else:
+        files = default_benchmarks()
+    modes = args.modes or ["execute", "redshift", "native"]
+    if args.repeat < 1:
+        raise click.UsageError("--repeat must be at least 1")
+
+    results: dict[str, dict] = {}
+    for spyfile in files:
+        name = spyfile.purebasename
+        results[name] = {}
+        for mode in modes:
+            phases = await run_benchmark(
+                spyfile,
+                mode,  # type: ignore[arg-type]
+                repeat=args.repeat,
+                warmup=args.warmup,
+            )
+            results[name][mode] = phases
+            print(fmt_results(name, mode, phases), flush=True)
+
+    report = make_report(results, repeat=args.repeat, warmup=args.warmup)
+    if args.json_output:
+        args.json_output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {args.json_output}")
+
+    if args.baseline:
+        baseline = load_report(str(args.baseline))
+        comparisons = compare_reports(baseline, report)
+        threshold = args.threshold / 100
+        min_delta = args.min_delta / 1000
+        print()
+        print(f"Comparison with {args.baseline} (median):")
+        for c in comparisons:
+            regression = c.is_regression(threshold, min_delta)
+            print(fmt_comparison(c, regression))
+        regressions = find_regressions(comparisons, threshold, min_delta)
+        if regressions:
+            print(f"{len(regressions)} regression(s) found")
+            sys.exit(1)
@@ -13,14 +13,24 @@ from typer import Option
 
 from spy.analyze.importing import ImportAnalyzer
 from spy.backend.c.cbackend import CBackend
-from spy.build.config import BuildConfig, BuildTarget, GCOption, OutputKind
+from spy.build.config import (
+    BuildConfig,
+    BuildTarget,
+    GCOption,
+    OptLevel,
+    OutputKind,
+    PGOError,
+    PGOMode,
+)
 from spy.cli._runners import init_vm, nullcontext, timer
 from spy.cli.commands.shared_args import (
     Base_Args,
     Filename_Required_Args,
     _execute_flag,
     _execute_options,
+    _jobs_mixin,
 )
+from spy.redshiftcache import RedshiftCache
 
 
 @dataclass
@@ -47,13 +57,42 @@ class _build_mixin:
     ] = None
 
     opt_level: Annotated[
-        int,
+        Optional[str],
         Option(
             "-O",
             metavar="LEVEL",
-            help="Optimization level",
+            help="Optimization level: 0, 1, 2, 3 or s (default: 3 with "
+            "--release, 0 otherwise)",
+            click_type=click.Choice(OptLevel.__args__),
+            show_default=False,
+        ),
+    ] = None
+
+    lto: Annotated[
+        Optional[bool],
+        Option(
+            "--lto/--no-lto",
+            help="Enable link-time optimization (default: only with --release)",
+            show_default=False,
+        ),
+    ] = None
+
+    pgo_generate: Annotated[
+        bool,
+        Option(
+            "--pgo-generate",
+            help="Build an instrumented executable which collects a profile "
+            "for PGO into BUILD_DIR/pgo",
+        ),
+    ] = False
+
+    pgo_use: Annotated[
+        bool,
+        Option(
+            "--pgo-use",
+            help="Optimize using the profile collected by a --pgo-generate build",
         ),
-    ] = 0
+    ] = False
 
     warning_as_error: Annotated[
         bool,
@@ -94,7 +133,7 @@ class _build_mixin:
         str,
         Option(
             "--gc",
-            help="GC implementation: auto, none, bdwgc (default: auto, "
+            help="GC implementation: auto, none, bdwgc, spygc (default: auto, "
             "i.e. bdwgc for native, none for wasm targets)",
             click_type=click.Choice(["auto", *GCOption.__args__]),
         ),
@@ -111,7 +150,12 @@ class _build_mixin:
 
 @dataclass
 class Build_Args(
-    Base_Args, _build_mixin, _execute_flag, _execute_options, Filename_Required_Args
+    Base_Args,
+    _build_mixin,
+    _jobs_mixin,
+    _execute_flag,
+    _execute_options,
+    Filename_Required_Args,
 ): ...
 
 
@@ -125,7 +169,12 @@ async def build(args: Build_Args) -> None:
     importer.import_all()
 
     vm.ast_color_map = {}
-    vm.redshift(error_mode=args.error_mode)
+    cache = None
+    if not args.no_spyc and args.error_mode == "eager":
+        cache = RedshiftCache.from_importer(importer)
+    vm.redshift(error_mode=args.error_mode, cache=cache, jobs=args.jobs)
+    if cache is not None:
+        cache.save(importer)
 
     gc: GCOption
     if args.gc == "auto":
@@ -136,9 +185,9 @@ async def build(args: Build_Args) -> None:
     else:
         gc = args.gc  # type: ignore[assignment]
 
-    if gc != "none" and args.target != "native":
+    if gc == "bdwgc" and args.target != "native":
         raise click.UsageError(
-            f"WASM targets only support --gc=none, got --gc={args.gc}"
+            f"WASM targets only support --gc=none or --gc=spygc, got --gc={args.gc}"
         )
 
     if args.static and args.target != "native":
@@ -147,10 +196,27 @@ async def build(args: Build_Args) -> None:
     if args.static and sys.platform == "darwin":
         raise click.UsageError("--static is not supported on macOS")
 
+    pgo: PGOMode = "none"
+    if args.pgo_generate and args.pgo_use:
+        raise click.UsageError("--pgo-generate and --pgo-use are mutually exclusive")
+    elif args.pgo_generate:
+        pgo = "generate"
+    elif args.pgo_use:
+        pgo = "use"
+
+    if pgo != "none" and (args.target != "native" or args.output_kind != "exe"):
+        raise click.UsageError(
+            "--pgo-generate and --pgo-use can only be used with "
+            "--target native --output-kind exe"
+        )
+
     config = BuildConfig(
         target=args.target,
         kind=args.output_kind,
         build_type="release" if args.release_mode else "debug",
+        opt_level=args.opt_level,  # type: ignore[arg-type]
+        lto=args.lto,
+        pgo=pgo,
         warning_as_error=args.warning_as_error,
         gc=gc,
         static=args.static,
@@ -158,12 +224,20 @@ async def build(args: Build_Args) -> None:
 
     cwd = py.path.local(".")
     build_dir = get_build_dir(args)
+    if pgo == "use" and not build_dir.join("pgo").check(dir=True):
+        raise click.UsageError(
+            f"no profile data in {build_dir.join('pgo')}: build with "
+            "--pgo-generate and run the executable first"
+        )
     backend = CBackend(vm, modname, config, build_dir, dump_c=args.cdump)
 
     backend.cwrite()
     if args.cdump:
         return
-    backend.write_build_script()
+    try:
+        backend.write_build_script()
+    except PGOError as e:
+        raise click.ClickException(str(e))
     assert backend.build_script is not None
 
     if args.no_compile:
@@ -179,6 +253,11 @@ async def build(args: Build_Args) -> None:
         # outfile is not in a subdir of cwd, let's display the full path
         executable = str(outfile)
     print(f"[{config.build_type}] {executable} ")
+    if pgo == "generate":
+        assert backend.ninja is not None
+        pgo_dir = backend.ninja.pgo_dir
+        print(f"Run {executable} to collect a profile into {pgo_dir}, then rebuild")
+        print("with --pgo-use")
 
     if args.execute:
         with timer() if args.timeit else nullcontext():
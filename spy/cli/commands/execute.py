@@ -6,11 +6,14 @@ from spy.cli.commands.shared_args import (
     Base_Args,
     Filename_Required_Args,
     _execute_options,
+    _opcache_stats_mixin,
 )
 
 
 @dataclass
-class Execute_Args(Base_Args, _execute_options, Filename_Required_Args): ...
+class Execute_Args(
+    Base_Args, _execute_options, _opcache_stats_mixin, Filename_Required_Args
+): ...
 
 
 async def execute(args: Execute_Args) -> None:
@@ -24,4 +27,11 @@ async def execute(args: Execute_Args) -> None:
     w_mod = vm.modules_w[modname]
 
     argv: list[str] = args.argv or []
-    execute_spy_main(vm, w_mod, argv, redshift=False, _timeit=args.timeit)
+    execute_spy_main(
+        vm,
+        w_mod,
+        argv,
+        redshift=False,
+        _timeit=args.timeit,
+        _opcache_stats=args.opcache_stats,
+    )
@@ -14,7 +14,9 @@ from spy.cli.commands.shared_args import (
     Filename_Required_Args,
     _execute_flag,
     _execute_options,
+    _jobs_mixin,
 )
+from spy.redshiftcache import RedshiftCache
 
 
 @dataclass
@@ -46,7 +48,12 @@ class _redshift_mixin:
 
 @dataclass
 class Redshift_Args(
-    Base_Args, _redshift_mixin, _execute_flag, _execute_options, Filename_Required_Args
+    Base_Args,
+    _redshift_mixin,
+    _jobs_mixin,
+    _execute_flag,
+    _execute_options,
+    Filename_Required_Args,
 ):
     extra_dump: Annotated[
         Optional[list[Path]],
@@ -77,7 +84,17 @@ async def redshift(args: Redshift_Args) -> None:
     importer.import_all()
 
     vm.ast_color_map = {}
-    vm.redshift(error_mode=args.error_mode)
+    # the ast and html formats show the colors of the expressions, which are
+    # not stored in the redshift cache and not sent back by the workers
+    cache = None
+    jobs = 1
+    if args.execute or args.format == "spy":
+        if not args.no_spyc and args.error_mode == "eager":
+            cache = RedshiftCache.from_importer(importer)
+        jobs = args.jobs
+    vm.redshift(error_mode=args.error_mode, cache=cache, jobs=jobs)
+    if cache is not None:
+        cache.save(importer)
 
     if args.execute:
         w_mod = vm.modules_w[modname]
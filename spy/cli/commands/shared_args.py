@@ -79,6 +79,27 @@ class _execute_options(_timeit_mixin):
     ] = None
 
 
+@dataclass
+class _opcache_stats_mixin:
+    opcache_stats: Annotated[
+        bool,
+        Option("--opcache-stats", help="Print inline cache statistics"),
+    ] = False
+
+
+@dataclass
+class _jobs_mixin:
+    jobs: Annotated[
+        int,
+        Option(
+            "-j",
+            "--jobs",
+            metavar="N",
+            help="Redshift functions in N parallel processes (eager mode only)",
+        ),
+    ] = 1
+
+
 @dataclass
 class _execute_flag:
     execute: Annotated[
@@ -87,4 +108,6 @@ class _execute_flag:
 
 
 @dataclass
-class Execute_Args(Base_Args, _execute_options, Filename_Required_Args): ...
+class Execute_Args(
+    Base_Args, _execute_options, _opcache_stats_mixin, Filename_Required_Args
+): ...
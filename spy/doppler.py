@@ -523,12 +523,14 @@ class DopplerFrame(ASTFrame):
         return self.shift_opimpl(tup, w_opimpl, [v_T] + newitems_v, w_T=wam.w_static_T)
 
     def shift_expr_Slice(self, op: ast.Slice, wam: W_MetaArg) -> ast.Expr:
+        # the opimpl was computed by eval_expr_Slice as Slice(start, stop, step)
         w_opimpl = self.opimpl[op]
+        v_T = make_const(self.vm, op.loc, wam.w_static_T)
         v_start = self.shifted_expr[op.start]
         v_stop = self.shifted_expr[op.stop]
         v_step = self.shifted_expr[op.step]
         return self.shift_opimpl(
-            op, w_opimpl, [v_start, v_stop, v_step], w_T=wam.w_static_T
+            op, w_opimpl, [v_T, v_start, v_stop, v_step], w_T=wam.w_static_T
         )
 
     def shift_expr_Dict(self, dict: ast.Dict, wam: W_MetaArg) -> ast.Expr:
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Any, Optional
 
 import spy
@@ -20,9 +21,11 @@ elif IS_BROWSER:
     LLMOD = None
 else:
     assert not IS_PYODIDE
-    # "normal" python, we can preload LLMOD
+    # "normal" python, we can preload LLMOD. This is cheap: the module is
+    # compiled only when we create the first LLSPyInstance, and the compiled
+    # code is cached in BUILD/wasmtime-cache.
     LIBSPY_WASM = BUILD.join("wasi", "debug", "libspy.wasm")
-    LLMOD = LLWasmModule(LIBSPY_WASM)  # type: ignore
+    LLMOD = LLWasmModule(LIBSPY_WASM, cache_dir=BUILD.join("wasmtime-cache"))  # type: ignore
 
 # XXX ^^^^
 # is it correct to always use debug/libspy.wasm? For tests it's surely fine
@@ -80,12 +83,104 @@ class LibSPyHost(HostModule):
         self.panic_lineno = lineno
 
 
+class LLAlloc:
+    """
+    A block of linear memory allocated on behalf of the interpreter, e.g. the
+    'spy_Str *' of a W_Str or the memory returned by gc_alloc.
+
+    All the W_* objects which point inside the block keep a reference to its
+    LLAlloc: when the last of them goes away, the block is given back to
+    libspy. If the address is stored into linear memory, we can no longer
+    track who uses it: in that case the block "escapes" and it's never freed.
+    """
+
+    __slots__ = ("ll", "addr", "size", "escaped")
+    ll: "LLSPyInstance"
+    addr: int
+    size: int
+    escaped: bool
+
+    def __init__(self, ll: "LLSPyInstance", addr: int, size: int) -> None:
+        self.ll = ll
+        self.addr = addr
+        self.size = size
+        self.escaped = False
+
+    def __repr__(self) -> str:
+        return f"<LLAlloc 0x{self.addr:x} size={self.size} escaped={self.escaped}>"
+
+    # there must be exactly one LLAlloc per block, else we free it twice
+    def __copy__(self) -> "LLAlloc":
+        return self
+
+    def __deepcopy__(self, memo: Any) -> "LLAlloc":
+        return self
+
+    def escape(self) -> None:
+        if not self.escaped:
+            self.escaped = True
+            self.ll.live_allocs -= 1
+            self.ll.live_bytes -= self.size
+            self.ll.escaped_allocs += 1
+            self.ll.escaped_bytes += self.size
+
+    def __del__(self) -> None:
+        if not self.escaped:
+            self.ll.live_allocs -= 1
+            self.ll.live_bytes -= self.size
+            self.ll.pending_free.append(self.addr)
+            self.ll.pending_bytes += self.size
+
+
+@dataclass
+class LLMemoryUsage:
+    """
+    Snapshot of the memory usage of an LLSPyInstance, see
+    LLSPyInstance.memory_usage().
+    """
+
+    linear_memory: int  # size of the linear memory, in bytes
+    live_allocs: int  # blocks owned by live objects
+    live_bytes: int
+    escaped_allocs: int  # blocks which will never be freed
+    escaped_bytes: int
+    freed_allocs: int  # total, since the creation of the instance
+    freed_bytes: int
+    pending_allocs: int  # dead blocks, freed at the next call
+    pending_bytes: int
+
+    def __str__(self) -> str:
+        MB = 1024 * 1024
+        return (
+            f"linear memory: {self.linear_memory / MB:.2f} MB\n"
+            f"live:          {self.live_allocs} blocks, {self.live_bytes} bytes\n"
+            f"escaped:       {self.escaped_allocs} blocks, "
+            f"{self.escaped_bytes} bytes\n"
+            f"freed:         {self.freed_allocs} blocks, {self.freed_bytes} bytes\n"
+            f"pending free:  {self.pending_allocs} blocks, {self.pending_bytes} bytes"
+        )
+
+
 class LLSPyInstance(LLWasmInstance):
     """
     A specialized version of LLWasmInstance which automatically link against
     LibSPyHost()
+
+    It also keeps track of the memory allocated on behalf of the interpreter,
+    see LLAlloc.
     """
 
+    pending_free: list[int]
+    pending_bytes: int
+    call_depth: int
+    calls: int  # number of calls into libspy: see SideEffectWatcher
+    live_allocs: int
+    live_bytes: int
+    escaped_allocs: int
+    escaped_bytes: int
+    freed_allocs: int
+    freed_bytes: int
+
     def __init__(
         self,
         llmod: LLWasmModule,
@@ -96,8 +191,69 @@ class LLSPyInstance(LLWasmInstance):
         self.libspy = LibSPyHost()
         hostmods = [self.libspy] + hostmods
         super().__init__(llmod, hostmods, instance=instance)
+        self.pending_free = []
+        self.pending_bytes = 0
+        self.call_depth = 0
+        self.calls = 0
+        self.live_allocs = 0
+        self.live_bytes = 0
+        self.escaped_allocs = 0
+        self.escaped_bytes = 0
+        self.freed_allocs = 0
+        self.freed_bytes = 0
+
+    def own(self, addr: int, size: int) -> Optional[LLAlloc]:
+        """
+        Take ownership of a block of memory which was just allocated by
+        libspy. Return None for NULL.
+        """
+        if addr == 0:
+            return None
+        size = int(size)
+        self.live_allocs += 1
+        self.live_bytes += size
+        return LLAlloc(self, int(addr), size)
+
+    def free_pending(self) -> None:
+        """
+        Free the blocks whose LLAlloc died.
+
+        LLAlloc.__del__ can run at any point, including while we are inside
+        a WASM call (e.g. during a call to a host function): so, it only
+        schedules the block, and we free it when it's safe to re-enter libspy.
+        """
+        assert self.call_depth == 0
+        pending, nbytes = self.pending_free, self.pending_bytes
+        self.pending_free, self.pending_bytes = [], 0
+        self.freed_allocs += len(pending)
+        self.freed_bytes += nbytes
+        for addr in pending:
+            self._call("spy_free", addr)
+
+    def memory_usage(self) -> LLMemoryUsage:
+        return LLMemoryUsage(
+            linear_memory=self.mem.size(),
+            live_allocs=self.live_allocs,
+            live_bytes=self.live_bytes,
+            escaped_allocs=self.escaped_allocs,
+            escaped_bytes=self.escaped_bytes,
+            freed_allocs=self.freed_allocs,
+            freed_bytes=self.freed_bytes,
+            pending_allocs=len(self.pending_free),
+            pending_bytes=self.pending_bytes,
+        )
 
     def call(self, name: str, *args: Any) -> Any:
+        if self.pending_free and self.call_depth == 0:
+            self.free_pending()
+        self.call_depth += 1
+        self.calls += 1
+        try:
+            return self._call(name, *args)
+        finally:
+            self.call_depth -= 1
+
+    def _call(self, name: str, *args: Any) -> Any:
         try:
             return super().call(name, *args)
         except WasmTrap:
@@ -39,6 +39,7 @@
 #endif
 
 #include "spy/__spy__.h"
+#include "spy/arena.h"
 #include "spy/builtins.h"
 #include "spy/debug.h"
 #include "spy/gc.h"
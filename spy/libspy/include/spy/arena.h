@@ -0,0 +1,54 @@
+#ifndef SPY_ARENA_H
+#define SPY_ARENA_H
+
+#include "spy.h"
+
+/* unsafe.Arena: a bump-pointer region allocator.
+
+   Memory is carved out of big malloc()ed chunks by just incrementing a
+   pointer. Individual allocations are never freed: instead, reset() makes
+   the whole region available again in O(1) (the chunks are kept for reuse)
+   and close() gives all the memory back to the system.
+
+   Arena memory is NOT zeroed and NOT scanned by the GC: it must not contain
+   the only reference to a GC-managed object.
+*/
+
+#define SPY_ARENA_ALIGN 8
+#define SPY_ARENA_MIN_CHUNK_SIZE (64 * 1024)
+
+typedef struct spy_ArenaChunk spy_ArenaChunk;
+struct spy_ArenaChunk {
+    spy_ArenaChunk *next;
+    size_t size; // size of data[], in bytes
+    char data[];
+};
+
+typedef struct {
+    char *cur;              // next free byte in the current chunk
+    char *end;              // end of the current chunk
+    spy_ArenaChunk *chunks; // chunks in use, the current one first
+    spy_ArenaChunk *free;   // chunks released by reset(), ready for reuse
+    bool closed;
+} spy_Arena;
+
+spy_Arena *WASM_EXPORT(spy_unsafe$Arena$__new__)(void);
+void WASM_EXPORT(spy_unsafe$Arena$reset)(spy_Arena *a);
+void WASM_EXPORT(spy_unsafe$Arena$close)(spy_Arena *a);
+void *spy_arena_alloc_slow(spy_Arena *a, size_t size);
+
+// only for the interpreter, the C backend uses the inline version below
+void *WASM_EXPORT(spy_arena_alloc_exported)(spy_Arena *a, size_t size);
+
+static inline void *
+spy_arena_alloc(spy_Arena *a, size_t size) {
+    size = (size + SPY_ARENA_ALIGN - 1) & ~(size_t)(SPY_ARENA_ALIGN - 1);
+    if (size <= (size_t)(a->end - a->cur)) {
+        void *p = a->cur;
+        a->cur += size;
+        return p;
+    }
+    return spy_arena_alloc_slow(a, size);
+}
+
+#endif /* SPY_ARENA_H */
@@ -7,6 +7,30 @@ typedef struct {
     void *p;
 } spy_GcRef;
 
+/* spygc: our own conservative mark & sweep GC, see src/gc.c.
+
+   libspy.a is compiled only once for all the GC options, so the GC is
+   selected at runtime: the C code generated with --gc=spygc calls
+   spy_gc_enable() from a constructor, and from that point all the calls to
+   spy_gc_alloc() go to spygc, including the ones done by libspy itself
+   (e.g. to allocate strings).
+*/
+typedef struct {
+    size_t collections;
+    size_t allocated_bytes; // total, since the start of the program
+    size_t freed_bytes;     // total, since the start of the program
+    size_t live_bytes;      // after the last collection
+    size_t heap_bytes;      // currently owned by the GC
+    size_t peak_heap_bytes;
+} spy_GcStats;
+
+extern bool spy_spygc_enabled;
+void spy_gc_enable(void);
+void *spy_spygc_alloc(size_t size);
+void WASM_EXPORT(spy_gc_collect)(void);
+spy_GcStats spy_gc_stats(void);
+void spy_gc_print_stats(void);
+
 #ifdef SPY_GC_BDWGC
 #include <gc.h>
 
@@ -15,13 +39,53 @@ spy_GcAlloc(size_t size) {
     return (spy_GcRef){GC_MALLOC(size)};
 }
 
+#elif defined(SPY_GC_SPYGC)
+
+static inline spy_GcRef
+spy_GcAlloc(size_t size) {
+    return (spy_GcRef){spy_spygc_alloc(size)};
+}
+
+__attribute__((constructor)) static void
+spy_gc_init_spygc(void) {
+    spy_gc_enable();
+}
+
+/* On wasm32, the locals of a function can live in wasm locals, which are
+   invisible to a GC which scans linear memory. SPY_GC_ROOT(x) takes the
+   address of x and lets it escape, which forces the compiler to keep x in
+   the shadow stack. SPY_GC_PIN(T, expr) does the same for a temporary of
+   type T, so that e.g. the result of a call stays alive while the other
+   arguments of the outer call are being computed.
+
+   On native, the GC scans the registers and the C stack, so these are
+   no-ops (see below).
+*/
+#  if defined(__wasm__)
+static inline void *
+spy_gc_escape(void *p) {
+    __asm__ volatile("" : : "r"(p) : "memory");
+    return p;
+}
+#    define SPY_GC_ROOT(x) spy_gc_escape(&(x))
+#    define SPY_GC_PIN(T, ...) (*(T *)spy_gc_escape((T[1]){__VA_ARGS__}))
+#  endif
+
 #else
-// default: no GC, just malloc and leak
+// default: no GC, just malloc and leak. This goes through spy_gc_alloc so
+// that the code inside libspy uses spygc when it is enabled.
+void *spy_gc_alloc(size_t size);
+
 static inline spy_GcRef
 spy_GcAlloc(size_t size) {
-    return (spy_GcRef){malloc(size)};
+    return (spy_GcRef){spy_gc_alloc(size)};
 }
 
 #endif
 
+#ifndef SPY_GC_ROOT
+#  define SPY_GC_ROOT(x) ((void)0)
+#  define SPY_GC_PIN(T, ...) (__VA_ARGS__)
+#endif
+
 #endif /* SPY_GC_H */
@@ -15,6 +15,117 @@ spy_Str *WASM_EXPORT(spy_posix$_freadall)(FILE *f);
 spy_Str *WASM_EXPORT(spy_posix$_freadline)(FILE *f);
 void WASM_EXPORT(spy_posix$_fclose)(FILE *f);
 
+/* posix.MMap: a read-only view of the whole content of a file.
+
+   On native targets the file is mmap()ed, so the content is never copied and
+   the pages are loaded lazily by the OS. WASI has no mmap, so there we fall
+   back to reading the whole file into a malloc()ed buffer.
+
+   len() and m[i] use i32, so they work only on files smaller than 2 GiB. For
+   bigger files, size() returns the length as an f64 (which is exact up to
+   2**53), and the content is accessed in chunks of SPY_POSIX_MMAP_CHUNK
+   bytes:
+       nchunks() is the number of chunks
+       chunk_len(k) is the length of chunk k
+       chunk_getitem(k, i) is byte i of chunk k
+
+   NOTE: the interpreter reads `data` and `length` directly from the linear
+   memory, see vm/modules/posix.py: the layout of the struct must be kept in
+   sync.
+*/
+typedef struct {
+    const uint8_t *data;
+    size_t length;
+    bool mapped; // true if data comes from mmap(), false if from malloc()
+} spy_posix$MMap;
+
+// NOTE: this is also defined in vm/modules/posix.py
+#define SPY_POSIX_MMAP_CHUNK ((size_t)1 << 30)
+
+spy_posix$MMap *WASM_EXPORT(spy_posix$mmap)(spy_Str *path);
+void WASM_EXPORT(spy_posix$MMap$close)(spy_posix$MMap *m);
+
+static inline int32_t
+spy_posix$MMap$__len__(spy_posix$MMap *m) {
+    if (m->length > INT32_MAX)
+        spy_panic("OverflowError", "MMap too big, use size() and chunks",
+                  __FILE__, __LINE__);
+    return (int32_t)m->length;
+}
+
+static inline uint8_t
+spy_posix$MMap$__getitem__(spy_posix$MMap *m, int32_t i) {
+    if (i < 0 || (size_t)i >= m->length)
+        spy_panic("IndexError", "MMap index out of range", __FILE__, __LINE__);
+    return m->data[i];
+}
+
+static inline double
+spy_posix$MMap$size(spy_posix$MMap *m) {
+    return (double)m->length;
+}
+
+static inline int32_t
+spy_posix$MMap$nchunks(spy_posix$MMap *m) {
+    return (int32_t)((m->length + SPY_POSIX_MMAP_CHUNK - 1) / SPY_POSIX_MMAP_CHUNK);
+}
+
+static inline void
+spy_posix$MMap$_check_chunk(spy_posix$MMap *m, int32_t k) {
+    // NOTE: on wasm32 k * SPY_POSIX_MMAP_CHUNK overflows for k >= 4, so we
+    // must check k before computing any offset
+    if (k < 0 || k >= spy_posix$MMap$nchunks(m))
+        spy_panic("IndexError", "MMap chunk out of range", __FILE__, __LINE__);
+}
+
+static inline int32_t
+spy_posix$MMap$chunk_len(spy_posix$MMap *m, int32_t k) {
+    spy_posix$MMap$_check_chunk(m, k);
+    size_t n = m->length - (size_t)k * SPY_POSIX_MMAP_CHUNK;
+    return (int32_t)(n < SPY_POSIX_MMAP_CHUNK ? n : SPY_POSIX_MMAP_CHUNK);
+}
+
+static inline uint8_t
+spy_posix$MMap$chunk_getitem(spy_posix$MMap *m, int32_t k, int32_t i) {
+    spy_posix$MMap$_check_chunk(m, k);
+    size_t offset = (size_t)k * SPY_POSIX_MMAP_CHUNK + (size_t)i;
+    if (i < 0 || (size_t)i >= SPY_POSIX_MMAP_CHUNK || offset >= m->length)
+        spy_panic("IndexError", "MMap index out of range", __FILE__, __LINE__);
+    return m->data[offset];
+}
+
+/* posix.File: a buffered reader which iterates over the lines of a file.
+
+   Lines are searched directly in a single reusable buffer, which grows only
+   if a line doesn't fit in it: the only per-line allocation is the spy_Str
+   returned by __item__/readline.
+
+   Iteration follows the usual protocol, see ASTFrame._desugar_For. Since
+   the file object is mutable, the iterator is the file itself:
+       __fastiter__() moves to the first line and returns the file
+       __continue_iteration__() returns whether there is a current line
+       __item__() returns a copy of the current line
+       __next__() moves to the next line and returns the file
+*/
+typedef struct {
+    FILE *f;
+    char *buf;
+    size_t capacity;
+    size_t start; // start of the current line
+    size_t stop;  // end of the current line, including the '\n'
+    size_t end;   // end of the data read so far
+    bool eof;
+    bool has_line;
+} spy_posix$File;
+
+spy_posix$File *WASM_EXPORT(spy_posix$open)(spy_Str *path);
+spy_Str *WASM_EXPORT(spy_posix$File$readline)(spy_posix$File *f);
+void WASM_EXPORT(spy_posix$File$close)(spy_posix$File *f);
+spy_posix$File *WASM_EXPORT(spy_posix$File$__fastiter__)(spy_posix$File *f);
+spy_posix$File *WASM_EXPORT(spy_posix$File$__next__)(spy_posix$File *f);
+bool WASM_EXPORT(spy_posix$File$__continue_iteration__)(spy_posix$File *f);
+spy_Str *WASM_EXPORT(spy_posix$File$__item__)(spy_posix$File *f);
+
 // NOTE: this struct is also defined in vm/modules/posix.py, the two definitions must be
 // kept in sync
 typedef struct spy_posix$TerminalSize spy_posix$TerminalSize;
@@ -42,6 +42,44 @@ int32_t WASM_EXPORT(spy_str_hash)(spy_Str *s);
 #define spy_builtins$str$__len__ spy_str_len
 #define spy_builtins$hash_str spy_str_hash
 
+/* StringBuilder: a growable buffer to build strings with amortized O(1)
+   appends, instead of the quadratic behavior of repeated `+`.
+
+   The buffer is itself a spy_Str whose length is the capacity. If the buffer
+   is exactly full, build() returns it without copying: this is the common
+   case for str.join, which reserve()s the exact size in advance. After that
+   the buffer is shared, and the next append() copies it.
+*/
+typedef struct {
+    spy_Str *buf;    // NULL if capacity == 0
+    size_t length;   // number of bytes used
+    size_t capacity; // == buf->length
+    bool shared;     // buf has been returned by build()
+} spy_StringBuilder;
+
+spy_StringBuilder *spy_builtins$StringBuilder$__new__(void);
+void spy_builtins$StringBuilder$reserve(spy_StringBuilder *sb, int32_t n);
+spy_Str *spy_builtins$StringBuilder$build(spy_StringBuilder *sb);
+void spy_strbuilder_append_slow(spy_StringBuilder *sb, spy_Str *s);
+
+static inline void
+spy_builtins$StringBuilder$append(spy_StringBuilder *sb, spy_Str *s) {
+    // sb->buf is NULL if capacity == 0, and memcpy(NULL + 0, ..., 0) is UB
+    if (s->length == 0)
+        return;
+    if (!sb->shared && s->length <= sb->capacity - sb->length) {
+        memcpy((char *)sb->buf->utf8 + sb->length, s->utf8, s->length);
+        sb->length += s->length;
+        return;
+    }
+    spy_strbuilder_append_slow(sb, s);
+}
+
+static inline int32_t
+spy_builtins$StringBuilder$__len__(spy_StringBuilder *sb) {
+    return (int32_t)sb->length;
+}
+
 // __str__ methods of common builtin types
 spy_Str *spy_builtins$i32$__str__(int32_t x);
 
@@ -5,13 +5,16 @@
 
 void *WASM_EXPORT(spy_gc_alloc)(size_t size);
 void *WASM_EXPORT(spy_raw_alloc)(size_t size);
+void WASM_EXPORT(spy_free)(void *p);
 
-// When compiling with bdwgc, override spy_gc_alloc with an inline that calls
-// GC_MALLOC. This takes precedence over the function in libspy.a.
+// When compiling with bdwgc or spygc, override spy_gc_alloc to call the GC
+// directly. This takes precedence over the function in libspy.a.
 #ifdef SPY_GC_BDWGC
 #include <gc.h>
 static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
 #define spy_gc_alloc(size) spy_gc_alloc_bdwgc(size)
+#elif defined(SPY_GC_SPYGC)
+#define spy_gc_alloc(size) spy_spygc_alloc(size)
 #endif
 
 /* Define the struct and accessor functions to represent a managed pointer to
@@ -26,7 +29,7 @@ static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
    } Ptr_T;
 
    SPY_PTR_FUNCTIONS(raw, Ptr_T, T) defines all the accessor functions such as
-   Ptr_T$alloc, Ptr_T$load, etc.
+   Ptr_T$alloc, Ptr_T$arena_alloc, Ptr_T$load, etc.
 
    In SPY_RELEASE mode, a managed pointer is just a wrapper around an
    unmanaged C pointer, but in SPY_DEBUG it also contains the length of the
@@ -46,6 +49,9 @@ static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
     static inline PTR PTR##$alloc(size_t n) {                                          \
         return (PTR){spy_##MEMKIND##_alloc(sizeof(T) * n)};                            \
     }                                                                                  \
+    static inline PTR PTR##$arena_alloc(spy_Arena *a, size_t n) {                      \
+        return (PTR){spy_arena_alloc(a, sizeof(T) * n)};                               \
+    }                                                                                  \
     static inline T PTR##$deref(PTR p) {                                               \
         return *(p.p);                                                                 \
     }                                                                                  \
@@ -66,8 +72,32 @@ static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
     }                                                                                  \
     static inline bool PTR##$to_bool(PTR p) {                                          \
         return p.p;                                                                    \
+    }                                                                                  \
+    static inline void PTR##$memcpy(                                                   \
+        PTR dst, ptrdiff_t dst_start, PTR src, ptrdiff_t src_start, ptrdiff_t n        \
+    ) {                                                                                \
+        memcpy(dst.p + dst_start, src.p + src_start, sizeof(T) * n);                   \
+    }                                                                                  \
+    static inline void PTR##$memmove(                                                  \
+        PTR dst, ptrdiff_t dst_start, PTR src, ptrdiff_t src_start, ptrdiff_t n        \
+    ) {                                                                                \
+        memmove(dst.p + dst_start, src.p + src_start, sizeof(T) * n);                  \
+    }                                                                                  \
+    static inline void PTR##$memset(PTR p, ptrdiff_t start, int byte, ptrdiff_t n) {   \
+        memset(p.p + start, byte, sizeof(T) * n);                                      \
+    }                                                                                  \
+    static inline void PTR##$fill(PTR p, ptrdiff_t start, T v, ptrdiff_t n) {          \
+        T *q = p.p + start;                                                            \
+        for (ptrdiff_t i = 0; i < n; i++)                                              \
+            q[i] = v;                                                                  \
     }
 
+/* Used by the checked version of memcpy & co.: [start, start+n) must be inside
+   the array. A NULL pointer has length 0, so it's accepted only if n == 0 */
+#define _SPY_PTR_CHECK_RANGE(P, START, N, MSG)                                         \
+    if ((N) < 0 || (START) < 0 || (START) + (N) > (P).length)                          \
+        spy_panic("PanicError", MSG, __FILE__, __LINE__);
+
 #define _SPY_PTR_FUNCTIONS_CHECKED(MEMKIND, PTR, T)                                    \
     static inline PTR PTR##_from_addr(T *p) {                                          \
         return (PTR){p, 1};                                                            \
@@ -75,6 +105,9 @@ static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
     static inline PTR PTR##$alloc(size_t n) {                                          \
         return (PTR){spy_##MEMKIND##_alloc(sizeof(T) * n), n};                         \
     }                                                                                  \
+    static inline PTR PTR##$arena_alloc(spy_Arena *a, size_t n) {                      \
+        return (PTR){spy_arena_alloc(a, sizeof(T) * n), n};                            \
+    }                                                                                  \
     static inline T PTR##$deref(PTR p) {                                               \
         return *(p.p);                                                                 \
     }                                                                                  \
@@ -113,6 +146,30 @@ static inline void *spy_gc_alloc_bdwgc(size_t size) { return GC_MALLOC(size); }
     }                                                                                  \
     static inline bool PTR##$to_bool(PTR p) {                                          \
         return p.p;                                                                    \
+    }                                                                                  \
+    static inline void PTR##$memcpy(                                                   \
+        PTR dst, ptrdiff_t dst_start, PTR src, ptrdiff_t src_start, ptrdiff_t n        \
+    ) {                                                                                \
+        _SPY_PTR_CHECK_RANGE(dst, dst_start, n, "ptr_memcpy out of bounds");           \
+        _SPY_PTR_CHECK_RANGE(src, src_start, n, "ptr_memcpy out of bounds");           \
+        memcpy(dst.p + dst_start, src.p + src_start, sizeof(T) * n);                   \
+    }                                                                                  \
+    static inline void PTR##$memmove(                                                  \
+        PTR dst, ptrdiff_t dst_start, PTR src, ptrdiff_t src_start, ptrdiff_t n        \
+    ) {                                                                                \
+        _SPY_PTR_CHECK_RANGE(dst, dst_start, n, "ptr_memmove out of bounds");          \
+        _SPY_PTR_CHECK_RANGE(src, src_start, n, "ptr_memmove out of bounds");          \
+        memmove(dst.p + dst_start, src.p + src_start, sizeof(T) * n);                  \
+    }                                                                                  \
+    static inline void PTR##$memset(PTR p, ptrdiff_t start, int byte, ptrdiff_t n) {   \
+        _SPY_PTR_CHECK_RANGE(p, start, n, "ptr_memset out of bounds");                 \
+        memset(p.p + start, byte, sizeof(T) * n);                                      \
+    }                                                                                  \
+    static inline void PTR##$fill(PTR p, ptrdiff_t start, T v, ptrdiff_t n) {          \
+        _SPY_PTR_CHECK_RANGE(p, start, n, "ptr_fill out of bounds");                   \
+        T *q = p.p + start;                                                            \
+        for (ptrdiff_t i = 0; i < n; i++)                                              \
+            q[i] = v;                                                                  \
     }
 
 #endif /* SPY_UNSAFE_H */
@@ -0,0 +1,92 @@
+#include "spy.h"
+
+spy_Arena *
+spy_unsafe$Arena$__new__(void) {
+    spy_Arena *a = (spy_Arena *)malloc(sizeof(spy_Arena));
+    if (a == NULL)
+        spy_panic("MemoryError", "cannot allocate arena", __FILE__, __LINE__);
+    memset(a, 0, sizeof(spy_Arena));
+    return a;
+}
+
+static void
+free_chunks(spy_ArenaChunk *c) {
+    while (c) {
+        spy_ArenaChunk *next = c->next;
+        free(c);
+        c = next;
+    }
+}
+
+// Make c the current chunk
+static void *
+use_chunk(spy_Arena *a, spy_ArenaChunk *c, size_t size) {
+    c->next = a->chunks;
+    a->chunks = c;
+    a->cur = c->data + size;
+    a->end = c->data + c->size;
+    return c->data;
+}
+
+void *
+spy_arena_alloc_slow(spy_Arena *a, size_t size) {
+    if (a->closed)
+        spy_panic("PanicError", "Arena is closed", __FILE__, __LINE__);
+
+    // first, try to reuse a chunk released by reset()
+    spy_ArenaChunk **pc = &a->free;
+    while (*pc) {
+        spy_ArenaChunk *c = *pc;
+        if (c->size >= size) {
+            *pc = c->next;
+            return use_chunk(a, c, size);
+        }
+        pc = &c->next;
+    }
+
+    // allocate a new chunk: each chunk is at least twice as big as the
+    // previous one, so that the number of chunks grows logarithmically
+    size_t chunk_size = SPY_ARENA_MIN_CHUNK_SIZE;
+    if (a->chunks && a->chunks->size * 2 > chunk_size)
+        chunk_size = a->chunks->size * 2;
+    if (size > chunk_size)
+        chunk_size = size;
+    spy_ArenaChunk *c = (spy_ArenaChunk *)malloc(sizeof(spy_ArenaChunk) + chunk_size);
+    if (c == NULL)
+        spy_panic("MemoryError", "cannot allocate arena chunk", __FILE__, __LINE__);
+    c->size = chunk_size;
+    return use_chunk(a, c, size);
+}
+
+void *
+spy_arena_alloc_exported(spy_Arena *a, size_t size) {
+    return spy_arena_alloc(a, size);
+}
+
+void
+spy_unsafe$Arena$reset(spy_Arena *a) {
+    // move all the chunks to the free list
+    spy_ArenaChunk *c = a->chunks;
+    while (c) {
+        spy_ArenaChunk *next = c->next;
+        c->next = a->free;
+        a->free = c;
+        c = next;
+    }
+    a->chunks = NULL;
+    a->cur = NULL;
+    a->end = NULL;
+}
+
+void
+spy_unsafe$Arena$close(spy_Arena *a) {
+    // the spy_Arena struct itself is kept alive, so that using a closed arena
+    // is a clean panic instead of a use-after-free
+    free_chunks(a->chunks);
+    free_chunks(a->free);
+    a->chunks = NULL;
+    a->free = NULL;
+    a->cur = NULL;
+    a->end = NULL;
+    a->closed = true;
+}
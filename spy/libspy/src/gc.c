@@ -0,0 +1,524 @@
+/* spygc: a conservative, non-moving mark & sweep GC.
+
+   It is enabled by compiling the generated C code with -DSPY_GC_SPYGC (see
+   gc.h). The main target is wasm32, where bdwgc is not available.
+
+   Memory is organized in chunks, which are obtained from malloc() and
+   registered in a table sorted by address:
+
+     - small objects (up to SPYGC_MAX_SMALL bytes) are rounded up to one of
+       the size classes, and each chunk contains objects of only one class
+
+     - each large object lives in its own chunk
+
+   Each object has a state byte (FREE, ALLOCATED, or ALLOCATED|MARKED). Any
+   word which points inside an allocated object keeps it alive, so interior
+   pointers are fine.
+
+   The roots are:
+
+     - the stack. On wasm32 this is the "shadow stack" in linear memory: the
+       values which live only in wasm locals are invisible to us, so the C
+       backend takes care of spilling all the GC-managed locals and
+       temporaries to the shadow stack (see SPY_GC_ROOT and SPY_GC_PIN). On
+       native, we scan the C stack and the registers, like bdwgc does.
+
+     - the global data of the program (only on native, see scan_data).
+
+   Memory which is obtained from raw_alloc is NOT scanned.
+
+   A collection happens when the bytes allocated since the last one exceed
+   max(SPYGC_MIN_THRESHOLD, live bytes after the last collection): this keeps
+   the heap bounded to roughly twice the live data.
+
+   Two environment variables are useful for debugging:
+
+     - SPYGC_STATS: print some statistics at exit
+
+     - SPYGC_THRESHOLD=N: do a collection every N allocated bytes,
+       regardless of the live data. E.g. SPYGC_THRESHOLD=1 does a collection
+       at every allocation, which is very slow but good to find objects
+       which are not properly rooted.
+*/
+
+// needed for pthread_getattr_np and dl_iterate_phdr
+#define _GNU_SOURCE
+#include "spy.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#if defined(__EMSCRIPTEN__)
+#  include <emscripten/stack.h>
+#elif defined(__wasm__)
+// nothing to include
+#elif defined(__linux__)
+#  include <link.h>
+#  include <pthread.h>
+#  include <setjmp.h>
+#elif defined(__APPLE__)
+#  include <mach-o/getsect.h>
+#  include <mach-o/ldsyms.h>
+#  include <pthread.h>
+#  include <setjmp.h>
+#endif
+
+#define SPYGC_MAX_SMALL 2048
+#define SPYGC_CHUNK_SIZE (256 * 1024)
+#define SPYGC_MIN_THRESHOLD (4 * 1024 * 1024)
+
+#define STATE_FREE 0
+#define STATE_ALLOCATED 1
+#define STATE_MARKED 2
+
+static const size_t size_classes[] = {
+    16, 32, 48, 64, 96, 128, 192, 256, 384, 512, 768, 1024, 1536, 2048,
+};
+#define NUM_CLASSES (sizeof(size_classes) / sizeof(size_classes[0]))
+
+typedef struct {
+    char *start;
+    char *end;
+    size_t objsize;  // for large objects, the size of the only object
+    size_t nobjs;
+    int size_class;  // -1 for large objects
+    uint8_t state[];
+} spygc_chunk;
+
+typedef struct free_obj {
+    struct free_obj *next;
+} free_obj;
+
+typedef struct {
+    char *start;
+    size_t size;
+} mark_item;
+
+bool spy_spygc_enabled = false;
+
+/* The state of the heap is itself allocated with malloc(). This is needed
+   because on native scan_data() scans all our global data: if e.g. heap_min
+   were a global variable, it would keep the first object alive forever.
+*/
+typedef struct {
+    spygc_chunk **chunks;  // sorted by address
+    size_t n_chunks;
+    size_t chunks_capacity;
+    char *heap_min;
+    char *heap_max;
+    free_obj *freelists[NUM_CLASSES];
+} spygc_heap;
+
+static spygc_heap *H = NULL;
+
+static mark_item *mark_stack = NULL;
+static size_t mark_stack_len = 0;
+static size_t mark_stack_capacity = 0;
+
+static spy_GcStats stats;
+static size_t bytes_since_gc = 0;
+static size_t threshold = SPYGC_MIN_THRESHOLD;
+static bool fixed_threshold = false;
+
+// NOTE: we cannot use spy_panic here, because on WASI it is imported from
+// the host, and standalone executables don't have it
+NORETURN static void
+out_of_memory(void) {
+    fprintf(stderr, "spygc: out of memory\n");
+    abort();
+}
+
+static void
+init_heap(void) {
+    H = calloc(1, sizeof(spygc_heap));
+    if (H == NULL)
+        out_of_memory();
+    H->heap_min = (char *)UINTPTR_MAX;
+    const char *s = getenv("SPYGC_THRESHOLD");
+    if (s != NULL) {
+        threshold = strtoul(s, NULL, 10);
+        fixed_threshold = true;
+    }
+}
+
+void
+spy_gc_enable(void) {
+    // this is called by a constructor in every C file, see gc.h
+    if (spy_spygc_enabled)
+        return;
+    if (H == NULL)
+        init_heap();
+    spy_spygc_enabled = true;
+    if (getenv("SPYGC_STATS") != NULL)
+        atexit(spy_gc_print_stats);
+}
+
+/* ========== chunks ========== */
+
+static int
+size_class_of(size_t size) {
+    for (size_t i = 0; i < NUM_CLASSES; i++) {
+        if (size <= size_classes[i])
+            return (int)i;
+    }
+    return -1;
+}
+
+// return the index of the chunk containing p, or -1
+static ptrdiff_t
+find_chunk(char *p) {
+    if (p < H->heap_min || p >= H->heap_max)
+        return -1;
+    // find the last chunk whose start is <= p
+    size_t lo = 0, hi = H->n_chunks;
+    while (lo < hi) {
+        size_t mid = (lo + hi) / 2;
+        if (H->chunks[mid]->start <= p)
+            lo = mid + 1;
+        else
+            hi = mid;
+    }
+    if (lo == 0)
+        return -1;
+    spygc_chunk *c = H->chunks[lo - 1];
+    if (p >= c->end)
+        return -1;
+    return (ptrdiff_t)(lo - 1);
+}
+
+static void
+update_heap_bounds(void) {
+    if (H->n_chunks == 0) {
+        H->heap_min = (char *)UINTPTR_MAX;
+        H->heap_max = NULL;
+        return;
+    }
+    H->heap_min = H->chunks[0]->start;
+    H->heap_max = NULL;
+    for (size_t i = 0; i < H->n_chunks; i++) {
+        if (H->chunks[i]->end > H->heap_max)
+            H->heap_max = H->chunks[i]->end;
+    }
+}
+
+static spygc_chunk *
+new_chunk(int size_class, size_t objsize, size_t nobjs) {
+    spygc_chunk *c = malloc(sizeof(spygc_chunk) + nobjs);
+    char *mem = malloc(objsize * nobjs);
+    if (c == NULL || mem == NULL)
+        out_of_memory();
+    c->start = mem;
+    c->end = mem + objsize * nobjs;
+    c->objsize = objsize;
+    c->nobjs = nobjs;
+    c->size_class = size_class;
+    memset(c->state, STATE_FREE, nobjs);
+
+    // insert it into the sorted table
+    if (H->n_chunks == H->chunks_capacity) {
+        H->chunks_capacity = H->chunks_capacity ? H->chunks_capacity * 2 : 64;
+        H->chunks = realloc(H->chunks, H->chunks_capacity * sizeof(spygc_chunk *));
+        if (H->chunks == NULL)
+            out_of_memory();
+    }
+    size_t i = H->n_chunks;
+    while (i > 0 && H->chunks[i - 1]->start > mem) {
+        H->chunks[i] = H->chunks[i - 1];
+        i--;
+    }
+    H->chunks[i] = c;
+    H->n_chunks++;
+    if (mem < H->heap_min)
+        H->heap_min = mem;
+    if (c->end > H->heap_max)
+        H->heap_max = c->end;
+    stats.heap_bytes += objsize * nobjs;
+    if (stats.heap_bytes > stats.peak_heap_bytes)
+        stats.peak_heap_bytes = stats.heap_bytes;
+    return c;
+}
+
+static void
+free_chunk(spygc_chunk *c) {
+    stats.heap_bytes -= c->objsize * c->nobjs;
+    free(c->start);
+    free(c);
+}
+
+static void
+refill_freelist(int size_class) {
+    size_t objsize = size_classes[size_class];
+    size_t nobjs = SPYGC_CHUNK_SIZE / objsize;
+    spygc_chunk *c = new_chunk(size_class, objsize, nobjs);
+    // push the objects in reverse order, so that they are allocated in
+    // increasing address order
+    for (size_t i = nobjs; i > 0; i--) {
+        free_obj *obj = (free_obj *)(c->start + (i - 1) * objsize);
+        obj->next = H->freelists[size_class];
+        H->freelists[size_class] = obj;
+    }
+}
+
+/* ========== marking ========== */
+
+static void
+push_mark(char *start, size_t size) {
+    if (mark_stack_len == mark_stack_capacity) {
+        mark_stack_capacity = mark_stack_capacity ? mark_stack_capacity * 2 : 1024;
+        mark_stack = realloc(mark_stack, mark_stack_capacity * sizeof(mark_item));
+        if (mark_stack == NULL)
+            out_of_memory();
+    }
+    mark_stack[mark_stack_len].start = start;
+    mark_stack[mark_stack_len].size = size;
+    mark_stack_len++;
+}
+
+static inline void
+mark_maybe(char *p) {
+    ptrdiff_t ci = find_chunk(p);
+    if (ci < 0)
+        return;
+    spygc_chunk *c = H->chunks[ci];
+    size_t i = (size_t)(p - c->start) / c->objsize;
+    if (c->state[i] != STATE_ALLOCATED)
+        return;  // free or already marked
+    c->state[i] |= STATE_MARKED;
+    push_mark(c->start + i * c->objsize, c->objsize);
+}
+
+static void
+scan_range(char *lo, char *hi) {
+    uintptr_t a = ((uintptr_t)lo + sizeof(void *) - 1) & ~(sizeof(void *) - 1);
+    for (char **p = (char **)a; (char *)(p + 1) <= hi; p++)
+        mark_maybe(*p);
+}
+
+static void
+process_mark_stack(void) {
+    while (mark_stack_len > 0) {
+        mark_item item = mark_stack[--mark_stack_len];
+        scan_range(item.start, item.start + item.size);
+    }
+}
+
+/* ========== roots ========== */
+
+#if defined(__wasm__)
+#  if !defined(__EMSCRIPTEN__)
+extern char __global_base;
+extern char __heap_base;
+#  endif
+
+static void
+scan_stack(char *sp) {
+#  if defined(__EMSCRIPTEN__)
+    char *top = (char *)emscripten_stack_get_base();
+#  else
+    // depending on the linker flags, the stack is either before the global
+    // data (--stack-first) or between the data and the heap
+    char *top = sp < &__global_base ? &__global_base : &__heap_base;
+#  endif
+    scan_range(sp, top);
+}
+
+/* We don't scan the global data on wasm32. The C backend emits only i32
+   global variables and NULL pointer constants, so the only GC pointers are
+   on the stack. On the other hand, the data segment contains the state of
+   malloc(): in a 32 bit address space, its sizes are often
+   indistinguishable from heap addresses, and they would keep alive big
+   chunks of garbage.
+
+   If the C backend starts to emit global variables which contain GC
+   pointers, it will need to register them explicitly.
+*/
+static void
+scan_data(void) {}
+
+#elif defined(__linux__)
+
+static char *stack_top = NULL;
+
+static void
+scan_stack(char *sp) {
+    if (stack_top == NULL) {
+        pthread_attr_t attr;
+        void *addr;
+        size_t size;
+        pthread_getattr_np(pthread_self(), &attr);
+        pthread_attr_getstack(&attr, &addr, &size);
+        pthread_attr_destroy(&attr);
+        stack_top = (char *)addr + size;
+    }
+    scan_range(sp, stack_top);
+}
+
+static int
+scan_phdr(struct dl_phdr_info *info, size_t size, void *data) {
+    (void)size;
+    (void)data;
+    // scan only the writable segments of the main executable, which is the
+    // first object reported by dl_iterate_phdr
+    for (int i = 0; i < info->dlpi_phnum; i++) {
+        const ElfW(Phdr) *ph = &info->dlpi_phdr[i];
+        if (ph->p_type == PT_LOAD && (ph->p_flags & PF_W)) {
+            char *start = (char *)(info->dlpi_addr + ph->p_vaddr);
+            scan_range(start, start + ph->p_memsz);
+        }
+    }
+    return 1;  // stop after the first object
+}
+
+static void
+scan_data(void) {
+    dl_iterate_phdr(scan_phdr, NULL);
+}
+
+#elif defined(__APPLE__)
+
+static void
+scan_stack(char *sp) {
+    char *top = (char *)pthread_get_stackaddr_np(pthread_self());
+    scan_range(sp, top);
+}
+
+static void
+scan_data(void) {
+    const char *sects[] = {"__data", "__bss", "__common"};
+    for (size_t i = 0; i < sizeof(sects) / sizeof(sects[0]); i++) {
+        unsigned long size;
+        char *start = (char *)getsectiondata(
+            (const struct mach_header_64 *)&_mh_execute_header, "__DATA", sects[i], &size
+        );
+        if (start != NULL)
+            scan_range(start, start + size);
+    }
+}
+
+#else
+#  error "spygc is not supported on this platform"
+#endif
+
+static void __attribute__((noinline))
+mark_roots(void) {
+#if !defined(__wasm__)
+    // spill the registers on the stack, so that scan_stack() sees them
+    jmp_buf regs;
+    setjmp(regs);
+#endif
+    volatile char marker;
+    scan_stack((char *)&marker);
+    scan_data();
+}
+
+/* ========== sweeping ========== */
+
+static size_t
+sweep(void) {
+    size_t live = 0;
+    size_t j = 0;
+    for (size_t c_i = 0; c_i < NUM_CLASSES; c_i++)
+        H->freelists[c_i] = NULL;
+
+    for (size_t i = 0; i < H->n_chunks; i++) {
+        spygc_chunk *c = H->chunks[i];
+        size_t n_live = 0;
+        for (size_t k = 0; k < c->nobjs; k++) {
+            if (c->state[k] == (STATE_ALLOCATED | STATE_MARKED)) {
+                c->state[k] = STATE_ALLOCATED;
+                n_live++;
+            }
+            else {
+                if (c->state[k] == STATE_ALLOCATED)
+                    stats.freed_bytes += c->objsize;
+                c->state[k] = STATE_FREE;
+            }
+        }
+        if (n_live == 0) {
+            free_chunk(c);
+            continue;
+        }
+        live += n_live * c->objsize;
+        if (c->size_class >= 0) {
+            for (size_t k = c->nobjs; k > 0; k--) {
+                if (c->state[k - 1] == STATE_FREE) {
+                    free_obj *obj = (free_obj *)(c->start + (k - 1) * c->objsize);
+                    obj->next = H->freelists[c->size_class];
+                    H->freelists[c->size_class] = obj;
+                }
+            }
+        }
+        H->chunks[j++] = c;
+    }
+    H->n_chunks = j;
+    update_heap_bounds();
+    return live;
+}
+
+/* ========== public API ========== */
+
+void
+spy_gc_collect(void) {
+    if (H == NULL)
+        return;
+    mark_roots();
+    process_mark_stack();
+    size_t live = sweep();
+    stats.collections++;
+    stats.live_bytes = live;
+    bytes_since_gc = 0;
+    if (!fixed_threshold)
+        threshold = live > SPYGC_MIN_THRESHOLD ? live : SPYGC_MIN_THRESHOLD;
+}
+
+void *
+spy_spygc_alloc(size_t size) {
+    if (H == NULL)
+        init_heap();
+    if (size == 0)
+        size = 1;
+    if (bytes_since_gc >= threshold)
+        spy_gc_collect();
+
+    int size_class = size_class_of(size);
+    char *obj;
+    spygc_chunk *c;
+    if (size_class >= 0) {
+        if (H->freelists[size_class] == NULL)
+            refill_freelist(size_class);
+        free_obj *fobj = H->freelists[size_class];
+        H->freelists[size_class] = fobj->next;
+        obj = (char *)fobj;
+        c = H->chunks[find_chunk(obj)];
+        size = c->objsize;
+    }
+    else {
+        c = new_chunk(-1, size, 1);
+        obj = c->start;
+    }
+    c->state[(size_t)(obj - c->start) / c->objsize] = STATE_ALLOCATED;
+    memset(obj, 0, size);
+    bytes_since_gc += size;
+    stats.allocated_bytes += size;
+    return obj;
+}
+
+spy_GcStats
+spy_gc_stats(void) {
+    return stats;
+}
+
+void
+spy_gc_print_stats(void) {
+    fprintf(
+        stderr,
+        "spygc: %zu collections, %zu KB allocated, %zu KB freed, "
+        "%zu KB live, %zu KB heap, %zu KB peak heap\n",
+        stats.collections,
+        stats.allocated_bytes / 1024,
+        stats.freed_bytes / 1024,
+        stats.live_bytes / 1024,
+        stats.heap_bytes / 1024,
+        stats.peak_heap_bytes / 1024
+    );
+}
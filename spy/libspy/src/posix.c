@@ -1,13 +1,24 @@
 #include "spy.h"
 #include <stdio.h>
 
+#ifndef SPY_TARGET_WASI
+#  include <fcntl.h>
+#  include <sys/mman.h>
+#  include <sys/stat.h>
+#endif
+
+static char *
+cstr_from_spy_Str(spy_Str *s) {
+    // spy_Str is not null-terminated, make a temporary copy
+    char *res = (char *)malloc(s->length + 1);
+    memcpy(res, s->utf8, s->length);
+    res[s->length] = '\0';
+    return res;
+}
+
 FILE *
 spy_posix$_fopen(spy_Str *filename) {
-    // spy_Str is not null-terminated, make a temporary copy for fopen
-    char *fname = (char *)malloc(filename->length + 1);
-    memcpy(fname, filename->utf8, filename->length);
-    fname[filename->length] = '\0';
-
+    char *fname = cstr_from_spy_Str(filename);
     FILE *f = fopen(fname, "r");
     free(fname);
     if (f == NULL) {
@@ -114,3 +125,213 @@ void
 spy_posix$_fclose(FILE *f) {
     fclose(f);
 }
+
+// ================= posix.File =================
+
+#define SPY_FILE_BUFSIZE 65536
+
+spy_posix$File *
+spy_posix$open(spy_Str *path) {
+    FILE *fp = spy_posix$_fopen(path);
+    spy_posix$File *f = (spy_posix$File *)malloc(sizeof(spy_posix$File));
+    char *buf = (char *)malloc(SPY_FILE_BUFSIZE);
+    if (f == NULL || buf == NULL)
+        spy_panic("MemoryError", "cannot allocate File", __FILE__, __LINE__);
+    memset(f, 0, sizeof(spy_posix$File));
+    f->f = fp;
+    f->buf = buf;
+    f->capacity = SPY_FILE_BUFSIZE;
+    return f;
+}
+
+// Read more data into the buffer. The data before f->start is not needed
+// anymore, so we first move the current line at the beginning of the
+// buffer, and we grow it only if the line alone fills it.
+static void
+file_fill(spy_posix$File *f) {
+    if (f->start > 0) {
+        memmove(f->buf, f->buf + f->start, f->end - f->start);
+        f->end -= f->start;
+        f->stop -= f->start;
+        f->start = 0;
+    }
+    if (f->end == f->capacity) {
+        f->capacity *= 2;
+        f->buf = (char *)realloc(f->buf, f->capacity);
+        if (f->buf == NULL)
+            spy_panic("MemoryError", "cannot grow File buffer", __FILE__, __LINE__);
+    }
+    size_t n = fread(f->buf + f->end, 1, f->capacity - f->end, f->f);
+    f->end += n;
+    if (n == 0) {
+        if (ferror(f->f))
+            spy_panic("OSError", "File: read error", __FILE__, __LINE__);
+        f->eof = true;
+    }
+}
+
+// Move to the next line
+static void
+file_advance(spy_posix$File *f) {
+    if (f->f == NULL)
+        spy_panic("ValueError", "I/O operation on closed file", __FILE__, __LINE__);
+    f->start = f->stop;
+    size_t searched = f->start;
+    while (true) {
+        char *nl = memchr(f->buf + searched, '\n', f->end - searched);
+        if (nl != NULL) {
+            f->stop = nl - f->buf + 1;
+            f->has_line = true;
+            return;
+        }
+        if (f->eof) {
+            // the last line, without '\n'
+            f->stop = f->end;
+            f->has_line = f->start < f->end;
+            return;
+        }
+        searched = f->end - f->start; // file_fill moves start to 0
+        file_fill(f);
+    }
+}
+
+spy_Str *
+spy_posix$File$__item__(spy_posix$File *f) {
+    size_t n = f->stop - f->start;
+    spy_Str *res = spy_str_alloc(n);
+    if (n > 0)
+        memcpy((char *)res->utf8, f->buf + f->start, n);
+    return res;
+}
+
+spy_Str *
+spy_posix$File$readline(spy_posix$File *f) {
+    file_advance(f);
+    return spy_posix$File$__item__(f);
+}
+
+spy_posix$File *
+spy_posix$File$__fastiter__(spy_posix$File *f) {
+    file_advance(f);
+    return f;
+}
+
+spy_posix$File *
+spy_posix$File$__next__(spy_posix$File *f) {
+    file_advance(f);
+    return f;
+}
+
+bool
+spy_posix$File$__continue_iteration__(spy_posix$File *f) {
+    return f->has_line;
+}
+
+void
+spy_posix$File$close(spy_posix$File *f) {
+    // the struct itself is kept alive, so that using a closed file is a
+    // clean error instead of a use-after-free
+    if (f->f != NULL)
+        fclose(f->f);
+    free(f->buf);
+    f->f = NULL;
+    f->buf = NULL;
+    f->start = f->stop = f->end = 0;
+    f->has_line = false;
+}
+
+// ================= posix.MMap =================
+
+#ifndef SPY_TARGET_WASI
+
+static bool
+mmap_file(spy_posix$MMap *m, const char *fname) {
+    int fd = open(fname, O_RDONLY);
+    if (fd < 0)
+        return false;
+    struct stat st;
+    if (fstat(fd, &st) != 0) {
+        close(fd);
+        return false;
+    }
+    m->length = (size_t)st.st_size;
+    if (m->length > 0) {
+        // the mapping stays valid after close(fd)
+        void *p = mmap(NULL, m->length, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (p == MAP_FAILED) {
+            close(fd);
+            return false;
+        }
+        m->data = (const uint8_t *)p;
+        m->mapped = true;
+    }
+    close(fd);
+    return true;
+}
+
+#else
+
+static bool
+mmap_file(spy_posix$MMap *m, const char *fname) {
+    // no mmap on WASI: read the whole file at once
+    FILE *f = fopen(fname, "r");
+    if (f == NULL)
+        return false;
+    if (fseek(f, 0, SEEK_END) != 0) {
+        fclose(f);
+        return false;
+    }
+    long size = ftell(f);
+    if (size < 0 || fseek(f, 0, SEEK_SET) != 0) {
+        fclose(f);
+        return false;
+    }
+    if (size > 0) {
+        uint8_t *buf = (uint8_t *)malloc(size);
+        if (buf == NULL)
+            spy_panic("MemoryError", "cannot allocate MMap buffer", __FILE__, __LINE__);
+        m->length = fread(buf, 1, size, f);
+        m->data = buf;
+    }
+    bool ok = !ferror(f);
+    fclose(f);
+    if (!ok)
+        free((void *)m->data);
+    return ok;
+}
+
+#endif
+
+spy_posix$MMap *
+spy_posix$mmap(spy_Str *path) {
+    spy_posix$MMap *m = (spy_posix$MMap *)malloc(sizeof(spy_posix$MMap));
+    if (m == NULL)
+        spy_panic("MemoryError", "cannot allocate MMap", __FILE__, __LINE__);
+    memset(m, 0, sizeof(spy_posix$MMap));
+    char *fname = cstr_from_spy_Str(path);
+    bool ok = mmap_file(m, fname);
+    free(fname);
+    if (!ok) {
+        free(m);
+        spy_panic("OSError", "cannot mmap file", __FILE__, __LINE__);
+        return NULL;
+    }
+    return m;
+}
+
+void
+spy_posix$MMap$close(spy_posix$MMap *m) {
+    // like Arena, the struct itself is kept alive, so that using a closed
+    // MMap is a clean IndexError instead of a use-after-free
+#ifndef SPY_TARGET_WASI
+    if (m->mapped)
+        munmap((void *)m->data, m->length);
+    else
+        free((void *)m->data);
+#else
+    free((void *)m->data);
+#endif
+    m->data = NULL;
+    m->length = 0;
+    m->mapped = false;
+}
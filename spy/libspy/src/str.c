@@ -86,6 +86,9 @@ spy_str_replace(spy_Str *original, spy_Str *old, spy_Str *new_str) {
 
 spy_Str *
 spy_str_mul(spy_Str *a, int32_t b) {
+    // like Python, multiplying by a negative number gives the empty string
+    if (b < 0)
+        b = 0;
     size_t l = a->length * b;
     spy_Str *res = spy_str_alloc(l);
     char *buf = (char *)res->utf8;
@@ -96,6 +99,62 @@ spy_str_mul(spy_Str *a, int32_t b) {
     return res;
 }
 
+spy_StringBuilder *
+spy_builtins$StringBuilder$__new__(void) {
+    spy_StringBuilder *sb = (spy_StringBuilder *)spy_GcAlloc(sizeof(spy_StringBuilder)).p;
+    sb->buf = NULL;
+    sb->length = 0;
+    sb->capacity = 0;
+    sb->shared = false;
+    return sb;
+}
+
+// Replace the buffer of sb with a fresh one of the given capacity
+static void
+strbuilder_realloc(spy_StringBuilder *sb, size_t capacity) {
+    spy_Str *buf = spy_str_alloc(capacity);
+    if (sb->length > 0)
+        memcpy((char *)buf->utf8, sb->buf->utf8, sb->length);
+    sb->buf = buf;
+    sb->capacity = capacity;
+    sb->shared = false;
+}
+
+void
+spy_strbuilder_append_slow(spy_StringBuilder *sb, spy_Str *s) {
+    size_t needed = sb->length + s->length;
+    if (sb->shared || needed > sb->capacity) {
+        size_t capacity = sb->capacity * 2;
+        if (capacity < needed)
+            capacity = needed;
+        if (capacity < 16)
+            capacity = 16;
+        strbuilder_realloc(sb, capacity);
+    }
+    memcpy((char *)sb->buf->utf8 + sb->length, s->utf8, s->length);
+    sb->length = needed;
+}
+
+void
+spy_builtins$StringBuilder$reserve(spy_StringBuilder *sb, int32_t n) {
+    // reserve exactly n bytes, so that build() does not need to copy if the
+    // final length is n
+    if (n > 0 && (size_t)n > sb->capacity)
+        strbuilder_realloc(sb, n);
+}
+
+spy_Str *
+spy_builtins$StringBuilder$build(spy_StringBuilder *sb) {
+    if (sb->length == sb->capacity && sb->buf != NULL) {
+        sb->shared = true;
+        return sb->buf;
+    }
+    spy_Str *res = spy_str_alloc(sb->length);
+    if (sb->length > 0)
+        memcpy((char *)res->utf8, sb->buf->utf8, sb->length);
+    return res;
+}
+
 bool
 spy_str_eq(spy_Str *a, spy_Str *b) {
     if (a->length != b->length)
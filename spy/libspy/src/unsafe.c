@@ -1,11 +1,25 @@
 #include "spy.h"
 
+// Like the real GCs, return zeroed memory: e.g. array.zeros relies on it
 void *
 spy_gc_alloc(size_t size) {
-    return malloc(size);
+    if (spy_spygc_enabled)
+        return spy_spygc_alloc(size);
+    return calloc(1, size);
 }
 
 void *
 spy_raw_alloc(size_t size) {
     return malloc(size);
 }
+
+/* Used by the interpreter to give back the memory of the objects which died,
+   see LLSPyInstance.free_pending. Memory allocated by spygc is reclaimed by
+   the GC itself.
+*/
+void
+spy_free(void *p) {
+    if (spy_spygc_enabled)
+        return;
+    free(p);
+}
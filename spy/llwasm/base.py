@@ -1,10 +1,15 @@
 import struct
-from typing import Any, Literal, Self
+from typing import Any, Callable, Literal, Self
 
 import py.path
 
 LLWasmType = Literal[None, "void *", "int32_t", "int16_t"]
 
+I32 = struct.Struct("i")
+I16 = struct.Struct("h")
+I8 = struct.Struct("b")
+F64 = struct.Struct("d")
+
 
 class HostModule:
     """
@@ -33,6 +38,15 @@ class LLWasmInstanceBase:
     def from_file(cls, f: py.path.local, hostmods: list[HostModule] = []) -> Self:
         raise NotImplementedError
 
+    def get_func(self, name: str) -> Callable[..., Any]:
+        """
+        Return a python callable which calls the given exported function.
+
+        call(name, *args) is equivalent to get_func(name)(*args): hot paths
+        can keep a reference to the function and avoid the lookup.
+        """
+        raise NotImplementedError
+
     def call(self, name: str, *args: Any) -> Any:
         raise NotImplementedError
 
@@ -88,30 +102,59 @@ class LLWasmInstanceBase:
 
 
 class LLWasmMemoryBase:
+    # number of writes done by the host: see SideEffectWatcher
+    writes: int = 0
+
     def read(self, addr: int, n: int) -> bytearray:
         """
         Read n bytes of memory at the given address.
         """
         raise NotImplementedError
 
+    def read_view(self, addr: int, n: int) -> memoryview:
+        """
+        Like read(), but avoid the copy if the backend supports it.
+
+        The view is valid only until the next call into WASM: after that the
+        memory might have grown, and the view might point to stale memory.
+        """
+        return memoryview(self.read(addr, n))
+
     def write(self, addr: int, b: bytes) -> None:
         raise NotImplementedError
 
+    def invalidate(self) -> None:
+        """
+        Called after each call into WASM, since the memory might have grown.
+        """
+        pass
+
+    def size(self) -> int:
+        """
+        Return the current size of the linear memory, in bytes.
+        """
+        raise NotImplementedError
+
+    def grow(self, pages: int) -> None:
+        """
+        Grow the linear memory by the given number of 64KB pages.
+        """
+        raise NotImplementedError
+
     def read_i32(self, addr: int) -> int:
-        rawbytes = self.read(addr, 4)
-        return struct.unpack("i", rawbytes)[0]
+        return I32.unpack_from(self.read_view(addr, 4))[0]
 
     def read_i16(self, addr: int) -> int:
-        rawbytes = self.read(addr, 2)
-        return struct.unpack("h", rawbytes)[0]
+        return I16.unpack_from(self.read_view(addr, 2))[0]
 
     def read_i8(self, addr: int) -> int:
-        rawbytes = self.read(addr, 1)
-        return rawbytes[0]
+        return I8.unpack_from(self.read_view(addr, 1))[0]
+
+    def read_u8(self, addr: int) -> int:
+        return self.read_view(addr, 1)[0]
 
     def read_f64(self, addr: int) -> int:
-        rawbytes = self.read(addr, 8)
-        return struct.unpack("d", rawbytes)[0]
+        return F64.unpack_from(self.read_view(addr, 8))[0]
 
     def read_ptr(self, addr: int) -> tuple[int, int]:
         """
@@ -135,16 +178,19 @@ class LLWasmMemoryBase:
         return self.read(addr, n)
 
     def write_i32(self, addr: int, v: int) -> None:
-        self.write(addr, struct.pack("i", v))
+        self.write(addr, I32.pack(v))
 
     def write_i16(self, addr: int, v: int) -> None:
-        self.write(addr, struct.pack("h", v))
+        self.write(addr, I16.pack(v))
 
     def write_i8(self, addr: int, v: int) -> None:
-        self.write(addr, struct.pack("b", v))
+        self.write(addr, I8.pack(v))
+
+    def write_u8(self, addr: int, v: int) -> None:
+        self.write(addr, struct.pack("B", v))
 
     def write_f64(self, addr: int, v: float) -> None:
-        self.write(addr, struct.pack("d", v))
+        self.write(addr, F64.pack(v))
 
     def write_ptr(self, addr: int, v_addr: int, v_length: int) -> None:
         """
@@ -65,7 +65,8 @@ class LLWasmInstance(LLWasmInstanceBase):
         else:
             self.instance = instance
 
-        self.mem = LLWasmMemory(self.instance.HEAP8)
+        self.funcs: dict[str, Callable[..., Any]] = {}
+        self.mem = LLWasmMemory(self.instance)
         for hostmod in hostmods:
             hostmod.ll = self
 
@@ -112,20 +113,66 @@ class LLWasmInstance(LLWasmInstanceBase):
         assert isinstance(addr, int)
         return addr
 
+    def get_func(self, name: str) -> Callable[..., Any]:
+        func = self.funcs.get(name)
+        if func is None:
+            jsfunc = self.get_export(name)
+            mem = self.mem
+
+            def func(*args: Any) -> Any:
+                try:
+                    return jsfunc(*args)
+                finally:
+                    mem.invalidate()
+
+            self.funcs[name] = func
+        return func
+
     def call(self, name: str, *args: Any) -> Any:
-        func = self.get_export(name)
-        return func(*args)
+        return self.get_func(name)(*args)
 
 
 class LLWasmMemory(LLWasmMemoryBase):
-    def __init__(self, jsmem: Any) -> None:
-        self.jsmem = jsmem
+    """
+    Wrapper around the HEAP8 of an emscripten instance.
+
+    When the memory grows, emscripten replaces HEAP8 with a new array: so we
+    fetch it again after each call into WASM.
+    """
+
+    def __init__(self, instance: Any) -> None:
+        self.instance = instance
+        self._jsmem = instance.HEAP8
+
+    @property
+    def jsmem(self) -> Any:
+        if self._jsmem is None:
+            self._jsmem = self.instance.HEAP8
+        return self._jsmem
+
+    def invalidate(self) -> None:
+        self._jsmem = None
 
     def read(self, addr: int, n: int) -> bytearray:
         """
         Read n bytes of memory at the given address.
         """
+        if addr < 0:
+            # else subarray() would count from the end of the memory
+            raise IndexError("out of bounds memory access")
         return self.jsmem.subarray(addr, addr + n).to_py()
 
     def write(self, addr: int, b: bytes) -> None:
+        if addr < 0:
+            raise IndexError("out of bounds memory access")
+        self.writes += 1
         self.jsmem.subarray(addr, addr + len(b)).assign(b)
+
+    def size(self) -> int:
+        return self.jsmem.length
+
+    def grow(self, pages: int) -> None:
+        # libspy.mjs is linked without -sALLOW_MEMORY_GROWTH, so the memory
+        # has a fixed size. In particular, all the instances have the same
+        # size and VMSnapshot.restore never needs to grow them.
+        raise MemoryError("the linear memory of emscripten instances cannot grow")
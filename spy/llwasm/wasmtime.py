@@ -2,13 +2,26 @@
 A pythonic wrapper around wasmtime.
 """
 
-from typing import Any, Optional
+import ctypes
+import hashlib
+import os
+import re
+from importlib.metadata import version
+from typing import Any, Callable, Optional
 
 import py.path
 import wasmtime as wt
 from typing_extensions import Self
+from wasmtime import _ffi as ffi
+from wasmtime._func import enter_wasm
 
-from .base import HostModule, LLWasmInstanceBase, LLWasmMemoryBase, LLWasmModuleBase
+from .base import (
+    I32,
+    HostModule,
+    LLWasmInstanceBase,
+    LLWasmMemoryBase,
+    LLWasmModuleBase,
+)
 
 WasmTrap = wt.Trap
 
@@ -23,26 +36,103 @@ _ENGINE: Optional[wt.Engine] = None
 def get_engine() -> wt.Engine:
     global _ENGINE
     if _ENGINE is None:
-        _ENGINE = wt.Engine()
+        # Parallel compilation starts a pool of threads which stays alive
+        # after the compilation: the process would then be multi-threaded,
+        # and redshiftpool could not safely fork() it. libspy is compiled
+        # only once anyway, see load_module_cached.
+        config = wt.Config()
+        config.parallel_compilation = False
+        _ENGINE = wt.Engine(config)
     return _ENGINE
 
 
+WASMTIME_VERSION = version("wasmtime")
+NUL = re.compile(b"\0")
+
+
 class LLWasmModule(LLWasmModuleBase):
+    """
+    A WASM module. Compiling it is expensive, so we do it lazily the first
+    time it's needed, i.e. when we create the first instance.
+
+    If cache_dir is given, the compiled code is cached on disk and reused by
+    the next processes, see load_module_cached.
+    """
+
     filename: str
-    mod: wt.Module
+    cache_dir: Optional[py.path.local]
+    _mod: Optional[wt.Module]
 
-    def __init__(self, filename: str) -> None:
+    def __init__(
+        self, filename: str, *, cache_dir: Optional[py.path.local] = None
+    ) -> None:
         self.filename = filename
-        self.mod = wt.Module.from_file(get_engine(), filename)
+        self.cache_dir = cache_dir
+        self._mod = None
 
     def __repr__(self) -> str:
         return f"<LLWasmModule {self.filename}>"
 
+    @property
+    def mod(self) -> wt.Module:
+        if self._mod is None:
+            if self.cache_dir is None:
+                self._mod = wt.Module.from_file(get_engine(), self.filename)
+            else:
+                self._mod = load_module_cached(
+                    get_engine(), self.filename, self.cache_dir
+                )
+        return self._mod
+
     @classmethod
     async def async_new(cls, url: str) -> Self:
         raise NotImplementedError("this is needed only for emscripten")
 
 
+def load_module_cached(
+    engine: wt.Engine, filename: str, cache_dir: py.path.local
+) -> wt.Module:
+    """
+    Load the compiled code of the given .wasm from cache_dir. If it's not
+    there, compile it and store it for the next time.
+
+    The cache key is the hash of the .wasm plus the version of wasmtime.
+    Moreover, wasmtime itself refuses to deserialize code compiled with an
+    incompatible engine: if the cached file cannot be loaded for any reason,
+    we just compile again. Note that deserializing runs native code without
+    any validation, so cache_dir must be as trusted as the .wasm itself.
+    """
+    wasm = py.path.local(filename)
+    content = wasm.read_binary()
+    h = hashlib.sha256(content).hexdigest()[:16]
+    prefix = f"{wasm.purebasename}-"
+    cached = cache_dir.join(f"{prefix}{h}-wasmtime-{WASMTIME_VERSION}.cwasm")
+    if cached.check(file=True):
+        try:
+            return wt.Module.deserialize_file(engine, str(cached))
+        except wt.WasmtimeError:
+            pass
+
+    mod = wt.Module(engine, content)
+    # the cache is only an optimization: if we cannot write it, e.g. because
+    # spy is installed in a read-only location, we just go ahead
+    try:
+        cache_dir.ensure(dir=True)
+        # remove the entries of the previous builds of the same .wasm
+        for old in cache_dir.listdir(f"{prefix}*.cwasm"):
+            old.remove()
+        # write to a temp file and rename it, so that concurrent processes
+        # (e.g. pytest-xdist workers) never see a partially written file.
+        # Also, deserialize_file() mmap()s the file: modifying it in place
+        # would crash the processes which are using it.
+        tmp = cache_dir.join(f"{cached.basename}.{os.getpid()}.tmp")
+        tmp.write_binary(mod.serialize())
+        os.replace(tmp, cached)
+    except OSError:
+        pass
+    return mod
+
+
 def get_linker(
     store: wt.Store,
     llmod: LLWasmModule,
@@ -116,6 +206,8 @@ def get_wasi_config() -> wt.WasiConfig:
     wasi_config.inherit_stdin()
     wasi_config.inherit_stdout()
     wasi_config.inherit_stderr()
+    # e.g. for SPYGC_THRESHOLD, see libspy/src/gc.c
+    wasi_config.inherit_env()
     wasi_config.preopen_dir("/", "/")
     return wasi_config
 
@@ -124,6 +216,8 @@ class LLWasmInstance(LLWasmInstanceBase):
     f: py.path.local
     store: wt.Store
     instance: wt.Instance
+    exports: dict[str, Any]
+    funcs: dict[str, Callable[..., Any]]  # see get_func
     mem: "LLWasmMemory"
 
     def __init__(
@@ -149,7 +243,11 @@ class LLWasmInstance(LLWasmInstanceBase):
         if init is not None:
             assert isinstance(init, wt.Func)
             init(self.store)
-        memory = self.instance.exports(self.store).get("memory")
+        # resolve all the exports once: instance.exports() is slow
+        exports = self.instance.exports(self.store)
+        self.exports = {name: exports[name] for name in exports._extern_map}
+        self.funcs = {}
+        memory = self.exports.get("memory")
         assert isinstance(memory, wt.Memory)
         self.mem = LLWasmMemory(self.store, memory)
         for hostmod in hostmods:
@@ -167,15 +265,22 @@ class LLWasmInstance(LLWasmInstanceBase):
         return cls(llmod, hostmods)
 
     def get_export(self, name: str) -> Any:
-        exports = self.instance.exports(self.store)
-        wasm_obj = exports.get(name)
+        wasm_obj = self.exports.get(name)
         if wasm_obj is None:
             raise AttributeError(name)
         return wasm_obj
 
     def all_exports(self) -> Any:
-        exports = self.instance.exports(self.store)
-        return list(exports._extern_map)
+        return list(self.exports)
+
+    def get_func(self, name: str) -> Callable[..., Any]:
+        func = self.funcs.get(name)
+        if func is None:
+            wasm_func = self.get_export(name)
+            assert isinstance(wasm_func, wt.Func)
+            func = make_trampoline(self.store, wasm_func, self.mem)
+            self.funcs[name] = func
+        return func
 
     def get_addr_of_global(self, name: str) -> int:
         g = self.get_export(name)
@@ -185,28 +290,175 @@ class LLWasmInstance(LLWasmInstanceBase):
         return addr
 
     def call(self, name: str, *args: Any) -> Any:
-        func = self.get_export(name)
-        assert isinstance(func, wt.Func)
-        return func(self.store, *args)
+        return self.get_func(name)(*args)
+
+
+# the wasmtime_val_t fields corresponding to each wasm type
+VALTYPE_FIELDS = {
+    "i32": (ffi.WASMTIME_I32.value, "i32"),
+    "i64": (ffi.WASMTIME_I64.value, "i64"),
+    "f32": (ffi.WASMTIME_F32.value, "f32"),
+    "f64": (ffi.WASMTIME_F64.value, "f64"),
+}
+
+
+def make_trampoline(
+    store: wt.Store, func: wt.Func, mem: "LLWasmMemory"
+) -> Callable[..., Any]:
+    """
+    Return a python function which calls the given wasm function.
+
+    It's equivalent to func(store, *args), but much faster: wt.Func.__call__
+    queries the FuncType and converts each argument to a wt.Val at every
+    call, while we do it once and reuse the same argument/result arrays.
+    This relies on the private API of wasmtime-py (_ffi and enter_wasm),
+    which is fine since we pin its version.
+
+    After each call, the views of mem are invalidated, since the memory
+    might have grown.
+    """
+    ty = func.type(store)
+    try:
+        params = [VALTYPE_FIELDS[str(t)] for t in ty.params]
+        results = [VALTYPE_FIELDS[str(t)] for t in ty.results]
+    except KeyError:
+        # e.g. funcref or externref: use the slow path
+
+        def slow_trampoline(*args: Any) -> Any:
+            try:
+                return func(store, *args)
+            finally:
+                mem.invalidate()
+
+        return slow_trampoline
+
+    nparams = len(params)
+    nresults = len(results)
+    params_arr = (ffi.wasmtime_val_t * nparams)()
+    results_arr = (ffi.wasmtime_val_t * nresults)()
+    param_fields = []
+    for i, (kind, field) in enumerate(params):
+        params_arr[i].kind = kind  # type: ignore[assignment]
+        param_fields.append((params_arr[i].of, field))
+    result_field = results[0][1] if nresults == 1 else None
+    context = store._context
+    raw_func = ctypes.byref(func._func)
+    call = ffi.wasmtime_func_call
+
+    def trampoline(*args: Any) -> Any:
+        if len(args) != nparams:
+            raise wt.WasmtimeError(
+                f"wrong number of parameters: given {len(args)}, expected {nparams}"
+            )
+        for (of, field), arg in zip(param_fields, args):
+            setattr(of, field, arg)
+        try:
+            with enter_wasm(store) as trap:
+                error = call(
+                    context, raw_func, params_arr, nparams, results_arr, nresults, trap
+                )
+                if error:
+                    raise wt.WasmtimeError._from_ptr(error)
+        finally:
+            mem.invalidate()
+        if nresults == 0:
+            return None
+        elif nresults == 1:
+            return getattr(results_arr[0].of, result_field)  # type: ignore
+        else:
+            return [getattr(results_arr[i].of, f) for i, (_, f) in enumerate(results)]
+
+    return trampoline
 
 
 class LLWasmMemory(LLWasmMemoryBase):
     """
-    Thin wrapper around wt.Memory
+    Wrapper around wt.Memory.
+
+    We access the linear memory through a memoryview which points directly
+    to it, instead of going through wt.Memory.read/write, which are much
+    slower. When the memory grows, the view must be recreated: this happens
+    lazily, after invalidate() or when we try to access past its end.
+
+    Note that this relies on the fact that wasmtime reserves the whole 4GB
+    address space for 32-bit memories, so the memory never moves, it only
+    grows.
     """
 
     store: wt.Store
     mem: wt.Memory
+    view: Optional[memoryview]
+    base: int  # address of the linear memory in the host process
 
     def __init__(self, store: wt.Store, mem: wt.Memory):
         self.store = store
         self.mem = mem
+        self.view = None
+        self.base = 0
+
+    def invalidate(self) -> None:
+        self.view = None
+
+    def get_view(self, addr: int, n: int) -> memoryview:
+        """
+        Return a view of the whole memory, making sure that the n bytes at
+        `addr` are in bounds.
+        """
+        if addr < 0:
+            # else slicing the view would wrap around to the end of the memory
+            raise IndexError("out of bounds memory access")
+        end = addr + n
+        view = self.view
+        if view is None or end > len(view):
+            size = self.mem.data_len(self.store)
+            if end > size:
+                raise IndexError("out of bounds memory access")
+            ptr = self.mem.data_ptr(self.store)
+            self.base = ctypes.addressof(ptr.contents)
+            buf = (ctypes.c_ubyte * size).from_address(self.base)
+            view = self.view = memoryview(buf).cast("B")
+        return view
 
     def read(self, addr: int, n: int) -> bytearray:
         """
         Read n bytes of memory at the given address.
         """
-        return self.mem.read(self.store, addr, addr + n)
+        return bytearray(self.get_view(addr, n)[addr : addr + n])
+
+    def read_view(self, addr: int, n: int) -> memoryview:
+        return self.get_view(addr, n)[addr : addr + n]
 
     def write(self, addr: int, b: bytes) -> None:
-        self.mem.write(self.store, b, addr)
+        self.writes += 1
+        n = len(b)
+        self.get_view(addr, n)[addr : addr + n] = b
+
+    def size(self) -> int:
+        return self.mem.data_len(self.store)
+
+    def grow(self, pages: int) -> None:
+        self.mem.grow(self.store, pages)
+        self.invalidate()
+
+    # fast paths for the most common cases
+
+    def read_i32(self, addr: int) -> int:
+        return I32.unpack_from(self.get_view(addr, 4), addr)[0]
+
+    def write_i32(self, addr: int, v: int) -> None:
+        self.writes += 1
+        I32.pack_into(self.get_view(addr, 4), addr, v)
+
+    def read_cstr(self, addr: int) -> bytearray:
+        # look for the terminator inside the view: reading past the end of
+        # the memory would run into wasmtime's guard pages and crash the host
+        view = self.get_view(addr, 1)
+        m = NUL.search(view, addr)
+        if m is None and len(view) < self.size():
+            # the memory grew since we took the view
+            self.invalidate()
+            view = self.get_view(addr, 1)
+            m = NUL.search(view, addr)
+        if m is None:
+            raise IndexError("out of bounds memory access")
+        return bytearray(view[addr : m.start()])
@@ -0,0 +1,388 @@
+"""
+Persistent cache for the result of redshifting.
+
+The redshifted version of each function is stored in a .spyr file inside
+__pycache__, next to the .spyc of the main module. The cache is keyed on the
+source code of the main module and all its transitive imports (see
+ImportAnalyzer.get_import_list): if any of them changes, the whole cache is
+discarded.
+
+For each function, we store its redshifted FuncDef and the types of its
+locals. W_Objects which are referenced by the AST (e.g. the w_T of the
+expressions) are stored by FQN and looked up in vm.globals_w when the cache is
+loaded.
+
+Moreover, we record the FQN constants (ast.FQNConst) referenced by the
+body. Some of them are created by the redshift itself: prebuilt exceptions can
+be recreated from the cache, but if the body refers to any other global which
+does not exist (e.g. a generic function which was specialized during the
+redshift), the entry is not used and the function is redshifted as usual.
+
+Functions whose redshift has side effects on the blue state of the VM (see
+SideEffectWatcher) are never cached, since a cache hit would skip them.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+from typing import TYPE_CHECKING, Any, Optional
+
+import py.path
+
+import spy
+from spy import ast
+from spy.fqn import FQN, NSPart
+from spy.vm.cell import W_Cell
+from spy.vm.exc import W_Exception
+from spy.vm.function import FuncParam, W_ASTFunc, W_FuncType
+from spy.vm.object import W_Object, W_Type
+
+if TYPE_CHECKING:
+    from spy.analyze.importing import ImportAnalyzer
+    from spy.vm.vm import SPyVM
+
+# Cache version: increment this when the format of the .spyr files changes
+SPYR_VERSION = 2
+
+_SPY_FINGERPRINT: Optional[str] = None
+
+
+def spy_fingerprint() -> str:
+    """
+    Return a fingerprint of the source code of the compiler itself.
+
+    The result of redshifting depends also on the interp-level code (e.g. the
+    builtin modules and the opspecs), so the cache must be discarded if it
+    changes.
+
+    We hash the content of the files and not their mtime, so that e.g. two
+    fresh checkouts of the same commit have the same fingerprint.
+    """
+    global _SPY_FINGERPRINT
+    if _SPY_FINGERPRINT is None:
+        h = hashlib.sha256()
+        root = str(spy.ROOT)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d != "tests")
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    path = os.path.join(dirpath, filename)
+                    relpath = os.path.relpath(path, root)
+                    with open(path, "rb") as f:
+                        content = f.read()
+                    h.update(f"{relpath}:{len(content)}\n".encode())
+                    h.update(content)
+        _SPY_FINGERPRINT = h.hexdigest()
+    return _SPY_FINGERPRINT
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class SideEffectWatcher:
+    """
+    Detect whether redshifting a function changed the blue state of the VM.
+
+    The redshift of a function executes its blue code, which might have side
+    effects which are not visible in the redshifted function. If we reuse a
+    redshifted function without redshifting it again (because it comes from
+    the cache or from a worker process), those side effects are lost. We
+    consider as side effects:
+
+      - writes to a W_Cell, e.g. a `var` incremented by a @blue function.
+        W_Cell.writes counts the writes to the cells of all the VMs, so the
+        writes done by other VMs in the meantime are false positives;
+
+      - new results in the BlueCache for blue functions written in SPy: the
+        results of the interp-level builtins can be recomputed at any time,
+        and if they create new types, they also create new globals;
+
+      - writes to the linear memory: for simplicity, any write done by the
+        host and any call into libspy count as a write.
+
+    New globals are not considered, since the callers deal with them in
+    different ways.
+    """
+
+    def __init__(self, vm: "SPyVM") -> None:
+        self.vm = vm
+        self.cell_writes = W_Cell.writes
+        self.spy_records = vm.bluecache.spy_records
+        self.mem_writes = vm.ll.mem.writes
+        self.ll_calls = vm.ll.calls
+
+    def changed(self) -> bool:
+        vm = self.vm
+        return (
+            vm.bluecache.spy_records != self.spy_records
+            or vm.ll.mem.writes != self.mem_writes
+            or vm.ll.calls != self.ll_calls
+            or W_Cell.writes != self.cell_writes
+        )
+
+
+def _encode_fqn(fqn: FQN) -> Any:
+    # we cannot use str(fqn), because not all the FQNs can be parsed back
+    # (e.g. the ones whose qualifiers are blue values)
+    return tuple(
+        (part.name, tuple(_encode_fqn(q) for q in part.qualifiers), part.suffix)
+        for part in fqn.parts
+    )
+
+
+def _decode_fqn(parts: Any) -> FQN:
+    return FQN(
+        [
+            NSPart(name, [_decode_fqn(q) for q in quals], suffix)
+            for name, quals, suffix in parts
+        ]
+    )
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickle redshifted ASTs, storing W_Objects and FQNs by name.
+    """
+
+    def __init__(self, vm: "SPyVM", f: io.BytesIO) -> None:
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.vm = vm
+
+    def persistent_id(self, obj: Any) -> Any:
+        if isinstance(obj, FQN):
+            return ("fqn", _encode_fqn(obj))
+        elif isinstance(obj, W_Object):
+            return self.encode_w_obj(obj)
+        return None
+
+    def encode_w_obj(self, w_obj: W_Object) -> Any:
+        fqn = getattr(w_obj, "fqn", None)
+        if isinstance(fqn, FQN) and self.vm.lookup_global_maybe(fqn) is w_obj:
+            return ("global", _encode_fqn(fqn))
+        elif isinstance(w_obj, W_FuncType):
+            # functypes are not stored in globals_w: they are uniquely
+            # identified by their structure, see W_FuncType.new
+            params = tuple((self.encode_w_obj(p.w_T), p.kind) for p in w_obj.params)
+            w_restype = self.encode_w_obj(w_obj.w_restype)
+            return ("functype", params, w_restype, w_obj.color, w_obj.kind)
+        raise CacheMiss(f"cannot store {w_obj}")
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, vm: "SPyVM", f: io.BytesIO) -> None:
+        super().__init__(f)
+        self.vm = vm
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid[0] == "fqn":
+            return _decode_fqn(pid[1])
+        return self.decode_w_obj(pid)
+
+    def decode_w_obj(self, pid: Any) -> W_Object:
+        kind = pid[0]
+        if kind == "global":
+            fqn = _decode_fqn(pid[1])
+            w_obj = self.vm.lookup_global_maybe(fqn)
+            if w_obj is None:
+                raise CacheMiss(f"missing global: {fqn}")
+            return w_obj
+        assert kind == "functype"
+        _, params, w_restype, color, func_kind = pid
+        params = [
+            FuncParam(self.decode_type(p), param_kind) for p, param_kind in params
+        ]
+        return W_FuncType.new(
+            params, self.decode_type(w_restype), color=color, kind=func_kind
+        )
+
+    def decode_type(self, pid: Any) -> W_Type:
+        w_T = self.decode_w_obj(pid)
+        if not isinstance(w_T, W_Type):
+            raise CacheMiss(f"not a type: {w_T}")
+        return w_T
+
+
+class RedshiftCache:
+    vm: "SPyVM"
+    spyr: py.path.local
+    key: str
+    funcs: dict[str, bytes]
+    hits: int
+    misses: int
+
+    def __init__(self, vm: "SPyVM", spyr: py.path.local, key: str) -> None:
+        self.vm = vm
+        self.spyr = spyr
+        self.key = key
+        self.funcs = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_importer(cls, importer: "ImportAnalyzer") -> "RedshiftCache":
+        """
+        Create the cache for the main module of the given importer, and load
+        its content if the key matches.
+        """
+        main_modname = importer.main_modname
+        mod = importer.getmod(main_modname)
+        spyfile = py.path.local(mod.filename)
+        spyr = spyfile.dirpath("__pycache__").join(f"{spyfile.purebasename}.spyr")
+        key = cls.compute_key(importer)
+        rc = cls(importer.vm, spyr, key)
+        rc.load(importer)
+        return rc
+
+    @staticmethod
+    def compute_key(importer: "ImportAnalyzer") -> str:
+        h = hashlib.sha256()
+        h.update(f"{SPYR_VERSION}:{spy_fingerprint()}\n".encode())
+        for modname in importer.get_import_list():
+            mod = importer.mods[modname]
+            if isinstance(mod, ast.Module):
+                src = py.path.local(mod.filename).read_binary()
+                digest = hashlib.sha256(src).hexdigest()
+                h.update(f"{modname}:{mod.filename}:{digest}\n".encode())
+            else:
+                h.update(f"{modname}:{mod}\n".encode())
+        return h.hexdigest()
+
+    def load(self, importer: "ImportAnalyzer") -> None:
+        if not self.spyr.check():
+            return
+        try:
+            with self.spyr.open("rb") as f:
+                data = pickle.load(f)
+            if data["version"] == SPYR_VERSION and data["key"] == self.key:
+                self.funcs = data["funcs"]
+        except Exception as e:
+            importer.record_cache_error(str(self.spyr), "load", e)
+
+    def save(self, importer: "ImportAnalyzer") -> None:
+        if not self.dirty:
+            return
+        try:
+            self.spyr.dirpath().ensure(dir=True)
+            data = {"version": SPYR_VERSION, "key": self.key, "funcs": self.funcs}
+            with self.spyr.open("wb") as f:
+                pickle.dump(data, f)
+            self.dirty = False
+        except Exception as e:
+            importer.record_cache_error(str(self.spyr), "save", e)
+
+    def record(self, w_newfunc: W_ASTFunc) -> None:
+        """
+        Record the result of redshifting a function.
+        """
+        blob = dump_redshifted(self.vm, w_newfunc)
+        if blob is not None:
+            self.funcs[str(w_newfunc.fqn)] = blob
+            self.dirty = True
+
+    def contains(self, w_func: W_ASTFunc) -> bool:
+        return str(w_func.fqn) in self.funcs
+
+    def lookup(self, w_func: W_ASTFunc) -> Optional[W_ASTFunc]:
+        """
+        Return the redshifted version of w_func, if it's in the cache.
+        """
+        blob = self.funcs.get(str(w_func.fqn))
+        if blob is None:
+            self.misses += 1
+            return None
+        try:
+            w_newfunc = load_redshifted(self.vm, w_func, blob)
+        except CacheMiss:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return w_newfunc
+
+
+def dump_redshifted(vm: "SPyVM", w_newfunc: W_ASTFunc) -> Optional[bytes]:
+    """
+    Serialize the result of redshifting a function.
+
+    Return None if the function references objects which cannot be stored.
+    """
+    assert w_newfunc.redshifted
+    assert w_newfunc.locals_types_w is not None
+    funcdef = w_newfunc.funcdef
+    consts: list[tuple[str, FQN, FQN, Optional[str]]] = []
+    for node in funcdef.walk(ast.FQNConst):
+        assert isinstance(node, ast.FQNConst)
+        w_obj = vm.lookup_global(node.fqn)
+        w_T = vm.dynamic_type(w_obj)
+        if isinstance(w_obj, W_Exception):
+            if w_obj.annotations:
+                return None  # not supported
+            consts.append(("exc", node.fqn, w_T.fqn, w_obj.message))
+        else:
+            consts.append(("global", node.fqn, w_T.fqn, None))
+
+    entry = {
+        "funcdef": funcdef,
+        "locals_types_w": w_newfunc.locals_types_w,
+        "consts": consts,
+    }
+    f = io.BytesIO()
+    try:
+        _Pickler(vm, f).dump(entry)
+    except CacheMiss:
+        return None
+    return f.getvalue()
+
+
+def load_redshifted(vm: "SPyVM", w_func: W_ASTFunc, blob: bytes) -> W_ASTFunc:
+    """
+    Load the redshifted version of w_func, which was serialized by
+    dump_redshifted.
+
+    Raise CacheMiss if any of the referenced globals is missing.
+    """
+    entry = _Unpickler(vm, io.BytesIO(blob)).load()
+    check_consts(vm, entry["consts"])
+    funcdef = entry["funcdef"]
+    assert isinstance(funcdef, ast.FuncDef)
+    w_newfunc = W_ASTFunc(
+        fqn=w_func.fqn,
+        closure=(),
+        w_functype=w_func.w_functype,
+        funcdef=funcdef,
+        locals_types_w=entry["locals_types_w"],
+    )
+    w_func.invalidate(w_newfunc)
+    return w_newfunc
+
+
+def check_consts(
+    vm: "SPyVM", consts: list[tuple[str, FQN, FQN, Optional[str]]]
+) -> None:
+    """
+    Check that all the FQN constants referenced by a redshifted function
+    exist, recreating the prebuilt exceptions if needed.
+    """
+    to_create: dict[FQN, tuple[W_Type, Optional[str]]] = {}
+    for kind, fqn, T_fqn, message in consts:
+        w_obj = vm.lookup_global_maybe(fqn)
+        if w_obj is None:
+            w_T = vm.lookup_global_maybe(T_fqn)
+            if kind != "exc" or not isinstance(w_T, W_Type):
+                raise CacheMiss(f"missing global: {fqn}")
+            to_create[fqn] = (w_T, message)
+            continue
+        w_T = vm.dynamic_type(w_obj)
+        if w_T.fqn != T_fqn:
+            raise CacheMiss(f"wrong type: {fqn}")
+        if kind == "exc":
+            assert isinstance(w_obj, W_Exception)
+            if w_obj.message != message:
+                raise CacheMiss(f"wrong exception: {fqn}")
+
+    # only create the missing objects if everything else is fine
+    for fqn, (w_T, message) in to_create.items():
+        w_exc = w_T.pyclass(message)  # type: ignore
+        vm.add_global(fqn, w_exc)
@@ -0,0 +1,167 @@
+"""
+Redshift functions in parallel, using a pool of worker processes.
+
+The functions are split into contiguous chunks, and each chunk is redshifted
+by a fresh worker process, forked from the main process: so it starts from
+the state of the VM at the moment of the fork, and the state left by the
+other chunks is not visible. The worker sends back the serialized result of
+each function (see redshiftcache.dump_redshifted).
+
+The main process then merges the results in the same order in which a serial
+redshift would have processed the functions. The results of a worker can be
+used only if the redshift had no side effects, since they would be lost in
+the main process: if the redshift of a function creates new globals (e.g. a
+specialization of a generic function), changes the blue state of the VM
+(see redshiftcache.SideEffectWatcher), prints something or fails, the worker
+gives up and the function is redshifted again in the main process, at the
+right moment.
+
+Parallel redshift is supported only on platforms with os.fork(), and only if
+the process is single-threaded, see can_fork().
+"""
+
+import contextlib
+import io
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Optional
+
+from spy.fqn import FQN
+from spy.redshiftcache import SideEffectWatcher, dump_redshifted
+from spy.vm.function import W_ASTFunc
+
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+# the VM and the functions which are used by the worker processes. They are
+# set by the main process just before forking.
+_WORKER_VM: Optional["SPyVM"] = None
+_WORKER_FUNCS: list[tuple[FQN, W_ASTFunc]] = []
+
+RESULTS = dict[FQN, Optional[bytes]]
+
+
+def can_fork() -> bool:
+    """
+    Return whether we can safely fork the worker processes.
+
+    fork() in a multi-threaded process is unsafe, because the child might
+    deadlock on a lock which was held by another thread. The workers are
+    forked by the main thread without any helper thread, but if the program
+    which embeds the VM started other threads, we go on serially.
+
+    Native threads are not visible here: wasmtime's ones are avoided by
+    llwasm.wasmtime.get_engine.
+    """
+    return (
+        "fork" in multiprocessing.get_all_start_methods()
+        and threading.active_count() == 1
+    )
+
+
+def redshift_in_workers(
+    vm: "SPyVM", funcs: list[tuple[FQN, W_ASTFunc]], jobs: int
+) -> RESULTS:
+    """
+    Redshift the given functions in `jobs` worker processes.
+
+    Return a dict mapping the FQN of each function which was attempted to the
+    serialized redshifted function, or to None if it must be redshifted by
+    the main process. Functions which come after a None in the same chunk are
+    not attempted, and are not in the dict.
+    """
+    global _WORKER_VM, _WORKER_FUNCS
+    # split the functions into contiguous chunks: several chunks per worker,
+    # to balance the load. Each chunk gets a fresh worker,
+    # so that it does not see the state left by the previous one
+    n_chunks = min(len(funcs), jobs * 4)
+    size = -(-len(funcs) // n_chunks)  # ceil division
+    chunks = [(i, min(i + size, len(funcs))) for i in range(0, len(funcs), size)]
+
+    # We fork the workers ourselves from the current thread, instead of using
+    # multiprocessing.Pool: with maxtasksperchild, the Pool forks the
+    # replacement workers from one of its helper threads, while the others
+    # are alive. fork() in a multi-threaded process can deadlock the child,
+    # if another thread holds a lock at that moment.
+    ctx = multiprocessing.get_context("fork")
+    todo = list(range(len(chunks)))
+    running: dict[Connection, tuple[int, BaseProcess]] = {}
+    results: list[list[tuple[int, Optional[bytes]]]] = [[] for _ in chunks]
+    _WORKER_VM = vm
+    _WORKER_FUNCS = funcs
+    try:
+        while todo or running:
+            while todo and len(running) < jobs:
+                k = todo.pop(0)
+                r, w = ctx.Pipe(duplex=False)
+                proc: BaseProcess = ctx.Process(
+                    target=_worker_main, args=(chunks[k], w)
+                )
+                proc.start()
+                w.close()
+                running[r] = (k, proc)
+            for ready in wait(list(running)):
+                assert isinstance(ready, Connection)
+                k, proc = running.pop(ready)
+                try:
+                    results[k] = ready.recv()
+                except EOFError:
+                    # the worker died: give up on the whole chunk
+                    start, end = chunks[k]
+                    results[k] = [(start, None)]
+                ready.close()
+                proc.join()
+    finally:
+        for r, (k, proc) in running.items():
+            proc.terminate()
+            proc.join()
+            r.close()
+        _WORKER_VM = None
+        _WORKER_FUNCS = []
+
+    res: RESULTS = {}
+    for chunk_results in results:
+        for i, blob in chunk_results:
+            fqn, w_func = funcs[i]
+            res[fqn] = blob
+    return res
+
+
+def _worker_main(chunk: tuple[int, int], conn: Connection) -> None:
+    conn.send(_redshift_chunk(chunk))
+    conn.close()
+
+
+def _redshift_chunk(chunk: tuple[int, int]) -> list[tuple[int, Optional[bytes]]]:
+    """
+    Worker side: redshift the functions in order, like _redshift_some does.
+
+    As soon as a function has a side effect, the state of the worker VM
+    diverges from the one of a serial redshift: from that point, we give up
+    on all the remaining functions of the chunk.
+    """
+    from spy.doppler import redshift
+
+    vm = _WORKER_VM
+    assert vm is not None
+    start, end = chunk
+    res: list[tuple[int, Optional[bytes]]] = []
+    for i in range(start, end):
+        fqn, w_func = _WORKER_FUNCS[i]
+        n_globals = len(vm.globals_w)
+        watcher = SideEffectWatcher(vm)
+        out = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                w_newfunc = redshift(vm, w_func, "eager")
+        except Exception:
+            res.append((i, None))
+            break
+        vm.globals_w[fqn] = w_newfunc
+        if len(vm.globals_w) != n_globals or out.getvalue() or watcher.changed():
+            res.append((i, None))
+            break
+        res.append((i, dump_redshifted(vm, w_newfunc)))
+    return res
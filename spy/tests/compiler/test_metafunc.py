@@ -38,6 +38,31 @@ class TestMetaFunc(CompilerTest):
         assert mod.test1() == 10
         assert mod.test2() == "hello world"
 
+    def test_varargs_forward_red_arg(self):
+        # the same metafunc is called from two places with the same static
+        # types: each call must forward its own red MetaArg
+        mod = self.compile("""
+        from operator import OpSpec, MetaArg
+
+        @blue.metafunc
+        def foo(m_x, *args_m):
+            def impl(x: i32, neg: bool) -> i32:
+                if neg:
+                    return -x
+                return x
+            m_neg: MetaArg = args_m[0]
+            return OpSpec(impl, [m_x, m_neg])
+
+        def a(neg: bool) -> i32:
+            return foo(1, neg)
+
+        def b(neg: bool) -> i32:
+            return foo(2, neg)
+        """)
+        assert mod.a(True) == -1
+        assert mod.b(True) == -2
+        assert mod.b(False) == 2
+
     def test_wrong_argcount(self):
         src = """
         @blue.metafunc
@@ -80,6 +105,18 @@ class TestMetaFunc(CompilerTest):
         w_T = mod.foo(unwrap=False)
         assert w_T is B.w_i32
 
+    @no_C
+    def test_functype_restype(self):
+        mod = self.compile("""
+        def inc(x: i32) -> f64:
+            return x + 1.0
+
+        def foo() -> type:
+            return STATIC_TYPE(inc).restype
+        """)
+        w_T = mod.foo(unwrap=False)
+        assert w_T is B.w_f64
+
     @no_C
     def test_COLOR(self):
         mod = self.compile("""
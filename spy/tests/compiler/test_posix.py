@@ -1,3 +1,4 @@
+from spy.errors import SPyError
 from spy.tests.support import CompilerTest
 
 
@@ -110,3 +111,161 @@ class TestPosix(CompilerTest):
         f.write("hello\nworld\n")
         tup = mod.foo(str(f))
         assert tup == ("hello\n", "world\n", "")
+
+    def test_mmap(self):
+        src = """
+        from posix import mmap
+
+        def count(fname: str, b: u8) -> i32:
+            m = mmap(fname)
+            n = 0
+            i = 0
+            while i < len(m):
+                if m[i] == b:
+                    n = n + 1
+                i = i + 1
+            m.close()
+            return n
+
+        def get(fname: str, i: i32) -> u8:
+            m = mmap(fname)
+            return m[i]
+
+        def length_after_close(fname: str) -> i32:
+            m = mmap(fname)
+            m.close()
+            return len(m)
+        """
+        mod = self.compile(src)
+        f = self.tmpdir.join("foo.txt")
+        f.write("hello\nworld\n")
+        assert mod.count(str(f), ord("o")) == 2
+        assert mod.count(str(f), ord("\n")) == 2
+        assert mod.get(str(f), 6) == ord("w")
+        assert mod.length_after_close(str(f)) == 0
+        with SPyError.raises("W_IndexError"):
+            mod.get(str(f), 12)
+
+    def test_mmap_chunks(self):
+        src = """
+        from posix import mmap
+
+        def count(fname: str, b: u8) -> i32:
+            m = mmap(fname)
+            n = 0
+            k = 0
+            while k < m.nchunks():
+                size = m.chunk_len(k)
+                i = 0
+                while i < size:
+                    if m.chunk_getitem(k, i) == b:
+                        n = n + 1
+                    i = i + 1
+                k = k + 1
+            m.close()
+            return n
+
+        def size(fname: str) -> f64:
+            m = mmap(fname)
+            return m.size()
+
+        def nchunks(fname: str) -> i32:
+            m = mmap(fname)
+            return m.nchunks()
+
+        def get(fname: str, k: i32, i: i32) -> u8:
+            m = mmap(fname)
+            return m.chunk_getitem(k, i)
+
+        def chunk_len(fname: str, k: i32) -> i32:
+            m = mmap(fname)
+            return m.chunk_len(k)
+        """
+        mod = self.compile(src)
+        f = self.tmpdir.join("foo.txt")
+        f.write("hello\nworld\n")
+        assert mod.count(str(f), ord("o")) == 2
+        assert mod.size(str(f)) == 12.0
+        assert mod.nchunks(str(f)) == 1
+        assert mod.chunk_len(str(f), 0) == 12
+        assert mod.get(str(f), 0, 6) == ord("w")
+        with SPyError.raises("W_IndexError", match="MMap index out of range"):
+            mod.get(str(f), 0, 12)
+        with SPyError.raises("W_IndexError", match="MMap index out of range"):
+            mod.get(str(f), 0, -1)
+        with SPyError.raises("W_IndexError", match="MMap chunk out of range"):
+            mod.get(str(f), 4, 0)
+        with SPyError.raises("W_IndexError", match="MMap chunk out of range"):
+            mod.chunk_len(str(f), 1)
+        f.write("")
+        assert mod.size(str(f)) == 0.0
+        assert mod.nchunks(str(f)) == 0
+
+    def test_mmap_empty_file(self):
+        src = """
+        from posix import mmap
+
+        def foo(fname: str) -> i32:
+            m = mmap(fname)
+            n = len(m)
+            m.close()
+            return n
+        """
+        mod = self.compile(src)
+        f = self.tmpdir.join("empty.txt")
+        f.write("")
+        assert mod.foo(str(f)) == 0
+        with SPyError.raises("W_OSError"):
+            mod.foo(str(self.tmpdir.join("missing.txt")))
+
+    def test_file_iter(self):
+        src = """
+        from posix import open
+
+        def count(fname: str) -> i32:
+            n = 0
+            for line in open(fname):
+                n = n + len(line) * 1000 + 1
+            return n
+
+        def last(fname: str) -> str:
+            res = ""
+            for line in open(fname):
+                res = line
+            return res
+        """
+        mod = self.compile(src)
+        f = self.tmpdir.join("foo.txt")
+        f.write("hello\nworld\n\nlast")
+        assert mod.count(str(f)) == (6 + 6 + 1 + 4) * 1000 + 4
+        assert mod.last(str(f)) == "last"
+        f.write("")
+        assert mod.count(str(f)) == 0
+        # lines longer than the buffer
+        f.write("a" * 100000 + "\n" + "b" * 200000 + "\n")
+        assert mod.count(str(f)) == (100001 + 200001) * 1000 + 2
+
+    def test_file_readline(self):
+        src = """
+        from posix import open
+
+        def foo(fname: str) -> str:
+            f = open(fname)
+            res = f.readline()
+            for line in f:
+                res = res + "|" + line
+            res = res + "|" + f.readline()
+            f.close()
+            return res
+
+        def closed(fname: str) -> str:
+            f = open(fname)
+            f.close()
+            return f.readline()
+        """
+        mod = self.compile(src)
+        f = self.tmpdir.join("foo.txt")
+        f.write("a\nb\nc\n")
+        assert mod.foo(str(f)) == "a\n|b\n|c\n|"
+        with SPyError.raises("W_ValueError", match="I/O operation on closed file"):
+            mod.closed(str(f))
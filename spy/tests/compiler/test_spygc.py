@@ -0,0 +1,105 @@
+import pytest
+
+from spy.tests.support import CompilerTest, only_C
+
+
+class TestSpyGC(CompilerTest):
+    """
+    Run some allocation-heavy code with --gc=spygc.
+
+    SPYGC_THRESHOLD=1 forces a collection at every allocation: if an object
+    which is still in use is not properly rooted, it is freed and reused
+    immediately, and the results are wrong. We need to optimize, else all
+    the locals are in the shadow stack anyway.
+    """
+
+    GC = "spygc"
+    OPT_LEVEL = "2"
+
+    @pytest.fixture(autouse=True)
+    def collect_often(self, monkeypatch):
+        monkeypatch.setenv("SPYGC_THRESHOLD", "1")
+
+    @only_C
+    def test_str(self):
+        mod = self.compile("""
+        def make_name(i: i32) -> str:
+            return "p" + str(i) + "_" + str(i * 2)
+
+        def foo(n: i32) -> str:
+            res = ""
+            i = 0
+            while i < n:
+                res = res + make_name(i) + make_name(i + 1)[0]
+                i = i + 1
+            return res
+        """)
+        expected = "".join(f"p{i}_{i * 2}p" for i in range(20))
+        assert mod.foo(20) == expected
+
+    @only_C
+    def test_list_and_dict(self):
+        mod = self.compile("""
+        from _list import list
+        from _dict import dict
+
+        def foo(n: i32) -> i32:
+            lst = list[str]()
+            i = 0
+            while i < n:
+                lst.append("k" + str(i))
+                i = i + 1
+            d = dict[str, i32]()
+            i = 0
+            while i < n:
+                d[lst[i]] = i
+                i = i + 1
+            total = 0
+            i = 0
+            while i < n:
+                total = total + d["k" + str(i)]
+                i = i + 1
+            return total
+        """)
+        assert mod.foo(100) == sum(range(100))
+
+    @only_C
+    def test_struct(self):
+        mod = self.compile("""
+        @struct
+        class Point:
+            x: i32
+            name: str
+
+        def make(i: i32) -> Point:
+            return Point(i, "p" + str(i))
+
+        def foo() -> str:
+            a = make(1)
+            b = make(2)
+            return a.name + make(3).name + b.name
+        """)
+        assert mod.foo() == "p1p3p2"
+
+    @only_C
+    def test_memory_is_reclaimed(self, monkeypatch):
+        # use the default threshold, else this is too slow
+        monkeypatch.delenv("SPYGC_THRESHOLD")
+        mod = self.compile("""
+        from unsafe import gc_alloc, gc_ptr
+
+        def foo(size: i32, iterations: i32) -> i32:
+            res = 0
+            i = 0
+            while i < iterations:
+                buf = gc_alloc[i32](size)
+                buf[size - 1] = i
+                res = res + buf[size - 1]
+                i = i + 1
+            return res
+        """)
+        # allocate 200 MB in total, 1 MB at a time
+        assert mod.foo(256 * 1024, 200) == sum(range(200))
+        mem = mod.ll.mem
+        size = mem.mem.data_len(mem.store)
+        assert size < 50 * 1024 * 1024
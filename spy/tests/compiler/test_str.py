@@ -1,7 +1,7 @@
 import re
 
 from spy.errors import SPyError
-from spy.tests.support import CompilerTest, skip_backends
+from spy.tests.support import CompilerTest, expect_errors, skip_backends
 
 
 class TestStr(CompilerTest):
@@ -37,6 +37,16 @@ class TestStr(CompilerTest):
         """)
         assert mod.foo() == "hello hello hello "
 
+    def test_multiply_negative(self):
+        mod = self.compile("""
+        def foo(a: str, n: i32) -> str:
+            return a * n
+        """)
+        assert mod.foo("ab", 0) == ""
+        assert mod.foo("ab", -1) == ""
+        assert mod.foo("ab", -100) == ""
+        assert mod.foo("ab", 2) == "abab"
+
     def test_str_argument(self):
         mod = self.compile("""
         def foo(a: str) -> str:
@@ -354,3 +364,78 @@ class TestStr(CompilerTest):
         # assert mod.foo("abc", "", "-", 0) == "abc"  # count not supported
         # assert mod.foo("abc", "ab", "--", 0) == "abc"  # count not supported
         assert mod.foo("abc", "xy", "--") == "abc"
+
+    def test_StringBuilder(self):
+        mod = self.compile("""
+        def foo(n: i32) -> str:
+            sb = StringBuilder()
+            i = 0
+            while i < n:
+                sb.append(str(i))
+                sb.append(",")
+                i = i + 1
+            return sb.build()
+
+        def length(n: i32) -> i32:
+            sb = StringBuilder()
+            sb.append("x" * n)
+            sb.append("àè")
+            return len(sb)
+
+        def empty() -> str:
+            sb = StringBuilder()
+            sb.append("")
+            a = sb.build()
+            sb.append("")
+            return a + sb.build()
+        """)
+        assert mod.foo(0) == ""
+        assert mod.foo(3) == "0,1,2,"
+        assert mod.foo(1000) == "".join(f"{i}," for i in range(1000))
+        assert mod.length(5) == 9
+        assert mod.empty() == ""
+
+    def test_StringBuilder_build_twice(self):
+        mod = self.compile("""
+        def foo() -> str:
+            sb = StringBuilder()
+            sb.reserve(3)
+            sb.append("abc")
+            a = sb.build()
+            # a is exactly full: the buffer is shared, and append must not
+            # modify a
+            sb.append("def")
+            b = sb.build()
+            return a + "|" + b
+        """)
+        assert mod.foo() == "abc|abcdef"
+
+    def test_join(self):
+        mod = self.compile("""
+        def make(n: i32) -> list[str]:
+            lst: list[str] = []
+            i = 0
+            while i < n:
+                lst.append(str(i))
+                i = i + 1
+            return lst
+
+        def foo(sep: str, n: i32) -> str:
+            return sep.join(make(n))
+        """)
+        assert mod.foo(", ", 0) == ""
+        assert mod.foo(", ", 1) == "0"
+        assert mod.foo(", ", 4) == "0, 1, 2, 3"
+        assert mod.foo("", 4) == "0123"
+        assert mod.foo("àè", 3) == "0àè1àè2"
+
+    def test_join_wrong_type(self):
+        src = """
+        def foo() -> str:
+            return ",".join(42)
+        """
+        errors = expect_errors(
+            "str.join() expects a `list[str]`, got `i32`",
+            ("this is `i32`", "42"),
+        )
+        self.compile_raises(src, "foo", errors)
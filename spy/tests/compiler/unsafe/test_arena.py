@@ -0,0 +1,93 @@
+from spy.errors import SPyError
+from spy.tests.support import CompilerTest
+
+
+class TestArena(CompilerTest):
+    def test_alloc(self):
+        mod = self.compile("""
+        from unsafe import Arena, arena_alloc, raw_ptr
+
+        def foo() -> f64:
+            arena = Arena()
+            a: raw_ptr[i32] = arena_alloc[i32](arena, 3)
+            b = arena_alloc[f64](arena, 2)
+            a[0] = 1
+            a[1] = 2
+            a[2] = 3
+            b[0] = 0.5
+            b[1] = 0.25
+            res = a[0] + a[1] + a[2] + b[0] + b[1]
+            arena.close()
+            return res
+        """)
+        assert mod.foo() == 6.75
+
+    def test_many_allocs(self):
+        # allocate much more than a single chunk
+        mod = self.compile("""
+        from unsafe import Arena, arena_alloc
+
+        def foo(n: i32) -> i32:
+            arena = Arena()
+            total = 0
+            i = 0
+            while i < n:
+                buf = arena_alloc[i32](arena, 1000)
+                buf[0] = i
+                buf[999] = i
+                total = total + buf[0] + buf[999]
+                i = i + 1
+            arena.close()
+            return total
+        """)
+        assert mod.foo(100) == 2 * sum(range(100))
+
+    def test_reset(self):
+        mod = self.compile("""
+        from unsafe import Arena, arena_alloc
+
+        def foo() -> i32:
+            arena = Arena()
+            a = arena_alloc[i32](arena, 10)
+            a[0] = 42
+            arena.reset()
+            # after reset() the memory is reused
+            b = arena_alloc[i32](arena, 10)
+            res = b[0]
+            arena.close()
+            return res
+        """)
+        assert mod.foo() == 42
+
+    def test_pass_arena_around(self):
+        mod = self.compile("""
+        from unsafe import Arena, arena_alloc, raw_ptr
+
+        def make_buf(arena: Arena, n: i32) -> raw_ptr[i32]:
+            buf = arena_alloc[i32](arena, n)
+            i = 0
+            while i < n:
+                buf[i] = i * i
+                i = i + 1
+            return buf
+
+        def foo(n: i32) -> i32:
+            arena = Arena()
+            buf = make_buf(arena, n)
+            res = buf[n - 1]
+            arena.close()
+            return res
+        """)
+        assert mod.foo(10) == 81
+
+    def test_alloc_after_close(self):
+        mod = self.compile("""
+        from unsafe import Arena, arena_alloc
+
+        def foo() -> None:
+            arena = Arena()
+            arena.close()
+            buf = arena_alloc[i32](arena, 1)
+        """)
+        with SPyError.raises("W_PanicError", match="Arena is closed"):
+            mod.foo()
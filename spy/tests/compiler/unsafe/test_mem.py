@@ -0,0 +1,137 @@
+import pytest
+
+from spy.errors import SPyError
+from spy.tests.support import CompilerTest, expect_errors
+
+
+@pytest.fixture(params=["raw", "gc"])
+def memkind(request):
+    return request.param
+
+
+class TestBulkMem(CompilerTest):
+    def test_memcpy(self, memkind):
+        k = memkind
+        mod = self.compile(f"""
+        from unsafe import {k}_alloc as k_alloc, memcpy, memset
+
+        def foo() -> i32:
+            a = k_alloc[i32](5)
+            b = k_alloc[i32](5)
+            memset[i32](b, 0, 0, 5)
+            i = 0
+            while i < 5:
+                a[i] = i + 1
+                i = i + 1
+            memcpy[i32](b, 1, a, 0, 3)
+            return b[0] * 1000 + b[1] * 100 + b[2] * 10 + b[3]
+        """)
+        assert mod.foo() == 123
+
+    def test_memmove_overlapping(self):
+        mod = self.compile("""
+        from unsafe import gc_alloc, memmove
+
+        def foo(shift_right: bool) -> i32:
+            a = gc_alloc[i32](5)
+            i = 0
+            while i < 5:
+                a[i] = i + 1
+                i = i + 1
+            if shift_right:
+                memmove[i32](a, 1, a, 0, 4)
+            else:
+                memmove[i32](a, 0, a, 1, 4)
+            res = 0
+            i = 0
+            while i < 5:
+                res = res * 10 + a[i]
+                i = i + 1
+            return res
+        """)
+        assert mod.foo(True) == 11234
+        assert mod.foo(False) == 23455
+
+    def test_memset_fill(self):
+        mod = self.compile("""
+        from unsafe import gc_alloc, memset, fill
+
+        def foo() -> i32:
+            a = gc_alloc[i32](4)
+            fill[i32](a, 0, 7, 4)
+            memset[i32](a, 1, 0, 2)
+            return a[0] * 1000 + a[1] * 100 + a[2] * 10 + a[3]
+
+        def bar() -> f64:
+            a = gc_alloc[f64](3)
+            fill[f64](a, 1, 1.5, 2)
+            return a[0] + a[1] + a[2]
+        """)
+        assert mod.foo() == 7007
+        assert mod.bar() == 3.0
+
+    def test_struct(self):
+        mod = self.compile("""
+        from unsafe import gc_alloc, memcpy, fill
+
+        @struct
+        class Point:
+            x: i32
+            y: i32
+
+        def foo() -> i32:
+            a = gc_alloc[Point](3)
+            b = gc_alloc[Point](3)
+            fill[Point](a, 0, Point(1, 2), 3)
+            a[2].x = 3
+            memcpy[Point](b, 0, a, 0, 3)
+            return b[0].x + b[1].y + b[2].x
+        """)
+        assert mod.foo() == 6
+
+    def test_out_of_bounds(self):
+        mod = self.compile("""
+        from unsafe import gc_alloc, memcpy, memset, fill
+
+        def copy(dst_start: i32, src_start: i32, n: i32) -> None:
+            a = gc_alloc[i32](4)
+            b = gc_alloc[i32](4)
+            memcpy[i32](b, dst_start, a, src_start, n)
+
+        def do_fill(start: i32, n: i32) -> None:
+            a = gc_alloc[i32](4)
+            fill[i32](a, start, 42, n)
+
+        def do_memset(start: i32, n: i32) -> None:
+            a = gc_alloc[i32](4)
+            memset[i32](a, start, 0, n)
+        """)
+        mod.copy(0, 0, 4)
+        mod.copy(4, 4, 0)
+        mod.do_fill(1, 3)
+        mod.do_memset(0, 4)
+        with SPyError.raises("W_PanicError", match="ptr_memcpy out of bounds"):
+            mod.copy(1, 0, 4)
+        with SPyError.raises("W_PanicError", match="ptr_memcpy out of bounds"):
+            mod.copy(0, -1, 2)
+        with SPyError.raises("W_PanicError", match="ptr_memcpy out of bounds"):
+            mod.copy(0, 0, -1)
+        with SPyError.raises("W_PanicError", match="ptr_fill out of bounds"):
+            mod.do_fill(2, 3)
+        with SPyError.raises("W_PanicError", match="ptr_memset out of bounds"):
+            mod.do_memset(0, 5)
+
+    def test_wrong_ptr_type(self):
+        src = """
+        from unsafe import gc_alloc, memcpy
+
+        def foo() -> None:
+            a = gc_alloc[f64](4)
+            b = gc_alloc[i32](4)
+            memcpy[i32](b, 0, a, 0, 4)
+        """
+        errors = expect_errors(
+            "expected `raw_ptr[i32]` or `gc_ptr[i32]`",
+            ("this is `unsafe::gc_ptr[f64]`", "a"),
+        )
+        self.compile_raises(src, "foo", errors)
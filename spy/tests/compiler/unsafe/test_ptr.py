@@ -1,3 +1,5 @@
+import gc
+
 import pytest
 
 from spy.errors import SPyError
@@ -64,6 +66,28 @@ class TestUnsafePtr(CompilerTest):
         assert mod.bar(1) == 3.4
         assert mod.bar(2) == 5.6
 
+    @only_interp
+    def test_gc_alloc_memory_is_freed(self):
+        mod = self.compile("""
+        from unsafe import gc_alloc
+
+        def foo(size: i32, iterations: i32) -> i32:
+            res = 0
+            i = 0
+            while i < iterations:
+                buf = gc_alloc[i32](size)
+                buf[size - 1] = i
+                res = res + buf[size - 1]
+                i = i + 1
+            return res
+        """)
+        # allocate 100 MB in total, 1 MB at a time
+        assert mod.foo(256 * 1024, 100) == sum(range(100))
+        gc.collect()
+        usage = self.vm.ll.memory_usage()
+        assert usage.freed_allocs + usage.pending_allocs >= 99
+        assert usage.linear_memory < 50 * 1024 * 1024
+
     def test_out_of_bound(self, memkind):
         k = memkind
         mod = self.compile(f"""
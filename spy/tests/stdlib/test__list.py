@@ -1,7 +1,7 @@
 import pytest
 
 from spy.errors import SPyError
-from spy.tests.support import CompilerTest
+from spy.tests.support import CompilerTest, expect_errors
 
 
 class TestList(CompilerTest):
@@ -135,6 +135,15 @@ class TestList(CompilerTest):
 
         assert mod.reverse_slice() == [3, 2, 1]
 
+    def test_getitem_slice_red_bounds(self):
+        mod = self.compile("""
+            def red_slice(start: i32, step: i32) -> list[i32]:
+                l = [1,2,3,4,5,6]
+                return l[start::step]
+            """)
+        assert mod.red_slice(1, 2) == [2, 4, 6]
+        assert mod.red_slice(0, 3) == [1, 4]
+
     def test_fastiter(self):
         src = """
         from _list import list
@@ -342,10 +351,24 @@ class TestList(CompilerTest):
 
             lst1.extend(lst2)
             return len(lst1)
+
+        def test_self() -> str:
+            lst = list[int]()
+            i = 0
+            while i < 3:
+                lst.append(i)
+                i = i + 1
+            lst.extend(lst)
+            lst.extend(lst)
+            s = ''
+            for x in lst:
+                s = s + str(x)
+            return s
         """
         mod = self.compile(src)
         assert mod.test_extend() == "10 20 30 40 "
         assert mod.test_empty() == 1
+        assert mod.test_self() == "012012012012"
 
     def test_copy(self):
         src = """
@@ -693,3 +716,209 @@ class TestList(CompilerTest):
         assert mod.test_single_diff() == False
         assert mod.test_after_mutations() == True
         assert mod.test_f64() == True
+
+    def test_sort(self):
+        src = """
+        def make(n: i32, kind: i32) -> list[i32]:
+            lst = list[i32]()
+            seed = 1
+            i = 0
+            while i < n:
+                seed = (seed * 75 + 74) % 65537
+                if kind == 0:
+                    lst.append(seed)
+                elif kind == 1:
+                    lst.append(seed % 10)
+                elif kind == 2:
+                    lst.append(i)
+                elif kind == 3:
+                    lst.append(n - i)
+                else:
+                    lst.append(i % 100)
+                i = i + 1
+            return lst
+
+        def digest(lst: list[i32]) -> i32:
+            h = 0
+            for x in lst:
+                h = (h * 31 + x) % 1000003
+            return h
+
+        def sort_digest(n: i32, kind: i32) -> i32:
+            lst = make(n, kind)
+            lst.sort()
+            return digest(lst)
+
+        def sort_reverse_digest(n: i32, kind: i32) -> i32:
+            lst = make(n, kind)
+            lst.sort(True)
+            return digest(lst)
+        """
+
+        def make(n: int, kind: int) -> list[int]:
+            lst = []
+            seed = 1
+            for i in range(n):
+                seed = (seed * 75 + 74) % 65537
+                lst.append([seed, seed % 10, i, n - i, i % 100][kind])
+            return lst
+
+        def digest(lst: list[int]) -> int:
+            h = 0
+            for x in lst:
+                h = (h * 31 + x) % 1000003
+            return h
+
+        mod = self.compile(src)
+        for n in [0, 1, 2, 10, 63, 64, 65, 300]:
+            for kind in range(5):
+                expected = digest(sorted(make(n, kind)))
+                assert mod.sort_digest(n, kind) == expected
+        for kind in range(5):
+            expected = digest(sorted(make(300, kind), reverse=True))
+            assert mod.sort_reverse_digest(300, kind) == expected
+
+    def test_sort_key(self):
+        src = """
+        # each item is key * 10000 + original position
+        def make(n: i32) -> list[i32]:
+            lst = list[i32]()
+            seed = 1
+            i = 0
+            while i < n:
+                seed = (seed * 75 + 74) % 65537
+                lst.append((seed % 10) * 10000 + i)
+                i = i + 1
+            return lst
+
+        def get_key(x: i32) -> i32:
+            return x // 10000
+
+        def digest(lst: list[i32]) -> i32:
+            h = 0
+            for x in lst:
+                h = (h * 31 + x) % 1000003
+            return h
+
+        def sort_key(n: i32, reverse: bool) -> i32:
+            lst = make(n)
+            lst.sort(get_key, reverse)
+            return digest(lst)
+
+        def sorted_key(n: i32) -> i32:
+            lst = make(n)
+            res = sorted(lst, get_key)
+            # lst is untouched
+            return digest(res) - digest(lst)
+        """
+
+        def make(n: int) -> list[int]:
+            lst = []
+            seed = 1
+            for i in range(n):
+                seed = (seed * 75 + 74) % 65537
+                lst.append((seed % 10) * 10000 + i)
+            return lst
+
+        def digest(lst: list[int]) -> int:
+            h = 0
+            for x in lst:
+                h = (h * 31 + x) % 1000003
+            return h
+
+        def key(x: int) -> int:
+            return x // 10000
+
+        mod = self.compile(src)
+        for n in [10, 300]:
+            # the sort is stable, also with reverse=True
+            expected = digest(sorted(make(n), key=key))
+            assert mod.sort_key(n, False) == expected
+            expected = digest(sorted(make(n), key=key, reverse=True))
+            assert mod.sort_key(n, True) == expected
+            assert mod.sorted_key(n) == digest(sorted(make(n), key=key)) - digest(
+                make(n)
+            )
+
+    def test_sort_key_calls(self):
+        # like CPython, the key is called only once per item, not on each
+        # comparison
+        src = """
+        var calls: i32 = 0
+
+        def get_key(x: i32) -> i32:
+            calls = calls + 1
+            return -x
+
+        def make(n: i32) -> list[i32]:
+            lst = list[i32]()
+            i = 0
+            while i < n:
+                lst.append((i * 37) % 101)
+                i = i + 1
+            return lst
+
+        def sort_key(n: i32, reverse: bool) -> i32:
+            lst = make(n)
+            calls = 0
+            lst.sort(get_key, reverse)
+            return calls
+
+        def sort_key_first(n: i32, reverse: bool) -> i32:
+            lst = make(n)
+            lst.sort(get_key, reverse)
+            return lst[0]
+
+        def sorted_key() -> i32:
+            lst = [3, 1, 2]
+            calls = 0
+            res = sorted(lst, get_key)
+            return calls * 1000 + res[0]
+        """
+        mod = self.compile(src)
+        for n in [0, 1, 10, 100, 300]:
+            assert mod.sort_key(n, False) == n
+            assert mod.sort_key(n, True) == n
+        assert mod.sort_key_first(300, False) == 100
+        assert mod.sort_key_first(300, True) == 0
+        assert mod.sorted_key() == 3 * 1000 + 3
+
+    def test_sorted(self):
+        src = """
+        def sorted_i32() -> i32:
+            lst = [3, 1, 4, 2]
+            res = sorted(lst)
+            return lst[0] * 10000 + res[0] * 1000 + res[1] * 100 + res[2] * 10 + res[3]
+
+        def sorted_f64(reverse: bool) -> f64:
+            lst = [2.5, -1.0, 3.5, 0.5]
+            res = sorted(lst, reverse)
+            return res[0] * 10.0 + res[3]
+
+        def by_len(s: str) -> i32:
+            return len(s)
+
+        def sorted_len() -> str:
+            lst = ["ccc", "b", "aa", "d"]
+            res = sorted(lst, by_len, True)
+            return res[0] + res[1] + res[2] + res[3]
+        """
+        mod = self.compile(src)
+        assert mod.sorted_i32() == 31234
+        assert mod.sorted_f64(False) == -10.0 + 3.5
+        assert mod.sorted_f64(True) == 35.0 - 1.0
+        assert mod.sorted_len() == "cccaabd"
+
+    def test_sort_wrong_args(self):
+        src = """
+        def get_key(x: i32) -> i32:
+            return -x
+
+        def foo() -> None:
+            lst = [3, 1, 2]
+            lst.sort(get_key, 1)
+        """
+        errors = expect_errors(
+            "the reverse argument of sort() must be a bool",
+        )
+        self.compile_raises(src, "foo", errors)
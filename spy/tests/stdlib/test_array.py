@@ -1,6 +1,7 @@
 import pytest
 
-from spy.tests.support import CompilerTest
+from spy.errors import SPyError
+from spy.tests.support import CompilerTest, expect_errors
 
 
 class TestArray(CompilerTest):
@@ -155,3 +156,387 @@ class TestArray(CompilerTest):
         # Test 3D array with dimensions 2x2x3
         # Element at [1, 0, 1] should be at index: 1*2*3 + 0*3 + 1 = 7
         assert mod.test3(buf, 2, 2, 3) == 70
+
+    def test_binop_array(self):
+        src = """
+        from array import array
+
+        def make(n: i32, start: f64) -> array[f64, 1]:
+            a = array[f64, 1](n)
+            i = 0
+            while i < n:
+                a[i] = start + i
+                i = i + 1
+            return a
+
+        def test(op: str, i: i32) -> f64:
+            a = make(5, 1.0)   # [1, 2, 3, 4, 5]
+            b = make(5, 10.0)  # [10, 11, 12, 13, 14]
+            if op == "+":
+                return (a + b)[i]
+            elif op == "-":
+                return (a - b)[i]
+            elif op == "*":
+                return (a * b)[i]
+            else:
+                return (b / a)[i]
+        """
+        mod = self.compile(src)
+        assert mod.test("+", 0) == 11
+        assert mod.test("+", 4) == 19
+        assert mod.test("-", 2) == -9
+        assert mod.test("*", 3) == 52
+        assert mod.test("/", 1) == 5.5
+
+    def test_binop_scalar(self):
+        src = """
+        from array import array
+
+        def test(i: i32) -> i32:
+            a = array[i32, 1](3)
+            a[0] = 1
+            a[1] = 2
+            a[2] = 3
+            b = (a * 10 + 1) - 2
+            return b[i]
+        """
+        mod = self.compile(src)
+        assert mod.test(0) == 9
+        assert mod.test(1) == 19
+        assert mod.test(2) == 29
+
+    def test_binop_shape_mismatch(self):
+        src = """
+        from array import array
+
+        def test() -> None:
+            a = array[i32, 2](2, 3)
+            b = array[i32, 2](3, 2)
+            c = a + b
+        """
+        mod = self.compile(src)
+        with SPyError.raises("W_ValueError", match="could not be broadcast"):
+            mod.test()
+
+    def test_div_int_array(self):
+        src = """
+        from array import array
+
+        def test() -> None:
+            a = array[i32, 1](3)
+            b = a / a
+        """
+        errors = expect_errors("`/` is supported only by float arrays")
+        self.compile_raises(src, "test", errors)
+
+    def test_reductions(self):
+        src = """
+        from array import array
+
+        def make(n: i32) -> array[i32, 1]:
+            a = array[i32, 1](n)
+            i = 0
+            while i < n:
+                a[i] = (i * 7) % 11 - 5
+                i = i + 1
+            return a
+
+        def test_sum(n: i32) -> i32:
+            return make(n).sum()
+
+        def test_min(n: i32) -> i32:
+            return make(n).min()
+
+        def test_max(n: i32) -> i32:
+            return make(n).max()
+
+        def test_dot(n: i32) -> i32:
+            a = make(n)
+            return a.dot(a)
+        """
+        mod = self.compile(src)
+        items = [(i * 7) % 11 - 5 for i in range(20)]
+        assert mod.test_sum(20) == sum(items)
+        assert mod.test_sum(0) == 0
+        assert mod.test_min(20) == min(items)
+        assert mod.test_max(20) == max(items)
+        assert mod.test_dot(20) == sum(x * x for x in items)
+        with SPyError.raises("W_ValueError", match="zero-size array"):
+            mod.test_min(0)
+
+    def test_fill_copy_from(self):
+        src = """
+        from array import array
+
+        def test() -> f64:
+            a = array[f64, 2](2, 3)
+            a.fill(1.5)
+            b = array[f64, 2](2, 3)
+            b.copy_from(a)
+            b[1, 2] = 4.0
+            return a.sum() + b.sum()
+
+        def test_mismatch() -> None:
+            a = array[f64, 1](3)
+            b = array[f64, 1](4)
+            a.copy_from(b)
+        """
+        mod = self.compile(src)
+        assert mod.test() == 9.0 + 11.5
+        with SPyError.raises("W_ValueError", match="shapes do not match"):
+            mod.test_mismatch()
+
+    def test_ops_array3(self):
+        src = """
+        from array import array
+
+        def test() -> i32:
+            a = array[i32, 3](2, 3, 4)
+            a.fill(2)
+            b = a * a + a
+            return b.sum() + b.max()
+        """
+        mod = self.compile(src)
+        assert mod.test() == 6 * 24 + 6
+
+    def test_views_share_memory(self):
+        src = """
+        from array import array
+
+        def make(n: i32, m: i32) -> array[i32, 2]:
+            a = array[i32, 2](n, m)
+            i = 0
+            while i < n:
+                j = 0
+                while j < m:
+                    a[i, j] = i * 10 + j
+                    j = j + 1
+                i = i + 1
+            return a
+
+        def test_row() -> i32:
+            a = make(3, 4)
+            row = a[1]
+            row[2] = 100
+            return len(row) * 1000 + a[1, 2]
+
+        def test_col() -> i32:
+            a = make(3, 4)
+            col = a[:, 2]
+            col[0] = 100
+            return col.get_stride(0) * 1000 + a[0, 2] + col[2]
+
+        def test_block() -> i32:
+            a = make(4, 6)
+            tile = a[1:3, 2:5]
+            tile[1, 2] = 100
+            return tile.get_shape(0) * 10000 + tile.get_shape(1) * 1000 + a[2, 4]
+        """
+        mod = self.compile(src)
+        assert mod.test_row() == 4 * 1000 + 100
+        assert mod.test_col() == 4 * 1000 + 100 + 22
+        assert mod.test_block() == 2 * 10000 + 3 * 1000 + 100
+
+    def test_slice_step(self):
+        src = """
+        from array import array
+
+        def test(step: i32) -> i32:
+            a = array[i32, 1](10)
+            i = 0
+            while i < 10:
+                a[i] = i
+                i = i + 1
+            b = a[::step]
+            res = 0
+            i = 0
+            while i < len(b):
+                res = res * 10 + b[i]
+                i = i + 1
+            return res
+
+        def test_negative_index() -> i32:
+            a = array[i32, 2](2, 3)
+            a[1, 2] = 42
+            return a[-1, -1]
+        """
+        mod = self.compile(src)
+        assert mod.test(3) == 369
+        assert mod.test(-3) == 9630
+        assert mod.test_negative_index() == 42
+
+    def test_copy(self):
+        src = """
+        from array import array
+
+        def test() -> i32:
+            a = array[i32, 2](3, 4)
+            a.fill(1)
+            col = a[:, 1]
+            c = col.copy()
+            c[0] = 100
+            res = 0
+            if not col.is_contiguous():
+                res = res + 1
+            if c.is_contiguous():
+                res = res + 10
+            return res * 1000 + a[0, 1] + c.sum()
+        """
+        mod = self.compile(src)
+        assert mod.test() == 11 * 1000 + 1 + 102
+
+    def test_strided_fill_copy(self):
+        src = """
+        from array import array
+
+        def test() -> f64:
+            a = array[f64, 2](4, 6)
+            a[:, 1] = 2.0
+            a[1:3, 3:5] = 1.5
+            b = array[f64, 2](2, 2)
+            b.fill(0.25)
+            a[0:4:2, 4:6] = b
+            return a.sum()
+
+        def test_ops_on_view() -> f64:
+            a = array[f64, 2](4, 6)
+            a.fill(1.0)
+            tile = a[1:3, 1:4]
+            t = tile * 2.0 + tile
+            return t.sum() + tile.max()
+        """
+        mod = self.compile(src)
+        # column: 4 * 2.0; block: 4 * 1.5; b: 3 * 0.25 (a[2, 4] was 1.5)
+        assert mod.test() == 8.0 + 6.0 - 1.5 + 4 * 0.25
+        assert mod.test_ops_on_view() == 6 * 3.0 + 1.0
+
+    def test_strided_ops(self):
+        src = """
+        from array import array
+
+        def make(n: i32, m: i32) -> array[i32, 2]:
+            a = array[i32, 2](n, m)
+            i = 0
+            while i < n:
+                j = 0
+                while j < m:
+                    a[i, j] = i * 10 + j
+                    j = j + 1
+                i = i + 1
+            return a
+
+        def test_reductions() -> i32:
+            col = make(4, 5)[:, 3]
+            return col.sum() * 10000 + col.min() * 100 + col.max()
+
+        def test_reductions_3d() -> i32:
+            a = array[i32, 3](2, 3, 4)
+            a.fill(1)
+            a[1, 2, 1] = 7
+            a[0, 2, 3] = -3
+            v = a[:, 1:3, 1:4:2]
+            return v.sum() * 10000 + (v.min() + 10) * 100 + v.max()
+
+        def test_negative_step() -> i32:
+            rev = make(3, 4)[::-1, ::-2]
+            b = rev - rev[0, 0]
+            return rev[0, 0] * 100 + b.min() * 10 - b.max()
+
+        def test_binop() -> i32:
+            a = make(3, 4)
+            t = a[1:3, 0:4:2]
+            c = t + a[0:2, 1:3]
+            d = t * 2
+            return c[1, 1] * 100 + d[1, 1]
+
+        def test_dot() -> i32:
+            a = make(4, 3)
+            return a[:, 1].dot(a[::-1, 2])
+
+        def test_empty() -> i32:
+            v = make(3, 4)[1:1, ::2]
+            w = v * 3 + v
+            return v.sum() + len(w)
+
+        def test_empty_min() -> i32:
+            return make(3, 4)[:, 2:2].min()
+        """
+        mod = self.compile(src)
+        # col is [3, 13, 23, 33]
+        assert mod.test_reductions() == 72 * 10000 + 3 * 100 + 33
+        # v has 2*2*2 items: six 1s, -3 and 7
+        assert mod.test_reductions_3d() == (6 - 3 + 7) * 10000 + 7 * 100 + 7
+        # rev is [[23, 21], [13, 11], [3, 1]]
+        assert mod.test_negative_step() == 23 * 100 + (-22) * 10 - 0
+        # t is [[10, 12], [20, 22]], a[0:2, 1:3] is [[1, 2], [11, 12]]
+        assert mod.test_binop() == (22 + 12) * 100 + 44
+        # [1, 11, 21, 31] . [32, 22, 12, 2]
+        assert mod.test_dot() == 32 + 242 + 252 + 62
+        assert mod.test_empty() == 0
+        with SPyError.raises("W_ValueError", match="zero-size array"):
+            mod.test_empty_min()
+
+    def test_overlapping_copy(self):
+        src = """
+        from array import array
+
+        def digits(a: array[i32, 1]) -> i32:
+            res = 0
+            i = 0
+            while i < len(a):
+                res = res * 10 + a[i]
+                i = i + 1
+            return res
+
+        def make() -> array[i32, 1]:
+            a = array[i32, 1](5)
+            i = 0
+            while i < 5:
+                a[i] = i
+                i = i + 1
+            return a
+
+        def test_forward() -> i32:
+            a = make()
+            a[1:5] = a[0:4]
+            return digits(a)
+
+        def test_backward() -> i32:
+            a = make()
+            a[0:4] = a[1:5]
+            return digits(a)
+
+        def test_copy_from() -> i32:
+            a = make()
+            a[2:5].copy_from(a[0:3])
+            return digits(a)
+
+        def test_strided() -> i32:
+            # row i is [i, i+1, i+2]; shift the columns right by one
+            a = array[i32, 2](2, 3)
+            i = 0
+            while i < 2:
+                j = 0
+                while j < 3:
+                    a[i, j] = i + j
+                    j = j + 1
+                i = i + 1
+            a[:, 1:3] = a[:, 0:2]
+            return digits(a[0]) * 1000 + digits(a[1])
+        """
+        mod = self.compile(src)
+        assert mod.test_forward() == 123  # [0, 0, 1, 2, 3]
+        assert mod.test_backward() == 12344
+        assert mod.test_copy_from() == 1012  # [0, 1, 0, 1, 2]
+        assert mod.test_strided() == 1 * 1000 + 112
+
+    def test_too_many_indices(self):
+        src = """
+        from array import array
+
+        def test() -> i32:
+            a = array[i32, 1](3)
+            return a[0, 1]
+        """
+        errors = expect_errors("too many indices for array")
+        self.compile_raises(src, "test", errors)
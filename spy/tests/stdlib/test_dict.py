@@ -72,10 +72,9 @@ class TestDict(CompilerTest):
         """
         mod = self.compile(src)
         assert mod.test(10) == 10
-        # MIN_LOG_SIZE = 6 => 64 entries
-        # MAX_FILL_RATIO = 2 / 3 => 43 entries to trigger resize
-        assert mod.test(43) == 43
-        # and 86 entries to trigger two resizes
+        # MIN_LOG_SIZE = 3 => 8 nodes, usable_fraction = 5 entries
+        assert mod.test(6) == 6
+        # several resizes
         assert mod.test(86) == 86
 
     def test_len_after_many_inserts(self):
@@ -107,6 +106,76 @@ class TestDict(CompilerTest):
         mod = self.compile(src)
         assert mod.test() == 0
 
+    def test_index_width(self):
+        # the index uses 1 byte per node up to 256 nodes, 2 bytes up to 65536
+        # nodes and 4 bytes after that
+        src = """
+        from _dict import dict
+
+        def test(n: i32) -> i32:
+            d = dict[i32, i32]()
+            i = 0
+            while i < n:
+                d[i * 7] = i
+                i += 1
+            i = 0
+            while i < n:
+                if d[i * 7] != i:
+                    return -1
+                i += 1
+            if d.__contains__(n * 7 + 1):
+                return -1
+            return len(d)
+        """
+        mod = self.compile(src)
+        assert mod.test(170) == 170
+        assert mod.test(171) == 171
+        if self.backend not in ("interp", "doppler"):
+            # too slow to run in the interpreter
+            assert mod.test(43691) == 43691
+
+    def test_delete_and_reinsert(self):
+        src = """
+        from _dict import dict
+
+        def test(n: i32) -> i32:
+            d = dict[i32, i32]()
+            # fill the index with dummies: the dict must resize instead of
+            # looping forever
+            i = 0
+            while i < n:
+                d[i] = i
+                d.__delitem__(i)
+                i += 1
+            d[1] = 10
+            d[2] = 20
+            d[3] = 30
+            d.__delitem__(1)
+            return len(d) * 100 + d[2] + d[3]
+        """
+        mod = self.compile(src)
+        assert mod.test(100) == 250
+
+    def test_delete_keeps_other_keys(self):
+        src = """
+        from _dict import dict
+
+        def test() -> dict[i32, i32]:
+            d = dict[i32, i32]()
+            i = 0
+            while i < 20:
+                d[i] = i * 10
+                i += 1
+            i = 0
+            while i < 20:
+                d.__delitem__(i)
+                i += 3
+            return d
+        """
+        mod = self.compile(src)
+        expected = {i: i * 10 for i in range(20) if i % 3 != 0}
+        assert mod.test() == expected
+
     def test_delete_twice_raises(self):
         src = """
         from _dict import dict
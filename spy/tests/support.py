@@ -7,7 +7,7 @@ import pytest
 
 from spy.backend.c.cbackend import CBackend
 from spy.backend.interp import InterpModuleWrapper
-from spy.build.config import BuildConfig, BuildTarget
+from spy.build.config import BuildConfig, BuildTarget, GCOption, OptLevel
 from spy.build.ninja import NinjaWriter
 from spy.doppler import ErrorMode
 from spy.errors import SPyError
@@ -108,7 +108,8 @@ class CompilerTest:
     backend: Backend
     vm: SPyVM
 
-    OPT_LEVEL: Optional[int] = None
+    OPT_LEVEL: Optional[OptLevel] = None
+    GC: GCOption = "none"
 
     @pytest.fixture(params=params_with_marks(ALL_BACKENDS))  # type: ignore
     def compiler_backend(self, request):
@@ -200,6 +201,7 @@ class CompilerTest:
                 kind="lib",
                 build_type="debug",
                 opt_level=self.OPT_LEVEL,
+                gc=self.GC,
             )
             WrapperClass = WasmModuleWrapper
         elif self.backend == "emscripten":
@@ -208,6 +210,7 @@ class CompilerTest:
                 kind="exe",
                 build_type="debug",
                 opt_level=self.OPT_LEVEL,
+                gc=self.GC,
             )
             WrapperClass = ExeWrapper
         elif self.backend == "py-cffi":
@@ -216,6 +219,7 @@ class CompilerTest:
                 kind="py-cffi",
                 build_type="debug",
                 opt_level=self.OPT_LEVEL,
+                gc=self.GC,
             )
             WrapperClass = load_cffi_module
         else:
@@ -5,8 +5,18 @@ This is just a small part of the tests: the majority of the functionality is
 tested by tests/compiler/*.py.
 """
 
+import textwrap
+
+import pytest
+
+from spy.analyze.importing import ImportAnalyzer
 from spy.backend.c.c_ast import BinOp, Literal, UnaryOp, make_table
+from spy.backend.c.cbackend import CBackend
 from spy.backend.c.context import C_Ident
+from spy.build.config import BuildConfig
+from spy.fqn import FQN
+from spy.vm.str import ll_spy_str_hash, ll_spy_Str_new_utf8
+from spy.vm.vm import SPyVM
 
 
 class TestExpr:
@@ -51,6 +61,21 @@ class TestExpr:
         # fmt: on
         assert str(expr) == "1 * (2 + 3 * 4)"
 
+    def test_BinOp_right_associativity(self):
+        # fmt: off
+        expr = BinOp("-",
+            left = BinOp("-",
+                left = Literal("1"),
+                right = Literal("2")
+            ),
+            right = BinOp("-",
+                left = Literal("3"),
+                right = Literal("4")
+            )
+        )
+        # fmt: on
+        assert str(expr) == "1 - 2 - (3 - 4)"
+
     def test_UnaryOp(self):
         # fmt: off
         expr = UnaryOp("-",
@@ -80,3 +105,171 @@ class TestExpr:
 def test_C_Ident():
     assert str(C_Ident("hello")) == "hello"
     assert str(C_Ident("default")) == "default$"
+
+
+@pytest.mark.usefixtures("init")
+class TestCWrite:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.builddir = tmpdir.join("build")
+        self.builddir.ensure(dir=True)
+
+    def cwrite(self, **sources: str) -> CBackend:
+        for modname, src in sources.items():
+            self.tmpdir.join(f"{modname}.spy").write(textwrap.dedent(src))
+        vm = SPyVM()
+        vm.path.append(str(self.tmpdir))
+        importer = ImportAnalyzer(vm, "main", use_spyc=False)
+        importer.parse_all()
+        importer.import_all()
+        vm.redshift(error_mode="eager")
+        config = BuildConfig(target="native", kind="exe", build_type="debug")
+        backend = CBackend(vm, "main", config, self.builddir, dump_c=False)
+        backend.cwrite()
+        return backend
+
+    def test_split_structdefs(self):
+        linked = """
+        from unsafe import gc_ptr
+
+        @struct
+        class Node:
+            val: i32
+            next: gc_ptr[Node]
+        """
+        main = """
+        import linked
+
+        @struct
+        class Point:
+            x: i32
+            y: i32
+
+        @struct
+        class Rect:
+            a: Point
+            b: Point
+
+        def main() -> None:
+            r = Rect(Point(1, 2), Point(3, 4))
+        """
+        backend = self.cwrite(main=main, linked=linked)
+        hfiles = backend.structdefs_hfiles
+        h_point = hfiles[FQN("main::Point")]
+        h_rect = hfiles[FQN("main::Rect")]
+        h_node = hfiles[FQN("linked::Node")]
+        assert len({h_point, h_rect, h_node}) == 3
+        # Node and gc_ptr[Node] depend on each other, so they are in the same
+        # header
+        assert hfiles[FQN("unsafe::gc_ptr[linked::Node]")] == h_node
+        src = self.builddir.join("src")
+        assert f'#include "{h_point}"' in src.join(h_rect).read()
+        main_h = src.join("main.h").read()
+        assert f'#include "{h_rect}"' in main_h
+        assert f'#include "{h_node}"' not in main_h
+        assert f'#include "{h_node}"' in src.join("linked.h").read()
+
+    def test_unchanged_files_are_not_rewritten(self):
+        aaa = """
+        @struct
+        class Point:
+            x: i32
+            y: i32
+
+        def make(x: i32) -> Point:
+            return Point(x, x)
+        """
+        main = """
+        import aaa
+
+        def main() -> None:
+            print(aaa.make(1).x)
+        """
+        self.cwrite(main=main, aaa=aaa)
+        src = self.builddir.join("src")
+        files = src.listdir()
+        for f in files:
+            f.setmtime(f.mtime() - 100)
+        mtimes = {f.basename: f.mtime() for f in files}
+        #
+        self.cwrite(main=main.replace("print(", "print(1 + "), aaa=aaa)
+        changed = {f.basename for f in files if f.mtime() != mtimes[f.basename]}
+        assert changed == {"main.c"}
+
+    def test_header_change_triggers_rebuild(self):
+        main = """
+        @struct
+        class Point:
+            x: i32
+            y: i32
+
+        def main() -> None:
+            print(Point(1, 2).x)
+        """
+        backend = self.cwrite(main=main)
+        assert len(backend.cfiles) == 1  # so we use gen_build_ninja_single
+        backend.write_build_script()
+        exe = backend.build()
+        mtime = exe.mtime()
+        # simulate a change which touches only the structdefs header
+        hname = backend.structdefs_hfiles[FQN("main::Point")]
+        h = self.builddir.join("src", hname)
+        h.write(h.read() + "\n// changed\n")
+        h.setmtime(mtime + 10)
+        exe = backend.build()
+        assert exe.mtime() != mtime
+
+    def test_strconsts(self):
+        aaa = """
+        def greet() -> str:
+            return "hello"
+        """
+        main = """
+        import aaa
+
+        def foo() -> str:
+            return "hello"
+
+        def bar() -> str:
+            return "hello" + " world"
+        """
+        backend = self.cwrite(main=main, aaa=aaa)
+        src = self.builddir.join("src")
+        strconsts = src.join("spy_strconsts.c")
+        assert strconsts in backend.cfiles
+        # "hello" is used three times in two modules, but defined only once
+        name = backend.strconsts.get(b"hello")
+        h = ll_spy_str_hash(b"hello")
+        defs = [line for line in strconsts.readlines() if "const spy_Str" in line]
+        assert len(defs) == 2
+        assert f'const spy_Str {name} = {{5, {h}, "hello"}};\n' in defs
+        # each module declares it only once
+        for modname in ("main", "aaa"):
+            cfile = src.join(f"{modname}.c").read()
+            assert cfile.count(f"extern const spy_Str {name};") == 1
+            assert "static spy_Str" not in cfile
+
+    def test_strconsts_single_module(self):
+        # with a single module, the pool goes into its .c, so that the build
+        # has a single C file
+        main = """
+        def foo() -> str:
+            return "hello"
+        """
+        backend = self.cwrite(main=main)
+        src = self.builddir.join("src")
+        assert backend.cfiles == [src.join("main.c")]
+        assert not src.join("spy_strconsts.c").check()
+        name = backend.strconsts.get(b"hello")
+        cfile = src.join("main.c").read()
+        assert f"extern const spy_Str {name};" in cfile
+        assert f"const spy_Str {name} = {{5, " in cfile
+
+    def test_strconsts_hash(self):
+        # the precomputed hash must match the one computed by libspy
+        vm = SPyVM()
+        for s in ["", "a", "hello", "àèìòù", "x" * 100]:
+            utf8 = s.encode("utf-8")
+            ptr = ll_spy_Str_new_utf8(vm.ll, utf8)
+            assert vm.ll.call("spy_str_hash", ptr) == ll_spy_str_hash(utf8)
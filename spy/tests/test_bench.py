@@ -0,0 +1,74 @@
+import asyncio
+import textwrap
+
+import pytest
+
+from spy import bench
+from spy.bench import Comparison
+
+
+@pytest.mark.usefixtures("init")
+class TestBench:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    def write(self, src: str):
+        f = self.tmpdir.join("prog.spy")
+        f.write(textwrap.dedent(src))
+        return f
+
+    def test_summarize(self):
+        stats = bench.summarize([3.0, 1.0, 2.0])
+        assert stats["min"] == 1.0
+        assert stats["max"] == 3.0
+        assert stats["median"] == 2.0
+        assert stats["mean"] == 2.0
+        assert stats["stdev"] == 1.0
+        assert bench.summarize([5.0])["stdev"] == 0.0
+
+    @pytest.mark.parametrize("mode", ["execute", "redshift"])
+    def test_run_benchmark(self, mode, capsys):
+        f = self.write("""
+        def main() -> None:
+            print(42)
+        """)
+        phases = asyncio.run(bench.run_benchmark(f, mode, repeat=2, warmup=1))
+        assert list(phases) == bench.PHASES[mode] + ["total"]
+        for stats in phases.values():
+            assert len(stats["samples"]) == 2
+        # the output of main() is discarded
+        out, err = capsys.readouterr()
+        assert "42" not in out
+
+    def test_compare_reports(self):
+        def report(parse: float, run: float) -> dict:
+            results = {
+                "fibo": {
+                    "execute": {
+                        "parse": bench.summarize([parse]),
+                        "run": bench.summarize([run]),
+                    }
+                }
+            }
+            return bench.make_report(results, repeat=1, warmup=0)
+
+        base = report(parse=0.100, run=0.0001)
+        cur = report(parse=0.150, run=0.0002)
+        comparisons = bench.compare_reports(base, cur)
+        assert comparisons == [
+            Comparison("fibo", "execute", "parse", 0.100, 0.150),
+            Comparison("fibo", "execute", "run", 0.0001, 0.0002),
+        ]
+        # run is 2x slower, but it's below min_delta
+        [reg] = bench.find_regressions(comparisons, threshold=0.1, min_delta=0.001)
+        assert reg.phase == "parse"
+        assert bench.find_regressions(comparisons, threshold=0.6, min_delta=0) == [
+            comparisons[1]
+        ]
+
+    def test_load_report(self):
+        f = self.tmpdir.join("bad.json")
+        f.write('{"version": 9999}')
+        with pytest.raises(ValueError, match="unsupported benchmark format"):
+            bench.load_report(str(f))
@@ -1,8 +1,10 @@
 import json
 import re
+import shutil
 import subprocess
 import sys
 import textwrap
+import time
 from subprocess import getstatusoutput
 from typing import Any
 
@@ -10,6 +12,7 @@ import pytest
 from typer.testing import CliRunner
 
 import spy
+from spy.build.config import PGOError, cc_is_clang, find_llvm_profdata
 from spy.cli import app
 
 PYODIDE_EXE = spy.ROOT.dirpath().join("pyodide", "venv", "bin", "python")
@@ -152,6 +155,11 @@ class TestMain:
         _, stdout = self.run("--timeit", self.main_spy)
         assert "main()" in stdout
 
+    def test_opcache_stats(self):
+        _, stdout = self.run("--opcache-stats", self.main_spy)
+        assert "OpCache:" in stdout
+        assert "monomorphic nodes:" in stdout
+
     def test_redshift_and_run(self):
         _, stdout = self.run("redshift", "-x", self.main_spy)
         assert stdout == "hello world\n"
@@ -235,6 +243,118 @@ class TestMain:
         csrc = main_c.read()
         assert csrc.startswith('#include "main.h"')
 
+    def test_opt_level(self):
+        build_ninja = self.tmpdir.join("build.ninja")
+        # fmt: off
+        self.run("build", "--no-compile", "--build-dir", self.tmpdir,
+                 "--target", "wasi", self.main_spy)
+        assert "-O0" in build_ninja.read()
+        assert "-flto" not in build_ninja.read()
+        self.run("build", "--no-compile", "--build-dir", self.tmpdir,
+                 "--target", "wasi", "--release", self.main_spy)
+        assert "-O3 -flto" in build_ninja.read()
+        self.run("build", "--no-compile", "--build-dir", self.tmpdir,
+                 "--target", "wasi", "--release", "-Os", "--no-lto",
+                 self.main_spy)
+        # fmt: on
+        s = build_ninja.read()
+        assert "-Os" in s
+        assert "-O3" not in s
+        assert "-flto" not in s
+
+    def test_pgo(self):
+        build_ninja = self.tmpdir.join("build.ninja")
+        pgo_dir = self.tmpdir.join("pgo")
+        # fmt: off
+        self.run("build", "--no-compile", "--build-dir", self.tmpdir,
+                 "--gc", "none", "--pgo-generate", self.main_spy)
+        assert f"-fprofile-generate={pgo_dir}" in build_ninja.read()
+        # fmt: on
+        # with clang, --pgo-use needs a merged profile: we never compile, so
+        # an empty one is enough
+        pgo_dir.join("default.profdata").ensure()
+        # fmt: off
+        self.run("build", "--no-compile", "--build-dir", self.tmpdir,
+                 "--gc", "none", "--pgo-use", self.main_spy)
+        # fmt: on
+        assert "-fprofile-use=" in build_ninja.read()
+
+    def test_pgo_build(self):
+        # generate -> run -> use, with the real toolchain
+        if shutil.which("cc") is None:
+            pytest.skip("no C compiler")
+        if cc_is_clang("cc"):
+            try:
+                find_llvm_profdata("cc")
+            except PGOError:
+                pytest.skip("llvm-profdata not found")
+        main_exe = self.tmpdir.join("main")
+        pgo_dir = self.tmpdir.join("pgo")
+        # fmt: off
+        self.run("build", "--build-dir", self.tmpdir, "--gc", "none",
+                 "--pgo-generate", self.main_spy)
+        # fmt: on
+        assert getstatusoutput(str(main_exe)) == (0, "hello world")
+        profile = pgo_dir.listdir(lambda f: f.ext in (".profraw", ".gcda"))
+        assert profile
+        # fmt: off
+        use_args = ["build", "--build-dir", self.tmpdir, "--gc", "none",
+                    "--pgo-use", self.main_spy]
+        # fmt: on
+        self.run(*use_args)
+        assert getstatusoutput(str(main_exe)) == (0, "hello world")
+
+        # a new profile must trigger a rebuild
+        mtime = main_exe.mtime()
+        time.sleep(0.01)
+        for f in profile:
+            f.setmtime()
+        self.run(*use_args)
+        assert main_exe.mtime() > mtime
+
+    def test_pgo_errors(self):
+        with pytest.raises(SystemExit):
+            self.run("build", "--pgo-use", "-b", self.tmpdir, self.main_spy)
+        with pytest.raises(SystemExit):
+            self.run("build", "--pgo-generate", "-t", "wasi", self.main_spy)
+
+    @pytest.mark.parametrize("target", ["native", "wasi"])
+    def test_gc_spygc(self, target):
+        # fmt: off
+        self.run("build", "--build-dir", self.tmpdir, "--target", target,
+                 "--gc", "spygc", self.main_spy)
+        # fmt: on
+        assert "-DSPY_GC_SPYGC" in self.tmpdir.join("build.ninja").read()
+        if target == "native":
+            cmd = str(self.tmpdir.join("main"))
+        else:
+            cmd = f"python -m spy.tool.wasmtime {self.tmpdir.join('main.wasm')}"
+        status, out = getstatusoutput(cmd)
+        assert status == 0
+        assert out == "hello world"
+
+    def test_gc_bdwgc_wasm(self):
+        with pytest.raises(SystemExit):
+            self.run("build", "--gc", "bdwgc", "-t", "wasi", self.main_spy)
+
+    def test_bench(self):
+        results = self.tmpdir.join("results.json")
+        # fmt: off
+        res, stdout = self.run("bench", "-m", "execute", "-n", "2", "-w", "0",
+                               "--json", results, self.main_spy)
+        assert stdout.startswith("main             execute   init=")
+        report = json.loads(results.read())
+        assert report["repeat"] == 2
+        samples = report["results"]["main"]["execute"]["run"]["samples"]
+        assert len(samples) == 2
+        # compare against itself: no regressions
+        res, stdout = self.run("bench", "-m", "execute", "-n", "1", "-w", "0",
+                               "--baseline", results, "--threshold", "1000",
+                               self.main_spy)
+        # fmt: on
+        assert "main             execute   parse" in stdout
+        assert "REGRESSION" not in stdout
+
     @pytest.mark.parametrize(
         "target",
         [
@@ -366,6 +366,25 @@ class TestDoppler:
             raise ValueError # /.../test.spy:4
         """)
 
+    def test_same_exception_different_lines(self):
+        # the two raise statements have the same exception, so the only
+        # difference between the two calls to RAISE is the loc: check that
+        # they are not mixed up by the BlueCache
+        self.redshift("""
+        def foo(x: i32) -> None:
+            if x < 0:
+                raise ValueError('bad')
+            if x > 100:
+                raise ValueError('bad')
+        """)
+        self.assert_dump("""
+        def foo(x: i32) -> None:
+            if x < 0:
+                raise ValueError('bad') # /.../test.spy:4
+            if x > 100:
+                raise ValueError('bad') # /.../test.spy:6
+        """)
+
     def test_ast_color_map_populated(self):
         self.vm.ast_color_map = {}
         src = """
@@ -259,6 +259,26 @@ class TestImportAnalyzer:
         assert f"version {SPYC_VERSION}" in error.error_message
         assert f"expected {SPYC_VERSION + 1}" in error.error_message
 
+    def test_cache_unknown_format(self):
+        src = "x: i32 = 42"
+        self.write("mod1.spy", src, mtime_delta=-1)
+        # e.g. a .spyc which was pickled by an old version of SPy
+        spyc_file = self.tmpdir.join("__pycache__", "mod1.spyc")
+        spyc_file.ensure()
+        spyc_file.write_binary(b"\x80\x05 this is not a valid .spyc")
+
+        analyzer = ImportAnalyzer(self.vm, "mod1")
+        analyzer.parse_all()
+        assert "mod1" not in analyzer.cached_mods
+        assert len(analyzer.cache_errors) == 1
+        assert "Version mismatch" in analyzer.cache_errors[0].error_message
+
+        # the cache is rewritten in the new format
+        analyzer.import_all()
+        assert importing.spycformat.read_version(spyc_file.read_binary()) == (
+            SPYC_VERSION
+        )
+
     def test_use_spyc_disabled(self):
         src = "x: i32 = 42"
         self.write("mod1.spy", src, mtime_delta=-1)
@@ -97,3 +97,32 @@ class TestLibSPy(CTest):
         loc = excinfo.value.w_exc.annotations[0].loc
         assert loc.filename == "myfile"
         assert loc.line_start == 42
+
+    def test_arena(self):
+        src = r"""
+        #include <spy.h>
+
+        int32_t test_arena(void) {
+            spy_Arena *a = spy_unsafe$Arena$__new__();
+            char *p1 = spy_arena_alloc(a, 3);
+            char *p2 = spy_arena_alloc(a, 5);
+            // allocations are 8-aligned and contiguous
+            if (p2 != p1 + 8)
+                return 1;
+            // a big allocation gets its own chunk
+            char *big = spy_arena_alloc(a, 1024 * 1024);
+            if (big == NULL)
+                return 2;
+            big[1024 * 1024 - 1] = 'x';
+            // after reset(), the chunks are reused
+            spy_unsafe$Arena$reset(a);
+            char *p3 = spy_arena_alloc(a, 1024 * 1024);
+            if (p3 != big)
+                return 3;
+            spy_unsafe$Arena$close(a);
+            return 0;
+        }
+        """
+        test_wasm = self.c_compile(src, exports=["test_arena"])
+        ll = LLSPyInstance.from_file(test_wasm)
+        assert ll.call("test_arena") == 0
@@ -160,6 +160,111 @@ class TestLLWasm(CTest):
 
         fn(self.selenium, test_wasm)
 
+    def test_memory_grow(self):
+        src = r"""
+        #include <stdint.h>
+        int32_t grow(void) {
+            // return the address of the first byte of the new page
+            int32_t old_pages = __builtin_wasm_memory_grow(0, 1);
+            int8_t *p = (int8_t *)(old_pages * 65536);
+            p[0] = 42;
+            return (int32_t)p;
+        }
+        """
+        test_wasm = self.c_compile(src, exports=["grow"])
+
+        @self.run_in_pyodide_maybe
+        def fn(selenium, test_wasm):
+            from spy.llwasm import LLWasmInstance
+
+            ll = LLWasmInstance.from_file(test_wasm)
+            size = ll.mem.size()
+            ll.mem.read_i32(0)  # make sure that the memory is accessed once
+            ptr = ll.call("grow")
+            assert ptr == size
+            assert ll.mem.size() == size + 65536
+            assert ll.mem.read_i8(ptr) == 42
+            ll.mem.write_i32(ptr + 4, 1234)
+            assert ll.mem.read_i32(ptr + 4) == 1234
+            assert bytes(ll.mem.read_view(ptr, 1)) == b"\x2a"
+
+        fn(self.selenium, test_wasm)
+
+    def test_mem_out_of_bounds(self):
+        src = r"""
+        int foo(void) { return 0; }
+        """
+        test_wasm = self.c_compile(src, exports=["foo"])
+
+        @self.run_in_pyodide_maybe
+        def fn(selenium, test_wasm):
+            import pytest
+
+            from spy.llwasm import LLWasmInstance
+
+            ll = LLWasmInstance.from_file(test_wasm)
+            size = ll.mem.size()
+            with pytest.raises(IndexError):
+                ll.mem.read_i32(size - 2)
+            with pytest.raises(IndexError):
+                ll.mem.read_i32(-4)
+            with pytest.raises(IndexError):
+                ll.mem.read(-8, 4)
+            with pytest.raises(IndexError):
+                ll.mem.write(-8, b"abcd")
+            with pytest.raises(IndexError):
+                ll.mem.write_i32(-4, 42)
+
+        fn(self.selenium, test_wasm)
+
+    def test_read_cstr_out_of_bounds(self):
+        src = r"""
+        int foo(void) { return 0; }
+        """
+        test_wasm = self.c_compile(src, exports=["foo"])
+
+        @self.run_in_pyodide_maybe
+        def fn(selenium, test_wasm):
+            import pytest
+
+            from spy.llwasm import LLWasmInstance
+
+            ll = LLWasmInstance.from_file(test_wasm)
+            size = ll.mem.size()
+            ll.mem.write(size - 8, b"hello\0xy")
+            assert ll.mem.read_cstr(size - 8) == b"hello"
+            assert ll.mem.read_cstr(size - 3) == b""
+            # no terminator before the end of the memory
+            with pytest.raises(IndexError):
+                ll.mem.read_cstr(size - 2)
+            with pytest.raises(IndexError):
+                ll.mem.read_cstr(size)
+
+        fn(self.selenium, test_wasm)
+
+    def test_get_func(self):
+        src = r"""
+        #include <stdint.h>
+        int32_t add(int32_t x, int32_t y) { return x + y; }
+        double half(double x) { return x / 2; }
+        void nothing(void) { }
+        """
+        test_wasm = self.c_compile(src, exports=["add", "half", "nothing"])
+
+        @self.run_in_pyodide_maybe
+        def fn(selenium, test_wasm):
+            from spy.llwasm import LLWasmInstance
+
+            ll = LLWasmInstance.from_file(test_wasm)
+            add = ll.get_func("add")
+            assert ll.get_func("add") is add
+            assert add(1, 2) == 3
+            assert add(-5, 2) == -3
+            assert ll.get_func("half")(3.0) == 1.5
+            assert ll.get_func("nothing")() is None
+
+        fn(self.selenium, test_wasm)
+
     def test_multiple_instances(self):
         src = r"""
         int x = 100;
@@ -186,6 +291,43 @@ class TestLLWasm(CTest):
 
         fn(self.selenium, test_wasm)
 
+    def test_module_cache(self):
+        if self.llwasm_backend == "pyodide":
+            pytest.skip("the module cache is wasmtime-only")
+        from spy.llwasm import LLWasmInstance, LLWasmModule
+
+        src = r"""
+        int add(int x, int y) {
+            return x+y;
+        }
+        """
+        test_wasm = self.c_compile(src, exports=["add"])
+        cache_dir = self.tmpdir.join("cache")
+
+        # the module is compiled lazily, when we instantiate it
+        llmod = LLWasmModule(str(test_wasm), cache_dir=cache_dir)
+        assert llmod._mod is None
+        assert not cache_dir.check()
+        assert LLWasmInstance(llmod).call("add", 4, 5) == 9
+        [cached] = cache_dir.listdir()
+        assert cached.basename.startswith("test-")
+        assert cached.ext == ".cwasm"
+
+        # the second time we load it from the cache
+        content = cached.read_binary()
+        llmod = LLWasmModule(str(test_wasm), cache_dir=cache_dir)
+        assert LLWasmInstance(llmod).call("add", 1, 2) == 3
+        assert cache_dir.listdir() == [cached]
+
+        # a broken cache entry is ignored and overwritten. Note that we
+        # cannot write it in place, because the file is mmap()ed by the
+        # modules above
+        cached.remove()
+        cached.write_binary(b"garbage")
+        llmod = LLWasmModule(str(test_wasm), cache_dir=cache_dir)
+        assert LLWasmInstance(llmod).call("add", 3, 4) == 7
+        assert cached.read_binary() == content
+
     def test_HostModule(self):
         src = r"""
         #include <stdint.h>
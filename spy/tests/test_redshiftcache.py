@@ -0,0 +1,128 @@
+import os
+import textwrap
+
+import pytest
+
+from spy import redshiftcache
+from spy.analyze.importing import ImportAnalyzer
+from spy.backend.spy import SPyBackend
+from spy.fqn import FQN
+from spy.redshiftcache import RedshiftCache
+from spy.vm.function import W_Func
+from spy.vm.vm import SPyVM
+
+SRC = """
+def add(x: i32, y: i32) -> i32:
+    return x + y
+
+def check(x: i32) -> i32:
+    if x < 0:
+        raise ValueError("negative")
+    return add(x, 1)
+"""
+
+
+@pytest.mark.usefixtures("init")
+class TestRedshiftCache:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.tmpdir.join("test.spy").write(textwrap.dedent(SRC))
+
+    def redshift(self) -> tuple[SPyVM, RedshiftCache]:
+        vm = SPyVM()
+        vm.path.append(str(self.tmpdir))
+        importer = ImportAnalyzer(vm, "test")
+        importer.parse_all()
+        importer.import_all()
+        cache = RedshiftCache.from_importer(importer)
+        vm.redshift(error_mode="eager", cache=cache)
+        cache.save(importer)
+        return vm, cache
+
+    def dump(self, vm: SPyVM) -> str:
+        b = SPyBackend(vm)
+        return b.dump_mod("test")
+
+    def call(self, vm: SPyVM, name: str, *args):
+        w_func = vm.lookup_global(FQN(f"test::{name}"))
+        assert isinstance(w_func, W_Func)
+        args_w = [vm.wrap(arg) for arg in args]
+        return vm.unwrap(vm.fast_call(w_func, args_w))
+
+    def test_hit(self):
+        vm1, cache1 = self.redshift()
+        assert cache1.hits == 0
+        assert self.tmpdir.join("__pycache__", "test.spyr").check()
+        #
+        vm2, cache2 = self.redshift()
+        assert cache2.hits == 2
+        assert cache2.misses == 0
+        assert self.dump(vm2) == self.dump(vm1)
+        assert self.call(vm2, "check", 41) == 42
+
+    def test_prebuilt_exception(self):
+        self.redshift()
+        vm, cache = self.redshift()
+        assert cache.hits == 2
+        # the prebuilt exception has been recreated from the cache
+        with pytest.raises(Exception, match="negative"):
+            self.call(vm, "check", -1)
+
+    def test_invalidate(self):
+        self.redshift()
+        self.tmpdir.join("test.spy").write(
+            textwrap.dedent(SRC) + "\ndef foo() -> i32:\n    return 42\n"
+        )
+        vm, cache = self.redshift()
+        assert cache.hits == 0
+        assert self.call(vm, "foo") == 42
+
+    def test_side_effects_are_not_cached(self):
+        self.tmpdir.join("test.spy").write(
+            textwrap.dedent(SRC)
+            + textwrap.dedent("""
+            var counter: i32 = 0
+
+            @blue
+            def next_id() -> i32:
+                counter = counter + 1
+                return counter
+
+            def foo() -> i32:
+                return next_id()
+
+            def get_counter() -> i32:
+                return counter
+            """)
+        )
+        self.redshift()
+        vm, cache = self.redshift()
+        # foo is not in the cache, so its blue code runs again
+        assert cache.hits == 3
+        assert cache.misses == 1
+        assert self.call(vm, "foo") == 1
+        assert self.call(vm, "get_counter") == 1
+
+
+def test_spy_fingerprint(tmpdir, monkeypatch):
+    def fingerprint() -> str:
+        monkeypatch.setattr(redshiftcache, "_SPY_FINGERPRINT", None)
+        return redshiftcache.spy_fingerprint()
+
+    monkeypatch.setattr(redshiftcache.spy, "ROOT", tmpdir)
+    src = tmpdir.join("mod.py")
+    src.write("x = 1\n")
+    tmpdir.join("tests", "test_mod.py").write("y = 2\n", ensure=True)
+    fp = fingerprint()
+    # e.g. a fresh checkout: the content is the same but the mtime is not
+    os.utime(src, ns=(0, 0))
+    assert fingerprint() == fp
+    # same size and same mtime, but different content
+    src.write("x = 2\n")
+    os.utime(src, ns=(0, 0))
+    assert fingerprint() != fp
+    # tests are ignored
+    tmpdir.join("tests", "test_mod.py").write("y = 3\n")
+    src.write("x = 1\n")
+    assert fingerprint() == fp
@@ -0,0 +1,134 @@
+import textwrap
+import threading
+
+import pytest
+
+from spy import redshiftcache, redshiftpool
+from spy.analyze.importing import ImportAnalyzer
+from spy.backend.spy import SPyBackend
+from spy.fqn import FQN
+from spy.vm.function import W_ASTFunc, W_Func
+from spy.vm.vm import SPyVM
+
+SRC = """
+def add(x: i32, y: i32) -> i32:
+    return x + y
+
+def check(x: i32) -> i32:
+    if x < 0:
+        raise ValueError("negative")
+    return add(x, 1)
+
+def check2(x: i32) -> i32:
+    if x > 100:
+        raise ValueError("negative")
+    return add(x, 2)
+
+def make_list(x: i32) -> i32:
+    l = list[i32]()
+    l.append(x)
+    return len(l)
+
+def make_list2(x: i32) -> i32:
+    l = list[i32]()
+    l.append(x)
+    l.append(x)
+    return len(l)
+
+def sub(x: i32, y: i32) -> i32:
+    return x - y
+"""
+
+# the redshift of each f{i} increments the counter
+SIDE_EFFECTS_SRC = """
+var counter: i32 = 0
+
+@blue
+def next_id(x: i32) -> i32:
+    counter = counter + 1
+    return counter
+""" + "".join(
+    f"""
+def f{i}() -> i32:
+    return next_id({i})
+"""
+    for i in range(16)
+)
+
+
+@pytest.mark.skipif(not redshiftpool.can_fork(), reason="os.fork() not available")
+@pytest.mark.usefixtures("init")
+class TestRedshiftPool:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.tmpdir.join("test.spy").write(textwrap.dedent(SRC))
+        self.tmpdir.join("effects.spy").write(SIDE_EFFECTS_SRC)
+
+    def import_(self, modname: str = "test") -> SPyVM:
+        vm = SPyVM()
+        vm.path.append(str(self.tmpdir))
+        importer = ImportAnalyzer(vm, modname, use_spyc=False)
+        importer.parse_all()
+        importer.import_all()
+        return vm
+
+    def redshift(self, jobs: int, modname: str = "test") -> SPyVM:
+        vm = self.import_(modname)
+        vm.redshift(error_mode="eager", jobs=jobs)
+        return vm
+
+    def dump(self, vm: SPyVM) -> str:
+        b = SPyBackend(vm)
+        return b.dump_mod("test")
+
+    def call(self, vm: SPyVM, name: str, *args, modname: str = "test"):
+        w_func = vm.lookup_global(FQN(f"{modname}::{name}"))
+        assert isinstance(w_func, W_Func)
+        args_w = [vm.wrap(arg) for arg in args]
+        return vm.unwrap(vm.fast_call(w_func, args_w))
+
+    def test_same_as_serial(self):
+        vm1 = self.redshift(jobs=1)
+        vm2 = self.redshift(jobs=2)
+        assert self.dump(vm2) == self.dump(vm1)
+        assert list(vm2.globals_w) == list(vm1.globals_w)
+        assert self.call(vm2, "check", 41) == 42
+        assert self.call(vm2, "make_list2", 41) == 2
+        assert self.call(vm2, "sub", 5, 3) == 2
+
+    def test_no_fork_with_threads(self):
+        # forking a multi-threaded process is unsafe: redshift serially
+        stop = threading.Event()
+        t = threading.Thread(target=stop.wait)
+        t.start()
+        try:
+            assert not redshiftpool.can_fork()
+            vm = self.redshift(jobs=2)
+        finally:
+            stop.set()
+            t.join()
+        assert redshiftpool.can_fork()
+        assert self.call(vm, "check", 41) == 42
+
+    def test_blue_side_effects(self):
+        vm = self.redshift(jobs=4, modname="effects")
+        res = [self.call(vm, f"f{i}", modname="effects") for i in range(16)]
+        assert res == list(range(1, 17))
+
+    def test_blob_cache_miss(self):
+        # the blob of make_list references list[i32], which does not exist in
+        # a fresh VM: _redshift_one must redshift the function again
+        vm1 = self.redshift(jobs=1)
+        w_make_list = vm1.lookup_global(FQN("test::make_list"))
+        assert isinstance(w_make_list, W_ASTFunc)
+        blob = redshiftcache.dump_redshifted(vm1, w_make_list)
+        assert blob is not None
+        vm2 = self.import_()
+        fqn = FQN("test::make_list")
+        w_func = vm2.lookup_global(fqn)
+        assert isinstance(w_func, W_ASTFunc)
+        with pytest.raises(redshiftcache.CacheMiss):
+            redshiftcache.load_redshifted(vm2, w_func, blob)
+        vm2._redshift_one(fqn, w_func, "eager", None, blob)
+        assert self.call(vm2, "make_list", 41) == 1
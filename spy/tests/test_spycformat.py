@@ -0,0 +1,114 @@
+import pickle
+import textwrap
+
+import pytest
+
+from spy import ast
+from spy.analyze import spycformat
+from spy.analyze.scope import ScopeAnalyzer
+from spy.parser import Parser
+
+
+@pytest.mark.usefixtures("init")
+class TestSPyCFormat:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+
+    def parse(self, src: str) -> ast.Module:
+        f = self.tmpdir.join("test.spy")
+        f.write(textwrap.dedent(src))
+        mod = Parser.from_filename(str(f)).parse()
+        scopes = ScopeAnalyzer("test", mod)
+        scopes.analyze()
+        mod.symtable = scopes.by_module()
+        return mod
+
+    def roundtrip(self, mod: ast.Module) -> ast.Module:
+        data = spycformat.dump(mod, 42)
+        assert spycformat.read_version(data) == 42
+        return spycformat.load(data)
+
+    def dump(self, node: ast.Node) -> str:
+        import spy.ast_dump
+
+        return spy.ast_dump.dump(node, use_colors=False)
+
+    def test_roundtrip(self):
+        mod = self.parse("""
+        "module docstring"
+        from builtins import i32 as I32
+        import _list
+
+        var counter: i32 = -42
+        PI = 3.14
+
+        @blue
+        def make_adder(n):
+            def add(x: i32) -> i32:
+                return x + n
+            return add
+
+        class Point:
+            x: i32
+            y: i32
+
+        def foo(a: i32, *args: i32) -> str:
+            "foo docstring"
+            if a > 0 and not True:
+                return "ünïcødé"
+            for i in range(a):
+                pass
+            return "done"
+        """)
+        mod2 = self.roundtrip(mod)
+        assert self.dump(mod2) == self.dump(mod)
+        assert mod2.filename == mod.filename
+        assert mod2.docstring == "module docstring"
+        # check some locs and the symtables
+        foo = mod.get_funcdef("foo")
+        foo2 = mod2.get_funcdef("foo")
+        assert foo2.loc == foo.loc
+        assert foo2.body[1].loc == foo.body[1].loc
+        assert foo2.symtable._symbols == foo.symtable._symbols
+        assert mod2.symtable.implicit_imports == mod.symtable.implicit_imports
+        assert "_range" in mod2.symtable.implicit_imports
+        assert mod2.symtable._symbols == mod.symtable._symbols
+
+    def test_lazy_body(self):
+        mod = self.parse("""
+        def foo() -> i32:
+            return 1
+
+        def bar() -> i32:
+            return 2
+        """)
+        mod2 = self.roundtrip(mod)
+        foo = mod2.get_funcdef("foo")
+        bar = mod2.get_funcdef("bar")
+        assert isinstance(foo.__dict__["body"], spycformat.LazyBody)
+        assert isinstance(bar.__dict__["body"], spycformat.LazyBody)
+        [ret] = foo.body
+        assert isinstance(ret, ast.Return)
+        assert ret.loc.get_src() == "return 1"
+        assert foo.body is foo.body
+        assert foo.__dict__["body"] is foo.body
+        assert isinstance(bar.__dict__["body"], spycformat.LazyBody)
+        # the body can be replaced as a normal field
+        bar2 = bar.replace(body=[])
+        assert bar2.body == []
+        assert isinstance(bar.__dict__["body"], spycformat.LazyBody)
+
+    def test_pickle_lazy_body(self):
+        mod = self.parse("""
+        def foo() -> i32:
+            return 1
+        """)
+        foo = self.roundtrip(mod).get_funcdef("foo")
+        foo2 = pickle.loads(pickle.dumps(foo))
+        assert isinstance(foo2.__dict__["body"], list)
+        assert self.dump(foo2) == self.dump(foo)
+
+    def test_read_version(self):
+        assert spycformat.read_version(b"") is None
+        assert spycformat.read_version(b"\x80\x05 this is a pickle") is None
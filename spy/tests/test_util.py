@@ -12,6 +12,7 @@ from spy.util import (
     func_equals,
     magic_dispatch,
     shortrepr,
+    write_if_changed,
 )
 
 
@@ -171,6 +172,19 @@ class Test_func_equals:
         assert func_equals(f0, f0b)
 
 
+def test_write_if_changed(tmpdir):
+    f = tmpdir.join("hello.txt")
+    assert write_if_changed(f, "hello")
+    assert f.read() == "hello"
+    f.setmtime(f.mtime() - 10)
+    mtime = f.mtime()
+    assert not write_if_changed(f, "hello")
+    assert f.mtime() == mtime
+    assert write_if_changed(f, "world")
+    assert f.read() == "world"
+    assert f.mtime() != mtime
+
+
 # ======= tests for cleanup_spyc_files =======
 
 
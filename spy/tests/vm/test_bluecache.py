@@ -0,0 +1,116 @@
+import gc
+import weakref
+
+from spy.location import Loc
+from spy.vm.b import B
+from spy.vm.bluecache import UNCACHEABLE, InternedKey
+from spy.vm.modules.__spy__.interp_tuple import W_InterpTuple
+from spy.vm.opspec import W_MetaArg
+from spy.vm.str import W_Str
+from spy.vm.vm import SPyVM
+
+
+def test_get_key_identity():
+    vm = SPyVM()
+    # objects using the default spy_key() are their own key
+    assert vm.bluecache.get_key(B.w_i32) is B.w_i32
+
+
+def test_get_key_interned():
+    vm = SPyVM()
+    bc = vm.bluecache
+    k1 = bc.get_key(vm.wrap(42))
+    k2 = bc.get_key(vm.wrap(42))
+    assert isinstance(k1, InternedKey)
+    assert k1 is k2
+    assert bc.get_key(vm.wrap(43)) is not k1
+    #
+    w_a = vm.wrap("hello")
+    w_b = vm.wrap("hello")
+    assert w_a is not w_b
+    assert bc.get_key(w_a) is bc.get_key(w_b)
+
+
+def test_get_key_cached(monkeypatch):
+    vm = SPyVM()
+    bc = vm.bluecache
+    w_s = vm.wrap("hello")
+    k = bc.get_key(w_s)
+    # the key of W_Str is computed only once
+    monkeypatch.setattr(W_Str, "spy_key", None)
+    assert bc.get_key(w_s) is k
+    # but not shared with other VMs
+    monkeypatch.undo()
+    vm2 = SPyVM()
+    k2 = vm2.bluecache.get_key(w_s)
+    assert k2 is not k
+    assert k2.key == "hello"
+
+
+def test_interned_keys_are_freed():
+    vm = SPyVM()
+    bc = vm.bluecache
+    k = bc.get_key(vm.wrap(42))
+    w_func = B.w_abs
+    bc.record(w_func, [vm.wrap(-3)], vm.wrap(3))
+    n = len(bc.interned)
+    del k
+    gc.collect()
+    # the key of 42 was not used by any entry
+    assert len(bc.interned) == n - 1
+    bc.invalidate(w_func)
+    gc.collect()
+    assert len(bc.interned) == n - 2
+
+
+def test_cached_key_does_not_keep_the_vm_alive():
+    # w_t doesn't reference the VM, so it could be shared by many VMs
+    w_t = W_InterpTuple([B.w_i32, B.w_f64])
+    vm = SPyVM()
+    vm.bluecache.get_key(w_t)
+    ref = weakref.ref(vm.bluecache)
+    del vm
+    gc.collect()
+    assert ref() is None
+
+
+def test_get_key_nested():
+    vm = SPyVM()
+    bc = vm.bluecache
+    wam1 = W_MetaArg.from_w_obj(vm, vm.wrap("x"))
+    wam2 = W_MetaArg.from_w_obj(vm, vm.wrap("x"))
+    assert bc.get_key(wam1) is bc.get_key(wam2)
+    #
+    w_t1 = W_InterpTuple([vm.wrap(1), vm.wrap("a")])
+    w_t2 = W_InterpTuple([vm.wrap(1), vm.wrap("a")])
+    assert bc.get_key(w_t1) is bc.get_key(w_t2)
+
+
+def test_record_lookup_invalidate():
+    vm = SPyVM()
+    bc = vm.bluecache
+    w_func = B.w_abs
+    w_res = vm.wrap(3)
+    bc.record(w_func, [vm.wrap(-3)], w_res)
+    assert bc.lookup(w_func, [vm.wrap(-3)]) is w_res
+    assert bc.lookup(w_func, [vm.wrap(-4)]) is None
+    assert len(bc.data[w_func]) == 1
+    bc.invalidate(w_func)
+    assert w_func not in bc.data
+    assert bc.lookup(w_func, [vm.wrap(-3)]) is None
+
+
+def test_red_metaargs_are_not_cached():
+    vm = SPyVM()
+    bc = vm.bluecache
+    wam_red = W_MetaArg(vm, "red", B.w_i32, None, Loc.fake())
+    w_t = W_InterpTuple([vm.wrap(1), wam_red])
+    assert bc.get_key(w_t) is UNCACHEABLE
+    # it propagates through blue MetaArgs and nested tuples
+    assert bc.get_key(W_MetaArg.from_w_obj(vm, w_t)) is UNCACHEABLE
+    assert bc.get_key(W_InterpTuple([w_t])) is UNCACHEABLE
+    #
+    w_func = B.w_abs
+    bc.record(w_func, [w_t], vm.wrap(3))
+    assert w_func not in bc.data
+    assert bc.lookup(w_func, [w_t]) is None
@@ -0,0 +1,145 @@
+import textwrap
+
+import pytest
+
+from spy.errors import SPyError
+from spy.fqn import FQN
+from spy.vm.closurecompiler import CompiledFunc, InterpretedFunc
+from spy.vm.function import W_ASTFunc
+from spy.vm.vm import SPyVM
+
+
+@pytest.mark.usefixtures("init")
+class TestClosureCompiler:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.vm = SPyVM()
+        self.vm.path.append(str(self.tmpdir))
+
+    def redshift(self, src: str) -> None:
+        f = self.tmpdir.join("test.spy")
+        f.write(textwrap.dedent(src))
+        self.vm.import_("test")
+        self.vm.redshift(error_mode="eager")
+
+    def get_func(self, name: str) -> W_ASTFunc:
+        w_func = self.vm.lookup_global(FQN(f"test::{name}"))
+        assert isinstance(w_func, W_ASTFunc)
+        assert w_func.redshifted
+        return w_func
+
+    def call(self, name: str, *args):
+        w_func = self.get_func(name)
+        args_w = [self.vm.wrap(arg) for arg in args]
+        w_res = self.vm.fast_call(w_func, args_w)
+        return self.vm.unwrap(w_res)
+
+    def test_simple(self):
+        self.redshift("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        assert self.call("add", 4, 5) == 9
+        w_add = self.get_func("add")
+        assert isinstance(w_add.compiled, CompiledFunc)
+        assert w_add.compiled.slotnames == ["x", "y"]
+
+    def test_loops(self):
+        self.redshift("""
+        def foo(n: i32) -> i32:
+            tot = 0
+            i = 0
+            while True:
+                i = i + 1
+                if i > n:
+                    break
+                if i % 2 == 0:
+                    continue
+                tot = tot + i
+            return tot
+        """)
+        assert self.call("foo", 10) == 1 + 3 + 5 + 7 + 9
+        assert isinstance(self.get_func("foo").compiled, CompiledFunc)
+
+    def test_recursion_and_globals(self):
+        self.redshift("""
+        var counter: i32 = 0
+
+        def fibo(n: i32) -> i32:
+            counter = counter + 1
+            if n <= 1:
+                return n
+            return fibo(n-1) + fibo(n-2)
+
+        def get_counter() -> i32:
+            return counter
+        """)
+        assert self.call("fibo", 10) == 55
+        assert self.call("get_counter") == 177
+
+    def test_and_or_walrus(self):
+        self.redshift("""
+        def foo(a: bool, b: bool) -> bool:
+            return a and b
+
+        def bar(a: bool, b: bool) -> bool:
+            return a or b
+
+        def baz(x: i32) -> i32:
+            if (y := x * 2) > 10:
+                return y
+            return 0
+        """)
+        assert self.call("foo", True, False) is False
+        assert self.call("bar", False, True) is True
+        assert self.call("baz", 6) == 12
+        assert self.call("baz", 1) == 0
+
+    def test_no_return(self):
+        self.redshift("""
+        def foo(x: i32) -> i32:
+            if x:
+                return 1
+        """)
+        assert self.call("foo", 1) == 1
+        with SPyError.raises("W_TypeError", match="without a `return`"):
+            self.call("foo", 0)
+
+    def test_traceback(self):
+        self.redshift("""
+        def foo(x: i32) -> i32:
+            return bar(x)
+
+        def bar(x: i32) -> i32:
+            assert x > 0, "x must be positive"
+            return x
+        """)
+        with SPyError.raises("W_AssertionError") as excinfo:
+            self.call("foo", -1)
+        w_tb = excinfo.value.add_traceback()
+        assert [e.kind for e in w_tb.entries] == ["astframe", "astframe"]
+        assert [str(e.fqn) for e in w_tb.entries] == ["test::foo", "test::bar"]
+        assert w_tb.entries[0].loc.get_src() == "bar(x)"
+        assert w_tb.entries[1].loc.get_src().startswith("assert x > 0")
+
+    def test_disabled(self):
+        self.vm.use_closure_compiler = False
+        self.redshift("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        assert self.call("add", 4, 5) == 9
+        assert self.get_func("add").compiled is None
+
+    def test_fallback(self):
+        self.redshift("""
+        def make_tuple() -> tuple[i32, i32]:
+            return 1, 2
+
+        def foo() -> i32:
+            a, b = make_tuple()
+            return a + b
+        """)
+        assert self.call("foo") == 3
+        assert isinstance(self.get_func("foo").compiled, InterpretedFunc)
@@ -0,0 +1,103 @@
+import textwrap
+
+import pytest
+
+from spy.backend.interp import InterpModuleWrapper
+from spy.fqn import FQN
+from spy.vm.function import W_ASTFunc
+from spy.vm.opcache import MAX_ENTRIES
+from spy.vm.vm import SPyVM
+
+
+@pytest.mark.usefixtures("init")
+class TestOpCache:
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.vm = SPyVM()
+        self.vm.path.append(str(self.tmpdir))
+
+    def import_src(self, src: str) -> InterpModuleWrapper:
+        f = self.tmpdir.join("test.spy")
+        f.write(textwrap.dedent(src))
+        w_mod = self.vm.import_("test")
+        return InterpModuleWrapper(self.vm, w_mod)
+
+    def test_monomorphic(self):
+        mod = self.import_src("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        opcache = self.vm.opcache
+        assert mod.add(1, 2) == 3
+        misses = opcache.misses
+        assert mod.add(3, 4) == 7
+        assert mod.add(5, 6) == 11
+        assert opcache.misses == misses
+        assert opcache.hits >= 2
+
+    def test_dynamic(self):
+        # the static types are always the same, so the opimpl is cached, but
+        # the dispatch must still happen on the dynamic types
+        mod = self.import_src("""
+        def add(x: dynamic, y: dynamic) -> dynamic:
+            return x + y
+
+        def add_ints() -> i32:
+            return add(1, 2)
+
+        def add_strs() -> str:
+            return add("hello ", "world")
+        """)
+        assert mod.add_ints() == 3
+        assert mod.add_strs() == "hello world"
+
+    def test_polymorphic_and_megamorphic(self):
+        mod = self.import_src("""
+        @blue
+        def add(x, y):
+            return x + y
+
+        def foo() -> i32:
+            return add(1, 2) + add(3, 4)
+
+        def bar() -> i32:
+            return add(5, 6) + add(7, 8) + add(9, 10)
+        """)
+        assert mod.foo() == 10
+        # the body of add() has been executed with two different pairs of
+        # blue values
+        [cache] = [
+            cache
+            for node, cache in self.vm.opcache.iter_caches()
+            if node.loc.get_src() == "x + y"
+        ]
+        assert len(cache.entries) == 2
+        assert not cache.megamorphic
+        assert mod.bar() == 45
+        assert MAX_ENTRIES < 5
+        assert cache.megamorphic
+        assert cache.entries == []
+
+    def test_disabled(self):
+        self.vm.use_opcache = False
+        mod = self.import_src("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        assert mod.add(1, 2) == 3
+        assert self.vm.opcache.hits == 0
+        assert self.vm.opcache.misses == 0
+
+    def test_forget_redshifted(self):
+        mod = self.import_src("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        assert mod.add(1, 2) == 3
+        w_add = self.vm.lookup_global(FQN("test::add"))
+        assert isinstance(w_add, W_ASTFunc)
+        assert w_add.funcdef in self.vm.opcache.caches
+        self.vm.redshift(error_mode="eager")
+        assert w_add.funcdef not in self.vm.opcache.caches
+        assert mod.add(3, 4) == 7
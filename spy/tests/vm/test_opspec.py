@@ -1,5 +1,7 @@
+from spy.fqn import FQN
 from spy.location import Loc
 from spy.vm.b import B
+from spy.vm.modules.unsafe.ptr import W_PtrType
 from spy.vm.object import W_Object
 from spy.vm.opspec import W_MetaArg
 from spy.vm.vm import SPyVM
@@ -37,3 +39,22 @@ def test_oparg_key():
     wam_a = W_MetaArg.from_w_obj(vm, w_a)
     wam_b = W_MetaArg.from_w_obj(vm, w_b)
     assert wam_a.spy_key(vm) == wam_b.spy_key(vm)
+
+
+def test_oparg_key_loc():
+    vm = SPyVM()
+    loc1 = Loc("test.spy", 1, 1, 0, 5)
+    loc2 = Loc("test.spy", 2, 2, 0, 5)
+    # for most types, the loc is not part of the key
+    wam_i1 = W_MetaArg(vm, "red", B.w_i32, None, loc1)
+    wam_i2 = W_MetaArg(vm, "red", B.w_i32, None, loc2)
+    assert wam_i1.spy_key(vm) == wam_i2.spy_key(vm)
+    # ptrs and refs hardcode the loc in the opimpl of __getitem__ and
+    # __setitem__, so MetaArgs with different locs must have different keys
+    w_ptrT = W_PtrType.from_itemtype(FQN("unsafe::raw_ptr[i32]"), "raw", B.w_i32)
+    assert w_ptrT.__spy_metaarg_key_has_loc__
+    wam_p1 = W_MetaArg(vm, "red", w_ptrT, None, loc1)
+    wam_p2 = W_MetaArg(vm, "red", w_ptrT, None, loc2)
+    wam_p3 = W_MetaArg(vm, "red", w_ptrT, None, loc1)
+    assert wam_p1.spy_key(vm) != wam_p2.spy_key(vm)
+    assert wam_p1.spy_key(vm) == wam_p3.spy_key(vm)
@@ -0,0 +1,122 @@
+import textwrap
+
+import pytest
+
+from spy.fqn import FQN
+from spy.vm.b import B
+from spy.vm.cell import W_Cell
+from spy.vm.function import W_ASTFunc, W_Func
+from spy.vm.vm import SPyVM
+
+SRC = """
+var counter: i32 = 0
+GREETING = "hello"
+
+def inc() -> i32:
+    counter = counter + 1
+    return counter
+
+def greet(name: str) -> str:
+    return GREETING + " " + name
+
+def make_list(n: i32) -> i32:
+    l = list[i32]()
+    i = 0
+    while i < n:
+        l.append(i)
+        i = i + 1
+    return len(l)
+"""
+
+
+@pytest.mark.usefixtures("init")
+class TestSnapshot:
+    @pytest.fixture
+    def init(self, tmpdir):
+        tmpdir.join("mod.spy").write(textwrap.dedent(SRC))
+        tmpdir.join("other.spy").write("def foo() -> i32:\n    return 42\n")
+        self.vm = SPyVM()
+        self.vm.path.append(str(tmpdir))
+        self.vm.import_("mod")
+
+    def call(self, vm: SPyVM, name: str, *args):
+        w_func = vm.lookup_global(FQN(f"mod::{name}"))
+        assert isinstance(w_func, W_Func)
+        args_w = [vm.wrap(arg) for arg in args]
+        return vm.unwrap(vm.fast_call(w_func, args_w))
+
+    def test_from_snapshot(self):
+        snap = self.vm.snapshot()
+        vm2 = SPyVM.from_snapshot(snap)
+        assert vm2.ll is not self.vm.ll
+        assert list(vm2.globals_w) == list(self.vm.globals_w)
+        assert list(vm2.modules_w) == list(self.vm.modules_w)
+        assert vm2.lookup_global(FQN("builtins::i32")) is B.w_i32
+        assert self.call(vm2, "inc") == 1
+        assert self.call(vm2, "greet", "world") == "hello world"
+        assert self.call(vm2, "make_list", 10) == 10
+
+    def test_clones_are_independent(self):
+        assert self.call(self.vm, "inc") == 1
+        snap = self.vm.snapshot()
+        vm1 = SPyVM.from_snapshot(snap)
+        vm2 = SPyVM.from_snapshot(snap)
+        assert self.call(vm1, "inc") == 2
+        assert self.call(vm1, "inc") == 3
+        assert self.call(vm2, "inc") == 2
+        assert self.call(self.vm, "inc") == 2
+        # new modules are not visible to the other VMs
+        vm1.import_("other")
+        assert "other" in vm1.modules_w
+        assert "other" not in vm2.modules_w
+        assert "other" not in SPyVM.from_snapshot(snap).modules_w
+
+    def test_redshift_clone(self):
+        snap = self.vm.snapshot()
+        vm1 = SPyVM.from_snapshot(snap)
+        vm1.redshift(error_mode="eager")
+        w_inc = vm1.lookup_global(FQN("mod::inc"))
+        assert isinstance(w_inc, W_ASTFunc)
+        assert w_inc.redshifted
+        assert self.call(vm1, "make_list", 5) == 5
+        assert self.call(vm1, "greet", "world") == "hello world"
+        # the redshift did not affect the other VMs
+        for vm in [self.vm, SPyVM.from_snapshot(snap)]:
+            w_inc = vm.lookup_global(FQN("mod::inc"))
+            assert isinstance(w_inc, W_ASTFunc)
+            assert w_inc.is_valid
+            assert not w_inc.redshifted
+            assert self.call(vm, "make_list", 5) == 5
+
+    def test_snapshot_after_redshift(self):
+        self.vm.redshift(error_mode="eager")
+        assert self.call(self.vm, "make_list", 3) == 3
+        snap = self.vm.snapshot()
+        vm2 = SPyVM.from_snapshot(snap)
+        assert self.call(vm2, "make_list", 3) == 3
+        assert self.call(vm2, "greet", "world") == "hello world"
+
+    def test_snapshot_does_not_detach_vm(self):
+        w_mod = self.vm.modules_w["mod"]
+        w_cell = w_mod.getattr("counter")
+        assert isinstance(w_cell, W_Cell)
+        snap = self.vm.snapshot()
+        assert self.vm.modules_w["mod"] is w_mod
+        assert self.vm.lookup_global(FQN("mod::counter")) is w_cell
+        assert self.call(self.vm, "inc") == 1
+        assert self.vm.unwrap(w_cell.get()) == 1
+        # the snapshot is not affected by the changes to the VM
+        assert self.call(SPyVM.from_snapshot(snap), "inc") == 1
+
+    def test_strings(self):
+        w_s = self.vm.wrap("not materialized")
+        w_unreachable = self.vm.wrap("unreachable")
+        self.vm.modules_w["mod"].setattr("extra", w_s)
+        assert not w_s.is_materialized()
+        snap = self.vm.snapshot()
+        assert w_s.is_materialized()
+        # only the strings reachable from the VM are materialized
+        assert not w_unreachable.is_materialized()
+        vm2 = SPyVM.from_snapshot(snap)
+        # the spy_Str lives at the same address in the memory of vm2
+        assert vm2.ll.mem.read(w_s.ptr + 8, 16) == b"not materialized"
@@ -3,7 +3,7 @@ import pytest
 
 from spy.fqn import FQN
 from spy.tests.support import expect_errors
-from spy.vm.b import B
+from spy.vm.b import OP, B
 from spy.vm.builtin import builtin_type
 from spy.vm.exc import W_Exception
 from spy.vm.object import W_Object, W_Type
@@ -199,6 +199,68 @@ class TestVM:
         assert vm.unwrap(w_hello) == "hello"
         assert repr(w_hello) == "W_Str('hello')"
 
+    def test_W_Str_lazy(self):
+        vm = SPyVM()
+        w_a = vm.wrap("hello ")
+        w_b = vm.wrap("world")
+        w_ab = vm.fast_call(OP.w_str_add, [w_a, w_b])
+        assert isinstance(w_ab, W_Str)
+        assert vm.unwrap(w_ab) == "hello world"
+        w_eq = vm.fast_call(OP.w_str_eq, [w_ab, vm.wrap("hello world")])
+        assert w_eq is B.w_True
+        assert not w_a.is_materialized()
+        assert not w_ab.is_materialized()
+        assert vm.ll.memory_usage().live_allocs == 0
+        # .ptr materializes the string
+        ptr = w_a.ptr
+        assert w_a.is_materialized()
+        assert vm.ll.memory_usage().live_allocs == 1
+        assert vm.ll.mem.read_i32(ptr) == 6
+        assert vm.ll.mem.read(ptr + 8, 6) == b"hello "
+        # strings which come from linear memory are read lazily
+        w_c = W_Str.from_ptr(vm, ptr)
+        assert vm.unwrap(w_c) == "hello "
+        assert w_c.get_hash() == vm.ll.call("spy_str_hash", ptr)
+        assert w_b.get_hash() == vm.ll.call("spy_str_hash", w_b.ptr)
+
+    def test_W_Str_memory_is_freed(self):
+        vm = SPyVM()
+        w_a = vm.wrap("a" * 100)
+        w_a.ptr
+        usage = vm.ll.memory_usage()
+        assert usage.live_allocs == 1
+        assert usage.live_bytes == 108
+        del w_a
+        usage = vm.ll.memory_usage()
+        assert usage.live_allocs == 0
+        assert usage.pending_allocs == 1
+        # the memory is freed at the next call into libspy
+        for i in range(10_000):
+            vm.wrap("x" * 1000).ptr
+        usage = vm.ll.memory_usage()
+        assert usage.live_allocs == 0
+        assert usage.freed_allocs >= 9_999
+        assert usage.linear_memory < 32 * 1024 * 1024
+        assert "freed:" in str(usage)
+
+    def test_W_Str_escaped(self):
+        from spy.vm.modules.unsafe.mem import generic_mem_write
+
+        vm = SPyVM()
+        w_a = vm.wrap("hello")
+        addr = vm.ll.call("spy_gc_alloc", 8)
+        generic_mem_write(vm, addr, B.w_str, w_a)
+        assert w_a.llalloc is not None
+        assert w_a.llalloc.escaped
+        del w_a
+        vm.wrap("world")
+        usage = vm.ll.memory_usage()
+        assert usage.escaped_allocs == 1
+        assert usage.freed_allocs == 0
+        # the string is still alive in linear memory
+        w_b = W_Str.from_ptr(vm, vm.ll.mem.read_i32(addr))
+        assert vm.unwrap(w_b) == "hello"
+
     def test_call_function(self):
         vm = SPyVM()
         w_abs = B.w_abs
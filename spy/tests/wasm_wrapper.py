@@ -210,32 +210,32 @@ class WasmFuncWrapper:
 
         # Read DictData struct from memory
         # struct DictData {
-        #     ptr[i32] index;  // ptr is 8 bytes (4 for ptr + 4 for length)
+        #     ptr[u8] index;  // ptr is 8 bytes (4 for ptr + 4 for length)
         #     i32 log_size;
+        #     i32 usable;
         #     i32 length;
         #     ptr[Entry] entries;
         # };
         #
         # struct Entry {
-        #     i32 empty;
+        #     i32 hash;
         #     i32 key;
         #     i32 value;
         # };
+        #
+        # The entries array is dense, so the first `length` entries are the
+        # items of the dict, in insertion order
         addr = ll_ptr.addr
-        index = self.ll.mem.read_i32(addr)
-        log_size = self.ll.mem.read_i32(addr + 8)
-        length = self.ll.mem.read_i32(addr + 12)
-        entries = self.ll.mem.read_i32(addr + 16)
+        length = self.ll.mem.read_i32(addr + 16)
+        entries = self.ll.mem.read_i32(addr + 20)
 
         result = {}
         entry_size = 12  # for dict[i32, i32]
-        for i in range(1, length + 1):
+        for i in range(length):
             entry_addr = entries + i * entry_size
-            empty = self.ll.mem.read_i32(entry_addr + 0)
             key = self.ll.mem.read_i32(entry_addr + 4)
             value = self.ll.mem.read_i32(entry_addr + 8)
-            if not empty:
-                result[key] = value
+            result[key] = value
 
         return result
 
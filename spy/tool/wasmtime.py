@@ -18,6 +18,12 @@ def main() -> None:
         description="Run a WASI-enabled WebAssembly module using wasmtime."
     )
     parser.add_argument("wasm_file", help="Path to the .wasm file to run")
+    parser.add_argument(
+        "--memory-stats",
+        action="store_true",
+        help="At exit, print the size of the linear memory to stderr. Since "
+        "WASM memory never shrinks, this is also the peak memory usage.",
+    )
     parser.add_argument(
         "args", nargs=argparse.REMAINDER, help="Arguments to pass to the WASM program"
     )
@@ -31,6 +37,7 @@ def main() -> None:
     wasi_config.inherit_stdout()
     wasi_config.inherit_stderr()
     wasi_config.inherit_stdin()
+    wasi_config.inherit_env()
     store.set_wasi(wasi_config)
 
     # Load and instantiate the module
@@ -48,6 +55,16 @@ def main() -> None:
     except wt.WasmtimeError as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if args.memory_stats:
+            mem = instance.exports(store)["memory"]
+            assert isinstance(mem, wt.Memory)
+            size = mem.data_len(store)
+            print(
+                f"linear memory: {size // (64 * 1024)} pages "
+                f"({size // (1024 * 1024)} MB)",
+                file=sys.stderr,
+            )
 
 
 if __name__ == "__main__":
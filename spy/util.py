@@ -364,9 +364,24 @@ def record_src_in_linecache(source: str, *, name: str = "exec") -> str:
     return filename
 
 
+def write_if_changed(path: py.path.local, content: str) -> bool:
+    """
+    Write content to path, unless the file already contains exactly that.
+
+    This way the mtime of unchanged files is preserved, and build tools like
+    ninja don't rebuild what depends on them. Return True if the file was
+    written.
+    """
+    if path.check(file=True) and path.read() == content:
+        return False
+    path.write(content)
+    return True
+
+
 def cleanup_spyc_files(*paths: str | py.path.local, verbose: bool = False) -> int:
     """
-    Remove all .spyc cache files from __pycache__ directories in the given paths.
+    Remove all .spyc and .spyr cache files from __pycache__ directories in the
+    given paths.
     """
 
     n = 0
@@ -389,7 +404,7 @@ def cleanup_spyc_files(*paths: str | py.path.local, verbose: bool = False) -> in
             if os.path.basename(root) != "__pycache__":
                 continue
             for filename in files:
-                if filename.endswith(".spyc"):
+                if filename.endswith((".spyc", ".spyr")):
                     spyc_path = os.path.join(root, filename)
                     try:
                         rel_path = os.path.relpath(spyc_path, str(path))
@@ -16,8 +16,9 @@ from spy.vm.modules.__spy__ import SPY
 from spy.vm.modules.__spy__.interp_tuple import W_InterpTuple
 from spy.vm.modules.operator import OP, OP_from_token, OP_unary_from_token
 from spy.vm.modules.operator.convop import CONVERT_maybe
-from spy.vm.modules.types import TYPES
+from spy.vm.modules.types import TYPES, W_Loc
 from spy.vm.object import W_Object, W_Type
+from spy.vm.opcache import InlineCache
 from spy.vm.opimpl import W_OpImpl
 from spy.vm.opspec import W_MetaArg
 from spy.vm.primitive import W_Bool
@@ -64,6 +65,8 @@ class AbstractFrame:
     specialized_assigns: dict[ast.Assign, ast.Stmt]
     specialized_assignexprs: dict[ast.AssignExpr, ast.Expr]
     desugared_fors: dict[ast.For, tuple[ast.Assign, ast.While]]
+    # see call_OP_cached. Set by the subclasses
+    opcaches: dict[ast.Node, InlineCache]
 
     def __init__(
         self, vm: "SPyVM", ns: FQN, loc: Loc, symtable: SymTable, closure: CLOSURE
@@ -745,7 +748,10 @@ class AbstractFrame:
 
     def exec_stmt_Raise(self, raise_node: ast.Raise) -> None:
         wam_exc = self.eval_expr(raise_node.exc)
-        w_opimpl = self.vm.call_OP(raise_node.loc, OP.w_RAISE, [wam_exc])
+        wam_loc = W_MetaArg.from_w_obj(
+            self.vm, W_Loc(raise_node.exc.loc), loc=raise_node.loc
+        )
+        w_opimpl = self.vm.call_OP(raise_node.loc, OP.w_RAISE, [wam_exc, wam_loc])
         self.eval_opimpl(raise_node, w_opimpl, [wam_exc])
 
     def exec_stmt_Assert(self, assert_node: ast.Assert) -> None:
@@ -959,6 +965,24 @@ class AbstractFrame:
             return wam.as_red(self.vm)
         return wam
 
+    def call_OP_cached(
+        self,
+        op: ast.Node,
+        w_OP: W_Func,
+        arg_exprs: list[ast.Expr],
+        args_wam: list[W_MetaArg],
+    ) -> W_OpImpl:
+        """
+        Like vm.call_OP, but use the inline cache of `op` if possible. See
+        vm/opcache.py.
+
+        The cache is used only by frames which actually execute code: during
+        redshifting we always go through vm.call_OP.
+        """
+        if self.redshifting or not self.vm.use_opcache:
+            return self.vm.call_OP(op.loc, w_OP, args_wam)
+        return self.vm.opcache.call_OP(self.opcaches, op, w_OP, arg_exprs, args_wam)
+
     def eval_opimpl(
         self,
         op: ast.Node,
@@ -979,20 +1003,22 @@ class AbstractFrame:
         w_OP = OP_from_token(binop.op)  # e.g., w_ADD, w_MUL, etc.
         wam_l = self.eval_expr(binop.left)
         wam_r = self.eval_expr(binop.right)
-        w_opimpl = self.vm.call_OP(binop.loc, w_OP, [wam_l, wam_r])
+        w_opimpl = self.call_OP_cached(
+            binop, w_OP, [binop.left, binop.right], [wam_l, wam_r]
+        )
         return self.eval_opimpl(binop, w_opimpl, [wam_l, wam_r])
 
     def eval_expr_CmpOp(self, op: ast.CmpOp) -> W_MetaArg:
         w_OP = OP_from_token(op.op)  # e.g., w_ADD, w_MUL, etc.
         wam_l = self.eval_expr(op.left)
         wam_r = self.eval_expr(op.right)
-        w_opimpl = self.vm.call_OP(op.loc, w_OP, [wam_l, wam_r])
+        w_opimpl = self.call_OP_cached(op, w_OP, [op.left, op.right], [wam_l, wam_r])
         return self.eval_opimpl(op, w_opimpl, [wam_l, wam_r])
 
     def eval_expr_UnaryOp(self, unop: ast.UnaryOp) -> W_MetaArg:
         w_OP = OP_unary_from_token(unop.op)
         wam_v = self.eval_expr(unop.value)
-        w_opimpl = self.vm.call_OP(unop.loc, w_OP, [wam_v])
+        w_opimpl = self.call_OP_cached(unop, w_OP, [unop.value], [wam_v])
         return self.eval_opimpl(unop, w_opimpl, [wam_v])
 
     def _ensure_bool(self, wam: W_MetaArg) -> W_MetaArg:
@@ -1056,7 +1082,9 @@ class AbstractFrame:
     def eval_expr_Call(self, call: ast.Call) -> W_MetaArg:
         wam_func = self.eval_expr(call.func)
         args_wam = [self.eval_expr(arg) for arg in call.args]
-        w_opimpl = self.vm.call_OP(call.loc, OP.w_CALL, [wam_func] + args_wam)
+        w_opimpl = self.call_OP_cached(
+            call, OP.w_CALL, [call.func] + call.args, [wam_func] + args_wam
+        )
 
         # special case getattr and setattr: if we arrive at this point it means that the
         # call typed correctly (right number, type and color of arguments). The returned
@@ -1101,7 +1129,9 @@ class AbstractFrame:
     def eval_expr_GetAttr(self, op: ast.GetAttr) -> W_MetaArg:
         wam_obj = self.eval_expr(op.value)
         wam_name = self.eval_expr(op.attr)
-        w_opimpl = self.vm.call_OP(op.loc, OP.w_GETATTR, [wam_obj, wam_name])
+        w_opimpl = self.call_OP_cached(
+            op, OP.w_GETATTR, [op.value, op.attr], [wam_obj, wam_name]
+        )
         return self.eval_opimpl(op, w_opimpl, [wam_obj, wam_name])
 
     def eval_expr_List(self, lst: ast.List) -> W_MetaArg:
@@ -1277,6 +1307,7 @@ class ASTFrame(AbstractFrame):
         )
         self.w_func = w_func
         self.funcdef = w_func.funcdef
+        self.opcaches = vm.opcache.get_caches(self.funcdef)
 
     def __repr__(self) -> str:
         cls = self.__class__.__name__
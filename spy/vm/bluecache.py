@@ -1,9 +1,8 @@
-import itertools
-from collections import Counter, defaultdict
+import weakref
 from typing import TYPE_CHECKING, Any, Optional, Sequence
 
 from spy.textbuilder import Color
-from spy.vm.function import W_Func
+from spy.vm.function import W_ASTFunc, W_Func
 from spy.vm.object import W_Object
 
 if TYPE_CHECKING:
@@ -12,37 +11,133 @@ if TYPE_CHECKING:
 DEBUG = False
 
 ARGS_W = Sequence[W_Object]
-ARGS_KEY = tuple[W_Object, ...]
-KEY = tuple[W_Func, ARGS_KEY]
+ARGS_KEY = tuple[Any, ...]
+
+# for each class, whether it uses the default W_Object.spy_key()
+_KEY_IS_IDENTITY: dict[type, bool] = {}
+
+
+class InternedKey:
+    """
+    A hash-consed spy_key(): BlueCache.get_key guarantees that there is only
+    one InternedKey for each distinct spy_key(), so InternedKeys can be
+    compared and hashed by identity.
+    """
+
+    __slots__ = ("key", "__weakref__")
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+
+    def __repr__(self) -> str:
+        return f"InternedKey({self.key!r})"
+
+
+# The key of objects which must never be cached: calls whose arguments
+# contain it bypass the BlueCache and the OpCache. spy_key() implementations
+# which compose the keys of other objects must propagate it.
+UNCACHEABLE = InternedKey("<uncacheable>")
 
 
 class BlueCache:
     """
     Store and record the results of blue functions.
+
+    The cache is indexed by function first, and then by the interned keys of
+    the arguments (see get_key).
     """
 
     vm: "SPyVM"
-    data: dict[KEY, W_Object]
+    data: dict[W_Func, dict[ARGS_KEY, W_Object]]
+    # the InternedKeys are kept alive by the entries in data and by the
+    # objects which cache them: when they die, they disappear from here
+    interned: "weakref.WeakValueDictionary[Any, InternedKey]"
+    # number of results recorded for blue functions written in SPy: see
+    # SideEffectWatcher
+    spy_records: int
 
     def __init__(self, vm: "SPyVM"):
         self.vm = vm
         self.data = {}
+        self.interned = weakref.WeakValueDictionary()
+        self.spy_records = 0
+
+    def get_key(self, w_obj: W_Object) -> Any:
+        """
+        Return the interned key of w_obj.
+
+        Objects which use the default W_Object.spy_key() are their own
+        key. For the other objects, spy_key() is interned into an InternedKey.
+
+        If the class sets __spy_key_cacheable__, spy_key() is computed only
+        once per object: this is important e.g. for W_Str, whose key must be
+        read from the linear memory.
+        """
+        cls = type(w_obj)
+        is_identity = _KEY_IS_IDENTITY.get(cls)
+        if is_identity is None:
+            is_identity = cls.spy_key is W_Object.spy_key
+            _KEY_IS_IDENTITY[cls] = is_identity
+        if is_identity:
+            return w_obj
+        if w_obj.__spy_key_cacheable__:
+            cached = w_obj.__dict__.get("_interned_key")
+            # the same object might be used by multiple VMs (e.g. B.w_True),
+            # so we must check that the key belongs to us. The reference to
+            # the BlueCache is weak, to avoid keeping the VM alive.
+            if cached is not None and cached[0]() is self:
+                return cached[1]
+            ikey = self._intern(w_obj.spy_key(self.vm))
+            w_obj._interned_key = (weakref.ref(self), ikey)  # type: ignore
+            return ikey
+        return self._intern(w_obj.spy_key(self.vm))
+
+    def _intern(self, key: Any) -> InternedKey:
+        if key is UNCACHEABLE:
+            return key
+        ikey = self.interned.get(key)
+        if ikey is None:
+            ikey = self.interned[key] = InternedKey(key)
+        return ikey
+
+    def get_args_key(self, args_w: ARGS_W) -> Optional[ARGS_KEY]:
+        """
+        Return the key of args_w, or None if they cannot be cached
+        """
+        args_key = tuple([self.get_key(w_arg) for w_arg in args_w])
+        if UNCACHEABLE in args_key:
+            return None
+        return args_key
 
     def record(self, w_func: W_Func, args_w: ARGS_W, w_res: W_Object) -> None:
-        args_key = tuple(w_arg.spy_key(self.vm) for w_arg in args_w)
-        key = (w_func, args_key)
-        self.data[key] = w_res
+        args_key = self.get_args_key(args_w)
+        if args_key is None:
+            return
+        entries = self.data.get(w_func)
+        if entries is None:
+            entries = self.data[w_func] = {}
+        entries[args_key] = w_res
+        if isinstance(w_func, W_ASTFunc):
+            self.spy_records += 1
         if DEBUG:
             self._debug("record", w_func, args_key, w_res)
 
     def lookup(self, w_func: W_Func, args_w: ARGS_W) -> Optional[W_Object]:
-        args_key = tuple(w_arg.spy_key(self.vm) for w_arg in args_w)
-        key = (w_func, args_key)
-        w_res = self.data.get(key)
+        args_key = self.get_args_key(args_w)
+        if args_key is None:
+            return None
+        entries = self.data.get(w_func)
+        w_res = None if entries is None else entries.get(args_key)
         if DEBUG:
             self._debug("lookup", w_func, args_key, w_res)
         return w_res
 
+    def invalidate(self, w_func: W_Func) -> None:
+        """
+        Forget all the results recorded for w_func
+        """
+        self.data.pop(w_func, None)
+
     def _debug(
         self,
         what: str,
@@ -58,11 +153,15 @@ class BlueCache:
         print(f"BlueCache.{what}: {w_func.fqn} {args} -> {w_res}")
 
     def _fmt_key(self, k: Any, keycolor: Optional[str] = None) -> str:
+        if isinstance(k, InternedKey):
+            k = k.key
         if isinstance(k, tuple) and len(k) == 4 and k[0] == "MetaArg":
             # this is a key coming from W_MetaArg: it's common enough which
             # is worth special casing its formatting for readability
             # purposes
             _, color, t, val = k
+            if isinstance(val, InternedKey):
+                val = val.key
             k = f"MetaArg('{color}', {t.fqn}, {val})"
             return Color.set(color, str(k))
         else:
@@ -75,22 +174,22 @@ class BlueCache:
             self._pp_func(funcname)
 
     def _pp_summary(self) -> None:
-        c: Counter[W_Func] = Counter()
-        for (w_func, args_key), w_result in self.data.items():
-            c[w_func] += 1
+        sizes = [(len(entries), w_func) for w_func, entries in self.data.items()]
+        sizes.sort(key=lambda x: x[0], reverse=True)
         print()
         print("=== vm.bluecache ===")
         print("Entries | Function")
-        for w_func, n in c.most_common():
+        for n, w_func in sizes:
             print(f"{n:7d} | {w_func.fqn}")
 
     def _pp_func(self, funcname: str) -> None:
-        for key, w_result in self.data.items():
-            w_func, args_key = key
-            if funcname in str(w_func.fqn):
+        for w_func, entries in self.data.items():
+            if funcname not in str(w_func.fqn):
+                continue
+            for args_key, w_result in entries.items():
                 print(w_func.fqn)
                 for arg in args_key:
-                    print("   ", arg)
+                    print("   ", self._fmt_key(arg))
                 print("    ==>")
                 print("   ", w_result)
                 print()
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 from spy.fqn import FQN
 from spy.vm.b import TYPES
@@ -20,6 +20,10 @@ class W_Cell(W_Object):
     ASTFrame._specialize_Name.
     """
 
+    # number of calls to set(), for all the cells of all the VMs: see
+    # SideEffectWatcher
+    writes: ClassVar[int] = 0
+
     def __init__(self, fqn: FQN, w_val: W_Object) -> None:
         self.fqn = fqn
         self._w_val = w_val
@@ -31,4 +35,5 @@ class W_Cell(W_Object):
         return self._w_val
 
     def set(self, w_val: W_Object) -> None:
+        W_Cell.writes += 1
         self._w_val = w_val
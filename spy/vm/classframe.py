@@ -28,6 +28,7 @@ class ClassFrame(AbstractFrame):
         assert classdef.symtable.kind == "class"
         super().__init__(vm, ns, classdef.loc, classdef.symtable, closure)
         self.classdef = classdef
+        self.opcaches = vm.opcache.get_caches(classdef)
 
     def __repr__(self) -> str:
         return f"ClassFrame(name='{self.classdef.name}' kind='{self.classdef.kind}')"
@@ -0,0 +1,538 @@
+"""
+Closure compiler for redshifted functions.
+
+A redshifted W_ASTFunc contains only a small subset of the AST: all the
+operators have been turned into direct calls to FQNConsts, all the blue
+values have been turned into constants and all the remaining local
+variables are red and have a statically known type.
+
+ASTFrame can execute such functions, but it pays the cost of the generic
+machinery for every node it executes: magic_dispatch, W_MetaArg creation,
+typechecking of locals, etc.
+
+The ClosureCompiler translates the body of a redshifted function into a tree
+of pre-bound Python closures, which are then executed by CompiledFunc.run:
+
+  - local variables are stored in a list of "slots", whose indexes are
+    computed at compile time;
+
+  - the callee of each ast.Call is looked up at compile time, and
+    builtin functions are called directly;
+
+  - constants are wrapped only once.
+
+Expression closures take the slots and return a W_Object. Statement closures
+take the slots and return None to continue the execution, or something else
+to unwind: BREAK, CONTINUE or the W_Object which is being returned.
+
+If a function contains nodes which are not supported, compile_func returns
+an InterpretedFunc, which simply delegates to ASTFrame.
+
+Tracebacks: W_Traceback reconstructs the app-level frames by looking at the
+interp-level ones. CompiledFunc.run is the equivalent of ASTFrame.run, and
+all the closures decorated with @located carry a `node` default argument,
+which is used to compute the precise location of the error. See
+W_Traceback._from_py_frames.
+"""
+
+from types import CodeType
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence
+
+from spy import ast
+from spy.errors import SPyError
+from spy.util import magic_dispatch
+from spy.vm.b import TYPES, B
+from spy.vm.cell import W_Cell
+from spy.vm.function import LocalVar, W_ASTFunc, W_BuiltinFunc, W_Func
+from spy.vm.object import W_Object
+
+if TYPE_CHECKING:
+    from spy.vm.astframe import ASTFrame
+    from spy.vm.vm import SPyVM
+
+Slots = list[Optional[W_Object]]
+ExprFn = Callable[[Slots], W_Object]
+StmtFn = Callable[[Slots], Any]
+
+
+class CannotCompile(Exception):
+    pass
+
+
+class _Unwind:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<{self.name}>"
+
+
+BREAK = _Unwind("BREAK")
+CONTINUE = _Unwind("CONTINUE")
+
+# code objects of all the closures which carry a `node` default argument
+LOCATED_CODES: set[CodeType] = set()
+
+
+def located[F: Callable](fn: F) -> F:
+    LOCATED_CODES.add(fn.__code__)
+    return fn
+
+
+def compile_func(vm: "SPyVM", w_func: W_ASTFunc) -> "CompiledFunc | InterpretedFunc":
+    assert w_func.redshifted
+    try:
+        return ClosureCompiler(vm, w_func).compile()
+    except CannotCompile:
+        return InterpretedFunc(vm, w_func)
+
+
+class InterpretedFunc:
+    """
+    Fallback for functions which cannot be compiled: execute them with an
+    ASTFrame, as usual.
+    """
+
+    def __init__(self, vm: "SPyVM", w_func: W_ASTFunc) -> None:
+        self.vm = vm
+        self.w_func = w_func
+
+    def run(self, args_w: Sequence[W_Object]) -> W_Object:
+        from spy.vm.astframe import ASTFrame
+
+        frame = ASTFrame(self.vm, self.w_func, args_w)
+        return frame.run(args_w)
+
+
+class CompiledFunc:
+    vm: "SPyVM"
+    w_func: W_ASTFunc
+    slotnames: list[str]
+    body: StmtFn
+
+    def __init__(
+        self, vm: "SPyVM", w_func: W_ASTFunc, slotnames: list[str], body: StmtFn
+    ) -> None:
+        self.vm = vm
+        self.w_func = w_func
+        self.slotnames = slotnames
+        self.body = body
+        self.nargs = len(w_func.funcdef.args)
+        self.extra_slots: Slots = [None] * (len(slotnames) - self.nargs)
+        w_restype = w_func.w_functype.w_restype
+        self.can_fall_off = w_restype in (TYPES.w_NoneType, B.w_dynamic)
+
+    def __repr__(self) -> str:
+        return f"<CompiledFunc `{self.w_func.fqn}`>"
+
+    def run(self, args_w: Sequence[W_Object]) -> W_Object:
+        slots: Slots = list(args_w)
+        slots += self.extra_slots
+        w_res = self.body(slots)
+        if w_res is not None:
+            assert isinstance(w_res, W_Object)
+            return w_res
+        # we reached the end of the function. If it's void, we can return
+        # None, else it's an error.
+        if self.can_fall_off:
+            return B.w_None
+        loc = self.w_func.funcdef.loc.make_end_loc()
+        msg = "reached the end of the function without a `return`"
+        raise SPyError.simple("W_TypeError", msg, "no return", loc)
+
+    def make_astframe(self, slots: Optional[Slots]) -> "ASTFrame":
+        """
+        Create an ASTFrame which is equivalent to the execution state
+        described by the given slots.
+
+        This is used by tracebacks and SPdb, which expect to find "real"
+        frames.
+        """
+        from spy.vm.astframe import ASTFrame
+
+        frame = ASTFrame(self.vm, self.w_func, None)
+        assert self.w_func.locals_types_w is not None
+        decl_loc = self.w_func.funcdef.loc
+        for i, name in enumerate(self.slotnames):
+            w_val = slots[i] if slots is not None else None
+            frame.locals[name] = LocalVar(
+                varname=name,
+                decl_loc=decl_loc,
+                color="red",
+                w_T=self.w_func.locals_types_w[name],
+                w_val=w_val,
+            )
+        return frame
+
+
+def _noop(slots: Slots) -> None:
+    return None
+
+
+class ClosureCompiler:
+    """
+    Compile a redshifted W_ASTFunc into a CompiledFunc
+    """
+
+    vm: "SPyVM"
+    w_func: W_ASTFunc
+    funcdef: ast.FuncDef
+    slots: dict[str, int]
+
+    def __init__(self, vm: "SPyVM", w_func: W_ASTFunc) -> None:
+        assert w_func.redshifted
+        self.vm = vm
+        self.w_func = w_func
+        self.funcdef = w_func.funcdef
+        self.slots = {}
+
+    def compile(self) -> CompiledFunc:
+        w_ft = self.w_func.w_functype
+        if w_ft.has_varargs:
+            raise CannotCompile("varargs")
+
+        # arguments go in the first slots, in order
+        assert self.w_func.locals_types_w is not None
+        for arg in self.funcdef.args:
+            self.slots[arg.name] = len(self.slots)
+        for name in self.w_func.locals_types_w:
+            if name[0] != "@" and name not in self.slots:
+                self.slots[name] = len(self.slots)
+
+        body = self.compile_body(self.funcdef.body)
+        return CompiledFunc(self.vm, self.w_func, list(self.slots), body)
+
+    def get_slot(self, name: str) -> int:
+        i = self.slots.get(name)
+        if i is None:
+            raise CannotCompile(f"unknown local: {name}")
+        return i
+
+    def get_cell(self, fqn: Any) -> W_Cell:
+        w_cell = self.vm.lookup_global(fqn)
+        assert isinstance(w_cell, W_Cell)
+        return w_cell
+
+    # ==== statements ====
+
+    def compile_body(self, stmts: list[ast.Stmt]) -> StmtFn:
+        fns = tuple(
+            self.compile_stmt(stmt) for stmt in stmts if not isinstance(stmt, ast.Pass)
+        )
+        if len(fns) == 0:
+            return _noop
+        elif len(fns) == 1:
+            return fns[0]
+
+        def exec_body(slots: Slots) -> Any:
+            for fn in fns:
+                res = fn(slots)
+                if res is not None:
+                    return res
+            return None
+
+        return exec_body
+
+    def compile_stmt(self, stmt: ast.Stmt) -> StmtFn:
+        return magic_dispatch(self, "compile_stmt", stmt)
+
+    def compile_stmt_NotImplemented(self, stmt: ast.Stmt) -> StmtFn:
+        raise CannotCompile(stmt.__class__.__name__)
+
+    def compile_stmt_Return(self, ret: ast.Return) -> StmtFn:
+        value = self.compile_expr(ret.value)
+
+        @located
+        def exec_return(slots: Slots, node: ast.Node = ret) -> Any:
+            return value(slots)
+
+        return exec_return
+
+    def compile_stmt_Break(self, stmt: ast.Break) -> StmtFn:
+        return lambda slots: BREAK
+
+    def compile_stmt_Continue(self, stmt: ast.Continue) -> StmtFn:
+        return lambda slots: CONTINUE
+
+    def compile_stmt_VarDef(self, vardef: ast.VarDef) -> StmtFn:
+        if vardef.value is None:
+            # declarations are a no-op: the slot is already there
+            return _noop
+        return self._compile_store_local(vardef, vardef.name.value, vardef.value)
+
+    def compile_stmt_AssignLocal(self, assign: ast.AssignLocal) -> StmtFn:
+        return self._compile_store_local(assign, assign.target.value, assign.value)
+
+    def _compile_store_local(
+        self, stmt: ast.Stmt, varname: str, expr: ast.Expr
+    ) -> StmtFn:
+        i = self.get_slot(varname)
+        value = self.compile_expr(expr)
+
+        @located
+        def exec_store_local(slots: Slots, node: ast.Node = stmt) -> None:
+            slots[i] = value(slots)
+
+        return exec_store_local
+
+    def compile_stmt_AssignCell(self, assign: ast.AssignCell) -> StmtFn:
+        w_cell = self.get_cell(assign.target_fqn)
+        value = self.compile_expr(assign.value)
+
+        @located
+        def exec_store_cell(slots: Slots, node: ast.Node = assign) -> None:
+            w_cell.set(value(slots))
+
+        return exec_store_cell
+
+    def compile_stmt_StmtExpr(self, stmt: ast.StmtExpr) -> StmtFn:
+        value = self.compile_expr(stmt.value)
+
+        @located
+        def exec_stmtexpr(slots: Slots, node: ast.Node = stmt) -> None:
+            value(slots)
+
+        return exec_stmtexpr
+
+    def compile_stmt_If(self, if_node: ast.If) -> StmtFn:
+        test = self.compile_expr(if_node.test)
+        then_body = self.compile_body(if_node.then_body)
+        else_body = self.compile_body(if_node.else_body)
+        w_True = B.w_True
+
+        @located
+        def exec_if(slots: Slots, node: ast.Node = if_node) -> Any:
+            if test(slots) is w_True:
+                return then_body(slots)
+            else:
+                return else_body(slots)
+
+        return exec_if
+
+    def compile_stmt_While(self, while_node: ast.While) -> StmtFn:
+        test = self.compile_expr(while_node.test)
+        body = self.compile_body(while_node.body)
+        w_True = B.w_True
+
+        @located
+        def exec_while(slots: Slots, node: ast.Node = while_node) -> Any:
+            while test(slots) is w_True:
+                res = body(slots)
+                if res is not None:
+                    if res is BREAK:
+                        break
+                    elif res is CONTINUE:
+                        continue
+                    return res
+            return None
+
+        return exec_while
+
+    def compile_stmt_Assert(self, assert_node: ast.Assert) -> StmtFn:
+        vm = self.vm
+        test = self.compile_expr(assert_node.test)
+        msg = None
+        if assert_node.msg is not None:
+            msg = self.compile_expr(assert_node.msg)
+
+        @located
+        def exec_assert(slots: Slots, node: ast.Node = assert_node) -> None:
+            if test(slots) is B.w_False:
+                plain_msg = "assertion failed"
+                if msg is not None:
+                    plain_msg = vm.unwrap_str(msg(slots))
+                raise SPyError.simple(
+                    etype="W_AssertionError",
+                    primary=plain_msg,
+                    secondary="assertion failed",
+                    loc=assert_node.loc,
+                )
+
+        return exec_assert
+
+    # ==== expressions ====
+
+    def compile_expr(self, expr: ast.Expr) -> ExprFn:
+        return magic_dispatch(self, "compile_expr", expr)
+
+    def compile_expr_NotImplemented(self, expr: ast.Expr) -> ExprFn:
+        raise CannotCompile(expr.__class__.__name__)
+
+    def _const(self, w_val: W_Object) -> ExprFn:
+        return lambda slots: w_val
+
+    def compile_expr_Constant(self, const: ast.Constant) -> ExprFn:
+        return self._const(self.vm.wrap(const.value))
+
+    def compile_expr_StrConst(self, const: ast.StrConst) -> ExprFn:
+        return self._const(self.vm.wrap(const.value))
+
+    def compile_expr_LocConst(self, const: ast.LocConst) -> ExprFn:
+        return self._const(self.vm.wrap(const.value))
+
+    def compile_expr_FQNConst(self, const: ast.FQNConst) -> ExprFn:
+        return self._const(self.vm.lookup_global(const.fqn))
+
+    def compile_expr_Tuple(self, tup: ast.Tuple) -> ExprFn:
+        # after redshifting, ast.Tuple is used only to represent blue tuples
+        # (see doppler.make_const), so we can evaluate it once and for all.
+        from spy.vm.astframe import ASTFrame
+
+        for node in tup.walk():
+            if isinstance(node, (ast.Name, ast.NameLocalDirect, ast.NameOuterCell)):
+                raise CannotCompile("non-constant Tuple")
+        frame = ASTFrame(self.vm, self.w_func, None)
+        wam = frame.eval_expr(tup)
+        return self._const(wam.w_val)
+
+    def compile_expr_NameLocalDirect(self, name: ast.NameLocalDirect) -> ExprFn:
+        i = self.get_slot(name.sym.name)
+
+        def load_local(slots: Slots) -> W_Object:
+            w_val = slots[i]
+            if w_val is None:
+                raise SPyError("W_Exception", "read from uninitialized local")
+            return w_val
+
+        return load_local
+
+    def compile_expr_NameOuterCell(self, name: ast.NameOuterCell) -> ExprFn:
+        w_cell = self.get_cell(name.fqn)
+        return lambda slots: w_cell.get()
+
+    def compile_expr_AssignExprLocal(self, assignexpr: ast.AssignExprLocal) -> ExprFn:
+        i = self.get_slot(assignexpr.target.value)
+        value = self.compile_expr(assignexpr.value)
+
+        def eval_assignexpr_local(slots: Slots) -> W_Object:
+            w_val = slots[i] = value(slots)
+            return w_val
+
+        return eval_assignexpr_local
+
+    def compile_expr_AssignExprCell(self, assignexpr: ast.AssignExprCell) -> ExprFn:
+        w_cell = self.get_cell(assignexpr.target_fqn)
+        value = self.compile_expr(assignexpr.value)
+
+        def eval_assignexpr_cell(slots: Slots) -> W_Object:
+            w_val = value(slots)
+            w_cell.set(w_val)
+            return w_val
+
+        return eval_assignexpr_cell
+
+    def compile_expr_And(self, op: ast.And) -> ExprFn:
+        left = self.compile_expr(op.left)
+        right = self.compile_expr(op.right)
+        w_False = B.w_False
+
+        def eval_and(slots: Slots) -> W_Object:
+            w_left = left(slots)
+            if w_left is w_False:
+                return w_left
+            return right(slots)
+
+        return eval_and
+
+    def compile_expr_Or(self, op: ast.Or) -> ExprFn:
+        left = self.compile_expr(op.left)
+        right = self.compile_expr(op.right)
+        w_True = B.w_True
+
+        def eval_or(slots: Slots) -> W_Object:
+            w_left = left(slots)
+            if w_left is w_True:
+                return w_left
+            return right(slots)
+
+        return eval_or
+
+    def compile_expr_Call(self, call: ast.Call) -> ExprFn:
+        if not isinstance(call.func, ast.FQNConst):
+            raise CannotCompile("indirect call")
+        w_func = self.vm.lookup_global(call.func.fqn)
+        if not isinstance(w_func, W_Func):
+            raise CannotCompile("call to non-function")
+
+        args = tuple(self.compile_expr(arg) for arg in call.args)
+        if isinstance(w_func, W_BuiltinFunc) and w_func.color == "red":
+            return self._compile_builtin_call(call, w_func, args)
+        else:
+            return self._compile_generic_call(call, w_func, args)
+
+    def _compile_generic_call(
+        self, call: ast.Call, w_func: W_Func, args: tuple[ExprFn, ...]
+    ) -> ExprFn:
+        vm = self.vm
+        if w_func.color == "blue":
+            # blue functions must go through the bluecache
+            call_func = vm.fast_call
+        else:
+            call_func = lambda w_func, args_w: w_func.raw_call(vm, args_w)
+
+        @located
+        def eval_call(slots: Slots, node: ast.Node = call) -> W_Object:
+            args_w = [arg(slots) for arg in args]
+            return call_func(w_func, args_w)
+
+        return eval_call
+
+    def _compile_builtin_call(
+        self, call: ast.Call, w_func: W_BuiltinFunc, args: tuple[ExprFn, ...]
+    ) -> ExprFn:
+        # this must be kept in sync with W_BuiltinFunc.raw_call
+        vm = self.vm
+        pyfunc = w_func._pyfunc
+        if w_func.w_functype.w_restype is TYPES.w_NoneType:
+            w_None = B.w_None
+
+            @located
+            def eval_call_void(slots: Slots, node: ast.Node = call) -> W_Object:
+                w_res = pyfunc(vm, *[arg(slots) for arg in args])
+                return w_None if w_res is None else w_res
+
+            return eval_call_void
+
+        # specialize the most common arities
+        if len(args) == 0:
+
+            @located
+            def eval_call0(slots: Slots, node: ast.Node = call) -> W_Object:
+                return pyfunc(vm)
+
+            return eval_call0
+
+        elif len(args) == 1:
+            (a,) = args
+
+            @located
+            def eval_call1(slots: Slots, node: ast.Node = call) -> W_Object:
+                return pyfunc(vm, a(slots))
+
+            return eval_call1
+
+        elif len(args) == 2:
+            a, b = args
+
+            @located
+            def eval_call2(slots: Slots, node: ast.Node = call) -> W_Object:
+                return pyfunc(vm, a(slots), b(slots))
+
+            return eval_call2
+
+        elif len(args) == 3:
+            a, b, c = args
+
+            @located
+            def eval_call3(slots: Slots, node: ast.Node = call) -> W_Object:
+                return pyfunc(vm, a(slots), b(slots), c(slots))
+
+            return eval_call3
+
+        else:
+
+            @located
+            def eval_callN(slots: Slots, node: ast.Node = call) -> W_Object:
+                return pyfunc(vm, *[arg(slots) for arg in args])
+
+            return eval_callN
@@ -84,6 +84,7 @@ class W_Traceback(W_Object):
         from spy.doppler import DopplerFrame
         from spy.vm.astframe import ASTFrame
         from spy.vm.classframe import ClassFrame
+        from spy.vm.closurecompiler import LOCATED_CODES, CompiledFunc
         from spy.vm.modframe import ModFrame
 
         # Imagine to have this SPy code:
@@ -116,6 +117,10 @@ class W_Traceback(W_Object):
         #   When we encounter ASTFrame.run, we record an app-level SPy frame.
         #   When we encounter exec_stmt or eval_expr, we set a more precise loc info
         #   for the last recorded frame.
+        #
+        #   Closure-compiled functions work similarly: CompiledFunc.run is the
+        #   equivalent of ASTFrame.run, and the closures listed in
+        #   LOCATED_CODES are the equivalent of exec_stmt/eval_expr.
         entries = []
         for frame, lineno in frames:
             if frame.f_code in (
@@ -128,6 +133,17 @@ class W_Traceback(W_Object):
                 spyframe = frame.f_locals["self"]
                 entries.append(FrameInfo(spyframe))
 
+            elif frame.f_code is CompiledFunc.run.__code__:
+                # found an applevel frame for a compiled function
+                compiled = frame.f_locals["self"]
+                slots = frame.f_locals.get("slots")
+                entries.append(FrameInfo(compiled.make_astframe(slots)))
+
+            elif frame.f_code in LOCATED_CODES:
+                # update last frame with more precise loc info
+                node = frame.f_locals["node"]
+                entries[-1].loc = node.loc
+
             elif frame.f_code in (
                 ASTFrame.eval_expr.__code__,
                 DopplerFrame.eval_expr.__code__,
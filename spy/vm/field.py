@@ -11,6 +11,7 @@ if TYPE_CHECKING:
 @TYPES.builtin_type("Field")
 class W_Field(W_Object):
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
 
     def __init__(self, name: str, w_T: W_Type, loc: Loc) -> None:
         self.name = name
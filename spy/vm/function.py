@@ -15,9 +15,10 @@ from spy.ast import Color, FuncKind, FuncParamKind
 from spy.errors import SPyError
 from spy.fqn import FQN
 from spy.location import Loc
-from spy.vm.object import W_Object, W_Type, builtin_method
+from spy.vm.object import W_Object, W_Type, builtin_method, builtin_property
 
 if TYPE_CHECKING:
+    from spy.vm.closurecompiler import CompiledFunc, InterpretedFunc
     from spy.vm.opspec import W_MetaArg, W_OpSpec
     from spy.vm.vm import SPyVM
 
@@ -188,6 +189,15 @@ class W_FuncType(W_Type):
         else:
             return n == self.arity
 
+    @builtin_property("restype")
+    @staticmethod
+    def w_get_restype(vm: "SPyVM", w_self: "W_FuncType") -> W_Type:
+        """
+        Applevel property to get the return type. We cannot use a simple
+        Member because of circular imports.
+        """
+        return w_self.w_restype
+
     def all_params(self) -> Iterator[FuncParam]:
         """
         Iterate over all params. Go to infinity in case of varargs
@@ -346,6 +356,10 @@ class W_ASTFunc(W_Func):
     # mistake).
     w_redshifted_into: Optional["W_ASTFunc"]
 
+    # for redshifted functions, the closure-compiled version of the body,
+    # created lazily by raw_call. See vm/closurecompiler.py.
+    compiled: Optional["CompiledFunc | InterpretedFunc"]
+
     def __init__(
         self,
         w_functype: W_FuncType,
@@ -362,6 +376,7 @@ class W_ASTFunc(W_Func):
         self.closure = closure
         self.locals_types_w = locals_types_w
         self.w_redshifted_into = None
+        self.compiled = None
 
     @property
     def redshifted(self) -> bool:
@@ -392,6 +407,22 @@ class W_ASTFunc(W_Func):
     def raw_call(self, vm: "SPyVM", args_w: Sequence[W_Object]) -> W_Object:
         from spy.vm.astframe import ASTFrame
 
+        if self.w_redshifted_into is not None:
+            # The function has been redshifted, but some references to the
+            # old W_ASTFunc survive (e.g. inside the closures of a compiled
+            # caller, or in the methods of a type). Instead of failing the
+            # "w_func has been redshifted" assert in ASTFrame, we run the new
+            # function: it's equivalent, and faster.
+            return self.w_redshifted_into.raw_call(vm, args_w)
+
+        if self.redshifted and vm.use_closure_compiler:
+            # the function might be shared by multiple VMs, see vm/snapshot.py
+            if self.compiled is None or self.compiled.vm is not vm:
+                from spy.vm.closurecompiler import compile_func
+
+                self.compiled = compile_func(vm, self)
+            return self.compiled.run(args_w)
+
         frame = ASTFrame(vm, self, args_w)
         return frame.run(args_w)
 
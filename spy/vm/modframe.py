@@ -35,6 +35,7 @@ class ModFrame(AbstractFrame):
         assert mod.symtable.kind == "module"
         super().__init__(vm, ns, mod.loc, mod.symtable, closure=())
         self.mod = mod
+        self.opcaches = vm.opcache.get_caches(mod)
         self.w_mod = W_Module(ns.modname, mod.filename)
         self.vm.register_module(self.w_mod)
         self.declare_reserved_bool_locals()
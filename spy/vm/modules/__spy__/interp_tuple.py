@@ -1,6 +1,7 @@
 from typing import TYPE_CHECKING, Annotated, Any
 
 from spy.vm.b import B
+from spy.vm.bluecache import UNCACHEABLE
 from spy.vm.builtin import builtin_method
 from spy.vm.modules.__spy__ import SPY
 from spy.vm.object import W_Object
@@ -52,6 +53,7 @@ class W_InterpTuple(W_Object):
     """
 
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
 
     items_w: list[W_Object]
 
@@ -62,7 +64,22 @@ class W_InterpTuple(W_Object):
         return tuple([vm.unwrap(w_item) for w_item in self.items_w])
 
     def spy_key(self, vm: "SPyVM") -> Any:
-        return tuple(w_item.spy_key(vm) for w_item in self.items_w)
+        # Red MetaArgs are equal if they have the same static type, but the
+        # *args_m of a metafunc must keep their identity: if a metafunc does
+        # e.g. OpSpec(impl, [args_m[0]]), the W_MetaArg must be the one of the
+        # current call (see the comment in typechecker.typecheck_opspec).
+        # Since args_m is blue, the OpImpl of args_m[0] contains args_m as a
+        # constant and it would be cached: so tuples which contain red
+        # MetaArgs are never cached.
+        keys = []
+        for w_item in self.items_w:
+            if isinstance(w_item, W_MetaArg) and w_item.color == "red":
+                return UNCACHEABLE
+            key = vm.bluecache.get_key(w_item)
+            if key is UNCACHEABLE:
+                return UNCACHEABLE
+            keys.append(key)
+        return tuple(keys)
 
     def __repr__(self) -> str:
         return f"W_InterpTuple({self.items_w})"
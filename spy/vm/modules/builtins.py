@@ -183,8 +183,7 @@ def w_hash_bool(vm: "SPyVM", w_x: W_Bool) -> W_I32:
 @BUILTINS.builtin_func
 def w_hash_str(vm: "SPyVM", w_x: W_Str) -> W_I32:
     assert isinstance(w_x, W_Str)
-    res = vm.ll.call("spy_str_hash", w_x.ptr)
-    return vm.wrap(res)
+    return vm.wrap(w_x.get_hash())
 
 
 @BUILTINS.builtin_func(color="blue", kind="metafunc")
@@ -94,6 +94,8 @@ def default_callmethod(
         # non-methods in the type dict
         assert isinstance(w_func, W_Func)
         # call the w_func, passing wam_obj as the implicit self
+        if w_func.w_functype.kind == "metafunc":
+            return vm.fast_metacall(w_func, [wam_obj] + list(args_wam))
         w_opspec = W_OpSpec(w_func, [wam_obj] + list(args_wam))
         return w_opspec
     else:
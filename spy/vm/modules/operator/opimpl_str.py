@@ -14,32 +14,40 @@ if TYPE_CHECKING:
 def w_str_add(vm: "SPyVM", w_a: W_Str, w_b: W_Str) -> W_Str:
     assert isinstance(w_a, W_Str)
     assert isinstance(w_b, W_Str)
-    ptr_c = vm.ll.call("spy_str_add", w_a.ptr, w_b.ptr)
-    return W_Str.from_ptr(vm, ptr_c)
+    a = w_a.get_str_maybe()
+    b = w_b.get_str_maybe()
+    if a is not None and b is not None:
+        return W_Str(vm, a + b)
+    return W_Str.from_utf8(vm, w_a.get_utf8() + w_b.get_utf8())
 
 
 @OP.builtin_func
 def w_str_mul(vm: "SPyVM", w_a: W_Str, w_b: W_I32) -> W_Str:
     assert isinstance(w_a, W_Str)
     assert isinstance(w_b, W_I32)
-    ptr_c = vm.ll.call("spy_str_mul", w_a.ptr, w_b.value)
-    return W_Str.from_ptr(vm, ptr_c)
+    return W_Str.from_utf8(vm, w_a.get_utf8() * int(w_b.value))
+
+
+def str_eq(w_a: W_Str, w_b: W_Str) -> bool:
+    a = w_a.get_str_maybe()
+    b = w_b.get_str_maybe()
+    if a is not None and b is not None:
+        return a == b
+    return w_a.get_utf8() == w_b.get_utf8()
 
 
 @OP.builtin_func
 def w_str_eq(vm: "SPyVM", w_a: W_Str, w_b: W_Str) -> W_Bool:
     assert isinstance(w_a, W_Str)
     assert isinstance(w_b, W_Str)
-    res = vm.ll.call("spy_str_eq", w_a.ptr, w_b.ptr)
-    return vm.wrap(bool(res))
+    return vm.wrap(str_eq(w_a, w_b))
 
 
 @OP.builtin_func
 def w_str_ne(vm: "SPyVM", w_a: W_Str, w_b: W_Str) -> W_Bool:
     assert isinstance(w_a, W_Str)
     assert isinstance(w_b, W_Str)
-    res = vm.ll.call("spy_str_eq", w_a.ptr, w_b.ptr)
-    return vm.wrap(bool(not res))
+    return vm.wrap(not str_eq(w_a, w_b))
 
 
 def _parse_int(vm: "SPyVM", w_s: W_Str) -> int:
@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING
 from spy.errors import SPyError
 from spy.location import Loc
 from spy.vm.exc import W_Exception
+from spy.vm.modules.types import W_Loc
 from spy.vm.object import W_Type
 from spy.vm.opimpl import W_OpImpl
 from spy.vm.opspec import W_MetaArg, W_OpSpec
@@ -25,13 +26,18 @@ def w_raise(
 
 
 @OP.builtin_func(color="blue")
-def w_RAISE(vm: "SPyVM", wam_exc: W_MetaArg) -> W_OpImpl:
+def w_RAISE(vm: "SPyVM", wam_exc: W_MetaArg, wam_loc: W_MetaArg) -> W_OpImpl:
     from spy.vm.typechecker import typecheck_opspec
 
     # We are doing a bit of magic here:
     #   1. manually turn the blue wam_exc into an hardcoded message
     #   2. return an w_opimpl which calls w_raise with the hardcoded message,
     #      ignoring the actual wam_exc
+    #
+    # The location of the raise is passed explicitly as a blue W_Loc, so
+    # that it is part of the key used by the BlueCache: else, two raise
+    # statements of the same exception would share the same opimpl, and thus
+    # the same filename and lineno.
     if wam_exc.color != "blue":
         err = SPyError(
             "W_TypeError",
@@ -61,10 +67,13 @@ def w_RAISE(vm: "SPyVM", wam_exc: W_MetaArg) -> W_OpImpl:
     w_msg = vm.wrap(msg)
     wam_msg = W_MetaArg.from_w_obj(vm, w_msg)
 
-    w_fname = vm.wrap(wam_exc.loc.filename)
+    w_loc = wam_loc.w_blueval
+    assert isinstance(w_loc, W_Loc)
+    loc = w_loc.loc
+    w_fname = vm.wrap(loc.filename)
     wam_fname = W_MetaArg.from_w_obj(vm, w_fname)
 
-    w_lineno = vm.wrap(wam_exc.loc.line_start)
+    w_lineno = vm.wrap(loc.line_start)
     wam_lineno = W_MetaArg.from_w_obj(vm, w_lineno)
 
     w_opspec = W_OpSpec(OP.w_raise, [wam_etype, wam_msg, wam_fname, wam_lineno])
@@ -4,9 +4,11 @@ SPy `posix` module.
 
 from typing import TYPE_CHECKING, Annotated, Any
 
+from spy.errors import SPyError
 from spy.vm.b import B
+from spy.vm.builtin import builtin_method
 from spy.vm.object import W_Object
-from spy.vm.primitive import W_I32
+from spy.vm.primitive import W_F64, W_I32, W_U8, W_Bool
 from spy.vm.registry import ModuleRegistry
 from spy.vm.str import W_Str
 from spy.vm.struct import W_Struct
@@ -79,28 +81,190 @@ def w__fopen(vm: "SPyVM", w_filename: W_Str) -> W__FILE:
 @POSIX.builtin_func
 def w__fread(vm: "SPyVM", w_f: W__FILE, w_size: W_I32) -> W_Str:
     ptr = vm.ll.call("spy_posix$_fread", w_f.h, w_size.value)
-    return W_Str.from_ptr(vm, ptr)
+    return W_Str.from_ptr(vm, ptr, owned=True)
 
 
 @POSIX.builtin_func
 def w___freadall_chunked(vm: "SPyVM", w_f: W__FILE) -> W_Str:
     ptr = vm.ll.call("spy_posix$__freadall_chunked", w_f.h)
-    return W_Str.from_ptr(vm, ptr)
+    return W_Str.from_ptr(vm, ptr, owned=True)
 
 
 @POSIX.builtin_func
 def w__freadall(vm: "SPyVM", w_f: W__FILE) -> W_Str:
     ptr = vm.ll.call("spy_posix$_freadall", w_f.h)
-    return W_Str.from_ptr(vm, ptr)
+    return W_Str.from_ptr(vm, ptr, owned=True)
 
 
 @POSIX.builtin_func
 def w__freadline(vm: "SPyVM", w_f: W__FILE) -> W_Str:
     ptr = vm.ll.call("spy_posix$_freadline", w_f.h)
-    return W_Str.from_ptr(vm, ptr)
+    return W_Str.from_ptr(vm, ptr, owned=True)
 
 
 @POSIX.builtin_func
 def w__fclose(vm: "SPyVM", w_f: W__FILE) -> None:
     vm.ll.call("spy_posix$_fclose", w_f.h)
     return None
+
+
+@POSIX.builtin_type("File")
+class W_File(W_Object):
+    """
+    A buffered reader which iterates over the lines of a file, see posix.h:
+
+        for line in open(path):
+            ...
+
+    The file object is its own iterator.
+    """
+
+    __spy_storage_category__ = "value"
+    h: int  # value of `spy_posix$File *`
+
+    def __init__(self, h: int) -> None:
+        self.h = h
+
+    def spy_key(self, vm: "SPyVM") -> Any:
+        return ("spy_posix$File *", self.h)
+
+    @builtin_method("readline")
+    @staticmethod
+    def w_readline(vm: "SPyVM", w_self: "W_File") -> W_Str:
+        ptr = vm.ll.call("spy_posix$File$readline", w_self.h)
+        return W_Str.from_ptr(vm, ptr, owned=True)
+
+    @builtin_method("close")
+    @staticmethod
+    def w_close(vm: "SPyVM", w_self: "W_File") -> None:
+        vm.ll.call("spy_posix$File$close", w_self.h)
+
+    @builtin_method("__fastiter__")
+    @staticmethod
+    def w_fastiter(vm: "SPyVM", w_self: "W_File") -> "W_File":
+        vm.ll.call("spy_posix$File$__fastiter__", w_self.h)
+        return w_self
+
+    @builtin_method("__next__")
+    @staticmethod
+    def w_next(vm: "SPyVM", w_self: "W_File") -> "W_File":
+        vm.ll.call("spy_posix$File$__next__", w_self.h)
+        return w_self
+
+    @builtin_method("__continue_iteration__")
+    @staticmethod
+    def w_continue_iteration(vm: "SPyVM", w_self: "W_File") -> W_Bool:
+        res = vm.ll.call("spy_posix$File$__continue_iteration__", w_self.h)
+        return vm.wrap(bool(res))
+
+    @builtin_method("__item__")
+    @staticmethod
+    def w_item(vm: "SPyVM", w_self: "W_File") -> W_Str:
+        ptr = vm.ll.call("spy_posix$File$__item__", w_self.h)
+        return W_Str.from_ptr(vm, ptr, owned=True)
+
+
+@POSIX.builtin_func
+def w_open(vm: "SPyVM", w_path: W_Str) -> W_File:
+    h = vm.ll.call("spy_posix$open", w_path.ptr)
+    return W_File(h)
+
+
+# ================= memory-mapped files ===============
+
+# must be kept in sync with SPY_POSIX_MMAP_CHUNK in posix.h
+MMAP_CHUNK = 1 << 30
+
+
+@POSIX.builtin_type("MMap")
+class W_MMap(W_Object):
+    """
+    A read-only view of the whole content of a file, see posix.h.
+
+    The actual work is done by libspy, which in the interpreter runs on WASI:
+    so here the content is read into the linear memory instead of being
+    mmap()ed, but from the point of view of SPy code the behavior is the same.
+    """
+
+    __spy_storage_category__ = "value"
+    h: int  # value of `spy_posix$MMap *`
+    data: int
+    length: int
+
+    def __init__(self, h: int, data: int, length: int) -> None:
+        self.h = h
+        # the fields of the struct change only in close(), so we can cache
+        # them instead of reading them from the linear memory at each access
+        self.data = data
+        self.length = length
+
+    @staticmethod
+    def from_handle(vm: "SPyVM", h: int) -> "W_MMap":
+        # {const uint8_t *data; size_t length;}: both are 32 bits on wasm32
+        data = vm.ll.mem.read_i32(h)
+        length = vm.ll.mem.read_i32(h + 4)
+        return W_MMap(h, data, length)
+
+    def spy_key(self, vm: "SPyVM") -> Any:
+        return ("spy_posix$MMap *", self.h)
+
+    def check_chunk(self, k: int) -> None:
+        if k < 0 or k >= self.nchunks():
+            raise SPyError("W_IndexError", "MMap chunk out of range")
+
+    def nchunks(self) -> int:
+        return (self.length + MMAP_CHUNK - 1) // MMAP_CHUNK
+
+    @builtin_method("__len__")
+    @staticmethod
+    def w_len(vm: "SPyVM", w_self: "W_MMap") -> W_I32:
+        return W_I32(w_self.length)
+
+    @builtin_method("__getitem__")
+    @staticmethod
+    def w_getitem(vm: "SPyVM", w_self: "W_MMap", w_i: W_I32) -> W_U8:
+        i = int(vm.unwrap_i32(w_i))
+        if i < 0 or i >= w_self.length:
+            raise SPyError("W_IndexError", "MMap index out of range")
+        return W_U8(vm.ll.mem.read_u8(w_self.data + i))
+
+    @builtin_method("size")
+    @staticmethod
+    def w_size(vm: "SPyVM", w_self: "W_MMap") -> W_F64:
+        return W_F64(float(w_self.length))
+
+    @builtin_method("nchunks")
+    @staticmethod
+    def w_nchunks(vm: "SPyVM", w_self: "W_MMap") -> W_I32:
+        return W_I32(w_self.nchunks())
+
+    @builtin_method("chunk_len")
+    @staticmethod
+    def w_chunk_len(vm: "SPyVM", w_self: "W_MMap", w_k: W_I32) -> W_I32:
+        k = int(vm.unwrap_i32(w_k))
+        w_self.check_chunk(k)
+        return W_I32(min(w_self.length - k * MMAP_CHUNK, MMAP_CHUNK))
+
+    @builtin_method("chunk_getitem")
+    @staticmethod
+    def w_chunk_getitem(vm: "SPyVM", w_self: "W_MMap", w_k: W_I32, w_i: W_I32) -> W_U8:
+        k = int(vm.unwrap_i32(w_k))
+        i = int(vm.unwrap_i32(w_i))
+        w_self.check_chunk(k)
+        offset = k * MMAP_CHUNK + i
+        if i < 0 or i >= MMAP_CHUNK or offset >= w_self.length:
+            raise SPyError("W_IndexError", "MMap index out of range")
+        return W_U8(vm.ll.mem.read_u8(w_self.data + offset))
+
+    @builtin_method("close")
+    @staticmethod
+    def w_close(vm: "SPyVM", w_self: "W_MMap") -> None:
+        vm.ll.call("spy_posix$MMap$close", w_self.h)
+        w_self.data = 0
+        w_self.length = 0
+
+
+@POSIX.builtin_func
+def w_mmap(vm: "SPyVM", w_path: W_Str) -> W_MMap:
+    h = vm.ll.call("spy_posix$mmap", w_path.ptr)
+    return W_MMap.from_handle(vm, h)
@@ -22,6 +22,7 @@ class W_Loc(W_Object):
     """
 
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
 
     def __init__(self, loc: Loc) -> None:
         self.loc = loc
@@ -16,6 +16,7 @@ if TYPE_CHECKING:
 UNSAFE = ModuleRegistry("unsafe")
 
 from . import (
+    arena,  # noqa: F401 -- side effects
     div,  # noqa: F401 -- side effects
     mem,  # noqa: F401 -- side effects
     ptr,  # noqa: F401 -- side effects
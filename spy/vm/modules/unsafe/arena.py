@@ -0,0 +1,78 @@
+"""
+unsafe.Arena: a bump-pointer region allocator, see libspy/include/spy/arena.h.
+
+    arena = Arena()
+    buf = arena_alloc[i32](arena, 100)
+    ...
+    arena.reset()    # all the memory allocated so far can be reused
+    arena.close()    # give the memory back to the system
+
+The memory is owned by the arena, so arena_alloc returns a raw_ptr.
+"""
+
+from typing import TYPE_CHECKING, Annotated, Any
+
+from spy.vm.builtin import builtin_method
+from spy.vm.object import W_Object
+from spy.vm.primitive import W_I32, W_Dynamic
+from spy.vm.w import W_Type
+
+from . import UNSAFE
+from .misc import sizeof
+from .ptr import W_Ptr, W_PtrType, w_raw_ptr
+
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+
+@UNSAFE.builtin_type("Arena")
+class W_Arena(W_Object):
+    """
+    An unsafe::Arena. The actual allocator lives in libspy, and we keep only
+    its address.
+    """
+
+    __spy_storage_category__ = "value"
+    h: int  # value of `spy_Arena *`
+
+    def __init__(self, h: int) -> None:
+        self.h = h
+
+    def spy_key(self, vm: "SPyVM") -> Any:
+        return ("spy_Arena *", self.h)
+
+    @builtin_method("__new__")
+    @staticmethod
+    def w_new(vm: "SPyVM") -> "W_Arena":
+        h = vm.ll.call("spy_unsafe$Arena$__new__")
+        return W_Arena(h)
+
+    @builtin_method("reset")
+    @staticmethod
+    def w_reset(vm: "SPyVM", w_self: "W_Arena") -> None:
+        vm.ll.call("spy_unsafe$Arena$reset", w_self.h)
+
+    @builtin_method("close")
+    @staticmethod
+    def w_close(vm: "SPyVM", w_self: "W_Arena") -> None:
+        vm.ll.call("spy_unsafe$Arena$close", w_self.h)
+
+
+@UNSAFE.builtin_func(color="blue", kind="generic")
+def w_arena_alloc(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
+    w_ptrtype = vm.fast_call(w_raw_ptr, [w_T])  # unsafe::raw_ptr[i32]
+    assert isinstance(w_ptrtype, W_PtrType)
+    ITEMSIZE = sizeof(w_T)
+
+    # unsafe::raw_ptr[i32]::arena_alloc
+    #
+    # this is a special builtin function, its C equivalent is automatically
+    # generated by c.Context.new_ptr_type: it's an inlined pointer bump
+    @vm.register_builtin_func(w_ptrtype.fqn, "arena_alloc")
+    def w_fn(vm: "SPyVM", w_arena: W_Arena, w_n: W_I32) -> Annotated[W_Ptr, w_ptrtype]:
+        n = vm.unwrap_i32(w_n)
+        size = ITEMSIZE * n
+        addr = vm.ll.call("spy_arena_alloc_exported", w_arena.h, size)
+        return W_Ptr(w_ptrtype, addr, n)  # type: ignore
+
+    return w_fn
@@ -1,8 +1,11 @@
 from typing import TYPE_CHECKING, Annotated
 
-from spy.errors import WIP
+from spy.errors import WIP, SPyError
 from spy.vm.b import B
-from spy.vm.primitive import W_I32, W_Dynamic
+from spy.vm.irtag import IRTag
+from spy.vm.modules.types import W_Loc
+from spy.vm.opspec import W_MetaArg, W_OpSpec
+from spy.vm.primitive import W_I8, W_I32, W_U8, W_Dynamic
 from spy.vm.str import W_Str
 from spy.vm.struct import W_Struct, W_StructType
 from spy.vm.w import W_Object, W_Type
@@ -50,7 +53,8 @@ def w_gc_alloc(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
         n = vm.unwrap_i32(w_n)
         size = ITEMSIZE * n
         addr = vm.ll.call("spy_gc_alloc", size)
-        return W_Ptr(w_ptrtype, addr, n)  # type: ignore
+        llalloc = vm.ll.own(addr, size)
+        return W_Ptr(w_ptrtype, addr, n, llalloc)  # type: ignore
 
     return w_fn
 
@@ -86,6 +90,10 @@ def generic_mem_read(vm: "SPyVM", addr: int, w_T: W_Type) -> W_Object:
         return vm.wrap(vm.ll.mem.read_i32(addr))
     elif w_T is B.w_f64:
         return vm.wrap(vm.ll.mem.read_f64(addr))
+    elif w_T is B.w_i8:
+        return W_I8(vm.ll.mem.read_i8(addr))
+    elif w_T is B.w_u8:
+        return W_U8(vm.ll.mem.read_u8(addr))
     elif w_T is B.w_str:
         v_addr, v_length = vm.ll.mem.read_ptr(addr)
         assert v_length == 1
@@ -112,13 +120,22 @@ def generic_mem_write(vm: "SPyVM", addr: int, w_T: W_Type, w_val: W_Object) -> N
     elif w_T is B.w_f64:
         v = vm.unwrap_f64(w_val)
         vm.ll.mem.write_f64(addr, v)
+    elif w_T is B.w_i8:
+        vm.ll.mem.write_i8(addr, vm.unwrap_i8(w_val))
+    elif w_T is B.w_u8:
+        vm.ll.mem.write_u8(addr, vm.unwrap_u8(w_val))
     elif w_T is B.w_str:
         assert isinstance(w_val, W_Str)
         v = w_val.ptr
+        if w_val.llalloc:
+            # the string is now reachable from linear memory
+            w_val.llalloc.escape()
         assert 0 < v < 2**31 - 1
         vm.ll.mem.write_ptr(addr, v, 1)
     elif isinstance(w_T, W_PtrType):
         assert isinstance(w_val, W_Ptr)
+        if w_val.llalloc:
+            w_val.llalloc.escape()
         vm.ll.mem.write_ptr(addr, w_val.addr, w_val.length)
     elif isinstance(w_T, W_StructType):
         assert isinstance(w_val, W_Struct)
@@ -129,3 +146,214 @@ def generic_mem_write(vm: "SPyVM", addr: int, w_T: W_Type, w_val: W_Object) -> N
             generic_mem_write(vm, addr + offset, w_field.w_T, w_val.values_w[fname])
     else:
         raise WIP(f"Cannot write memory of type `{w_T.fqn.human_name}`")
+
+
+# ======== bulk memory operations ========
+#
+# memcpy[T], memmove[T], memset[T] and fill[T] operate on a range of items of
+# a raw_ptr[T] or gc_ptr[T], e.g.:
+#
+#     memcpy[T](dst, dst_start, src, src_start, n)
+#
+# They are metafuncs: the actual implementation is registered in the
+# namespace of the ptr type (e.g. unsafe::gc_ptr[i32]::memcpy), and the C
+# backend maps it to the functions generated by unsafe.h:SPY_PTR_FUNCTIONS.
+#
+# In the interpreter each operation is a single copy of linear memory; like
+# getitem and store, they take an extra w_loc to report out-of-bounds errors.
+
+
+def check_ptr_range(
+    w_ptr: W_Ptr, start: int, n: int, opname: str, w_loc: W_Loc
+) -> None:
+    if n < 0 or start < 0 or start + n > w_ptr.length:
+        msg = (
+            f"ptr_{opname} out of bounds: 0x{w_ptr.addr:x}[{start}:{start + n}] "
+            f"(upper bound: {w_ptr.length})"
+        )
+        raise SPyError.simple("W_PanicError", msg, "", w_loc.loc)
+
+
+def get_ptrtype(vm: "SPyVM", w_T: W_Type, wam_ptr: W_MetaArg) -> W_PtrType:
+    w_ptrtype = wam_ptr.w_static_T
+    if not isinstance(w_ptrtype, W_PtrType) or w_ptrtype.w_itemT is not w_T:
+        t = w_T.fqn.human_name
+        got = w_ptrtype.fqn.human_name
+        err = SPyError("W_TypeError", f"expected `raw_ptr[{t}]` or `gc_ptr[{t}]`")
+        err.add("error", f"this is `{got}`", wam_ptr.loc)
+        raise err
+    return w_ptrtype
+
+
+def make_copy_func(vm: "SPyVM", w_T: W_Type, opname: str) -> W_Dynamic:
+    ITEMSIZE = sizeof(w_T)
+
+    # unsafe::memcpy[T] and unsafe::memmove[T]
+    @vm.register_builtin_func(
+        "unsafe", opname, [w_T.fqn], color="blue", kind="metafunc"
+    )
+    def w_copy_T(
+        vm: "SPyVM",
+        wam_dst: W_MetaArg,
+        wam_dst_start: W_MetaArg,
+        wam_src: W_MetaArg,
+        wam_src_start: W_MetaArg,
+        wam_n: W_MetaArg,
+    ) -> W_OpSpec:
+        w_ptrtype = get_ptrtype(vm, w_T, wam_dst)
+        w_srctype = get_ptrtype(vm, w_T, wam_src)
+        if w_srctype is not w_ptrtype:
+            err = SPyError(
+                "W_TypeError", f"{opname} between different kinds of pointers"
+            )
+            err.add("error", f"this is `{w_ptrtype.fqn.human_name}`", wam_dst.loc)
+            err.add("error", f"this is `{w_srctype.fqn.human_name}`", wam_src.loc)
+            raise err
+        PTR = Annotated[W_Ptr, w_ptrtype]
+        irtag = IRTag(f"ptr.{opname}")
+
+        # unsafe::gc_ptr[i32]::memcpy
+        @vm.register_builtin_func(w_ptrtype.fqn, opname, irtag=irtag)
+        def w_ptr_copy(
+            vm: "SPyVM",
+            w_dst: PTR,
+            w_dst_start: W_I32,
+            w_src: PTR,
+            w_src_start: W_I32,
+            w_n: W_I32,
+            w_loc: W_Loc,
+        ) -> None:
+            dst_start = int(vm.unwrap_i32(w_dst_start))
+            src_start = int(vm.unwrap_i32(w_src_start))
+            n = int(vm.unwrap_i32(w_n))
+            check_ptr_range(w_dst, dst_start, n, opname, w_loc)
+            check_ptr_range(w_src, src_start, n, opname, w_loc)
+            if n == 0:
+                return
+            # read() makes a copy, so this is correct also for overlapping
+            # ranges, i.e. it is always a memmove
+            mem = vm.ll.mem
+            data = mem.read(w_src.addr + src_start * ITEMSIZE, n * ITEMSIZE)
+            mem.write(w_dst.addr + dst_start * ITEMSIZE, data)
+
+        wam_loc = W_MetaArg.from_w_obj(vm, W_Loc(wam_dst.loc))
+        args_wam = [wam_dst, wam_dst_start, wam_src, wam_src_start, wam_n, wam_loc]
+        return W_OpSpec(w_ptr_copy, args_wam)
+
+    return w_copy_T
+
+
+@UNSAFE.builtin_func(color="blue", kind="generic")
+def w_memcpy(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
+    """
+    memcpy[T](dst, dst_start, src, src_start, n): copy n items from src to
+    dst. The two ranges must not overlap.
+    """
+    return make_copy_func(vm, w_T, "memcpy")
+
+
+@UNSAFE.builtin_func(color="blue", kind="generic")
+def w_memmove(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
+    """
+    memmove[T](dst, dst_start, src, src_start, n): like memcpy[T], but the
+    two ranges can overlap.
+    """
+    return make_copy_func(vm, w_T, "memmove")
+
+
+@UNSAFE.builtin_func(color="blue", kind="generic")
+def w_memset(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
+    """
+    memset[T](ptr, start, byte, n): set all the bytes of n items to the
+    given value, usually 0.
+    """
+    ITEMSIZE = sizeof(w_T)
+
+    # unsafe::memset[T]
+    @vm.register_builtin_func(
+        "unsafe", "memset", [w_T.fqn], color="blue", kind="metafunc"
+    )
+    def w_memset_T(
+        vm: "SPyVM",
+        wam_ptr: W_MetaArg,
+        wam_start: W_MetaArg,
+        wam_byte: W_MetaArg,
+        wam_n: W_MetaArg,
+    ) -> W_OpSpec:
+        w_ptrtype = get_ptrtype(vm, w_T, wam_ptr)
+        PTR = Annotated[W_Ptr, w_ptrtype]
+        irtag = IRTag("ptr.memset")
+
+        # unsafe::gc_ptr[i32]::memset
+        @vm.register_builtin_func(w_ptrtype.fqn, "memset", irtag=irtag)
+        def w_ptr_memset(
+            vm: "SPyVM",
+            w_ptr: PTR,
+            w_start: W_I32,
+            w_byte: W_I32,
+            w_n: W_I32,
+            w_loc: W_Loc,
+        ) -> None:
+            start = int(vm.unwrap_i32(w_start))
+            n = int(vm.unwrap_i32(w_n))
+            check_ptr_range(w_ptr, start, n, "memset", w_loc)
+            byte = int(vm.unwrap_i32(w_byte)) & 0xFF
+            addr = w_ptr.addr + start * ITEMSIZE
+            vm.ll.mem.write(addr, bytes([byte]) * (n * ITEMSIZE))
+
+        wam_loc = W_MetaArg.from_w_obj(vm, W_Loc(wam_ptr.loc))
+        return W_OpSpec(w_ptr_memset, [wam_ptr, wam_start, wam_byte, wam_n, wam_loc])
+
+    return w_memset_T
+
+
+@UNSAFE.builtin_func(color="blue", kind="generic")
+def w_fill(vm: "SPyVM", w_T: W_Type) -> W_Dynamic:
+    """
+    fill[T](ptr, start, value, n): store value into n items
+    """
+    ITEMSIZE = sizeof(w_T)
+    T = Annotated[W_Object, w_T]
+
+    # unsafe::fill[T]
+    @vm.register_builtin_func(
+        "unsafe", "fill", [w_T.fqn], color="blue", kind="metafunc"
+    )
+    def w_fill_T(
+        vm: "SPyVM",
+        wam_ptr: W_MetaArg,
+        wam_start: W_MetaArg,
+        wam_v: W_MetaArg,
+        wam_n: W_MetaArg,
+    ) -> W_OpSpec:
+        w_ptrtype = get_ptrtype(vm, w_T, wam_ptr)
+        PTR = Annotated[W_Ptr, w_ptrtype]
+        irtag = IRTag("ptr.fill")
+
+        # unsafe::gc_ptr[i32]::fill
+        @vm.register_builtin_func(w_ptrtype.fqn, "fill", irtag=irtag)
+        def w_ptr_fill(
+            vm: "SPyVM",
+            w_ptr: PTR,
+            w_start: W_I32,
+            w_v: T,
+            w_n: W_I32,
+            w_loc: W_Loc,
+        ) -> None:
+            start = int(vm.unwrap_i32(w_start))
+            n = int(vm.unwrap_i32(w_n))
+            check_ptr_range(w_ptr, start, n, "fill", w_loc)
+            if n == 0:
+                return
+            # write the first item, then replicate its bytes
+            addr = w_ptr.addr + start * ITEMSIZE
+            generic_mem_write(vm, addr, w_T, w_v)
+            mem = vm.ll.mem
+            if n > 1:
+                item = mem.read(addr, ITEMSIZE)
+                mem.write(addr + ITEMSIZE, item * (n - 1))
+
+        wam_loc = W_MetaArg.from_w_obj(vm, W_Loc(wam_ptr.loc))
+        return W_OpSpec(w_ptr_fill, [wam_ptr, wam_start, wam_v, wam_n, wam_loc])
+
+    return w_fill_T
@@ -30,6 +30,7 @@ import fixedint
 
 from spy.errors import WIP, SPyError
 from spy.fqn import FQN
+from spy.libspy import LLAlloc
 from spy.location import Loc
 from spy.vm.b import B
 from spy.vm.builtin import builtin_method, builtin_property
@@ -110,6 +111,9 @@ class W_MemLocType(W_Type):
     The base type for all ptrs and refs
     """
 
+    # __getitem__ and __setitem__ hardcode the loc of the ptr in the opimpl
+    __spy_metaarg_key_has_loc__ = True
+
     memkind: MEMKIND
     w_itemT: Annotated[W_Type, Member("itemtype")]
 
@@ -210,22 +214,30 @@ class W_MemLoc(W_Object):
     # need to think of a more general solution
     addr: fixedint.Int32
     length: fixedint.Int32  # how many items in the array
+    # for gc memory allocated by the interpreter: all the ptrs and refs which
+    # point inside the same block share the same LLAlloc, and the block is
+    # freed when the last of them dies. See libspy.LLAlloc.
+    llalloc: Optional[LLAlloc]
 
     def __init__(
         self,
         w_T: W_MemLocType,
         addr: int | fixedint.Int32,
         length: int | fixedint.Int32,
+        llalloc: Optional[LLAlloc] = None,
     ) -> None:
         assert type(addr) in (int, fixedint.Int32)
         assert type(length) in (int, fixedint.Int32)
         if addr == 0:
             assert length == 0
         else:
-            assert length >= 1
+            # length can be 0 e.g. for gc_alloc[T](0), which still returns a
+            # valid address
+            assert length >= 0
         self.w_T = w_T
         self.addr = fixedint.Int32(addr)
         self.length = fixedint.Int32(length)
+        self.llalloc = llalloc
 
     def spy_get_w_type(self, vm: "SPyVM") -> W_Type:
         return self.w_T
@@ -355,7 +367,7 @@ class W_Ptr(W_MemLoc):
 
             if by == "byref":
                 assert isinstance(w_itemT, W_RefType)
-                return W_Ref(w_itemT, addr, length - i)
+                return W_Ref(w_itemT, addr, length - i, w_ptr.llalloc)
             else:
                 return vm.call_generic(UNSAFE.w_mem_read, [w_itemT], [vm.wrap(addr)])
 
@@ -498,7 +510,7 @@ def w_ptr_getfield(vm: "SPyVM", w_T: W_Type, w_memkind: W_Str) -> W_Dynamic:
         addr = w_ptr.addr + vm.unwrap_i32(w_offset)
         if by == "byref":
             assert isinstance(w_T, W_RefType)
-            return W_Ref(w_T, addr, 1)
+            return W_Ref(w_T, addr, 1, w_ptr.llalloc)
         else:
             return vm.call_generic(UNSAFE.w_mem_read, [w_T], [vm.wrap(addr)])
 
@@ -187,6 +187,11 @@ class W_Object:
     #   - 'reference': compare by identity
     __spy_storage_category__ = "reference"
 
+    # If True, spy_key() never changes during the lifetime of the object, so
+    # that BlueCache.get_key can compute it only once. It makes sense only for
+    # classes which override spy_key().
+    __spy_key_cacheable__ = False
+
     def __repr__(self) -> str:
         fqn = self._w.fqn
         addr = f"0x{id(self):x}"
@@ -421,6 +426,11 @@ class W_Type(W_Object):
     _pyclass: Optional[Type[W_Object]]
     _dict_w: Optional[dict[str, W_Object]]
 
+    # If True, the metafuncs of this type use the loc of their W_MetaArgs to
+    # compute the result (e.g. to hardcode the location of a panic), so the
+    # loc must be part of the W_MetaArg.spy_key.
+    __spy_metaarg_key_has_loc__ = False
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         cls = self.__class__.__name__
         raise TypeError(
@@ -0,0 +1,183 @@
+import sys
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence, TextIO
+
+from spy import ast
+from spy.vm.bluecache import UNCACHEABLE
+from spy.vm.function import W_Func
+from spy.vm.opimpl import W_OpImpl
+from spy.vm.opspec import W_MetaArg
+
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+# maximum number of entries per node. Nodes which see more than MAX_ENTRIES
+# different combinations of types become "megamorphic" and are no longer
+# cached.
+MAX_ENTRIES = 4
+
+OPCACHE_KEY = tuple[Any, ...]
+
+
+class InlineCache:
+    """
+    The cache for a single AST node.
+
+    It is a list of (key, w_opimpl) pairs: with only one entry, the cache is
+    monomorphic, with more entries it is polymorphic.
+    """
+
+    # for each argument, whether it is a literal. See OpCache.make_key
+    is_literal: tuple[bool, ...]
+    entries: list[tuple[OPCACHE_KEY, W_OpImpl]]
+    megamorphic: bool
+
+    def __init__(self, arg_exprs: Sequence[ast.Expr]) -> None:
+        self.is_literal = tuple(
+            isinstance(expr, (ast.Constant, ast.StrConst)) for expr in arg_exprs
+        )
+        self.entries = []
+        self.megamorphic = False
+
+    def lookup(self, key: OPCACHE_KEY) -> Optional[W_OpImpl]:
+        for k, w_opimpl in self.entries:
+            if k == key:
+                return w_opimpl
+        return None
+
+
+class OpCache:
+    """
+    Inline caches for the operators of non-redshifted frames.
+
+    When ASTFrame evaluates e.g. an ast.BinOp, it calls vm.call_OP to find the
+    W_OpImpl to execute. call_OP goes through the BlueCache, which is relatively
+    expensive: it needs to compute spy_key() of all the W_MetaArgs involved.
+
+    But the result of call_OP depends only on the color and the static type of
+    red arguments (and on the value of blue arguments), and these rarely
+    change between two executions of the same node. So, we keep a small cache
+    of W_OpImpls for each node.
+
+    The caches are kept in a side table instead of on the nodes themselves,
+    because AST nodes are saved in .spyc files, while opimpls belong to a
+    single VM.
+
+    The side table is indexed by the FuncDef (or Module, or ClassDef) whose
+    frame executes the nodes: when a function is redshifted, the original
+    version is never executed again, and vm._redshift_one calls forget() to
+    release its nodes and opimpls.
+    """
+
+    vm: "SPyVM"
+    caches: dict[ast.Node, dict[ast.Node, InlineCache]]
+    hits: int
+    misses: int
+
+    def __init__(self, vm: "SPyVM") -> None:
+        self.vm = vm
+        self.caches = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_caches(self, owner: ast.Node) -> dict[ast.Node, InlineCache]:
+        """
+        Return the caches for the nodes executed by the frames of `owner`
+        """
+        caches = self.caches.get(owner)
+        if caches is None:
+            caches = self.caches[owner] = {}
+        return caches
+
+    def forget(self, owner: ast.Node) -> None:
+        """
+        Drop all the caches for the nodes executed by the frames of `owner`
+        """
+        self.caches.pop(owner, None)
+
+    def make_key(
+        self, cache: InlineCache, args_wam: Sequence[W_MetaArg]
+    ) -> Optional[OPCACHE_KEY]:
+        """
+        Compute the key for the given arguments, or None if they cannot be
+        cached.
+
+        Literals evaluate always to the same blue value, so we don't need to
+        include them in the key. This is especially important for the attribute
+        name of ast.GetAttr, since computing the spy_key() of a W_Str is costly.
+        """
+        key: list[Any] = []
+        for is_literal, wam in zip(cache.is_literal, args_wam):
+            if is_literal:
+                key.append(None)
+            elif wam.color == "red":
+                key.append(wam.w_static_T)
+            else:
+                val = self.vm.bluecache.get_key(wam.w_blueval)
+                if val is UNCACHEABLE:
+                    return None
+                key.append((wam.w_static_T, val))
+        return tuple(key)
+
+    def call_OP(
+        self,
+        caches: dict[ast.Node, InlineCache],
+        node: ast.Node,
+        w_OP: W_Func,
+        arg_exprs: Sequence[ast.Expr],
+        args_wam: Sequence[W_MetaArg],
+    ) -> W_OpImpl:
+        """
+        Equivalent to vm.call_OP(node.loc, w_OP, args_wam), but cached.
+
+        caches is the result of get_caches() for the current frame, and
+        arg_exprs are the expressions which args_wam come from.
+        """
+        cache = caches.get(node)
+        if cache is None:
+            cache = caches[node] = InlineCache(arg_exprs)
+        elif cache.megamorphic:
+            self.misses += 1
+            return self.vm.call_OP(node.loc, w_OP, args_wam)
+
+        key = self.make_key(cache, args_wam)
+        if key is None:
+            self.misses += 1
+            return self.vm.call_OP(node.loc, w_OP, args_wam)
+        w_opimpl = cache.lookup(key)
+        if w_opimpl is not None:
+            self.hits += 1
+            return w_opimpl
+
+        self.misses += 1
+        w_opimpl = self.vm.call_OP(node.loc, w_OP, args_wam)
+        if len(cache.entries) < MAX_ENTRIES:
+            cache.entries.append((key, w_opimpl))
+        else:
+            cache.entries = []
+            cache.megamorphic = True
+        return w_opimpl
+
+    def iter_caches(self) -> Iterator[tuple[ast.Node, InlineCache]]:
+        for caches in self.caches.values():
+            yield from caches.items()
+
+    def pp(self, file: Optional[TextIO] = None) -> None:
+        if file is None:
+            file = sys.stdout
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0.0
+        n_mono = n_poly = n_mega = 0
+        for _, cache in self.iter_caches():
+            if cache.megamorphic:
+                n_mega += 1
+            elif len(cache.entries) > 1:
+                n_poly += 1
+            else:
+                n_mono += 1
+        print(
+            f"OpCache: {self.hits} hits, {self.misses} misses ({ratio:.1f}% hits)",
+            file=file,
+        )
+        print(f"  monomorphic nodes: {n_mono}", file=file)
+        print(f"  polymorphic nodes: {n_poly}", file=file)
+        print(f"  megamorphic nodes: {n_mega}", file=file)
@@ -33,6 +33,7 @@ from spy.analyze.symtable import Color, Symbol
 from spy.errors import SPyError
 from spy.location import Loc
 from spy.vm.b import OPERATOR, B
+from spy.vm.bluecache import UNCACHEABLE
 from spy.vm.builtin import builtin_class_attr, builtin_method, builtin_property
 from spy.vm.function import W_Func, W_FuncType
 from spy.vm.member import Member
@@ -89,6 +90,7 @@ class W_MetaArg(W_Object):
     """
 
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
 
     color: Color
     w_static_T: Annotated[W_Type, Member("static_type")]
@@ -129,13 +131,21 @@ class W_MetaArg(W_Object):
         """
         Two red opargs are equal if they have the same static types.
         Two blue opargs are equal if they also have the same values.
+
+        Opargs whose type has __spy_metaarg_key_has_loc__ are equal only if
+        they also have the same loc.
         """
         t = self.w_static_T.spy_key(vm)
+        if self.w_static_T.__spy_metaarg_key_has_loc__:
+            t = (t, self.loc)
         if self.color == "red":
             return ("MetaArg", "red", t, None)
         else:
             assert self._w_val is not None
-            return ("MetaArg", "blue", t, self._w_val.spy_key(vm))
+            val = vm.bluecache.get_key(self._w_val)
+            if val is UNCACHEABLE:
+                return UNCACHEABLE
+            return ("MetaArg", "blue", t, val)
 
     @builtin_method("__new__")
     @staticmethod
@@ -0,0 +1,266 @@
+"""
+Snapshots of a fully initialized SPyVM.
+
+Creating a SPyVM is relatively expensive: we need a new instance of
+libspy.wasm, to populate all the builtin modules, and typically to import the
+stdlib (_list, _dict, ...), which means to execute their blue code. With
+vm.snapshot() we capture the state of a VM once, and then
+SPyVM.from_snapshot() creates new independent VMs out of it, without
+re-executing anything:
+
+    vm = SPyVM()
+    vm.import_("_list")
+    snap = vm.snapshot()
+    ...
+    vm2 = SPyVM.from_snapshot(snap)
+
+The snapshot contains a copy of the linear memory of libspy and a copy of the
+tables of the VM (globals_w, irtags, modules_w and the BlueCache). Most of the
+linear memory is identical to the one of a fresh instance of libspy (e.g. it
+is still zero, or it contains the static data): so we store only the chunks
+which are different, and we write only those when restoring.
+
+The W_Objects themselves are shared by the snapshot and by all the VMs
+created from it, in the same way as e.g. B.w_True is shared by all the VMs.
+This works because most W_Objects never change after they have been created;
+the few exceptions are handled explicitly:
+
+  - W_Module and W_Cell are mutable: each VM gets its own copy;
+
+  - the redshift of a W_ASTFunc invalidates it, so each VM gets its own copy
+    of the red functions in globals_w. The original functions might still be
+    reachable through other paths (e.g. the methods of a type): if the
+    source VM redshifts them, W_ASTFunc.raw_call forwards the calls to the
+    redshifted version, which is equivalent;
+
+  - a W_Str is materialized lazily in the linear memory of the VM which
+    created it: before copying the memory, we materialize all the strings
+    reachable from the VM, so that their spy_Str is the same in all the
+    copies.
+
+vm.snapshot() does not change the source VM: it keeps using its own modules
+and cells, and the snapshot stores separate copies of them.
+
+Things which live outside the linear memory, such as the files opened by
+posix.open(), are not part of the snapshot.
+
+If the memory of the VM has grown, restore() grows the memory of the fresh
+instance to the same size. On emscripten the memory has a fixed size, so
+this never happens there.
+"""
+
+import copy
+import gc
+import types
+import weakref
+from typing import TYPE_CHECKING, Iterator
+
+from spy.fqn import FQN
+from spy.libspy import LLSPyInstance
+from spy.llwasm import LLWasmModule
+from spy.vm.bluecache import ARGS_KEY, InternedKey
+from spy.vm.cell import W_Cell
+from spy.vm.function import W_ASTFunc, W_Func
+from spy.vm.irtag import IRTag
+from spy.vm.module import W_Module
+from spy.vm.object import W_Object
+from spy.vm.str import W_Str
+
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+WASM_PAGE_SIZE = 65536
+CHUNK_SIZE = 4096
+
+
+class VMSnapshot:
+    """
+    The frozen state of a SPyVM, see the module docstring.
+
+    The objects which are copied into each VM (modules, cells and red
+    functions) are never given to anybody: they are only used as templates.
+    """
+
+    llmod: LLWasmModule
+    memory_size: int
+    chunks: list[tuple[int, bytes]]  # [(addr, content), ...]
+    globals_w: dict[FQN, W_Object]
+    irtags: dict[FQN, IRTag]
+    modules_w: dict[str, W_Module]
+    path: list[str]
+    bluecache_data: dict[W_Func, dict[ARGS_KEY, W_Object]]
+    bluecache_interned: "weakref.WeakValueDictionary[object, InternedKey]"
+
+    def __init__(self, vm: "SPyVM") -> None:
+        ll = vm.ll
+        assert ll.call_depth == 0, "cannot take a snapshot while running WASM code"
+        materialize_strings(vm)
+        if ll.pending_free:
+            # else the dead blocks would be leaked by all the copies
+            ll.free_pending()
+        self.llmod = ll.llmod
+        self.memory_size = ll.mem.size()
+        self.chunks = diff_memory(ll, LLSPyInstance(self.llmod))
+        self.irtags = dict(vm.irtags)
+        self.path = list(vm.path)
+        self.bluecache_data = {
+            w_func: dict(entries) for w_func, entries in vm.bluecache.data.items()
+        }
+        self.bluecache_interned = weakref.WeakValueDictionary(vm.bluecache.interned)
+        # the snapshot keeps its own copies of the mutable objects: the VM
+        # keeps using the originals, so that the W_Modules and W_Cells which
+        # the caller holds are still the live ones
+        self.globals_w, self.modules_w = copy_mutable_objects(
+            vm.globals_w, vm.modules_w
+        )
+
+    def __repr__(self) -> str:
+        n = len(self.globals_w)
+        kb = len(self.chunks) * CHUNK_SIZE // 1024
+        return f"<VMSnapshot ({n} globals, {kb} KB of linear memory)>"
+
+    def restore(self, vm: "SPyVM") -> None:
+        """
+        Restore the snapshot into a freshly created VM
+        """
+        assert vm.ll.llmod is self.llmod
+        mem = vm.ll.mem
+        size = mem.size()
+        if size < self.memory_size:
+            mem.grow((self.memory_size - size) // WASM_PAGE_SIZE)
+        for addr, content in self.chunks:
+            mem.write(addr, content)
+        vm.irtags = dict(self.irtags)
+        vm.path = list(self.path)
+        vm.bluecache.data = {
+            w_func: dict(entries) for w_func, entries in self.bluecache_data.items()
+        }
+        vm.bluecache.interned = weakref.WeakValueDictionary(self.bluecache_interned)
+        vm.globals_w, vm.modules_w = copy_mutable_objects(
+            self.globals_w, self.modules_w
+        )
+
+
+def diff_memory(ll: LLSPyInstance, pristine: LLSPyInstance) -> list[tuple[int, bytes]]:
+    """
+    Return the chunks of the memory of ll which are different from the
+    memory of a fresh instance.
+    """
+    size = ll.mem.size()
+    mem = ll.mem.read_view(0, size)
+    pristine_size = pristine.mem.size()
+    pristine_mem = pristine.mem.read_view(0, pristine_size)
+    chunks = []
+    for addr in range(0, size, CHUNK_SIZE):
+        chunk = mem[addr : addr + CHUNK_SIZE]
+        if addr < pristine_size:
+            if chunk == pristine_mem[addr : addr + CHUNK_SIZE]:
+                continue
+        elif not any(chunk):
+            continue
+        chunks.append((addr, bytes(chunk)))
+    return chunks
+
+
+def materialize_strings(vm: "SPyVM") -> None:
+    """
+    Make sure that all the W_Str which are reachable from the tables of the
+    VM are materialized and that their content has been read, so that they
+    are valid in all the copies of the linear memory.
+    """
+    for w_s in reachable_strings(vm):
+        w_s.get_utf8()
+        w_s.ptr
+
+
+def reachable_strings(vm: "SPyVM") -> Iterator[W_Str]:
+    """
+    Yield the W_Str of the VM which are reachable from globals_w, modules_w
+    and the BlueCache.
+
+    We don't follow the references to the VMs, to the Python modules and
+    classes and to the globals of Python functions: all the W_Objects of the
+    VM are reachable from its tables anyway, and following them would mean
+    walking the whole Python heap.
+    """
+    from spy.vm.vm import SPyVM
+
+    roots = [vm.globals_w, vm.modules_w, vm.bluecache.data]
+    seen: set[int] = set()
+    todo: list[object] = [roots]
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if type(obj) is W_Str:
+            if obj.vm is vm:
+                yield obj
+            continue
+        if isinstance(obj, types.FunctionType):
+            refs = [obj.__closure__, obj.__defaults__, obj.__kwdefaults__]
+        else:
+            refs = gc.get_referents(obj)
+        for ref in refs:
+            if not isinstance(ref, SKIP_TYPES) and not isinstance(ref, SPyVM):
+                todo.append(ref)
+
+
+# objects which cannot contain W_Strs, or which we must not follow
+SKIP_TYPES = (
+    type,
+    types.ModuleType,
+    LLSPyInstance,
+    str,
+    bytes,
+    int,
+    float,
+    type(None),
+)
+
+
+def copy_mutable_objects(
+    globals_w: dict[FQN, W_Object], modules_w: dict[str, W_Module]
+) -> tuple[dict[FQN, W_Object], dict[str, W_Module]]:
+    """
+    Return new globals_w and modules_w, which contain copies of all the
+    modules, cells and red functions.
+    """
+    copies: dict[int, W_Object] = {}  # id(original) -> copy
+
+    def copy_obj(w_obj: W_Object) -> W_Object:
+        if isinstance(w_obj, W_ASTFunc):
+            if w_obj.color == "blue":
+                # blue functions are never redshifted, and they are used as
+                # keys by the BlueCache: they must be shared
+                return w_obj
+            w_func = copy.copy(w_obj)
+            w_func.compiled = None
+            return w_func
+        elif isinstance(w_obj, W_Cell):
+            return W_Cell(w_obj.fqn, w_obj.get())
+        elif isinstance(w_obj, W_Module):
+            w_mod = copy.copy(w_obj)
+            w_mod._dict_w = {}
+            return w_mod
+        else:
+            return w_obj
+
+    new_globals_w = {}
+    for fqn, w_obj in globals_w.items():
+        w_copy = copies.get(id(w_obj))
+        if w_copy is None:
+            w_copy = copies[id(w_obj)] = copy_obj(w_obj)
+        new_globals_w[fqn] = w_copy
+
+    new_modules_w = {}
+    for modname, w_mod in modules_w.items():
+        w_newmod = copies.get(id(w_mod))
+        if w_newmod is None:
+            w_newmod = copies[id(w_mod)] = copy_obj(w_mod)
+        assert isinstance(w_newmod, W_Module)
+        for attr, w_val in w_mod.items_w():
+            w_newmod.setattr(attr, copies.get(id(w_val), w_val))
+        new_modules_w[modname] = w_newmod
+
+    return new_globals_w, new_modules_w
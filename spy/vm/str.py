@@ -1,5 +1,6 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
+from spy.libspy import LLAlloc
 from spy.llwasm import LLWasmInstance
 from spy.vm.b import BUILTINS, B
 from spy.vm.builtin import builtin_method
@@ -18,53 +19,155 @@ def ll_spy_Str_new(ll: LLWasmInstance, s: str) -> int:
 
     Return the corresponding 'spy_Str *'
     """
-    utf8 = s.encode("utf-8")
+    return ll_spy_Str_new_utf8(ll, s.encode("utf-8"))
+
+
+def ll_spy_Str_new_utf8(ll: LLWasmInstance, utf8: bytes) -> int:
+    """
+    Like ll_spy_Str_new, but take the already-encoded utf8 bytes.
+    """
     length = len(utf8)
     ptr = ll.call("spy_str_alloc", length)
     ll.mem.write(ptr + 8, utf8)
     return ptr
 
 
+def ll_spy_str_hash(utf8: bytes) -> int:
+    """
+    Compute the same hash as spy_str_hash (FNV-1a), which is never 0.
+    """
+    h = 2166136261
+    for b in utf8:
+        h = ((h ^ b) * 16777619) & 0xFFFFFFFF
+    if h >= 2**31:
+        h -= 2**32
+    if h == -1:
+        h = -2
+    if h == 0:
+        h = 1
+    return h
+
+
 @B.builtin_type("str", lazy_definition=True)
 class W_Str(W_Object):
     """
     An unicode string, internally represented as UTF-8.
 
-    This is basically a 'spy_Str *', i.e. a pointer to a C struct which
-    resides in the linear memory of the VM:
+    W_Str has a dual representation. On the host side, it holds a Python str
+    and/or its utf8 bytes. In the linear memory of the VM, it is a
+    'spy_Str *', i.e. a pointer to a C struct:
         typedef struct {
             size_t length;
             int32_t hash;
             const char utf8[];
         } spy_Str;
+
+    Strings created by the interpreter live only on the host, and they are
+    materialized into linear memory the first time that .ptr is needed (e.g.
+    to pass them to libspy or to store them in unsafe memory). Strings which
+    come from linear memory are read lazily, and the content is cached: the
+    content of a spy_Str never changes.
     """
 
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
     vm: "SPyVM"
-    ptr: int
+    _s: Optional[str]
+    _utf8: Optional[bytes]
+    _ptr: int  # 0 if not materialized yet
+    _hash: int  # 0 if not computed yet, like spy_Str.hash
+    # the memory is freed when the W_Str dies, unless it's shared with someone
+    # else. See libspy.LLAlloc.
+    llalloc: Optional[LLAlloc]
 
     def __init__(self, vm: "SPyVM", s: str) -> None:
-        ptr = ll_spy_Str_new(vm.ll, s)
         self.vm = vm
-        self.ptr = ptr
+        self._s = s
+        self._utf8 = None
+        self._ptr = 0
+        self._hash = 0
+        self.llalloc = None
 
     @staticmethod
-    def from_ptr(vm: "SPyVM", ptr: int) -> "W_Str":
+    def from_utf8(vm: "SPyVM", utf8: bytes) -> "W_Str":
         w_res = W_Str.__new__(W_Str)
         w_res.vm = vm
-        w_res.ptr = ptr
+        w_res._s = None
+        w_res._utf8 = utf8
+        w_res._ptr = 0
+        w_res._hash = 0
+        w_res.llalloc = None
         return w_res
 
+    @staticmethod
+    def from_ptr(vm: "SPyVM", ptr: int, *, owned: bool = False) -> "W_Str":
+        """
+        Wrap an existing 'spy_Str *'. Pass owned=True if the string was just
+        allocated by libspy and nobody else has a reference to it: in that
+        case, it will be freed together with the W_Str.
+        """
+        w_res = W_Str.__new__(W_Str)
+        w_res.vm = vm
+        w_res._s = None
+        w_res._utf8 = None
+        w_res._ptr = ptr
+        w_res._hash = 0
+        w_res.llalloc = None
+        if owned:
+            w_res.llalloc = vm.ll.own(ptr, 8 + w_res.get_length())
+        return w_res
+
+    @property
+    def ptr(self) -> int:
+        """
+        The 'spy_Str *' of this string. Materialize it if needed.
+        """
+        if self._ptr == 0:
+            utf8 = self.get_utf8()
+            ptr = ll_spy_Str_new_utf8(self.vm.ll, utf8)
+            if self._hash != 0:
+                self.vm.ll.mem.write_i32(ptr + 4, self._hash)
+            self._ptr = ptr
+            self.llalloc = self.vm.ll.own(ptr, 8 + len(utf8))
+        return self._ptr
+
+    def is_materialized(self) -> bool:
+        return self._ptr != 0
+
     def get_length(self) -> int:
-        return self.vm.ll.mem.read_i32(self.ptr)
+        if self._utf8 is None and self._s is None:
+            return self.vm.ll.mem.read_i32(self._ptr)
+        return len(self.get_utf8())
 
     def get_utf8(self) -> bytes:
-        length = self.get_length()
-        ba = self.vm.ll.mem.read(self.ptr + 8, length)
-        return bytes(ba)
+        if self._utf8 is None:
+            if self._s is not None:
+                self._utf8 = self._s.encode("utf-8")
+            else:
+                length = self.vm.ll.mem.read_i32(self._ptr)
+                self._utf8 = bytes(self.vm.ll.mem.read_view(self._ptr + 8, length))
+        return self._utf8
+
+    def get_str_maybe(self) -> Optional[str]:
+        """
+        Return the host-side str, if we have it. Useful for fast paths which
+        don't want to encode, decode or read the linear memory.
+        """
+        return self._s
 
     def _as_str(self) -> str:
-        return self.get_utf8().decode("utf-8")
+        if self._s is None:
+            self._s = self.get_utf8().decode("utf-8")
+        return self._s
+
+    def get_hash(self) -> int:
+        """
+        Same as spy_str_hash, so that the result doesn't depend on whether the
+        string is materialized.
+        """
+        if self._hash == 0:
+            self._hash = ll_spy_str_hash(self.get_utf8())
+        return self._hash
 
     def __repr__(self) -> str:
         s = self._as_str()
@@ -97,22 +200,107 @@ class W_Str(W_Object):
     @builtin_method("__getitem__")
     @staticmethod
     def w_getitem(vm: "SPyVM", w_s: "W_Str", w_i: W_I32) -> "W_Str":
+        from spy.errors import SPyError
+
         assert isinstance(w_s, W_Str)
         assert isinstance(w_i, W_I32)
-        ptr_c = vm.ll.call("spy_str_getitem", w_s.ptr, w_i.value)
-        return W_Str.from_ptr(vm, ptr_c)
+        # XXX this is wrong: it should return a code point. See spy_str_getitem
+        utf8 = w_s.get_utf8()
+        i = int(w_i.value)
+        if i < 0:
+            i += len(utf8)
+        if not (0 <= i < len(utf8)):
+            raise SPyError("W_IndexError", "string index out of bound")
+        return W_Str.from_utf8(vm, utf8[i : i + 1])
 
     @builtin_method("__len__")
     @staticmethod
     def w_len(vm: "SPyVM", w_s: "W_Str") -> W_I32:
         assert isinstance(w_s, W_Str)
-        length = vm.ll.call("spy_str_len", w_s.ptr)
-        return vm.wrap(length)
+        return vm.wrap(w_s.get_length())
 
     @builtin_method("replace")
     @staticmethod
     def w_replace(
         vm: "SPyVM", w_original: "W_Str", w_old: "W_Str", w_new: "W_Str"
     ) -> "W_Str":
-        ptr_c = vm.ll.call("spy_str_replace", w_original.ptr, w_old.ptr, w_new.ptr)
-        return W_Str.from_ptr(vm, ptr_c)
+        utf8 = w_original.get_utf8().replace(w_old.get_utf8(), w_new.get_utf8())
+        return W_Str.from_utf8(vm, utf8)
+
+    @builtin_method("join", color="blue", kind="metafunc")
+    @staticmethod
+    def w_join(vm: "SPyVM", wam_sep: W_MetaArg, wam_items: W_MetaArg) -> "W_OpSpec":
+        from spy.errors import SPyError
+        from spy.fqn import FQN
+
+        # str.join is implemented in SPy on top of StringBuilder, see
+        # _list::_str_join. For now we support only list[str].
+        w_T = wam_items.w_static_T
+        if "_list" in vm.modules_w:
+            w_list = vm.lookup_global(FQN("_list::list"))
+            w_liststr = vm.fast_call(w_list, [B.w_str])  # type: ignore
+            if w_T is w_liststr:
+                w_str_join = vm.lookup_global(FQN("_list::_str_join"))
+                return W_OpSpec(w_str_join, [wam_sep, wam_items])  # type: ignore
+
+        t = w_T.fqn.human_name
+        raise SPyError.simple(
+            "W_TypeError",
+            f"str.join() expects a `list[str]`, got `{t}`",
+            f"this is `{t}`",
+            wam_items.loc,
+        )
+
+
+@B.builtin_type("StringBuilder")
+class W_StringBuilder(W_Object):
+    """
+    A growable buffer to build strings in amortized O(1) per append.
+
+    In the C backend it is a 'spy_StringBuilder *', see libspy/str.h. In the
+    interpreter we just collect the utf8 chunks in a Python list, which are
+    joined by build().
+    """
+
+    chunks: list[bytes]
+    length: int
+
+    def __init__(self) -> None:
+        self.chunks = []
+        self.length = 0
+
+    def __repr__(self) -> str:
+        return f"<spy StringBuilder ({self.length} bytes)>"
+
+    def build(self) -> bytes:
+        if len(self.chunks) > 1:
+            self.chunks = [b"".join(self.chunks)]
+        return self.chunks[0] if self.chunks else b""
+
+    @builtin_method("__new__")
+    @staticmethod
+    def w_new(vm: "SPyVM") -> "W_StringBuilder":
+        return W_StringBuilder()
+
+    @builtin_method("append")
+    @staticmethod
+    def w_append(vm: "SPyVM", w_sb: "W_StringBuilder", w_s: W_Str) -> None:
+        utf8 = w_s.get_utf8()
+        w_sb.chunks.append(utf8)
+        w_sb.length += len(utf8)
+
+    @builtin_method("reserve")
+    @staticmethod
+    def w_reserve(vm: "SPyVM", w_sb: "W_StringBuilder", w_n: W_I32) -> None:
+        # this is just a hint to avoid reallocations, nothing to do here
+        pass
+
+    @builtin_method("build")
+    @staticmethod
+    def w_build(vm: "SPyVM", w_sb: "W_StringBuilder") -> W_Str:
+        return W_Str.from_utf8(vm, w_sb.build())
+
+    @builtin_method("__len__")
+    @staticmethod
+    def w_len(vm: "SPyVM", w_sb: "W_StringBuilder") -> W_I32:
+        return vm.wrap(w_sb.length)
@@ -326,6 +326,7 @@ class W_Struct(W_Object):
 @TYPES.builtin_type("StructField")
 class W_StructField(W_Object):
     __spy_storage_category__ = "value"
+    __spy_key_cacheable__ = True
 
     def __init__(self, name: str, w_T: W_Type, offset: int, loc: Loc) -> None:
         self.name = name
@@ -430,14 +431,14 @@ def unwrap_dict(vm: "SPyVM", w_dict: W_Object) -> dict[Any, Any]:
     w_dict_T = vm.dynamic_type(w_dict)
     w_fastiter = vm.lookup_global(w_dict_T.fqn.join("__fastiter__"))
     w_it = vm.call_w(w_fastiter, [w_dict], color="red")
-    w_it_T = vm.dynamic_type(w_it)
-    w_continue_iteration = vm.lookup_global(w_it_T.fqn.join("__continue_iteration__"))
-    is_continue = vm.call_w(w_continue_iteration, [w_it], color="red")
-    w_next = vm.lookup_global(w_it_T.fqn.join("__next__"))
-    w_it = vm.call_w(w_next, [w_it], color="red")
-
-    while vm.unwrap_bool(is_continue):
+    while True:
         w_it_T = vm.dynamic_type(w_it)
+        w_continue_iteration = vm.lookup_global(
+            w_it_T.fqn.join("__continue_iteration__")
+        )
+        is_continue = vm.call_w(w_continue_iteration, [w_it], color="red")
+        if not vm.unwrap_bool(is_continue):
+            break
         w_item_method = vm.lookup_global(w_it_T.fqn.join("__item__"))
         w_key = vm.call_w(w_item_method, [w_it], color="red")
         w_val = vm.getitem_w(w_dict, w_key, color="red")
@@ -445,9 +446,5 @@ def unwrap_dict(vm: "SPyVM", w_dict: W_Object) -> dict[Any, Any]:
 
         w_next = vm.lookup_global(w_it_T.fqn.join("__next__"))
         w_it = vm.call_w(w_next, [w_it], color="red")
-        w_continue_iteration = vm.lookup_global(
-            w_it_T.fqn.join("__continue_iteration__")
-        )
-        is_continue = vm.call_w(w_continue_iteration, [w_it], color="red")
 
     return result
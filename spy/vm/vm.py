@@ -6,7 +6,7 @@ from typing import Any, Callable, Iterable, Optional, Sequence, Union, overload
 import fixedint
 import py.path
 
-from spy import ROOT, ast, libspy
+from spy import ROOT, ast, libspy, redshiftpool
 from spy.analyze.symtable import Color, ImportRef, maybe_blue
 from spy.ast import Color, FuncKind
 from spy.doppler import ErrorMode, redshift
@@ -14,6 +14,12 @@ from spy.errors import WIP, SPyError
 from spy.fqn import FQN, QUALIFIERS
 from spy.libspy import LLSPyInstance
 from spy.location import Loc
+from spy.redshiftcache import (
+    CacheMiss,
+    RedshiftCache,
+    SideEffectWatcher,
+    load_redshifted,
+)
 from spy.util import func_equals
 from spy.vm.b import B
 from spy.vm.bluecache import BlueCache
@@ -43,6 +49,7 @@ from spy.vm.modules.time import TIME
 from spy.vm.modules.types import TYPES, W_Loc
 from spy.vm.modules.unsafe import UNSAFE
 from spy.vm.object import W_Object, W_Type
+from spy.vm.opcache import OpCache
 from spy.vm.opimpl import W_OpImpl
 from spy.vm.opspec import W_MetaArg, W_OpSpec
 from spy.vm.primitive import (
@@ -60,6 +67,7 @@ from spy.vm.primitive import (
 )
 from spy.vm.property import W_ClassMethod, W_Property, W_StaticMethod
 from spy.vm.registry import ModuleRegistry
+from spy.vm.snapshot import VMSnapshot
 from spy.vm.str import W_Str
 from spy.vm.struct import UnwrappedStruct
 
@@ -110,8 +118,16 @@ class SPyVM:
     ast_color_map: Optional[dict[ast.Node, Color]]
     # If True, cache errors are collected and reported; if False, they're raised
     robust_import_caching: bool
+    use_closure_compiler: bool
+    opcache: OpCache
+    use_opcache: bool
 
-    def __init__(self, ll: Optional[LLSPyInstance] = None) -> None:
+    def __init__(
+        self,
+        ll: Optional[LLSPyInstance] = None,
+        *,
+        snapshot: Optional[VMSnapshot] = None,
+    ) -> None:
         if ll is None:
             assert libspy.LLMOD is not None
             self.ll = LLSPyInstance(libspy.LLMOD)
@@ -126,6 +142,16 @@ class SPyVM:
         self.emit_warning = lambda err: None
         self.ast_color_map = None  # By default, don't keep track of expr colors.
         self.robust_import_caching = False  # By default, raise cache errors
+        # execute redshifted functions with the closure compiler instead of
+        # ASTFrame. See vm/closurecompiler.py
+        self.use_closure_compiler = True
+        # inline caches for operators in non-redshifted frames. See
+        # vm/opcache.py
+        self.opcache = OpCache(self)
+        self.use_opcache = True
+        if snapshot is not None:
+            snapshot.restore(self)
+            return
         self.make_module(BUILTINS)
         self.make_module(OPERATOR)
         self.make_module(TYPES)
@@ -149,6 +175,21 @@ class SPyVM:
         ll = await LLSPyInstance.async_new(llmod)
         return SPyVM(ll=ll)
 
+    @classmethod
+    def from_snapshot(cls, snapshot: VMSnapshot) -> "SPyVM":
+        """
+        Create a new VM from a snapshot, see vm/snapshot.py
+        """
+        ll = LLSPyInstance(snapshot.llmod)
+        return cls(ll, snapshot=snapshot)
+
+    def snapshot(self) -> VMSnapshot:
+        """
+        Capture the current state of the VM, so that we can quickly create
+        new identical VMs with SPyVM.from_snapshot. See vm/snapshot.py.
+        """
+        return VMSnapshot(self)
+
     def import_(self, modname: str) -> W_Module:
         from spy.analyze.importing import ImportAnalyzer
 
@@ -181,9 +222,21 @@ class SPyVM:
 
         return None
 
-    def redshift(self, error_mode: ErrorMode) -> None:
+    def redshift(
+        self,
+        error_mode: ErrorMode,
+        cache: Optional[RedshiftCache] = None,
+        jobs: int = 1,
+    ) -> None:
         """
         Perform a redshift on all W_ASTFunc.
+
+        If a RedshiftCache is given, functions found in the cache are not
+        redshifted again, and the newly redshifted ones are recorded.
+
+        If jobs > 1, the functions are redshifted in parallel by a pool of
+        worker processes (see spy/redshiftpool.py). This is supported only in
+        eager error mode.
         """
 
         def should_redshift(w_func: W_ASTFunc) -> bool:
@@ -199,19 +252,83 @@ class SPyVM:
             funcs = list(get_funcs())
             if not funcs:
                 break
-            self._redshift_some(funcs, error_mode)
+            self._redshift_some(funcs, error_mode, cache, jobs)
 
     def _redshift_some(
         self,
         funcs: list[tuple[FQN, W_ASTFunc]],
         error_mode: ErrorMode,
+        cache: Optional[RedshiftCache] = None,
+        jobs: int = 1,
     ) -> None:
-        for fqn, w_func in funcs:
-            assert w_func.color != "blue"
-            assert not w_func.redshifted
+        def is_cached(w_func: W_ASTFunc) -> bool:
+            return cache is not None and cache.contains(w_func)
+
+        parallel = jobs > 1 and error_mode == "eager" and redshiftpool.can_fork()
+        blobs: redshiftpool.RESULTS = {}
+        i = 0
+        while i < len(funcs):
+            if parallel:
+                # start a new pass: fork the workers from the current state,
+                # and give them all the functions which have not been
+                # attempted yet. If a pass is not worth it, we go on serially.
+                todo = [
+                    (fqn, w_func)
+                    for fqn, w_func in funcs[i:]
+                    if fqn not in blobs and not is_cached(w_func)
+                ]
+                if len(todo) > 1:
+                    results = redshiftpool.redshift_in_workers(self, todo, jobs)
+                    blobs.update(results)
+                    n_ok = sum(blob is not None for blob in results.values())
+                    parallel = n_ok >= jobs
+                else:
+                    parallel = False
+
+            # merge the results in order, until we find a function which was
+            # not attempted by the workers
+            while i < len(funcs):
+                fqn, w_func = funcs[i]
+                if parallel and fqn not in blobs and not is_cached(w_func):
+                    break
+                self._redshift_one(fqn, w_func, error_mode, cache, blobs.get(fqn))
+                i += 1
+
+    def _redshift_one(
+        self,
+        fqn: FQN,
+        w_func: W_ASTFunc,
+        error_mode: ErrorMode,
+        cache: Optional[RedshiftCache],
+        blob: Optional[bytes],
+    ) -> None:
+        assert w_func.color != "blue"
+        assert not w_func.redshifted
+        w_newfunc = None
+        if cache is not None:
+            w_newfunc = cache.lookup(w_func)
+        if w_newfunc is None and blob is not None:
+            # the blob might reference globals which were created by the
+            # worker: in that case, we redshift the function again
+            try:
+                w_newfunc = load_redshifted(self, w_func, blob)
+            except CacheMiss:
+                pass
+            else:
+                if cache is not None:
+                    cache.record(w_newfunc)
+        if w_newfunc is None:
+            # if the redshift has side effects, we cannot cache it: a cache hit
+            # would skip them. The functions redshifted by the workers are
+            # already guaranteed not to have any.
+            watcher = SideEffectWatcher(self) if cache is not None else None
             w_newfunc = redshift(self, w_func, error_mode)
-            assert w_newfunc.redshifted
-            self.globals_w[fqn] = w_newfunc
+            if cache is not None and watcher is not None and not watcher.changed():
+                cache.record(w_newfunc)
+        assert w_newfunc.redshifted
+        self.globals_w[fqn] = w_newfunc
+        # the original version is never executed again
+        self.opcache.forget(w_func.funcdef)
 
     def register_module(self, w_mod: W_Module) -> None:
         assert w_mod.name not in self.modules_w